@@ -5,7 +5,10 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """Caring about persistance of the discovered services (aka autochecks)"""
 
-from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union, NamedTuple
+from typing import Any, Callable, Counter, Dict, List, Optional, Sequence, Set, Tuple, Union, NamedTuple
+import collections
+import hashlib
+import marshal
 import sys
 from pathlib import Path
 
@@ -26,6 +29,7 @@ from cmk.utils.type_defs import (
 )
 from cmk.utils.log import console
 
+import cmk.base.profiling as profiling
 from cmk.base.discovered_labels import DiscoveredServiceLabels, ServiceLabel
 from cmk.base.check_utils import LegacyCheckParameters, Service
 
@@ -198,15 +202,108 @@ def has_autochecks(hostname: HostName) -> bool:
     return _autochecks_path_for(hostname).exists()
 
 
+# The evaluated autochecks of a host are cached in a marshalled file together with
+# the key they were created for. The key changes whenever the autochecks file is
+# replaced or modified or the autochecks are evaluated with other check variables.
+_RawAutochecksCacheKey = Tuple[str, int, int, int, Optional[str]]
+_raw_autochecks_cache_stats: Counter[str] = collections.Counter()
+
+
+def _autochecks_cache_path_for(hostname: HostName) -> Path:
+    return Path(cmk.utils.paths.tmp_dir, "autochecks_cache", hostname)
+
+
+def _raw_autochecks_cache_key(
+    path: Path,
+    check_variables: Optional[Dict[str, Any]],
+) -> _RawAutochecksCacheKey:
+    stat = path.stat()
+    return (
+        str(path),
+        stat.st_ino,
+        stat.st_mtime_ns,
+        stat.st_size,
+        hashlib.md5(repr(sorted(check_variables.items())).encode("utf-8")).hexdigest()
+        if check_variables else None,
+    )
+
+
+def _load_cached_raw_autochecks(
+    hostname: HostName,
+    cache_key: _RawAutochecksCacheKey,
+) -> Optional[Union[List[Dict[str, Any]], Tuple]]:
+    try:
+        cached_key, raw_autochecks = marshal.loads(
+            _autochecks_cache_path_for(hostname).read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        console.vverbose("Ignoring invalid autochecks cache of %s: %s\n", hostname, e)
+        return None
+    return raw_autochecks if tuple(cached_key) == cache_key else None
+
+
+def _save_cached_raw_autochecks(
+    hostname: HostName,
+    cache_key: _RawAutochecksCacheKey,
+    raw_autochecks: Union[List[Dict[str, Any]], Tuple],
+) -> None:
+    try:
+        content = marshal.dumps((cache_key, raw_autochecks))
+    except ValueError:
+        return  # The parameters contain objects that can not be cached
+
+    path = _autochecks_cache_path_for(hostname)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        store.save_bytes_to_file(path, content)
+    except (OSError, MKGeneralException) as e:
+        console.vverbose("Cannot write autochecks cache of %s: %s\n", hostname, e)
+
+
+def _format_raw_autochecks_cache_stats() -> str:
+    hits = _raw_autochecks_cache_stats["hits"]
+    total = hits + _raw_autochecks_cache_stats["misses"]
+    return "%d hits, %d misses (hit rate: %.1f%%)" % (
+        hits,
+        total - hits,
+        100.0 * hits / total if total else 0.0,
+    )
+
+
+profiling.register_statistics("Autochecks cache", _format_raw_autochecks_cache_stats)
+
+
 def _load_raw_autochecks(
     *,
     path: Path,
     check_variables: Optional[Dict[str, Any]],
 ) -> Union[List[Dict[str, Any]], Tuple]:
-    """Read raw autochecks and resolve parameters"""
+    """Read raw autochecks and resolve parameters
+
+    The evaluated autochecks are cached, the file is only evaluated again after
+    it has been changed."""
     if not path.exists():
         return []
 
+    hostname = HostName(path.stem)
+    cache_key = _raw_autochecks_cache_key(path, check_variables)
+    raw_autochecks = _load_cached_raw_autochecks(hostname, cache_key)
+    if raw_autochecks is not None:
+        _raw_autochecks_cache_stats["hits"] += 1
+        return raw_autochecks
+    _raw_autochecks_cache_stats["misses"] += 1
+
+    raw_autochecks = _eval_raw_autochecks(path=path, check_variables=check_variables)
+    _save_cached_raw_autochecks(hostname, cache_key, raw_autochecks)
+    return raw_autochecks
+
+
+def _eval_raw_autochecks(
+    *,
+    path: Path,
+    check_variables: Optional[Dict[str, Any]],
+) -> Union[List[Dict[str, Any]], Tuple]:
     console.vverbose("Loading autochecks from %s\n", path)
     with path.open(encoding="utf-8") as f:
         raw_file_content = f.read()
@@ -14,7 +14,7 @@ import cmk.utils.debug
 import cmk.utils.paths
 import cmk.utils.piggyback
 import cmk.utils.tty as tty
-from cmk.utils.cpu_tracking import CPUTracker
+from cmk.utils.cpu_tracking import CPUTracker, Snapshot
 from cmk.utils.log import console
 from cmk.utils.type_defs import HostAddress, HostName, result, SourceType
 
@@ -224,19 +224,33 @@ def fetch_all(
     #             - hostname != source.hostname
     #             - ipaddress != source.ipaddress
     #           If this is impossible, then we do not need the Tuple[HostName, HostAddress, ...].
-    for _hostname, _ipaddress, sources in nodes:
-        for source in sources:
-            console.vverbose("  Source: %s/%s\n" % (source.source_type, source.fetcher_type))
+    sources = [source for _hostname, _ipaddress, node_sources in nodes for source in node_sources]
+    for source in sources:
+        source.file_cache_max_age = max_cachefile_age
+
+    # Connect to all the agents of a cluster at once instead of one after the other.
+    tcp_sources = [source for source in sources if isinstance(source, TCPSource)]
+    prefetched: Dict[int, Tuple[result.Result, Snapshot]] = {}
+    if len(tcp_sources) > 1:
+        prefetched = {
+            id(source): fetched
+            for source, fetched in zip(tcp_sources, TCPSource.fetch_concurrently(tcp_sources))
+        }
 
-            source.file_cache_max_age = max_cachefile_age
+    for source in sources:
+        console.vverbose("  Source: %s/%s\n" % (source.source_type, source.fetcher_type))
 
+        if id(source) in prefetched:
+            raw_data, duration = prefetched[id(source)]
+        else:
             with CPUTracker() as tracker:
                 raw_data = source.fetch()
-            yield FetcherMessage.from_raw_data(
-                raw_data,
-                tracker.duration,
-                source.fetcher_type,
-            )
+            duration = tracker.duration
+        yield FetcherMessage.from_raw_data(
+            raw_data,
+            duration,
+            source.fetcher_type,
+        )
 
 
 def update_host_sections(
@@ -298,6 +312,7 @@ def update_host_sections(
         cmk.utils.piggyback.store_piggyback_raw_data(
             hostname,
             host_sections.piggybacked_raw_data,
+            spool=config.piggyback_spool,
         )
 
     return data
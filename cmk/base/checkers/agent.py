@@ -4,11 +4,23 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
-import abc
+import codecs
+import enum
 import logging
+import re
 import time
 from pathlib import Path
-from typing import cast, Dict, Final, Iterable, List, MutableSet, NamedTuple, Optional, Tuple
+from typing import (
+    cast,
+    Dict,
+    Final,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from six import ensure_binary, ensure_str
 
@@ -40,7 +52,7 @@ from cmk.base.exceptions import MKGeneralException
 from cmk.base.ip_lookup import normalize_ip_addresses
 
 from ._abstract import FileCacheFactory, Mode, Parser, SectionNameCollection, Source, Summarizer
-from .host_sections import HostSections
+from .host_sections import HostSections, LazySections
 
 __all__ = ["AgentSource", "AgentHostSections"]
 
@@ -99,7 +111,8 @@ class AgentSource(Source[AgentRawData, AgentHostSections]):
             fetcher_type=fetcher_type,
             description=description,
             default_raw_data=AgentRawData(b""),
-            default_host_sections=AgentHostSections(),
+            default_host_sections=AgentHostSections(
+                LazySections[AgentRawDataSection](ScannedAgentOutput.decode)),
             id_=id_,
             cache_dir=Path(cmk.utils.paths.tcp_cache_dir) if main_data_source else None,
             persisted_section_dir=(Path(cmk.utils.paths.var_dir) /
@@ -304,292 +317,280 @@ class AgentSummarizerDefault(AgentSummarizer):
                 (agent_version, expected_version, e))
 
 
-class ParserState(abc.ABC):
-    """Base class for the state machine.
-
-    .. uml::
+class PiggybackMarker(NamedTuple):
+    hostname: HostName
 
-        state "NOOPState" as noop
-        state "PiggybackSectionParser" as piggy
-        state "HostSectionParser" as host
-        state c <<choice>>
+    @staticmethod
+    def is_header(line: bytes) -> bool:
+        return (line.strip().startswith(b'<<<<') and line.strip().endswith(b'>>>>') and
+                not PiggybackMarker.is_footer(line))
 
-        [*] --> noop
-        noop --> c
+    @staticmethod
+    def is_footer(line: bytes) -> bool:
+        return line.strip() == b'<<<<>>>>'
 
-        c --> host: ""<<~<STR>>>""
-        host -up-> host: ""<<~<STR>>>""
-        host -> piggy: ""<<<~<STR>>>>""
-        host -up-> noop: ""<<~<>>>""\nOR error
+    @classmethod
+    def from_headerline(cls, line: bytes, hostname: HostName) -> "PiggybackMarker":
+        piggybacked_hostname = ensure_str(line.strip()[4:-4])
+        assert piggybacked_hostname
+        piggybacked_hostname = config.translate_piggyback_host(hostname, piggybacked_hostname)
+        # Protect Checkmk against unallowed host names. Normally source scripts
+        # like agent plugins should care about cleaning their provided host names
+        # up, but we need to be sure here to prevent bugs in Checkmk code.
+        return cls(regex("[^%s]" % REGEX_HOST_NAME_CHARS).sub("_", piggybacked_hostname))
 
-        c --> piggy : ""<<<~<STR>>>>""
-        piggy --> piggy : ""<<<~<STR>>>>""
-        piggy -up-> noop: ""<<<~<>>>>""\nOR error
 
-    See Also:
-        Gamma, Helm, Johnson, Vlissides (1995) Design Patterns "State pattern"
+class SectionMarker(NamedTuple):
+    name: SectionName
+    cached: Optional[Tuple[int, int]]
+    encoding: str
+    nostrip: bool
+    persist: Optional[int]
+    separator: Optional[str]
 
-    """
-    def __init__(
-        self,
-        hostname: HostName,
-        host_sections: AgentHostSections,
-        *,
-        section_info: MutableSet["HostSectionParser.Header"],
-        logger: logging.Logger,
-    ) -> None:
-        self.hostname: Final = hostname
-        self.host_sections = host_sections
-        self.section_info = section_info
-        self._logger: Final = logger
+    @staticmethod
+    def is_header(line: bytes) -> bool:
+        line = line.strip()
+        return (line.startswith(b'<<<') and line.endswith(b'>>>') and
+                not SectionMarker.is_footer(line) and not PiggybackMarker.is_header(line) and
+                not PiggybackMarker.is_footer(line))
 
-    def to_noop_parser(self) -> "NOOPParser":
-        return NOOPParser(
-            self.hostname,
-            self.host_sections,
-            section_info=self.section_info,
-            logger=self._logger,
-        )
+    @staticmethod
+    def is_footer(line: bytes) -> bool:
+        return line.strip() == b'<<<>>>'
 
-    def to_host_section_parser(
-        self,
-        section_header: "HostSectionParser.Header",
-    ) -> "HostSectionParser":
-        return HostSectionParser(
-            self.hostname,
-            self.host_sections,
-            section_header,
-            section_info=self.section_info,
-            logger=self._logger,
-        )
+    @classmethod
+    def from_headerline(cls, headerline: bytes) -> "SectionMarker":
+        def parse_options(elems: Iterable[str]) -> Iterable[Tuple[str, str]]:
+            for option in elems:
+                if "(" not in option:
+                    continue
+                name, value = option.split("(", 1)
+                assert value[-1] == ")", value
+                yield name, value[:-1]
 
-    def to_piggyback_section_parser(
-        self,
-        piggybacked_hostname: HostName,
-    ) -> "PiggybackSectionParser":
-        return PiggybackSectionParser(
-            self.hostname,
-            self.host_sections,
-            piggybacked_hostname,
-            section_info=self.section_info,
-            logger=self._logger,
-        )
+        if not SectionMarker.is_header(headerline):
+            raise ValueError(headerline)
 
-    def __call__(self, line: bytes) -> "ParserState":
-        raise NotImplementedError()
+        headerparts = ensure_str(headerline[3:-3]).split(":")
+        options = dict(parse_options(headerparts[1:]))
+        cached: Optional[Tuple[int, int]]
+        try:
+            cached_ = tuple(map(int, options["cached"].split(",")))
+            cached = cached_[0], cached_[1]
+        except KeyError:
+            cached = None
 
+        encoding = options.get("encoding", "utf-8")
+        nostrip = options.get("nostrip") is not None
 
-class NOOPParser(ParserState):
-    def __call__(self, line: bytes) -> ParserState:
-        if not line.strip():
-            return self
+        persist: Optional[int]
+        try:
+            persist = int(options["persist"])
+        except KeyError:
+            persist = None
 
+        separator: Optional[str]
         try:
-            if PiggybackSectionParser.is_header(line):
-                piggybacked_hostname = PiggybackSectionParser.parse_header(line, self.hostname)
-                if piggybacked_hostname == self.hostname:
-                    # Unpiggybacked "normal" host
-                    return self
-                return self.to_piggyback_section_parser(piggybacked_hostname)
-            if HostSectionParser.is_header(line):
-                return self.to_host_section_parser(HostSectionParser.parse_header(line))
-        except Exception:
-            self._logger.warning("Ignoring invalid raw section: %r" % line, exc_info=True)
-            return self.to_noop_parser()
-        return self
-
-
-class PiggybackSectionParser(ParserState):
-    def __init__(
-        self,
-        hostname: HostName,
-        host_sections: AgentHostSections,
-        piggybacked_hostname: HostName,
-        *,
-        section_info: MutableSet["HostSectionParser.Header"],
-        logger: logging.Logger,
-    ) -> None:
-        super().__init__(
-            hostname,
-            host_sections,
-            section_info=section_info,
-            logger=logger,
+            separator = chr(int(options["sep"]))
+        except KeyError:
+            separator = None
+
+        return SectionMarker(
+            name=SectionName(headerparts[0]),
+            cached=cached,
+            encoding=encoding,
+            nostrip=nostrip,
+            persist=persist,
+            separator=separator,
         )
-        self.piggybacked_hostname: Final = piggybacked_hostname
 
-    def __call__(self, line: bytes) -> ParserState:
-        if not line.strip():
-            return self
+    def cache_info(self, cached_at: int) -> Optional[Tuple[int, int]]:
+        # If both `persist` and `cached` are present, `cached` has priority
+        # over `persist`.  I do not know whether this is correct.
+        if self.cached:
+            return self.cached
+        if self.persist is not None:
+            return cached_at, self.persist - cached_at
+        return None
 
-        try:
-            if PiggybackSectionParser.is_footer(line):
-                return self.to_noop_parser()
-            if PiggybackSectionParser.is_header(line):
-                # Footer is optional.
-                piggybacked_hostname = PiggybackSectionParser.parse_header(line, self.hostname)
-                if piggybacked_hostname == self.hostname:
-                    # Unpiggybacked "normal" host
-                    return self.to_noop_parser()
-                return self.to_piggyback_section_parser(piggybacked_hostname)
-            self.host_sections.piggybacked_raw_data.setdefault(
-                self.piggybacked_hostname,
-                [],
-            ).append(line)
-        except Exception:
-            self._logger.warning("Ignoring invalid raw section: %r" % line, exc_info=True)
-            return self.to_noop_parser()
-
-        return self
 
-    @staticmethod
-    def is_header(line: bytes) -> bool:
-        return (line.strip().startswith(b'<<<<') and line.strip().endswith(b'>>>>') and
-                not PiggybackSectionParser.is_footer(line))
+class _LineType(enum.Enum):
+    HOST_HEADER = enum.auto()
+    HOST_FOOTER = enum.auto()
+    PIGGYBACK_HEADER = enum.auto()
+    PIGGYBACK_FOOTER = enum.auto()
 
     @staticmethod
-    def is_footer(line: bytes) -> bool:
-        return line.strip() == b'<<<<>>>>'
+    def of(line: bytes) -> "_LineType":
+        """Classify a line that `AgentOutputScanner` found as candidate."""
+        line = line.strip()
+        if line == b"<<<>>>":
+            return _LineType.HOST_FOOTER
+        if line == b"<<<<>>>>":
+            return _LineType.PIGGYBACK_FOOTER
+        if line.startswith(b"<<<<") and line.endswith(b">>>>"):
+            return _LineType.PIGGYBACK_HEADER
+        return _LineType.HOST_HEADER
 
-    @staticmethod
-    def parse_header(line: bytes, hostname: HostName) -> HostName:
-        piggybacked_hostname = ensure_str(line.strip()[4:-4])
-        assert piggybacked_hostname
-        piggybacked_hostname = config.translate_piggyback_host(hostname, piggybacked_hostname)
-        # Protect Checkmk against unallowed host names. Normally source scripts
-        # like agent plugins should care about cleaning their provided host names
-        # up, but we need to be sure here to prevent bugs in Checkmk code.
-        return regex("[^%s]" % REGEX_HOST_NAME_CHARS).sub("_", piggybacked_hostname)
 
+class ScannedAgentOutput:
+    """The result of `AgentOutputScanner.scan()`.
 
-class HostSectionParser(ParserState):
-    class Header(NamedTuple):
-        name: SectionName
-        cached: Optional[Tuple[int, int]]
-        encoding: str
-        nostrip: bool
-        persist: Optional[int]
-        separator: Optional[str]
+    The section bodies are kept as slices of the agent output.  They are
+    only decoded and tokenized when the section is accessed.
 
-        @classmethod
-        def from_headerline(cls, headerline: bytes) -> "HostSectionParser.Header":
-            def parse_options(elems: Iterable[str]) -> Iterable[Tuple[str, str]]:
-                for option in elems:
-                    if "(" not in option:
-                        continue
-                    name, value = option.split("(", 1)
-                    assert value[-1] == ")", value
-                    yield name, value[:-1]
-
-            if not HostSectionParser.is_header(headerline):
-                raise ValueError(headerline)
-
-            headerparts = ensure_str(headerline[3:-3]).split(":")
-            options = dict(parse_options(headerparts[1:]))
-            cached: Optional[Tuple[int, int]]
-            try:
-                cached_ = tuple(map(int, options["cached"].split(",")))
-                cached = cached_[0], cached_[1]
-            except KeyError:
-                cached = None
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self.sections = LazySections[AgentRawDataSection](ScannedAgentOutput.decode)
+        self.section_info: Set[SectionMarker] = set()
+        self.piggybacked_raw_data: Dict[HostName, List[bytes]] = {}
+
+    def host_sections(self) -> AgentHostSections:
+        return AgentHostSections(
+            self.sections,
+            piggybacked_raw_data=self.piggybacked_raw_data,
+        )
 
-            encoding = options.get("encoding", "utf-8")
-            nostrip = options.get("nostrip") is not None
+    @staticmethod
+    def decode(chunks: Iterable[Tuple[SectionMarker, memoryview]]
+              ) -> AgentRawDataSection:
+        section: AgentRawDataSection = []
+        for header, chunk in chunks:
+            lines = chunk.tobytes().split(b"\n")
+            if header.nostrip:
+                lines = [line for line in lines if line.strip()]
+            else:
+                lines = [line for line in map(bytes.strip, lines) if line]
+            section.extend(
+                text.split(header.separator)
+                for text in ScannedAgentOutput._decode_lines(lines, header.encoding))
+        return section
 
-            persist: Optional[int]
+    @staticmethod
+    def _decode_lines(lines: List[bytes], encoding: str) -> List[str]:
+        if not lines:
+            return []
+        if codecs.lookup(encoding).name == "utf-8":
+            # Decoding all lines at once is much faster.  UTF-8 never uses the
+            # newline byte in multibyte sequences, so this is the same as
+            # decoding the lines one by one, unless one of them fails.
             try:
-                persist = int(options["persist"])
-            except KeyError:
-                persist = None
+                return b"\n".join(lines).decode(encoding).split("\n")
+            except UnicodeDecodeError:
+                pass
+        return [
+            ensure_str_with_fallback(line, encoding=encoding, fallback="latin-1")
+            for line in lines
+        ]
 
-            separator: Optional[str]
-            try:
-                separator = chr(int(options["sep"]))
-            except KeyError:
-                separator = None
-
-            return HostSectionParser.Header(
-                name=SectionName(headerparts[0]),
-                cached=cached,
-                encoding=encoding,
-                nostrip=nostrip,
-                persist=persist,
-                separator=separator,
-            )
 
-        def cache_info(self, cached_at: int) -> Optional[Tuple[int, int]]:
-            # If both `persist` and `cached` are present, `cached` has priority
-            # over `persist`.  I do not know whether this is correct.
-            if self.cached:
-                return self.cached
-            if self.persist is not None:
-                return cached_at, self.persist - cached_at
-            return None
+class AgentOutputScanner:
+    """Single pass parser for the agent output.
 
-    def __init__(
-        self,
-        hostname: HostName,
-        host_sections: AgentHostSections,
-        section_header: Header,
-        *,
-        section_info: MutableSet[Header],
-        logger: logging.Logger,
-    ) -> None:
-        host_sections.sections.setdefault(section_header.name, [])
-        section_info.add(section_header)
-        super().__init__(
-            hostname,
-            host_sections,
-            section_info=section_info,
-            logger=logger,
-        )
-        self.section_header = section_header
+    The result is the same as parsing the agent output line by line, but
+    only the header and footer lines are examined in Python.  They are found with a single regex scan over the
+    agent output.  Everything in between is kept as a `memoryview` slice.
 
-    def __call__(self, line: bytes) -> ParserState:
-        if not line.strip():
-            return self
+    """
+    # Like `line.strip().startswith(b"<<<") and line.strip().endswith(b">>>")`.
+    _candidate = re.compile(rb"^[ \t\r\x0b\x0c]*<<<[^\n]*>>>[ \t\r\x0b\x0c]*$", re.MULTILINE)
 
-        try:
-            if PiggybackSectionParser.is_header(line):
-                piggybacked_hostname = PiggybackSectionParser.parse_header(line, self.hostname)
-                if piggybacked_hostname == self.hostname:
-                    # Unpiggybacked "normal" host
-                    return self
-                return self.to_piggyback_section_parser(piggybacked_hostname)
-            if HostSectionParser.is_footer(line):
-                return self.to_noop_parser()
-            if HostSectionParser.is_header(line):
-                # Footer is optional.
-                return self.to_host_section_parser(HostSectionParser.parse_header(line))
-
-            if not self.section_header.nostrip:
-                line = line.strip()
-
-            self.host_sections.sections[self.section_header.name].append(
-                ensure_str_with_fallback(
-                    line,
-                    encoding=self.section_header.encoding,
-                    fallback="latin-1",
-                ).split(self.section_header.separator))
-        except Exception:
-            self._logger.warning("Ignoring invalid raw section: %r" % line, exc_info=True)
-            return self.to_noop_parser()
-        return self
+    def __init__(self, hostname: HostName, *, logger: logging.Logger) -> None:
+        super().__init__()
+        self.hostname: Final = hostname
+        self._logger: Final = logger
 
-    @staticmethod
-    def is_header(line: bytes) -> bool:
-        line = line.strip()
-        return (line.startswith(b'<<<') and line.endswith(b'>>>') and
-                not HostSectionParser.is_footer(line) and
-                not PiggybackSectionParser.is_header(line) and
-                not PiggybackSectionParser.is_footer(line))
+    def scan(self, raw_data: AgentRawData) -> ScannedAgentOutput:
+        scanned = ScannedAgentOutput()
+        data = memoryview(raw_data)
+
+        # The state: in a host section (`header`), in a piggybacked
+        # section (`piggybacked_hostname`) or in between (neither).
+        header: Optional[SectionMarker] = None
+        piggybacked_hostname: Optional[HostName] = None
+        # Start of the body of the current section.
+        body = 0
+        for match in AgentOutputScanner._candidate.finditer(raw_data):
+            line = match.group()
+            line_type = _LineType.of(line)
+
+            if header is not None:
+                if line_type is _LineType.PIGGYBACK_FOOTER:
+                    continue  # part of the section body
+                if not self._add_section_body(scanned, header, data[body:match.start()]):
+                    header = None
+            elif piggybacked_hostname is not None:
+                if line_type in (_LineType.HOST_HEADER, _LineType.HOST_FOOTER):
+                    continue  # part of the piggybacked data
+                self._add_piggybacked_lines(
+                    scanned,
+                    piggybacked_hostname,
+                    data[body:match.start()],
+                )
+            elif line_type in (_LineType.HOST_FOOTER, _LineType.PIGGYBACK_FOOTER):
+                continue
+
+            body = match.end() + 1
+            try:
+                if line_type is _LineType.PIGGYBACK_HEADER:
+                    hostname = PiggybackMarker.from_headerline(line, self.hostname).hostname
+                    if hostname != self.hostname:
+                        header, piggybacked_hostname = None, hostname
+                    elif piggybacked_hostname is not None:
+                        # Unpiggybacked "normal" host
+                        piggybacked_hostname = None
+                    # else: stay in the current host section, if any
+                elif line_type is _LineType.HOST_HEADER:
+                    header, piggybacked_hostname = SectionMarker.from_headerline(line), None
+                    scanned.sections.add_raw(header.name, [])
+                    scanned.section_info.add(header)
+                else:
+                    header, piggybacked_hostname = None, None
+            except Exception:
+                self._logger.warning("Ignoring invalid raw section: %r" % line, exc_info=True)
+                header, piggybacked_hostname = None, None
+
+        if header is not None:
+            self._add_section_body(scanned, header, data[body:])
+        elif piggybacked_hostname is not None:
+            self._add_piggybacked_lines(scanned, piggybacked_hostname, data[body:])
+        return scanned
+
+    def _add_section_body(
+        self,
+        scanned: ScannedAgentOutput,
+        header: SectionMarker,
+        chunk: memoryview,
+    ) -> bool:
+        if not AgentOutputScanner._is_known_encoding(header.encoding):
+            # Like line by line parsing, fail on the first line of the body.
+            for line in bytes(chunk).split(b"\n"):
+                if line.strip():
+                    self._logger.warning("Ignoring invalid raw section: %r" % line)
+                    return False
+            return True
+        scanned.sections.add_raw(header.name, [(header, chunk)])
+        return True
 
     @staticmethod
-    def is_footer(line: bytes) -> bool:
-        return line.strip() == b'<<<>>>'
+    def _add_piggybacked_lines(
+        scanned: ScannedAgentOutput,
+        piggybacked_hostname: HostName,
+        chunk: memoryview,
+    ) -> None:
+        lines = [line for line in bytes(chunk).split(b"\n") if line.strip()]
+        if lines:
+            scanned.piggybacked_raw_data.setdefault(piggybacked_hostname, []).extend(lines)
 
     @staticmethod
-    def parse_header(line: bytes) -> Header:
-        return HostSectionParser.Header.from_headerline(line)
+    def _is_known_encoding(encoding: str) -> bool:
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            return False
+        return True
 
 
 class AgentParser(Parser[AgentRawData, AgentHostSections]):
@@ -615,15 +616,15 @@ class AgentParser(Parser[AgentRawData, AgentHostSections]):
         if config.agent_simulator:
             raw_data = agent_simulator.process(raw_data)
 
-        parser = self._parse_host_section(raw_data)
-        host_sections = parser.host_sections
+        scanned = AgentOutputScanner(self.hostname, logger=self._logger).scan(raw_data)
+        host_sections = scanned.host_sections()
 
         cached_at = int(time.time())
         # Transform to seconds and give the piggybacked host a little bit more time
         cache_age = int(1.5 * 60 * self.host_config.check_mk_check_interval)
         host_sections.cache_info.update({
             header.name: cast(Tuple[int, int], header.cache_info(cached_at))
-            for header in parser.section_info
+            for header in scanned.section_info
             if header.cache_info(cached_at) is not None
         })
         host_sections.piggybacked_raw_data = self._make_updated_piggyback_section_header(
@@ -633,7 +634,7 @@ class AgentParser(Parser[AgentRawData, AgentHostSections]):
         )
         persisted_sections = PersistedSections[AgentRawDataSection].from_sections(
             host_sections.sections,
-            {section_header.name: section_header.persist for section_header in parser.section_info},
+            {section_header.name: section_header.persist for section_header in scanned.section_info},
             cached_at=cached_at,
         )
         persisted_sections.update_and_store(self.section_store)
@@ -644,19 +645,6 @@ class AgentParser(Parser[AgentRawData, AgentHostSections]):
         )
         return host_sections.filter(selection)
 
-    def _parse_host_section(self, raw_data: AgentRawData) -> ParserState:
-        """Split agent output in chunks, splits lines by whitespaces."""
-        parser: ParserState = NOOPParser(
-            self.hostname,
-            AgentHostSections(),
-            section_info=set(),
-            logger=self._logger,
-        )
-        for line in raw_data.split(b"\n"):
-            parser = parser(line.rstrip(b"\n"))
-
-        return parser
-
     @staticmethod
     def _make_updated_piggyback_section_header(
         piggybacked_raw_data: Dict[HostName, List[bytes]],
@@ -672,7 +660,7 @@ class AgentParser(Parser[AgentRawData, AgentHostSections]):
             Return any other line without modification.
 
             """
-            if not HostSectionParser.is_header(line):
+            if not SectionMarker.is_header(line):
                 return line
             if b':cached(' in line or b':persist(' in line:
                 return line
@@ -9,12 +9,15 @@ from typing import Any, Dict, IO, List, Literal, Optional
 
 from cmk.utils.type_defs import HostAddress, HostName
 
+from cmk.fetchers.controller import GlobalConfig
+
 import cmk.base.config as config
 
 from ._abstract import Mode
 from ._checkers import make_sources
+from .snmp import make_plugin_store
 
-__all__ = ["dump", "dumps"]
+__all__ = ["dump", "dumps", "dumps_global"]
 
 
 def dump(hostname: HostName, ipaddress: Optional[HostAddress], file_: IO[str]) -> None:
@@ -27,6 +30,16 @@ def dumps(hostname: HostName, ipaddress: Optional[HostAddress]) -> str:
     return json.dumps(_make(hostname, ipaddress))
 
 
+def dumps_global(cmc_log_level: int) -> str:
+    """Return the configuration shared by all fetchers."""
+    return json.dumps(
+        GlobalConfig(
+            cmc_log_level=cmc_log_level,
+            snmp_plugin_store=make_plugin_store(),
+            concurrent_fetchers=config.concurrent_fetchers,
+        ).serialize())
+
+
 def _make(
     hostname: HostName,
     ipaddress: Optional[HostAddress],
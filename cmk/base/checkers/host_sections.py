@@ -11,14 +11,18 @@ from typing import (
     Any,
     Callable,
     cast,
+    Container,
     Dict,
+    Final,
     Generic,
     ItemsView,
     Iterator,
     KeysView,
     List,
+    Mapping,
     MutableMapping,
     Optional,
+    Sequence,
     Set,
     Tuple,
     TypeVar,
@@ -53,6 +57,87 @@ THostSections = TypeVar("THostSections", bound="HostSections")
 ParsedSectionContent = Any
 
 
+class _Pending:
+    """The raw chunks of a section that has not been decoded yet."""
+    __slots__ = ["chunks"]
+
+    def __init__(self, chunks: List[Any]) -> None:
+        self.chunks = chunks
+
+
+class LazySections(MutableMapping[SectionName, TRawDataSection]):
+    """Mapping of sections that are only decoded on first access.
+
+    The raw data of a section is kept as a list of chunks that `decode`
+    turns into the section content when the section is looked up for the
+    first time.  The decoded content replaces the chunks.
+
+    """
+    def __init__(self, decode: Callable[[Sequence[Any]], TRawDataSection]) -> None:
+        super().__init__()
+        self.decode: Final = decode
+        self._data: Dict[SectionName, Union[_Pending, TRawDataSection]] = {}
+
+    def __repr__(self) -> str:
+        return "%s(decoded=%r, pending=%r)" % (
+            type(self).__name__,
+            {k: v for k, v in self._data.items() if not isinstance(v, _Pending)},
+            [k for k, v in self._data.items() if isinstance(v, _Pending)],
+        )
+
+    def __getitem__(self, key: SectionName) -> TRawDataSection:
+        value = self._data[key]
+        if isinstance(value, _Pending):
+            value = self._data[key] = self.decode(value.chunks)
+        return value
+
+    def __setitem__(self, key: SectionName, value: TRawDataSection) -> None:
+        self._data[key] = value
+
+    def __delitem__(self, key: SectionName) -> None:
+        del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[SectionName]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def is_decoded(self, key: SectionName) -> bool:
+        return not isinstance(self._data[key], _Pending)
+
+    def add_raw(self, key: SectionName, chunks: Sequence[Any]) -> None:
+        """Append raw chunks to a section, create the section if needed."""
+        value = self._data.setdefault(key, _Pending([]))
+        if isinstance(value, _Pending):
+            value.chunks.extend(chunks)
+        elif chunks:
+            value.extend(self.decode(chunks))
+
+    def extend(self, other: Mapping[SectionName, TRawDataSection]) -> None:
+        """Append the content of the sections in `other`, without decoding if possible."""
+        for key in other:
+            if isinstance(other, LazySections) and other.decode is self.decode:
+                value = other._data[key]
+                if isinstance(value, _Pending):
+                    self.add_raw(key, value.chunks)
+                    continue
+            self.setdefault(key, cast(TRawDataSection, [])).extend(other[key])
+
+    def restricted(self, keys: Container[SectionName]) -> "LazySections[TRawDataSection]":
+        """Return the sections in `keys`, without decoding them."""
+        lazy_sections = LazySections(self.decode)
+        lazy_sections._data = {
+            k: _Pending(list(v.chunks)) if isinstance(v, _Pending) else v
+            for k, v in self._data.items()
+            if k in keys
+        }
+        return lazy_sections
+
+
 class HostSections(Generic[TRawDataSection], metaclass=abc.ABCMeta):
     """A wrapper class for the host information read by the data sources
 
@@ -73,7 +158,7 @@ class HostSections(Generic[TRawDataSection], metaclass=abc.ABCMeta):
         piggybacked_raw_data: Optional[Dict[HostName, List[bytes]]] = None,
     ) -> None:
         super().__init__()
-        self.sections = sections if sections else {}
+        self.sections = sections if sections is not None else {}
         self.cache_info = cache_info if cache_info else {}
         self.piggybacked_raw_data = piggybacked_raw_data if piggybacked_raw_data else {}
 
@@ -97,6 +182,7 @@ class HostSections(Generic[TRawDataSection], metaclass=abc.ABCMeta):
         if selection is NO_SELECTION:
             return self
         return HostSections(
+            self.sections.restricted(selection) if isinstance(self.sections, LazySections) else
             {k: v for k, v in self.sections.items() if k in selection},
             cache_info={k: v for k, v in self.cache_info.items() if k in selection},
             piggybacked_raw_data={
@@ -111,11 +197,14 @@ class HostSections(Generic[TRawDataSection], metaclass=abc.ABCMeta):
     #       Would this be correct here?
     def add(self, host_sections: "HostSections") -> None:
         """Add the content of `host_sections` to this HostSection."""
-        for section_name, section_content in host_sections.sections.items():
-            self.sections.setdefault(
-                section_name,
-                cast(TRawDataSection, []),
-            ).extend(section_content)
+        if isinstance(self.sections, LazySections):
+            self.sections.extend(host_sections.sections)
+        else:
+            for section_name, section_content in host_sections.sections.items():
+                self.sections.setdefault(
+                    section_name,
+                    cast(TRawDataSection, []),
+                ).extend(section_content)
 
         for hostname, raw_lines in host_sections.piggybacked_raw_data.items():
             self.piggybacked_raw_data.setdefault(hostname, []).extend(raw_lines)
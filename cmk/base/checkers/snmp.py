@@ -166,6 +166,7 @@ class SNMPSource(Source[SNMPRawData, SNMPHostSections]):
                 self.snmp_config.hostname,
                 config.snmp_without_sys_descr,
             ),
+            detection_cache_ttl=config.snmp_detection_cache_ttl,
             do_status_data_inventory=self.host_config.do_status_data_inventory,
             snmp_config=self.snmp_config,
         )
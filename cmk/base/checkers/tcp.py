@@ -5,10 +5,13 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import socket
-from typing import Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from cmk.utils.type_defs import HostAddress, HostName, SourceType
+import cmk.utils.debug
+from cmk.utils.cpu_tracking import Snapshot
+from cmk.utils.type_defs import AgentRawData, HostAddress, HostName, result, SourceType
 
+import cmk.fetchers.tcp as tcp
 from cmk.fetchers import FetcherType, TCPFetcher
 from cmk.fetchers.agent import DefaultAgentFileCache
 
@@ -60,6 +63,30 @@ class TCPSource(AgentSource):
             use_only_cache=self.use_only_cache,
         )
 
+    @staticmethod
+    def fetch_concurrently(
+        sources: Sequence["TCPSource"],
+    ) -> Sequence[Tuple[result.Result[AgentRawData, Exception], Snapshot]]:
+        """Fetch the data of all the sources at once.
+
+        See Also:
+            `cmk.fetchers.tcp.fetch_concurrently`
+
+        """
+        fetchers: List[Tuple[TCPFetcher, Mode]] = []
+        errors: Dict[int, Exception] = {}
+        for index, source in enumerate(sources):
+            try:
+                fetchers.append((source._make_fetcher(), source.mode))
+            except Exception as exc:
+                if cmk.utils.debug.enabled():
+                    raise
+                errors[index] = exc
+
+        fetched = iter(tcp.fetch_concurrently(fetchers))
+        return [(result.Error(errors[index]), Snapshot.null()) if index in errors else next(fetched)
+                for index in range(len(sources))]
+
     def _make_summarizer(self) -> AgentSummarizerDefault:
         return AgentSummarizerDefault(self.exit_spec, self)
 
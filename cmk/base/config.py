@@ -7,11 +7,13 @@
 import ast
 import contextlib
 import copy
+import gc
 import inspect
 import itertools
 import marshal
 import numbers
 import os
+import pickle
 import py_compile
 import struct
 import sys
@@ -27,6 +29,7 @@ from typing import (
     Iterator,
     List,
     Literal,
+    Mapping,
     NamedTuple,
     Optional,
     Sequence,
@@ -54,6 +57,7 @@ import cmk.utils.store as store
 import cmk.utils.tags
 import cmk.utils.translations
 import cmk.utils.version as cmk_version
+from cmk.utils.caching import format_cache_statistics
 from cmk.utils.check_utils import section_name_of
 from cmk.utils.encoding import ensure_str_with_fallback
 from cmk.utils.exceptions import MKGeneralException, MKTerminate
@@ -100,6 +104,7 @@ import cmk.base.autochecks as autochecks
 import cmk.base.check_api_utils as check_api_utils
 import cmk.base.check_utils
 import cmk.base.default_config as default_config
+import cmk.base.profiling as profiling
 from cmk.base.api.agent_based.checking_classes import CheckPlugin
 from cmk.base.api.agent_based.register.check_plugins_legacy import create_check_plugin_from_legacy
 from cmk.base.api.agent_based.register.section_plugins_legacy import (
@@ -637,10 +642,8 @@ class PackedConfigGenerator:
     def __init__(self, config_cache: "ConfigCache") -> None:
         self._config_cache = config_cache
 
-    def generate(self) -> str:
-        helper_config = ("#!/usr/bin/env python\n"
-                         "# encoding: utf-8\n"
-                         "# Created by Checkmk. Dump of the currently active configuration\n\n")
+    def generate(self) -> Dict[str, Any]:
+        helper_config: Dict[str, Any] = {}
 
         # These functions purpose is to filter out hosts which are monitored on different sites
         active_hosts = self._config_cache.all_active_hosts()
@@ -698,13 +701,10 @@ class PackedConfigGenerator:
             if varname not in derived_config_variable_names and val == variable_defaults[varname]:
                 continue
 
-            if not self._packable(varname, val):
-                continue
-
             if varname in filter_var_functions:
                 val = filter_var_functions[varname](val)
 
-            helper_config += "\n%s = %r\n" % (varname, val)
+            helper_config[varname] = val
 
         #
         # Add discovery rules
@@ -715,10 +715,7 @@ class PackedConfigGenerator:
             if not value:
                 continue
 
-            if not self._packable(str(ruleset_name), value):
-                continue
-
-            helper_config += "\n%s = %r\n" % (ruleset_name, value)
+            helper_config[str(ruleset_name)] = value
 
         #
         # Add modified check specific Checkmk base settings
@@ -728,48 +725,101 @@ class PackedConfigGenerator:
             if val == _check_variable_defaults[varname]:
                 continue
 
-            if not self._packable(varname, val):
-                continue
-
-            helper_config += "\n%s = %r\n" % (varname, val)
+            helper_config[varname] = val
 
         return helper_config
 
-    def _packable(self, varname: str, val: Any) -> bool:
-        """Checks whether or not a variable can be written to the config.mk
-        and read again from it."""
-        if isinstance(val, (str, int, bool)) or not val:
-            return True
 
-        try:
-            eval(repr(val))
-            return True
-        except SyntaxError:
-            return False
+# The position of each variable in the packed configuration: offset, length, is_pickled
+_PackedIndex = Dict[str, Tuple[int, int, bool]]
 
 
 class PackedConfigStore:
-    """Caring about persistence of the packed configuration"""
+    """Caring about persistence of the packed configuration
+
+    The variables are serialized one by one and stored together with an
+    index of their positions in the file. This way no Python source code
+    has to be created, compiled and executed.
+
+    File layout: magic, length of the index, marshaled index
+    {varname: (offset, length, is_pickled)} and the serialized values.
+    Values are marshaled, which is the fastest to load. Values marshal
+    can not handle (e.g. instances of custom classes) are pickled.
+    """
+    _MAGIC: Final[bytes] = b"\x00CMKPACKED\x01\n"
+    _INDEX_LENGTH: Final[struct.Struct] = struct.Struct("!I")
+    _MARSHAL_VERSION: Final[int] = 4
+
     def __init__(self, serial: OptionalConfigSerial) -> None:
         base_path: Final[Path] = cmk.utils.paths.make_helper_config_path(serial)
         self._compiled_path: Final[Path] = base_path / "precompiled_check_config.mk"
-        self._source_path: Final[Path] = base_path / "precompiled_check_config.mk.orig"
 
-    def write(self, helper_config: str) -> None:
-        self._source_path.parent.mkdir(parents=True, exist_ok=True)
-        store.save_file(self._source_path, helper_config + "\n")
+    def write(self, helper_config: Mapping[str, Any]) -> None:
+        index: _PackedIndex = {}
+        values: List[bytes] = []
+        offset = 0
+        for varname, value in helper_config.items():
+            packed = self._pack(varname, value)
+            if packed is None:
+                continue
+            packed_value, is_pickled = packed
+            index[varname] = (offset, len(packed_value), is_pickled)
+            values.append(packed_value)
+            offset += len(packed_value)
+
+        packed_index = marshal.dumps(index, self._MARSHAL_VERSION)
+        self._compiled_path.parent.mkdir(parents=True, exist_ok=True)
+        store.save_bytes_to_file(
+            self._compiled_path,
+            b"".join(
+                [self._MAGIC, self._INDEX_LENGTH.pack(len(packed_index)), packed_index] + values),
+        )
 
-        code = compile(helper_config, '<string>', 'exec')
-        tmp_path = self._compiled_path.parent / (self._compiled_path.name + ".compiled")
-        with tmp_path.open("wb") as compiled_file:
-            marshal.dump(code, compiled_file)
-        tmp_path.rename(self._compiled_path)
+    def _pack(self, varname: str, value: Any) -> Optional[Tuple[bytes, bool]]:
+        try:
+            return marshal.dumps(value, self._MARSHAL_VERSION), False
+        except ValueError:
+            pass
+
+        try:
+            return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), True
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            console.verbose("Not adding %s to the packed configuration: %s\n" % (varname, e))
+            return None
 
     def read(self) -> Dict[str, Any]:
         with self._compiled_path.open("rb") as f:
+            content = f.read()
+
+        if not content.startswith(self._MAGIC):
+            return self._read_compiled_code(content)
+
+        index_start = len(self._MAGIC) + self._INDEX_LENGTH.size
+        index_length, = self._INDEX_LENGTH.unpack_from(content, len(self._MAGIC))
+        index: _PackedIndex = marshal.loads(content[index_start:index_start + index_length])
+        data_start = index_start + index_length
+
+        # Deserializing creates lots of containers, none of them garbage. Don't let
+        # them trigger garbage collections which would dominate the loading time.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
             namespace: Dict[str, Any] = {}
-            exec(marshal.load(f), globals(), namespace)
+            for varname, (offset, length, is_pickled) in index.items():
+                packed_value = content[data_start + offset:data_start + offset + length]
+                namespace[varname] = (pickle.loads(packed_value)
+                                      if is_pickled else marshal.loads(packed_value))
             return namespace
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    @staticmethod
+    def _read_compiled_code(content: bytes) -> Dict[str, Any]:
+        # Packed configurations created by previous versions consist of marshaled code
+        namespace: Dict[str, Any] = {}
+        exec(marshal.loads(content), globals(), namespace)
+        return namespace
 
 
 def make_core_autochecks_dir(serial: OptionalConfigSerial) -> Path:
@@ -2582,12 +2632,16 @@ class HostConfig:
                 return SNMPBackend.inline
             if host_backend == "classic":
                 return SNMPBackend.classic
+            if host_backend == "session":
+                return SNMPBackend.session
             raise MKGeneralException("Bad Host SNMP Backend configuration: %s" % host_backend)
 
         if with_legacy_inline_snmp and snmp_backend_default == "inline_legacy":
             return SNMPBackend.inline_legacy
         if with_inline_snmp and snmp_backend_default == "inline":
             return SNMPBackend.inline
+        if snmp_backend_default == "session":
+            return SNMPBackend.session
         return SNMPBackend.classic
 
     def _is_cluster(self) -> bool:
@@ -3176,6 +3230,7 @@ class ConfigCache:
             clusters_of=self._clusters_of_cache,
             nodes_of=self._nodes_of_cache,
             all_configured_hosts=self._all_configured_hosts,
+            cache_sizes=ruleset_matcher_cache_sizes,
         )
 
         # Warning: do not change call order. all_active_hosts relies on the other values
@@ -3786,6 +3841,16 @@ def get_config_cache() -> ConfigCache:
     return config_cache["cache"]
 
 
+def _format_ruleset_matcher_cache_statistics() -> str:
+    config_cache = _config_cache.get_dict("config_cache")
+    if not config_cache:
+        return "not initialized"
+    return "\n" + format_cache_statistics(config_cache["cache"].ruleset_matcher.cache_statistics())
+
+
+profiling.register_statistics("Ruleset matcher caches", _format_ruleset_matcher_cache_statistics)
+
+
 # TODO: Find a clean way to move this to cmk.base.cee. This will be possible once the
 # configuration settings are not held in cmk.base.config namespace anymore.
 class CEEConfigCache(ConfigCache):
@@ -5,11 +5,26 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import abc
+import functools
+import multiprocessing
 import numbers
 import os
 import sys
 import shutil
-from typing import AnyStr, Callable, Dict, List, Optional, Tuple, Union, Iterator, Final, Iterable
+from typing import (
+    AnyStr,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+    Iterator,
+    Final,
+    Iterable,
+)
 from contextlib import contextmanager, suppress
 from pathlib import Path
 
@@ -52,6 +67,8 @@ CoreCommandName = str
 CoreCommand = str
 CheckCommandArguments = Iterable[Union[int, float, str, Tuple[str, str, str]]]
 
+_T = TypeVar("_T")
+
 
 class HelperConfig:
     """Managing the helper core config generations below var/check_mk/core/helper-config/[serial]
@@ -181,6 +198,64 @@ def duplicate_service_warning(
                    (checktype, description, host_name, *first_occurrence, *second_occurrence))
 
 
+#.
+#   .--Parallel------------------------------------------------------------.
+#   |                ____                 _ _      _                       |
+#   |               |  _ \ __ _ _ __ __ _| | | ___| |                      |
+#   |               | |_) / _` | '__/ _` | | |/ _ \ |                      |
+#   |               |  __/ (_| | | | (_| | | |  __/ |                      |
+#   |               |_|   \__,_|_|  \__,_|_|_|\___|_|                      |
+#   |                                                                      |
+#   +----------------------------------------------------------------------+
+#   | Process the hosts in parallel during configuration creation          |
+#   '----------------------------------------------------------------------'
+
+# Number of chunks per worker process. More chunks balance the load better
+# between the workers, fewer chunks reduce the overhead.
+_CHUNKS_PER_PROCESS = 4
+
+
+def host_chunks(hostnames: Sequence[HostName], processes: int) -> List[List[HostName]]:
+    """Split the hosts into consecutive chunks, keeping their order"""
+    chunk_size = max(1, -(-len(hostnames) // (processes * _CHUNKS_PER_PROCESS)))
+    return [
+        list(hostnames[index:index + chunk_size])
+        for index in range(0, len(hostnames), chunk_size)
+    ]
+
+
+def _process_host_chunk(
+    func: Callable[[List[HostName]], _T],
+    hostnames: List[HostName],
+) -> Tuple[_T, ConfigurationWarnings, List[HostName]]:
+    # The worker reports its warnings and failed IP lookups to the parent
+    initialize_warnings()
+    del _failed_ip_lookups[:]
+    return func(hostnames), g_configuration_warnings, _failed_ip_lookups
+
+
+def process_hosts_parallel(
+    func: Callable[[List[HostName]], _T],
+    hostnames: Sequence[HostName],
+    processes: int,
+) -> Iterator[_T]:
+    """Apply func to chunks of the hosts in forked worker processes
+
+    func must be a module level function. It is called with consecutive
+    chunks of the hosts and its results are returned in the order of the
+    hosts. The workers inherit the loaded configuration from this process.
+    Configuration warnings and failed IP lookups of the workers are added
+    to the ones of this process in the same order.
+    """
+    # Fork the workers: The configuration does not have to be loaded again
+    with multiprocessing.get_context("fork").Pool(processes) as pool:
+        for result, warnings, failed_ip_lookups in pool.imap(
+                functools.partial(_process_host_chunk, func), host_chunks(hostnames, processes)):
+            g_configuration_warnings.extend(warnings)
+            _failed_ip_lookups.extend(failed_ip_lookups)
+            yield result
+
+
 # TODO: Just for documentation purposes for now, add typing_extensions and use this.
 #
 # HostCheckCommand = NewType('HostCheckCommand',
@@ -6,12 +6,14 @@
 """Code for support of Nagios (and compatible) cores"""
 
 import base64
+import functools
 import os
 import py_compile
+import re
 import sys
 from io import StringIO
 from pathlib import Path
-from typing import Any, Dict, IO, List, Optional, Set, Tuple, Union
+from typing import Any, Dict, IO, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
 
 from six import ensure_binary, ensure_str
 
@@ -118,6 +120,87 @@ class NagiosConfig:
         # TODO: Something seems to be mixed up in our call sites...
         self._outfile.write(ensure_str(x))
 
+    def next_hostcheck_command_name(self) -> CoreCommand:
+        return "check-mk-host-custom-%d" % (len(self.hostcheck_commands_to_define) + 1)
+
+
+# The host check commands are numbered over all hosts. A worker only knows the
+# hosts of its own chunk, so it writes placeholders that are replaced with the
+# final command names when the chunks are put together.
+_HOSTCHECK_COMMAND_PLACEHOLDER = "\x00hostcheck-%d\x00"
+_HOSTCHECK_COMMAND_PLACEHOLDER_RE = re.compile("\x00hostcheck-(\\d+)\x00")
+
+
+class _NagiosConfigOfHostChunk(NagiosConfig):
+    def next_hostcheck_command_name(self) -> CoreCommand:
+        return _HOSTCHECK_COMMAND_PLACEHOLDER % (len(self.hostcheck_commands_to_define) + 1)
+
+
+class _HostChunkResult(NamedTuple):
+    config: str
+    hostgroups_to_define: Set[HostgroupName]
+    servicegroups_to_define: Set[ServicegroupName]
+    contactgroups_to_define: Set[ContactgroupName]
+    checknames_to_define: Set[CheckPluginName]
+    active_checks_to_define: Set[CheckPluginNameStr]
+    custom_commands_to_define: Set[CoreCommandName]
+    hostcheck_commands_to_define: List[Tuple[CoreCommand, str]]
+
+
+def _create_nagios_config_of_host_chunk(hostnames: List[HostName]) -> _HostChunkResult:
+    """Create the configuration of some hosts, executed in a worker process"""
+    config_cache = config.get_config_cache()
+    config_buffer = StringIO()
+    cfg = _NagiosConfigOfHostChunk(config_buffer, hostnames)
+    for hostname in hostnames:
+        _create_nagios_config_host(cfg, config_cache, hostname)
+
+    return _HostChunkResult(
+        config=config_buffer.getvalue(),
+        hostgroups_to_define=cfg.hostgroups_to_define,
+        servicegroups_to_define=cfg.servicegroups_to_define,
+        contactgroups_to_define=cfg.contactgroups_to_define,
+        checknames_to_define=cfg.checknames_to_define,
+        active_checks_to_define=cfg.active_checks_to_define,
+        custom_commands_to_define=cfg.custom_commands_to_define,
+        hostcheck_commands_to_define=cfg.hostcheck_commands_to_define,
+    )
+
+
+def _add_host_chunk_result(cfg: NagiosConfig, result: _HostChunkResult) -> None:
+    offset = len(cfg.hostcheck_commands_to_define)
+
+    def final_name(match: "re.Match[str]") -> str:
+        return "check-mk-host-custom-%d" % (offset + int(match.group(1)))
+
+    if result.hostcheck_commands_to_define:
+        cfg.write(_HOSTCHECK_COMMAND_PLACEHOLDER_RE.sub(final_name, result.config))
+        cfg.hostcheck_commands_to_define.extend(
+            (_HOSTCHECK_COMMAND_PLACEHOLDER_RE.sub(final_name, command), command_line)
+            for command, command_line in result.hostcheck_commands_to_define)
+    else:
+        cfg.write(result.config)
+
+    cfg.hostgroups_to_define.update(result.hostgroups_to_define)
+    cfg.servicegroups_to_define.update(result.servicegroups_to_define)
+    cfg.contactgroups_to_define.update(result.contactgroups_to_define)
+    cfg.checknames_to_define.update(result.checknames_to_define)
+    cfg.active_checks_to_define.update(result.active_checks_to_define)
+    cfg.custom_commands_to_define.update(result.custom_commands_to_define)
+
+
+def _create_nagios_config_hosts(cfg: NagiosConfig, config_cache: ConfigCache,
+                                hostnames: List[HostName]) -> None:
+    if config.core_config_processes > 1 and len(hostnames) > 1:
+        for result in core_config.process_hosts_parallel(_create_nagios_config_of_host_chunk,
+                                                         hostnames,
+                                                         config.core_config_processes):
+            _add_host_chunk_result(cfg, result)
+        return
+
+    for hostname in hostnames:
+        _create_nagios_config_host(cfg, config_cache, hostname)
+
 
 def create_config(outfile: IO[str], hostnames: Optional[List[HostName]]) -> None:
     if config.host_notification_periods != []:
@@ -148,8 +231,7 @@ def create_config(outfile: IO[str], hostnames: Optional[List[HostName]]) -> None
 
     _output_conf_header(cfg)
 
-    for hostname in sorted(hostnames):
-        _create_nagios_config_host(cfg, config_cache, hostname)
+    _create_nagios_config_hosts(cfg, config_cache, sorted(hostnames))
 
     _create_nagios_config_contacts(cfg, hostnames)
     _create_nagios_config_hostgroups(cfg)
@@ -212,7 +294,7 @@ def _create_nagios_host_spec(cfg: NagiosConfig, config_cache: ConfigCache, hostn
             host_spec[key] = value
 
     def host_check_via_service_status(service: ServiceName) -> CoreCommand:
-        command = "check-mk-host-custom-%d" % (len(cfg.hostcheck_commands_to_define) + 1)
+        command = cfg.next_hostcheck_command_name()
         cfg.hostcheck_commands_to_define.append(
             (command, 'echo "$SERVICEOUTPUT:%s:%s$" && exit $SERVICESTATEID:%s:%s$' %
              (host_config.hostname, service.replace('$HOSTNAME$', host_config.hostname),
@@ -964,28 +1046,57 @@ def _precompile_hostchecks(serial: ConfigSerial) -> None:
 
     console.verbose("Precompiling host checks...\n")
 
-    host_check_store = HostCheckStore()
-    for hostname in config_cache.all_active_hosts():
-        try:
-            console.verbose("%s%s%-16s%s:",
-                            tty.bold,
-                            tty.blue,
-                            hostname,
-                            tty.normal,
-                            stream=sys.stderr)
-            host_check = _dump_precompiled_hostcheck(config_cache, serial, hostname)
-            if host_check is None:
-                console.verbose("(no Checkmk checks)\n")
-                continue
+    if config.core_config_processes > 1:
+        errors: Iterable[Optional[str]] = core_config.process_hosts_parallel(
+            functools.partial(_precompile_hostchecks_of_host_chunk, serial),
+            sorted(config_cache.all_active_hosts()),
+            config.core_config_processes,
+        )
+    else:
+        errors = (_precompile_hostcheck(config_cache, HostCheckStore(), serial, hostname)
+                  for hostname in config_cache.all_active_hosts())
 
-            host_check_store.write(serial, hostname, host_check)
-        except Exception as e:
-            if cmk.utils.debug.enabled():
-                raise
-            console.error("Error precompiling checks for host %s: %s\n" % (hostname, e))
+    for error in errors:
+        if error is not None:
+            console.error(error)
             sys.exit(5)
 
 
+def _precompile_hostchecks_of_host_chunk(serial: ConfigSerial,
+                                         hostnames: List[HostName]) -> Optional[str]:
+    """Precompile the host checks of some hosts, executed in a worker process"""
+    config_cache = config.get_config_cache()
+    host_check_store = HostCheckStore()
+    for hostname in hostnames:
+        error = _precompile_hostcheck(config_cache, host_check_store, serial, hostname)
+        if error is not None:
+            return error
+    return None
+
+
+def _precompile_hostcheck(config_cache: ConfigCache, host_check_store: HostCheckStore,
+                          serial: ConfigSerial, hostname: HostName) -> Optional[str]:
+    """Precompile the host check of a host and return the error message in case it failed"""
+    try:
+        console.verbose("%s%s%-16s%s:",
+                        tty.bold,
+                        tty.blue,
+                        hostname,
+                        tty.normal,
+                        stream=sys.stderr)
+        host_check = _dump_precompiled_hostcheck(config_cache, serial, hostname)
+        if host_check is None:
+            console.verbose("(no Checkmk checks)\n")
+            return None
+
+        host_check_store.write(serial, hostname, host_check)
+    except Exception as e:
+        if cmk.utils.debug.enabled():
+            raise
+        return "Error precompiling checks for host %s: %s\n" % (hostname, e)
+    return None
+
+
 def _dump_precompiled_hostcheck(config_cache: ConfigCache,
                                 serial: ConfigSerial,
                                 hostname: HostName,
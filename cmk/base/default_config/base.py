@@ -36,6 +36,8 @@ default_host_group = 'check_mk'
 check_max_cachefile_age = 0  # per default do not use cache files when checking
 cluster_max_cachefile_age = 90  # secs.
 piggyback_max_cachefile_age = 3600  # secs
+# Store the piggyback data of a source in a single spool file instead of one file per host
+piggyback_spool: bool = False
 # Ruleset for translating piggyback host names
 piggyback_translation: _List = []
 # Ruleset for translating service descriptions
@@ -49,6 +51,8 @@ check_mk_perfdata_with_times = True
 debug_log = False  # deprecated
 monitoring_host = None  # deprecated
 max_num_processes = 50
+# Number of processes creating the core configuration, 1 creates it in this process
+core_config_processes = 1
 fallback_agent_output_encoding = 'latin-1'
 stored_passwords: _Dict = {}
 # Collection of predefined rule conditions. For the moment this setting is only stored
@@ -57,6 +61,12 @@ stored_passwords: _Dict = {}
 predefined_conditions: _Dict = {}
 # Global setting for managing HTTP proxy configs
 http_proxies: _Dict = {}
+# Maximum number of entries of the ruleset matcher caches by cache name
+# (see cmk.utils.rulesets.ruleset_matcher.DEFAULT_CACHE_SIZES). None means unbounded.
+ruleset_matcher_cache_sizes: _Dict[str, _Optional[int]] = {}
+# Run the TCP, program and piggyback fetchers of a host in threads
+# (see cmk.fetchers.controller._run_fetchers_concurrently)
+concurrent_fetchers: bool = False
 
 # SNMP communities and encoding
 
@@ -171,6 +181,8 @@ tcp_hosts: _List = [
 bulkwalk_hosts: _List = []
 snmpv2c_hosts: _List = []
 snmp_without_sys_descr: _List = []
+# Seconds the results of the SNMP detection are reused for the same device, 0 disables it
+snmp_detection_cache_ttl: int = 0
 snmpv3_contexts: _List = []
 usewalk_hosts: _List = []
 # use host name as ip address for these hosts
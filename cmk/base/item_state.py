@@ -17,8 +17,15 @@ item. The value is free form.
 Note: The item state is kept in tmpfs and not reboot-persistant.
 Do not store long-time things here. Also do not store complex
 structures like log files or stuff.
+
+The item states of a host are stored in a binary file: a short magic
+header followed by the marshalled states. Files written by older versions
+contain a Python literal instead. These are still read and are converted
+when the item states of the host are saved the next time.
 """
 
+import ast
+import marshal
 import os
 import traceback
 from typing import Any, AnyStr, Dict, List, Optional, Tuple, Union
@@ -49,6 +56,34 @@ class MKCounterWrapped(MKException):
     pass
 
 
+_BINARY_MAGIC = b"\x00CMKIS\x01\n"
+# Pin the marshal version so that the files do not depend on the interpreter.
+_MARSHAL_VERSION = 4
+
+
+def _load_item_states(filename: str) -> ItemStates:
+    """Load the item states, the caller is responsible for the lock"""
+    content = store.load_bytes_from_file(filename, default=b"")
+    if content.startswith(_BINARY_MAGIC):
+        return marshal.loads(memoryview(content)[len(_BINARY_MAGIC):])
+    # Migration: Python literal written by older versions
+    if not content.strip():
+        return {}
+    return ast.literal_eval(content.decode("utf-8"))
+
+
+def _save_item_states(filename: str, item_states: ItemStates) -> None:
+    """Save the item states, the caller is responsible for the lock"""
+    try:
+        content = _BINARY_MAGIC + marshal.dumps(item_states, _MARSHAL_VERSION)
+    except ValueError:
+        # Some check stored a value marshal does not know about (e.g. an
+        # instance of a subclass of str). Fall back to the Python literal.
+        store.save_object_to_file(filename, item_states, pretty=False)
+        return
+    store.save_bytes_to_file(filename, content)
+
+
 class CachedItemStates:
     def __init__(self) -> None:
         self._logger = logger
@@ -73,11 +108,8 @@ class CachedItemStates:
         filename = cmk.utils.paths.counters_dir + "/" + hostname
         try:
             # TODO: refactoring. put these two values into a named tuple
-            self._item_states = store.load_object_from_file(
-                filename,
-                default={},
-                lock=True,
-            )
+            store.aquire_lock(filename)
+            self._item_states = _load_item_states(filename)
             self._last_mtime = os.stat(filename).st_mtime
         finally:
             store.release_lock(filename)
@@ -104,7 +136,7 @@ class CachedItemStates:
             store.aquire_lock(filename)
             last_mtime = os.stat(filename).st_mtime
             if last_mtime != self._last_mtime:
-                self._item_states = store.load_object_from_file(filename, default={})
+                self._item_states = _load_item_states(filename)
 
                 # Remove obsolete keys
                 for key in self._removed_item_state_keys:
@@ -116,7 +148,7 @@ class CachedItemStates:
                 # Add updated keys
                 self._item_states.update(self._updated_item_states)
 
-            store.save_object_to_file(filename, self._item_states, pretty=False)
+            _save_item_states(filename, self._item_states)
         except Exception:
             raise MKGeneralException("Cannot write to %s: %s" % (filename, traceback.format_exc()))
         finally:
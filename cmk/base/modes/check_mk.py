@@ -60,6 +60,7 @@ import cmk.base.localize
 import cmk.base.obsolete_output as out
 import cmk.base.packaging
 import cmk.base.parent_scan
+import cmk.base.prediction
 import cmk.base.profiling as profiling
 from cmk.base.api.agent_based.checking_classes import CheckPlugin
 from cmk.base.core_factory import create_core
@@ -759,6 +760,57 @@ modes.register(
         short_help="Cleanup outdated piggyback files",
     ))
 
+#.
+#   .--Prediction----------------------------------------------------------.
+#   |            ____               _ _      _   _                         |
+#   |           |  _ \ _ __ ___  __| (_) ___| |_(_) ___  _ __              |
+#   |           | |_) | '__/ _ \/ _` | |/ __| __| |/ _ \| '_ \             |
+#   |           |  __/| | |  __/ (_| | | (__| |_| | (_) | | | |            |
+#   |           |_|   |_|  \___|\__,_|_|\___|\__|_|\___/|_| |_|            |
+#   |                                                                      |
+#   '----------------------------------------------------------------------'
+
+
+def mode_update_predictions(options: Dict) -> None:
+    result = cmk.base.prediction.update_predictions(options.get("procs", 4))
+    console.verbose("Refreshed %d predictions of %d metrics in %.2f seconds" %
+                    (result.refreshed, result.metrics, result.duration))
+    if result.failed:
+        console.verbose(", %d failed" % result.failed)
+    if result.skipped:
+        console.verbose(", skipped %d predictions of previous versions" % result.skipped)
+    if result.unused:
+        console.verbose(", %d predictions not used anymore" % result.unused)
+    console.verbose("\n")
+
+
+modes.register(
+    Mode(
+        long_option="update-predictions",
+        handler_function=mode_update_predictions,
+        needs_config=False,
+        needs_checks=False,
+        short_help="Refresh outdated predictions",
+        long_help=[
+            "Computes the predictions of all metrics using predictive levels which "
+            "are outdated or needed within the next two hours, e.g. the ones of the "
+            "next time group. This way the checks don't need to compute them after "
+            "the time group has changed. The metrics are found by their existing "
+            "predictions. Metrics whose predictions have not been used by their "
+            "check for longer than a prediction is valid are skipped.",
+        ],
+        sub_options=[
+            Option(
+                long_option="procs",
+                argument=True,
+                argument_descr="N",
+                argument_conv=int,
+                short_help="Refresh the predictions of up to N services in parallel. "
+                "Defaults to 4.",
+            ),
+        ],
+    ))
+
 #.
 #   .--scan-parents--------------------------------------------------------.
 #   |                                                         _            |
@@ -7,14 +7,30 @@
 
 import json
 import logging
-import math
 import os
+import tempfile
 import time
-from typing import Optional, List, Any, cast, Dict, Union, Callable, Tuple, TypedDict
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    cast,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+    TYPE_CHECKING,
+    Union,
+)
 
 import cmk.utils.debug
 import cmk.utils
 import cmk.utils.defines as defines
+import cmk.utils.paths
 import cmk.utils.store as store
 from cmk.utils.log import VERBOSE
 import cmk.utils.prediction
@@ -25,6 +41,7 @@ from cmk.utils.prediction import (
     Timegroup,
     TimeSeriesValues,
     Seconds,
+    TimeSeries,
     TimeWindow,
     RRDColumnFunction,
     PredictionInfo,
@@ -32,6 +49,9 @@ from cmk.utils.prediction import (
     EstimatedLevels,
 )
 
+if TYPE_CHECKING:
+    import numpy as np  # type: ignore[import]
+
 logger = logging.getLogger("cmk.prediction")
 
 _GroupByFunction = Callable[[Timestamp], Tuple[Timegroup, Timestamp]]
@@ -161,11 +181,12 @@ def _time_slices(
 def _retrieve_grouped_data_from_rrd(
     rrd_column: RRDColumnFunction,
     time_windows: _TimeSlices,
-) -> Tuple[TimeWindow, List[TimeSeriesValues]]:
+) -> Tuple[TimeWindow, List["np.ndarray"]]:
     "Collect all time slices and up-sample them to same resolution"
     from_time = time_windows[0][0]
 
-    slices = [(rrd_column(start, end), from_time - start) for start, end in time_windows]
+    slices = [(timeseries, from_time - start)
+              for timeseries, (start, _end) in zip(rrd_column(time_windows), time_windows)]
 
     # The resolutions of the different time ranges differ. We upsample
     # to the best resolution. We assume that the youngest slice has the
@@ -174,26 +195,49 @@ def _retrieve_grouped_data_from_rrd(
     if twindow[2] == 0:
         raise MKGeneralException("Got no historic metrics")
 
-    return twindow, [ts.bfill_upsample(twindow, shift) for ts, shift in slices]
-
+    return twindow, [ts.bfill_upsample_array(twindow, shift) for ts, shift in slices]
 
-def _data_stats(slices: List[TimeSeriesValues]) -> _DataStats:
-    "Statistically summarize all the upsampled RRD data"
 
-    descriptors: _DataStats = []
+def _data_stats(slices: Sequence[Union[TimeSeriesValues, "np.ndarray"]]) -> _DataStats:
+    """Statistically summarize all the upsampled RRD data
 
-    for time_column in zip(*slices):
-        point_line = [x for x in time_column if x is not None]
-        if point_line:
-            average = sum(point_line) / float(len(point_line))
-            descriptors.append([
-                average,
-                min(point_line),
-                max(point_line),
-                _std_dev(point_line, average),
-            ])
-        else:
-            descriptors.append([None, None, None, None])
+    Computes average, min, max and standard deviation of every time column.
+    Missing values (None or NaN) are ignored, columns without any values
+    result in None.
+    """
+    if not slices:
+        return []
+
+    # Imported on demand, see cmk.utils.prediction
+    import numpy as np  # type: ignore[import] # pylint: disable=import-outside-toplevel
+
+    num_points = min(len(s) for s in slices)
+    values = np.array([s[:num_points] for s in slices], dtype=float)
+
+    present = ~np.isnan(values)
+    samples = present.sum(axis=0)
+    present_values = np.where(present, values, 0.0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = present_values.sum(axis=0) / samples
+        # In the case of a single data-point an unbiased standard deviation is
+        # undefined. In this case we take the magnitude of the measured value
+        # itself as a measure of the dispersion.
+        std_dev = np.where(
+            samples > 1,
+            np.sqrt(np.abs((present_values**2).sum(axis=0) - average**2 * samples) / (samples - 1)),
+            np.abs(average),
+        )
+
+    descriptors: _DataStats = np.column_stack((
+        average,
+        np.fmin.reduce(values, axis=0),
+        np.fmax.reduce(values, axis=0),
+        std_dev,
+    )).tolist()
+
+    for index in np.flatnonzero(samples == 0).tolist():
+        descriptors[index] = [None, None, None, None]
 
     return descriptors
 
@@ -215,37 +259,47 @@ def _calculate_data_for_prediction(
     }
 
 
+# The checks and update_predictions() may write the predictions of a metric at the same time
+_LOCK_FILE = ".lock"
+
+
 def _save_predictions(
     pred_file: str,
     info: PredictionInfo,
     data_for_pred: _PredictionData,
 ) -> None:
-    with open(pred_file + '.info', "w") as fname:
-        json.dump(info, fname)
-    with open(pred_file, "w") as fname:
-        json.dump(data_for_pred, fname)
-
-
-def _std_dev(point_line: List[float], average: float) -> float:
-    samples = len(point_line)
-    # In the case of a single data-point an unbiased standard deviation is
-    # undefined. In this case we take the magnitude of the measured value
-    # itself as a measure of the dispersion.
-    if samples == 1:
-        return abs(average)
-    return math.sqrt(abs(sum(p**2 for p in point_line) - average**2 * samples) / float(samples - 1))
+    # The files are replaced, readers never see them partially written. The info is
+    # written last, so it is never newer than its data.
+    with store.locked(os.path.join(os.path.dirname(pred_file), _LOCK_FILE)):
+        _replace_json_file(pred_file, data_for_pred)
+        _replace_json_file(pred_file + '.info', info)
+
+
+def _replace_json_file(path: str, data: Any) -> None:
+    with tempfile.NamedTemporaryFile("w",
+                                     dir=os.path.dirname(path),
+                                     prefix=".%s.new" % os.path.basename(path),
+                                     delete=False) as tmp:
+        try:
+            os.chmod(tmp.name, 0o660)
+            json.dump(data, tmp)
+        except Exception:
+            os.unlink(tmp.name)
+            raise
+    os.replace(tmp.name, path)
 
 
 def _is_prediction_up_to_date(
     pred_file: str,
     timegroup: Timegroup,
     params: _PredictionParameters,
+    now: Timestamp,
 ) -> bool:
     """Check, if we need to (re-)compute the prediction file.
 
     This is the case if:
     - no prediction has been made yet for this time group
-    - the prediction from the last time is outdated
+    - the prediction from the last time is outdated at `now`
     - the prediction from the last time was made with other parameters
     """
     last_info = cmk.utils.prediction.retrieve_data_for_prediction(pred_file + ".info", timegroup)
@@ -253,7 +307,6 @@ def _is_prediction_up_to_date(
         return False
 
     period_info = _PREDICTION_PERIODS[params["period"]]
-    now = time.time()
     if last_info["time"] + cast(int, period_info["valid"]) * cast(int, period_info["slice"]) < now:
         logger.log(VERBOSE, "Prediction of %s outdated", timegroup)
         return False
@@ -285,12 +338,13 @@ def get_levels(
 
     pred_dir = cmk.utils.prediction.predictions_dir(hostname, service_description, dsname)
     store.makedirs(pred_dir)
+    Path(pred_dir, _LAST_USE_FILE).touch()
 
     pred_file = os.path.join(pred_dir, timegroup)
     cmk.utils.prediction.clean_prediction_files(pred_file)
 
     data_for_pred: Optional[_PredictionData] = None
-    if _is_prediction_up_to_date(pred_file, timegroup, params):
+    if _is_prediction_up_to_date(pred_file, timegroup, params, now):
         # Suppression: I am not sure how to check what this function returns
         #              For now I hope this is compatible.
         data_for_pred = cmk.utils.prediction.retrieve_data_for_prediction(  # type: ignore[assignment]
@@ -298,14 +352,39 @@ def get_levels(
 
     if data_for_pred is None:
         logger.log(VERBOSE, "Calculating prediction data for time group %s", timegroup)
-        cmk.utils.prediction.clean_prediction_files(pred_file, force=True)
+        data_for_pred = _update_predictions(hostname, service_description, [dsname], params, cf,
+                                            now, timegroup)[dsname]
+
+    # Find reference value in data_for_pred
+    index = int(rel_time / cast(int, data_for_pred["step"]))  # fixed: true-division
+    reference = dict(zip(data_for_pred["columns"], data_for_pred["points"][index]))
+    return cmk.utils.prediction.estimate_levels(reference, params, levels_factor)
 
-        time_windows = _time_slices(now, int(params["horizon"] * 86400), period_info, timegroup)
 
-        rrd_datacolumn = cmk.utils.prediction.rrd_datacolum(hostname, service_description, dsname,
-                                                            cf)
+def _update_predictions(
+    hostname: HostName,
+    service_description: ServiceName,
+    dsnames: Sequence[MetricName],
+    params: _PredictionParameters,
+    cf: ConsolidationFunctionName,
+    now: Timestamp,
+    timegroup: Timegroup,
+) -> Dict[MetricName, _PredictionData]:
+    """Compute and save the predictions of some metrics of a service
+
+    The RRD data of all metrics is fetched with a single livestatus query."""
+    period_info = _PREDICTION_PERIODS[params["period"]]
+    time_windows = _time_slices(now, int(params["horizon"] * 86400), period_info, timegroup)
 
-        data_for_pred = _calculate_data_for_prediction(time_windows, rrd_datacolumn)
+    rrd_data = cmk.utils.prediction.get_rrd_data_of_time_ranges(hostname, service_description,
+                                                                dsnames, cf, time_windows)
+
+    predictions: Dict[MetricName, _PredictionData] = {}
+    for dsname in dsnames:
+        pred_file = os.path.join(
+            cmk.utils.prediction.predictions_dir(hostname, service_description, dsname), timegroup)
+        data_for_pred = _calculate_data_for_prediction(time_windows,
+                                                       _fetched_rrd_column(rrd_data[dsname]))
 
         info: PredictionInfo = {
             u"time": now,
@@ -314,10 +393,190 @@ def get_levels(
             u"dsname": dsname,
             u"slice": period_info["slice"],
             u"params": params,
+            u"host_name": hostname,
+            u"service_description": service_description,
         }
         _save_predictions(pred_file, info, data_for_pred)
+        predictions[dsname] = data_for_pred
 
-    # Find reference value in data_for_pred
-    index = int(rel_time / cast(int, data_for_pred["step"]))  # fixed: true-division
-    reference = dict(zip(data_for_pred["columns"], data_for_pred["points"][index]))
-    return cmk.utils.prediction.estimate_levels(reference, params, levels_factor)
+    return predictions
+
+
+def _fetched_rrd_column(timeseries: List[TimeSeries]) -> RRDColumnFunction:
+    "RRD column function returning already fetched data"
+    return lambda _time_ranges: timeseries
+
+
+# Refresh outdated predictions before the checks need them. Otherwise the first
+# check after a change of the time group has to compute the prediction within its
+# check timeout.
+
+# The predictions needed until then are computed in advance: Twice the interval of the
+# cron job cmk_update_predictions, so that a late or slow run does not matter.
+_UPDATE_LOOKAHEAD = 2 * 3600
+
+# The checks touch this file of a metric whenever they use its prediction. Metrics which
+# have not been used for longer than a prediction is valid are not refreshed anymore, e.g.
+# the ones of removed services or of services without predictive levels now.
+_LAST_USE_FILE = ".last_use"
+
+
+class _PredictionGroup(NamedTuple):
+    """Metrics of a service sharing the prediction parameters"""
+    hostname: HostName
+    service_description: ServiceName
+    cf: ConsolidationFunctionName
+    params: _PredictionParameters
+    dsnames: List[MetricName]
+
+
+class PredictionUpdateResult(NamedTuple):
+    metrics: int
+    refreshed: int
+    failed: int
+    skipped: int
+    unused: int
+    duration: float
+
+
+def update_predictions(processes: int = 4) -> PredictionUpdateResult:
+    """Compute the predictions of the metrics which are outdated or missing soon
+
+    The metrics and their prediction parameters are taken from the latest
+    prediction of every metric, so a metric is refreshed once its check has
+    computed a first prediction and as long as its check uses the prediction.
+    Predictions outdated within the next `_UPDATE_LOOKAHEAD` seconds are refreshed
+    and the prediction of a time group starting until then is computed as the
+    check would do at its start. The services are processed by up to `processes`
+    threads in parallel.
+    """
+    start_time = time.time()
+    now = int(start_time)
+    lookahead = now + _UPDATE_LOOKAHEAD
+
+    groups, skipped, unused = _collect_prediction_groups(now)
+
+    outdated = []
+    for group in groups:
+        for timegroup, reference_time, until in _needed_timegroups(group.params, now, lookahead):
+            dsnames = [
+                dsname for dsname in group.dsnames if not _is_prediction_up_to_date(
+                    os.path.join(
+                        cmk.utils.prediction.predictions_dir(
+                            group.hostname, group.service_description, dsname), timegroup),
+                    timegroup, group.params, until)
+            ]
+            if dsnames:
+                outdated.append((group._replace(dsnames=dsnames), reference_time, timegroup))
+
+    refreshed = failed = 0
+    with ThreadPool(processes) as pool:
+        for group, success in pool.imap_unordered(lambda args: _update_prediction_group(*args),
+                                                  outdated):
+            if success:
+                refreshed += len(group.dsnames)
+            else:
+                failed += len(group.dsnames)
+
+    return PredictionUpdateResult(
+        metrics=sum(len(group.dsnames) for group in groups),
+        refreshed=refreshed,
+        failed=failed,
+        skipped=skipped,
+        unused=unused,
+        duration=time.time() - start_time,
+    )
+
+
+def _needed_timegroups(
+    params: _PredictionParameters,
+    now: Timestamp,
+    lookahead: Timestamp,
+) -> List[Tuple[Timegroup, Timestamp, Timestamp]]:
+    """The time groups used until `lookahead`, the time to compute their predictions for
+    and until when their predictions must be valid"""
+    period_info = _PREDICTION_PERIODS[params["period"]]
+    timegroup = _get_prediction_timegroup(now, period_info)[0]
+    next_timegroup, next_start = _get_prediction_timegroup(lookahead, period_info)[:2]
+    if next_timegroup == timegroup:
+        return [(timegroup, now, lookahead)]
+    return [(timegroup, now, next_start), (next_timegroup, next_start, lookahead)]
+
+
+def _update_prediction_group(group: _PredictionGroup, now: Timestamp,
+                             timegroup: Timegroup) -> Tuple[_PredictionGroup, bool]:
+    start_time = time.time()
+    try:
+        _update_predictions(group.hostname, group.service_description, group.dsnames, group.params,
+                            group.cf, now, timegroup)
+    except Exception as e:
+        if cmk.utils.debug.enabled():
+            raise
+        logger.warning("Cannot refresh the predictions of %s/%s (%s): %s", group.hostname,
+                       group.service_description, ", ".join(group.dsnames), e)
+        return group, False
+
+    logger.log(VERBOSE, "Refreshed the predictions of %s/%s (%s) for %s in %.2fs", group.hostname,
+               group.service_description, ", ".join(group.dsnames), timegroup,
+               time.time() - start_time)
+    return group, True
+
+
+def _collect_prediction_groups(now: Timestamp) -> Tuple[List[_PredictionGroup], int, int]:
+    """Find the metrics having predictions, grouped for fetching their data at once
+
+    The latest prediction of a metric determines its parameters. Predictions created
+    by previous versions lack the host name and service description. They are skipped
+    until the check has refreshed them. Metrics not used by their check lately are
+    counted as unused.
+    """
+    groups: Dict[Tuple[HostName, ServiceName, ConsolidationFunctionName, str],
+                 _PredictionGroup] = {}
+    skipped = unused = 0
+    for metric_dir in sorted(Path(cmk.utils.paths.var_dir, "prediction").glob("*/*/*")):
+        info = _latest_prediction_info(metric_dir)
+        if info is None:
+            continue
+
+        try:
+            hostname = info["host_name"]
+            service_description = info["service_description"]
+            dsname = info["dsname"]
+            cf = info["cf"]
+            params = info["params"]
+        except KeyError:
+            skipped += 1
+            continue
+
+        if not _is_used(metric_dir, params, now):
+            unused += 1
+            continue
+
+        group = groups.setdefault(
+            (hostname, service_description, cf, json.dumps(params, sort_keys=True)),
+            _PredictionGroup(hostname, service_description, cf, params, []))
+        group.dsnames.append(dsname)
+
+    return list(groups.values()), skipped, unused
+
+
+def _is_used(metric_dir: Path, params: _PredictionParameters, now: Timestamp) -> bool:
+    period_info = _PREDICTION_PERIODS[params["period"]]
+    try:
+        last_use = (metric_dir / _LAST_USE_FILE).stat().st_mtime
+    except OSError:
+        return False
+    return last_use + cast(int, period_info["valid"]) * cast(int, period_info["slice"]) >= now
+
+
+def _latest_prediction_info(metric_dir: Path) -> Optional[PredictionInfo]:
+    latest_info: Optional[PredictionInfo] = None
+    for info_file in metric_dir.glob("*.info"):
+        try:
+            info = json.loads(info_file.read_text())
+        except (IOError, ValueError):
+            continue
+        if isinstance(info, dict) and (latest_info is None or
+                                       info.get("time", 0) > latest_info.get("time", 0)):
+            latest_info = info
+    return latest_info
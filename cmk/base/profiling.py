@@ -6,12 +6,15 @@
 
 import sys
 from pathlib import Path
+from typing import Callable, Dict
 
+import cmk.utils.debug
 import cmk.base.obsolete_output as out
 from cmk.utils.log import console
 
 _profile = None
 _profile_path = Path("profile.out")
+_statistics: Dict[str, Callable[[], str]] = {}
 
 
 def enable() -> None:
@@ -26,7 +29,20 @@ def enabled() -> bool:
     return _profile is not None
 
 
+def register_statistics(name: str, get_statistics: Callable[[], str]) -> None:
+    """Register statistics (e.g. of caches) that are shown along with the profile"""
+    _statistics[name] = get_statistics
+
+
+def _output_statistics() -> None:
+    for name, get_statistics in sorted(_statistics.items()):
+        out.output("%s: %s\n" % (name, get_statistics()), stream=sys.stderr)
+
+
 def output_profile() -> None:
+    if cmk.utils.debug.enabled() or _profile:
+        _output_statistics()
+
     if not _profile:
         return
 
@@ -53,6 +53,8 @@ def default_config() -> Dict[str, Any]:
         "remote_status": None,
         "socket_queue_len": 10,
         "eventsocket_queue_len": 10,
+        "event_processing_threads": 1,
+        "event_queue_len": 1000,
         "hostname_translation": {},
         "archive_orphans": False,
         "archive_mode": "file",
@@ -4,6 +4,9 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import contextlib
+import itertools
+import mmap
 import os
 import struct
 import subprocess
@@ -11,15 +14,23 @@ import threading
 import time
 from logging import Logger
 from pathlib import Path
-from typing import Any, AnyStr, Dict, Iterable, List, Optional, Tuple, Union
+from typing import (Any, AnyStr, BinaryIO, Dict, Generator, Iterable, Iterator, List, Optional,
+                    Tuple, Union)
 
 from cmk.utils.log import VERBOSE
 from cmk.utils.render import date_and_time
 
 from .actions import quote_shell_string
+from .history_index import (index_line, index_path, indexed_end, IndexedRecord, INDEXED_COLUMNS,
+                            LogfileIndex)
 from .query import QueryGET
 from .settings import Settings
 
+# Adjacent lines of the history files are read at once up to this size
+_MAX_READ_SIZE = 1024 * 1024
+# Size of the blocks read when reading a history file backwards
+_REVERSE_BLOCK_SIZE = 1024 * 1024
+
 # TODO: As one can see clearly below, we should really have a class hierarchy here...
 
 
@@ -36,6 +47,8 @@ class History:
         self._lock = threading.Lock()
         self._mongodb = MongoDB()
         self._active_history_period = ActiveHistoryPeriod()
+        # The history file written lastly and the end of its indexed lines
+        self._indexed_end: Tuple[Optional[Path], Optional[int]] = (None, None)
         self.reload_configuration(config)
 
     def reload_configuration(self, config: Dict[str, Any]) -> None:
@@ -322,10 +335,39 @@ def _add_files(history: History, event: Dict[str, Any], what: str, who: str, add
             quote_tab(event.get(colname[6:], defval))  # drop "event_"
             for colname, defval in history._event_columns
         ]
+        line = b"\t".join(columns) + b"\n"
+
+        path = get_logfile(history._config, history._settings.paths.history_dir.value,
+                           history._active_history_period)
+        with path.open(mode='ab') as f:
+            offset = f.tell()
+            f.write(line)
+        _add_index_line(history, path, offset, line, columns)
 
-        with get_logfile(history._config, history._settings.paths.history_dir.value,
-                         history._active_history_period).open(mode='ab') as f:
-            f.write(b"\t".join(columns) + b"\n")
+
+def _add_index_line(history: History, path: Path, offset: int, line: bytes,
+                    columns: List[bytes]) -> None:
+    # The index is only an optimization: Lines not covered by it are always read
+    history_columns = [name for name, _defval in history._history_columns]
+    values = [columns[history_columns.index(name) - 1] for name in INDEXED_COLUMNS]
+    try:
+        # Only read from the index at the first write to a history file
+        last_path, end = history._indexed_end
+        if last_path != path:
+            end = indexed_end(path)
+        # An index left over from a deleted history file must not be continued and
+        # an index missing the previous lines must not get a gap
+        mode = 'ab' if offset and end in (None, offset) else 'wb'
+        with index_path(path).open(mode=mode) as f:
+            f.write(index_line(offset, len(line), values))
+        history._indexed_end = (path, offset + len(line))
+    except Exception as e:
+        # An index with a gap would hide the lines missing in it
+        history._indexed_end = (None, None)
+        index_path(path).unlink(missing_ok=True)
+        if history._settings.options.debug:
+            raise
+        history._logger.exception("Error writing history index of %s: %s" % (path, e))
 
 
 def quote_tab(col: Any) -> bytes:
@@ -410,6 +452,7 @@ def _expire_logfiles(settings: Settings, config: Dict[str, Any], logger: Logger,
                     logger.info("Deleting log file %s (age %s)" %
                                 (path, date_and_time(path.stat().st_mtime)))
                     path.unlink()
+                    index_path(path).unlink(missing_ok=True)
         except Exception as e:
             if settings.options.debug:
                 raise
@@ -501,7 +544,10 @@ def _get_files(history: History, logger: Logger, query: QueryGET) -> Iterable[An
                     history._logger.info("Skipping logfile %s.log because of time filter" % ts)
                 continue  # skip this file
 
-        new_entries = _parse_history_file(history, path, query, greptexts, limit, history._logger)
+        new_entries = _parse_indexed_history_file(history, path, query, limit, history._logger)
+        if new_entries is None:
+            new_entries = _parse_history_file(history, path, query, greptexts, limit,
+                                              history._logger)
         history_entries += new_entries
         if limit is not None:
             limit -= len(new_entries)
@@ -509,16 +555,100 @@ def _get_files(history: History, logger: Logger, query: QueryGET) -> Iterable[An
     return history_entries
 
 
+def _parse_indexed_history_file(history: History, path: Path, query: Any, limit: Optional[int],
+                                logger: Logger) -> Optional[List[Any]]:
+    """Reads only the lines which may match according to the index of the file
+
+    Returns None if the file has no usable index or the filters can not be
+    evaluated by the index. The lines are numbered like in the reversed file.
+    """
+    try:
+        index = LogfileIndex.load(path)
+        if index is None:
+            return None
+        records = index.matching_records(query.filters)
+        if records is None:
+            return None
+
+        entries: List[Any] = []
+        with path.open(mode='rb') as f:
+            unindexed_ranges = index.unindexed_ranges(os.fstat(f.fileno()).st_size)
+            if unindexed_ranges is None:
+                logger.warning("Ignoring history index of %s, it does not match the file" % path)
+                return None
+
+            # The lines not covered by the index are always candidates
+            head_lines, tail_lines = [_read_lines(f, start, end) for start, end in unindexed_ranges]
+            num_indexed = len(index)
+            num_lines = len(head_lines) + num_indexed + len(tail_lines)
+            candidates = itertools.chain(
+                ((len(head_lines) + num_indexed + number, line)
+                 for number, line in reversed(list(enumerate(tail_lines)))),
+                ((len(head_lines) + record.number, line)
+                 for record, line in _read_records_reversed(f, records)),
+                reversed(list(enumerate(head_lines))),
+            )
+            for number, line in candidates:
+                if limit is not None and len(entries) > limit:
+                    break
+                _parse_history_line(history, path, query, line, num_lines - number, entries, logger)
+        return entries
+    except Exception as e:
+        if history._settings.options.debug:
+            raise
+        logger.exception("Error using history index of %s: %s" % (path, e))
+        return None
+
+
+def _read_lines(f: BinaryIO, start: int, end: int) -> List[bytes]:
+    if start >= end:
+        return []
+    f.seek(start)
+    data = f.read(end - start)
+    lines = [line + b"\n" for line in data.split(b"\n")]
+    # The last line is either empty or an incomplete one just being written
+    if data.endswith(b"\n"):
+        lines.pop()
+    else:
+        lines[-1] = lines[-1][:-1]
+    return lines
+
+
+def _read_records_reversed(f: BinaryIO,
+                           records: List[IndexedRecord]) -> Iterator[Tuple[IndexedRecord, bytes]]:
+    """Reads the lines of the records, adjacent lines are read at once"""
+    batch: List[IndexedRecord] = []
+    for record in reversed(records):
+        if batch and (record.offset + record.length != batch[-1].offset or
+                      batch[0].offset + batch[0].length - record.offset > _MAX_READ_SIZE):
+            yield from _read_batch(f, batch)
+            batch = []
+        batch.append(record)
+    yield from _read_batch(f, batch)
+
+
+def _read_batch(f: BinaryIO, batch: List[IndexedRecord]) -> Iterator[Tuple[IndexedRecord, bytes]]:
+    if not batch:
+        return
+    start = batch[-1].offset
+    f.seek(start)
+    data = f.read(batch[0].offset + batch[0].length - start)
+    for record in batch:
+        yield record, data[record.offset - start:record.offset - start + record.length]
+
+
 def _parse_history_file(history: History, path: Path, query: Any, greptexts: List[str],
                         limit: Optional[int], logger: Logger) -> List[Any]:
+    if not greptexts:
+        return _parse_history_file_reversed(history, path, query, limit, logger)
+
     entries: List[Any] = []
     line_no = 0
     # If we have greptexts we pre-filter the file using the extremely
     # fast GNU Grep
     # Revert lines from the log file to have the newer lines processed first
-    cmd = 'tac %s' % quote_shell_string(str(path))
-    if greptexts:
-        cmd += " | egrep -i -e %s" % quote_shell_string(".*".join(greptexts))
+    cmd = 'tac %s | egrep -i -e %s' % (quote_shell_string(str(path)),
+                                        quote_shell_string(".*".join(greptexts)))
     grep = subprocess.Popen(cmd, shell=True, close_fds=True, stdout=subprocess.PIPE)  # nosec
     if grep.stdout is None:
         raise Exception("Huh? stdout vanished...")
@@ -529,19 +659,76 @@ def _parse_history_file(history: History, path: Path, query: Any, greptexts: Lis
             grep.kill()
             grep.wait()
             break
+        _parse_history_line(history, path, query, line, line_no, entries, logger)
+
+    return entries
 
-        try:
-            parts: List[Any] = line.decode('utf-8').rstrip('\n').split('\t')
-            _convert_history_line(history, parts)
-            values = [line_no] + parts
-            if query.filter_row(values):
-                entries.append(values)
-        except Exception as e:
-            logger.exception("Invalid line '%r' in history file %s: %s" % (line, path, e))
 
+def _parse_history_file_reversed(history: History, path: Path, query: Any, limit: Optional[int],
+                                 logger: Logger) -> List[Any]:
+    entries: List[Any] = []
+    with path.open(mode='rb') as f, contextlib.closing(_lines_reversed(f)) as lines:
+        for line_no, line in enumerate(lines, 1):
+            if limit is not None and len(entries) > limit:
+                break
+            _parse_history_line(history, path, query, line, line_no, entries, logger)
     return entries
 
 
+def _lines_reversed(f: BinaryIO) -> Generator[bytes, None, None]:
+    """Yields the lines of the file from the last to the first one, like tac does
+
+    Only the part of the file needed for the lines consumed is read.
+    """
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return
+    try:
+        data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        yield from _lines_reversed_from_blocks(f, size)
+        return
+
+    with data:
+        end = size
+        while end > 0:
+            start = data.rfind(b"\n", 0, end - 1) + 1
+            yield data[start:end]
+            end = start
+
+
+def _lines_reversed_from_blocks(f: BinaryIO, size: int) -> Iterator[bytes]:
+    position = size
+    data = b""
+    end = 0
+    while position > 0:
+        block_size = min(_REVERSE_BLOCK_SIZE, position)
+        position -= block_size
+        f.seek(position)
+        data = f.read(block_size) + data[:end]
+        end = len(data)
+        while True:
+            start = data.rfind(b"\n", 0, end - 1) + 1
+            if start == 0:
+                break  # The line may begin in the previous block
+            yield data[start:end]
+            end = start
+    if end:
+        yield data[:end]
+
+
+def _parse_history_line(history: History, path: Path, query: Any, line: bytes, line_no: int,
+                        entries: List[Any], logger: Logger) -> None:
+    try:
+        parts: List[Any] = line.decode('utf-8').rstrip('\n').split('\t')
+        _convert_history_line(history, parts)
+        values = [line_no] + parts
+        if query.filter_row(values):
+            entries.append(values)
+    except Exception as e:
+        logger.exception("Invalid line '%r' in history file %s: %s" % (line, path, e))
+
+
 # Speed-critical function for converting string representation
 # of log line back to Python values
 def _convert_history_line(history: History, values: List[Any]) -> None:
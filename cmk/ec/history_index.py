@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Sidecar index of the event history files
+
+Every history file <timestamp>.log gets an index file <timestamp>.idx, which is
+appended to together with the history file. It contains one line per history
+line with the byte offset and length of the history line and the fields which
+are most often filtered by: the time of the history entry, the event ID, the
+host and the rule ID. The values are written exactly like in the history file,
+so the filters of a query can be applied to them without any conversion.
+
+Queries for certain hosts, rules or event IDs search the index file for the
+requested values, which is much cheaper than reading the history file. Other
+filters on these fields, e.g. regular expressions, are evaluated once per
+distinct value of the field. Filters on the time are then checked on the
+remaining index lines. Either way, only the matching lines have to be read
+from the history file.
+
+The lines of the history file written before the index has been created and
+after the index has been written lastly are not covered by the index. These
+lines are always candidates. An index which has not been written completely is
+deleted, so the index has no gaps. An index which doesn't fit the history file
+is not used at all. When the history line has been written but the index line
+has not, e.g. because of a crash, the index is restarted with the next line, so
+the lines missing in it are before the indexed ones.
+"""
+
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+# The indexed fields and the conversion of their values
+_FIELDS: Dict[str, Callable[[str], Any]] = {
+    "history_time": float,
+    "event_id": int,
+    "event_host": str,
+    "event_rule_id": str,
+}
+INDEXED_COLUMNS = list(_FIELDS)
+_CONVERSIONS = list(_FIELDS.values())
+
+Filter = Tuple[str, str, Callable[[Any], bool], Any]
+# The same with the index of the field instead of the column name
+_IndexFilter = Tuple[int, str, Callable[[Any], bool], Any]
+
+
+def index_path(path: Path) -> Path:
+    return path.with_suffix(".idx")
+
+
+def index_line(offset: int, length: int, values: List[bytes]) -> bytes:
+    """The values are the quoted fields of INDEXED_COLUMNS, as written to the history file"""
+    return b"\t".join([b"%d" % offset, b"%d" % length] + values) + b"\n"
+
+
+def indexed_end(path: Path) -> Optional[int]:
+    """Returns the end of the indexed lines of the history file, None for an empty index
+
+    -1 means that the last index line is incomplete, the index can't be continued then.
+    """
+    try:
+        with index_path(path).open(mode="rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return None
+            f.seek(max(0, size - 4096))
+            tail = f.read()
+    except FileNotFoundError:
+        return None
+    if not tail.endswith(b"\n"):
+        return -1
+    try:
+        offset, length, _rest = tail[tail.rfind(b"\n", 0, -1) + 1:].split(b"\t", 2)
+        return int(offset) + int(length)
+    except ValueError:
+        return -1
+
+
+class IndexedRecord(NamedTuple):
+    number: int
+    offset: int
+    length: int
+
+
+class LogfileIndex:
+    def __init__(self, data: bytes) -> None:
+        super().__init__()
+        self._data = data
+        self._columns: List[Tuple[bytes, ...]] = []
+        self._postings: Dict[int, Dict[Any, List[int]]] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["LogfileIndex"]:
+        """Returns the index of the history file or None, if there is no index"""
+        try:
+            data = index_path(path).read_bytes()
+        except FileNotFoundError:
+            return None
+        # A crash may have left an incomplete last line
+        return cls(data[:data.rfind(b"\n") + 1])
+
+    def __len__(self) -> int:
+        return self._data.count(b"\n")
+
+    def unindexed_ranges(self, file_size: int) -> Optional[List[Tuple[int, int]]]:
+        """Returns the byte ranges of the history file before and after the indexed lines
+
+        None means that the index doesn't fit the history file.
+        """
+        if not self._data:
+            return [(0, file_size), (file_size, file_size)]
+        first = self._data[:self._data.index(b"\n")].split(b"\t", 1)
+        last = self._data[self._data.rfind(b"\n", 0, -1) + 1:].split(b"\t", 2)
+        start, end = int(first[0]), int(last[0]) + int(last[1])
+        if start > end or end > file_size:
+            return None
+        return [(0, start), (end, file_size)]
+
+    def matching_records(self, filters: List[Filter]) -> Optional[List[IndexedRecord]]:
+        """Returns the records matching all indexable filters, ordered like the file
+
+        None means that the filters can not be evaluated by the index. Filters
+        only on the time are not worth it: The history files are skipped by their
+        time span already and the remaining ones are mostly read completely.
+        """
+        indexable = [(INDEXED_COLUMNS.index(column_name), operator_name, predicate, argument)
+                     for column_name, operator_name, predicate, argument in filters
+                     if column_name in _FIELDS]
+        if all(field_index == 0 for field_index, _operator_name, _predicate, _argument in indexable):
+            return None
+        for field_index, operator_name, _predicate, argument in indexable:
+            if field_index != 0 and operator_name in ("=", "in"):
+                return self._search(field_index, argument if operator_name == "in" else
+                                    [argument], indexable)
+        return self._select(indexable)
+
+    def _search(self, field_index: int, values: List[Any],
+                indexable: List[_IndexFilter]) -> List[IndexedRecord]:
+        """Finds the index lines containing one of the values and checks them"""
+        data = self._data
+        terminator = b"\n" if field_index == len(INDEXED_COLUMNS) - 1 else b"\t"
+        starts: Set[int] = set()
+        for value in values:
+            needle = b"\t" + str(value).encode("utf-8") + terminator
+            position = data.find(needle)
+            while position != -1:
+                starts.add(data.rfind(b"\n", 0, position) + 1)
+                position = data.find(needle, position + 1)
+
+        records = []
+        number = previous = 0
+        for start in sorted(starts):
+            number += data.count(b"\n", previous, start)
+            previous = start
+            offset, length, *fields = data[start:data.index(b"\n", start)].split(b"\t")
+            if all(
+                    predicate(_CONVERSIONS[index](fields[index].decode("utf-8")))
+                    for index, _operator_name, predicate, _argument in indexable):
+                records.append(IndexedRecord(number, int(offset), int(length)))
+        return records
+
+    def _select(self, indexable: List[_IndexFilter]) -> List[IndexedRecord]:
+        """Evaluates the filters once per distinct value of the indexed fields"""
+        selected: Optional[Set[int]] = None
+        time_predicates = []
+        for field_index, _operator_name, predicate, _argument in indexable:
+            if field_index == 0:
+                time_predicates.append(predicate)
+                continue
+            matching: Set[int] = set()
+            for value, numbers in self._postings_of(field_index).items():
+                if predicate(value):
+                    matching.update(numbers)
+            selected = matching if selected is None else selected & matching
+
+        offsets, lengths, times = self._column(0), self._column(1), self._column(2)
+        return [
+            IndexedRecord(number, int(offsets[number]), int(lengths[number]))
+            for number in sorted(selected or ())
+            if all(predicate(float(times[number])) for predicate in time_predicates)
+        ]
+
+    def _column(self, column_index: int) -> Tuple[bytes, ...]:
+        if not self._columns:
+            rows = [line.split(b"\t") for line in self._data.split(b"\n")[:-1]]
+            if any(len(row) != len(_FIELDS) + 2 for row in rows):
+                raise ValueError("Invalid history index")
+            self._columns = list(zip(*rows))
+        return self._columns[column_index]
+
+    def _postings_of(self, field_index: int) -> Dict[Any, List[int]]:
+        """Maps the distinct values of a field to the numbers of their records"""
+        postings = self._postings.get(field_index)
+        if postings is None:
+            raw_postings: Dict[bytes, List[int]] = {}
+            for number, value in enumerate(self._column(field_index + 2)):
+                raw_postings.setdefault(value, []).append(number)
+            convert = _CONVERSIONS[field_index]
+            postings = self._postings[field_index] = {
+                convert(value.decode("utf-8")): numbers for value, numbers in raw_postings.items()
+            }
+        return postings
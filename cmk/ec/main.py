@@ -28,7 +28,8 @@ import threading
 import time
 import traceback
 from types import FrameType
-from typing import Any, AnyStr, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+from typing import (Any, AnyStr, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple,
+                    Type, Union)
 
 from six import ensure_binary
 
@@ -50,10 +51,13 @@ import livestatus
 from .actions import do_notify, do_event_action, do_event_actions, event_has_opened
 from .crash_reporting import ECCrashReport, CrashReportStore
 from .history import ActiveHistoryPeriod, History, scrub_string, quote_tab, get_logfile
+from .pipeline import EventPipeline
 from .query import MKClientError, Query, QueryGET
+from .rule_index import RuleIndex
 from .rule_packs import load_config as load_config_using
 from .settings import FileDescriptor, PortNumber, Settings, settings as create_settings
 from .snmp import SNMPTrapEngine
+from .status_store import StatusStore
 
 
 class SyslogPriority:
@@ -496,8 +500,17 @@ class Perfcounters:
         "processing": 0.99,  # event processing
         "sync": 0.95,  # Replication sync
         "request": 0.95,  # Client requests
+        "queueing": 0.99,  # waiting of received data for a worker thread
+        "matching": 0.99,  # parsing and rule matching of a message by a worker thread
+        "applying": 0.99,  # serialized processing of a matched message
     }
 
+    # Current values
+    _gauge_names = [
+        "event_queue_length",  # received data waiting for a worker thread
+        "apply_queue_length",  # processed data waiting for being applied
+    ]
+
     # TODO: Why aren't self._times / self._rates / ... not initialized with their defaults?
     def __init__(self, logger: Logger) -> None:
         super().__init__()
@@ -509,6 +522,7 @@ class Perfcounters:
         self._rates: Dict[str, float] = {}
         self._average_rates: Dict[str, float] = {}
         self._times: Dict[str, float] = {}
+        self._gauges = {n: 0 for n in self._gauge_names}
         self._last_statistics: Optional[float] = None
 
         self._logger = logger.getChild("Perfcounters")
@@ -524,6 +538,10 @@ class Perfcounters:
             else:
                 self._times[counter] = ptime
 
+    def set_gauge(self, gauge: str, value: int) -> None:
+        with self._lock:
+            self._gauges[gauge] = value
+
     def do_statistics(self) -> None:
         with self._lock:
             now = time.time()
@@ -557,6 +575,9 @@ class Perfcounters:
         for name in cls._weights:
             columns.append(("status_average_%s_time" % name, 0.0))
 
+        for name in cls._gauge_names:
+            columns.append(("status_" + name, 0))
+
         return columns
 
     def get_status(self) -> List[float]:
@@ -571,6 +592,9 @@ class Perfcounters:
             for name in self._weights:
                 row.append(self._times.get(name, 0.0))
 
+            for name in self._gauge_names:
+                row.append(self._gauges[name])
+
             return row
 
 
@@ -587,6 +611,20 @@ class Perfcounters:
 #   '----------------------------------------------------------------------'
 
 
+class RuleMatch(NamedTuple):
+    """The outcome of matching an event against the rules"""
+    # Matching rules which skipped the rest of their rule pack
+    skip_pack_hits: List[Dict[str, Any]]
+    # The first other matching rule, if any
+    rule: Optional[Dict[str, Any]]
+    cancelling: bool
+    match_groups: Dict[str, Any]
+
+
+# The events matched by a worker thread together with the time needed for matching
+_MatchedEvents = List[Tuple[Dict[str, Any], RuleMatch, float]]
+
+
 class EventServer(ECServerThread):
     month_names = {
         "Jan": 1,
@@ -627,6 +665,7 @@ class EventServer(ECServerThread):
 
         # TODO: Improve type!
         self._rules: List[Any] = []
+        self._rule_index: Optional[RuleIndex] = None
         self._hash_stats = []
         for _unused_facility in range(32):
             self._hash_stats.append([0] * 8)
@@ -640,6 +679,10 @@ class EventServer(ECServerThread):
         self._message_period = ActiveHistoryPeriod()
         self._rule_matcher = RuleMatcher(self._logger, config)
         self._event_creator = EventCreator(self._logger, config)
+        self._pipeline: Optional[EventPipeline] = None
+        # Serializes the decoding of SNMP traps, the engine is not thread safe
+        self._snmp_trap_lock = threading.Lock()
+        self._snmp_trap_events: Optional[List[Dict[str, Any]]] = None
 
         # HACK for testing: The real fix would involve breaking up these huge
         # class monsters.
@@ -817,7 +860,27 @@ class EventServer(ECServerThread):
         return os.open(str(self.settings.paths.event_pipe.value), os.O_RDWR | os.O_NONBLOCK)
 
     def handle_snmptrap(self, trap, ipaddress):
-        self.process_event(self._event_creator.create_event_from_trap(trap, ipaddress))
+        event = self._event_creator.create_event_from_trap(trap, ipaddress)
+        if self._snmp_trap_events is not None:
+            self._snmp_trap_events.append(event)  # decoded by a worker thread
+        else:
+            self.process_event(event)
+
+    def run(self) -> None:
+        num_workers = self._config["event_processing_threads"]
+        if num_workers:
+            self._pipeline = EventPipeline(self._logger.getChild("pipeline"),
+                                           self._perfcounters, num_workers,
+                                           self._config["event_queue_len"],
+                                           self._process_received, self._apply_processed)
+            self._pipeline.start()
+        try:
+            super().run()
+        finally:
+            if self._pipeline is not None:
+                self._logger.info("Processing pending messages")
+                self._pipeline.stop()
+                self._pipeline = None
 
     def serve(self) -> None:
         pipe_fragment = b''
@@ -888,14 +951,14 @@ class EventServer(ECServerThread):
                         # Do we have any complete messages?
                         if b'\n' in data:
                             complete, rest = data.rsplit(b"\n", 1)
-                            self.process_raw_lines(complete + b"\n", address)
+                            self.receive_raw_lines(complete + b"\n", address)
                         else:
                             rest = data  # keep for next time
 
                     # Only complete messages
                     else:
                         if data:
-                            self.process_raw_lines(data, address)
+                            self.receive_raw_lines(data, address)
                         rest = b""
 
                     # Connection still open?
@@ -918,11 +981,11 @@ class EventServer(ECServerThread):
                         if data[-1:] != b'\n':
                             if b'\n' in data:  # at least one complete message contained
                                 messages, pipe_fragment = data.rsplit(b'\n', 1)
-                                self.process_raw_lines(messages + b'\n')  # got lost in split
+                                self.receive_raw_lines(messages + b'\n')  # got lost in split
                             else:
                                 pipe_fragment = data  # keep beginning of message, wait for \n
                         else:
-                            self.process_raw_lines(data)
+                            self.receive_raw_lines(data)
                     else:  # EOF
                         os.close(pipe)
                         pipe = self.open_pipe()
@@ -938,14 +1001,13 @@ class EventServer(ECServerThread):
 
             # Read events from builtin syslog server
             if self._syslog is not None and self._syslog.fileno() in readable:
-                self.process_raw_lines(*self._syslog.recvfrom(4096))
+                self.receive_raw_lines(*self._syslog.recvfrom(4096))
 
             # Read events from builtin snmptrap server
             if self._snmptrap is not None and self._snmptrap.fileno() in readable:
                 try:
                     message, sender_address = self._snmptrap.recvfrom(65535)
-                    self.process_raw_data(
-                        lambda: self._snmp_trap_engine.process_snmptrap(message, sender_address))
+                    self.receive_snmptrap(message, sender_address)
                 except Exception:
                     self._logger.exception(
                         'Exception handling a SNMP trap from "%s". Skipping this one' %
@@ -954,22 +1016,104 @@ class EventServer(ECServerThread):
             try:
                 # process the first spool file we get
                 spool_file = next(self.settings.paths.spool_dir.value.glob('[!.]*'))
-                self.process_raw_lines(spool_file.read_bytes())
+                self.receive_raw_lines(spool_file.read_bytes())
                 spool_file.unlink()
                 select_timeout = 0  # enable fast processing to process further files
             except StopIteration:
                 select_timeout = 1  # restore default select timeout
 
+    def receive_raw_lines(self, data: bytes, address: Optional[Any] = None) -> None:
+        """Processes the received lines or hands them over to the worker threads"""
+        if self._pipeline is None:
+            self.process_raw_lines(data, address)
+        else:
+            self._pipeline.put(("lines", data, address))
+
+    def receive_snmptrap(self, message: bytes, sender_address: Any) -> None:
+        if self._pipeline is None:
+            self.process_raw_data(
+                lambda: self._snmp_trap_engine.process_snmptrap(message, sender_address))
+        else:
+            self._pipeline.put(("snmptrap", message, sender_address))
+
+    def _process_received(self, item: Tuple[str, bytes, Any]) -> _MatchedEvents:
+        """Parses the received data and matches the events, is done by the worker threads"""
+        kind, data, address = item
+        if kind == "snmptrap":
+            self._perfcounters.count("messages")
+            if self._ignore_events_as_slave():
+                return []
+            with self._snmp_trap_lock:
+                self._snmp_trap_events = events = []
+                try:
+                    self._snmp_trap_engine.process_snmptrap(data, address)
+                except Exception:
+                    self._logger.exception(
+                        'Exception handling a SNMP trap from "%s". Skipping this one' % address[0])
+                finally:
+                    self._snmp_trap_events = None
+        else:
+            events = []
+            for line_bytes in data.splitlines():
+                line = scrub_and_decode(line_bytes.rstrip())
+                if not line:
+                    continue
+                self._perfcounters.count("messages")
+                if self._ignore_events_as_slave():
+                    continue
+                try:
+                    if self._config["debug_rules"]:
+                        if address:
+                            self._logger.info(u"Processing message from %r: '%s'" %
+                                              (address, line))
+                        else:
+                            self._logger.info(u"Processing message '%s'" % line)
+                    events.append(
+                        self._event_creator.create_event_from_line(line.rstrip(), address))
+                except Exception as e:
+                    self._logger.exception(
+                        'Exception handling a log line (skipping this one): %s' % e)
+
+        matched = []
+        for event in events:
+            before = time.time()
+            try:
+                rule_match = self.match_event(event)
+            except Exception as e:
+                self._logger.exception('Exception matching an event (skipping this one): %s' % e)
+                continue
+            duration = time.time() - before
+            self._perfcounters.count_time("matching", duration)
+            matched.append((event, rule_match, duration))
+        return matched
+
+    def _apply_processed(self, matched: _MatchedEvents) -> None:
+        """Applies the matched events to the event status, is done by a single thread"""
+        for event, rule_match, match_duration in matched:
+            before = time.time()
+            try:
+                self.apply_rule_match(event, rule_match)
+            except Exception as e:
+                self._logger.exception('Exception processing an event (skipping this one): %s' % e)
+            duration = time.time() - before
+            self._perfcounters.count_time("applying", duration)
+            self._perfcounters.count_time("processing", match_duration + duration)
+
+    def _ignore_events_as_slave(self) -> bool:
+        # In replication slave mode (when not took over), ignore all events
+        if is_replication_slave(self._config) and self._slave_status["mode"] == "sync":
+            if self.settings.options.debug:
+                self._logger.info("Replication: we are in slave mode, ignoring event")
+            return True
+        return False
+
     # Processes incoming data, just a wrapper between the real data and the
     # handler function to record some statistics etc.
     def process_raw_data(self, handler):
         self._perfcounters.count("messages")
         before = time.time()
-        # In replication slave mode (when not took over), ignore all events
-        if not is_replication_slave(self._config) or self._slave_status["mode"] != "sync":
+        if not self._ignore_events_as_slave():
             handler()
-        elif self.settings.options.debug:
-            self._logger.info("Replication: we are in slave mode, ignoring event")
         elapsed = time.time() - before
         self._perfcounters.count_time("processing", elapsed)
 
@@ -1271,6 +1415,7 @@ class EventServer(ECServerThread):
         self._rule_by_id = {}
         # Speedup-Hash for rule execution
         self._rule_hash: Dict[int, Dict[int, Any]] = {}
+        self._rule_index: Optional[RuleIndex] = None
         count_disabled = 0
         count_rules = 0
         count_unspecific = 0
@@ -1346,6 +1491,7 @@ class EventServer(ECServerThread):
                     for prio, entries in self._rule_hash[facility].items():
                         stats.append("%s(%d)" % (SyslogPriority(prio), len(entries)))
                     self._logger.info(" %-12s: %s" % (SyslogFacility(facility), " ".join(stats)))
+            self._rule_index = RuleIndex(self._rule_hash)
 
     @staticmethod
     def _compile_matching_value(key, val):
@@ -1410,6 +1556,21 @@ class EventServer(ECServerThread):
                               (SyslogFacility(facility), SyslogPriority(priority), count,
                                (100.0 * count / float(total_count))))
 
+        if self._rule_index is None:
+            return
+        stats = self._rule_index.statistics()
+        if not stats.events:
+            return
+        self._logger.info("Rule index:")
+        self._logger.info("  %.1f rules per event by facility/priority, %.1f by host" %
+                          (stats.rules_of_facility_priority / stats.events,
+                           stats.rules_of_host / stats.events))
+        for field, skipped in sorted(stats.skipped.items()):
+            self._logger.info("  %.1f rules per event skipped because of the %s" %
+                              (skipped / stats.events, field))
+        self._logger.info("  Host cache: %d entries, hit rate %.2f%%" %
+                          (stats.cache.size, 100.0 * stats.cache.hit_rate))
+
     def process_line(self, line, address):
         line = line.rstrip()
         if self._config["debug_rules"]:
@@ -1422,25 +1583,39 @@ class EventServer(ECServerThread):
         self.process_event(event)
 
     def process_event(self, event):
-        self.do_translate_hostname(event)
+        self.apply_rule_match(event, self.match_event(event))
 
-        # Log all incoming messages into a syslog-like text file if that is enabled
-        if self._config["log_messages"]:
-            self.log_message(event)
+    def match_event(self, event: Dict[str, Any]) -> RuleMatch:
+        """Find the rule matching the event
+
+        Does not change the event status, see apply_rule_match(). This is done
+        by the worker threads of the event processing in parallel."""
+        self.do_translate_hostname(event)
 
         # Rule optimizer
-        if self._config["rule_optimizer"]:
+        rule_index = self._rule_index
+        if rule_index is not None:
             self._hash_stats[event["facility"]][event["priority"]] += 1
-            rule_candidates = self._rule_hash.get(event["facility"], {}).get(event["priority"], [])
+            rule_candidates = rule_index.candidates(event)
         else:
-            rule_candidates = self._rules
+            rule_candidates = [(rule, ()) for rule in self._rules]
 
         skip_pack = None
-        for rule in rule_candidates:
+        skip_pack_hits = []
+        for rule, required_texts in rule_candidates:
             if skip_pack and rule["pack"] == skip_pack:
                 continue  # still in the rule pack that we want to skip
             skip_pack = None  # new pack, reset skipping
 
+            # Rules not containing the needed texts can not match, like the others
+            # which have been left out by the rule index.
+            if required_texts and rule_index is not None \
+                    and not rule_index.has_required_texts(required_texts, event):
+                if self._config["debug_rules"]:
+                    self._logger.info("Skipping rule %s/%s, the event lacks the text %s" %
+                                      (rule["pack"], rule["id"], required_texts))
+                continue
+
             try:
                 result = self.event_rule_matches(rule, event)
             except Exception as e:
@@ -1454,103 +1629,121 @@ class EventServer(ECServerThread):
                 if self._config["debug_rules"]:
                     self._logger.info("  matching groups:\n%s" % pprint.pformat(match_groups))
 
-                self._event_status.count_rule_match(rule["id"])
-                if self._config["log_rulehits"]:
-                    self._logger.info("Rule '%s/%s' hit by message %s/%s - '%s'." %
-                                      (rule["pack"], rule["id"], SyslogFacility(event["facility"]),
-                                       SyslogPriority(event["priority"]), event["text"]))
-
-                if rule.get("drop"):
-                    if rule["drop"] == "skip_pack":
-                        skip_pack = rule["pack"]
-                        if self._config["debug_rules"]:
-                            self._logger.info("  skipping this rule pack (%s)" % skip_pack)
-                        continue
-                    self._perfcounters.count("drops")
-                    return
-
-                if cancelling:
-                    self._event_status.cancel_events(self, self._event_columns, event, match_groups,
-                                                     rule)
-                    return
-
-                # Remember the rule id that this event originated from
-                event["rule_id"] = rule["id"]
-
-                # Attach optional contact group information for visibility
-                # and eventually for notifications
-                self._add_rule_contact_groups_to_event(rule, event)
-
-                # Store groups from matching this event. In order to make
-                # persistence easier, we do not safe them as list but join
-                # them on ASCII-1.
-                event["match_groups"] = match_groups.get("match_groups_message", ())
-                event["match_groups_syslog_application"] = match_groups.get(
-                    "match_groups_syslog_application", ())
-                self.rewrite_event(rule, event, match_groups)
-
-                # Lookup the monitoring core hosts and add the core host
-                # name to the event when one can be matched.
-                #
-                # Needs to be done AFTER event rewriting, because the rewriting
-                # may change the "host" field.
-                #
-                # For the moment we have no rule/condition matching on this
-                # field. So we only add the core host info for matched events.
-                self._add_core_host_to_new_event(event)
-
-                if "count" in rule:
-                    count = rule["count"]
-                    # Check if a matching event already exists that we need to
-                    # count up. If the count reaches the limit, the event will
-                    # be opened and its rule actions performed.
-                    existing_event = \
-                        self._event_status.count_event(self, event, rule, count)
-                    if existing_event:
-                        if "delay" in rule:
-                            if self._config["debug_rules"]:
-                                self._logger.info("Event opening will be delayed for %d seconds" %
-                                                  rule["delay"])
-                            existing_event["delay_until"] = time.time() + rule["delay"]
-                            existing_event["phase"] = "delayed"
-                        else:
-                            event_has_opened(self._history, self.settings, self._config,
-                                             self._logger, self, self._event_columns, rule,
-                                             existing_event)
-
-                        self._history.add(existing_event, "COUNTREACHED")
-
-                        if "delay" not in rule and rule.get("autodelete"):
-                            existing_event["phase"] = "closed"
-                            self._history.add(existing_event, "AUTODELETE")
-                            with self._event_status.lock:
-                                self._event_status.remove_event(existing_event)
-                elif "expect" in rule:
-                    self._event_status.count_expected_event(self, event)
+                if rule.get("drop") == "skip_pack":
+                    skip_pack_hits.append(rule)
+                    skip_pack = rule["pack"]
+                    if self._config["debug_rules"]:
+                        self._logger.info("  skipping this rule pack (%s)" % skip_pack)
+                    continue
+
+                return RuleMatch(skip_pack_hits, rule, cancelling, match_groups)
+
+        return RuleMatch(skip_pack_hits, None, False, {})
+
+    def apply_rule_match(self, event: Dict[str, Any], rule_match: RuleMatch) -> None:
+        """Create, count or cancel events according to the rule matching the event"""
+        # Log all incoming messages into a syslog-like text file if that is enabled
+        if self._config["log_messages"]:
+            self.log_message(event)
+
+        for rule in rule_match.skip_pack_hits:
+            self._count_rule_hit(rule, event)
+
+        rule = rule_match.rule
+        if rule is None:
+            # No rule matched
+            if self._config["archive_orphans"]:
+                self._event_status.archive_event(event)
+            return
+
+        self._count_rule_hit(rule, event)
+        cancelling, match_groups = rule_match.cancelling, rule_match.match_groups
+
+        if rule.get("drop"):
+            self._perfcounters.count("drops")
+            return
+
+        if cancelling:
+            self._event_status.cancel_events(self, self._event_columns, event, match_groups, rule)
+            return
+
+        # Remember the rule id that this event originated from
+        event["rule_id"] = rule["id"]
+
+        # Attach optional contact group information for visibility
+        # and eventually for notifications
+        self._add_rule_contact_groups_to_event(rule, event)
+
+        # Store groups from matching this event. In order to make
+        # persistence easier, we do not safe them as list but join
+        # them on ASCII-1.
+        event["match_groups"] = match_groups.get("match_groups_message", ())
+        event["match_groups_syslog_application"] = match_groups.get(
+            "match_groups_syslog_application", ())
+        self.rewrite_event(rule, event, match_groups)
+
+        # Lookup the monitoring core hosts and add the core host
+        # name to the event when one can be matched.
+        #
+        # Needs to be done AFTER event rewriting, because the rewriting
+        # may change the "host" field.
+        #
+        # For the moment we have no rule/condition matching on this
+        # field. So we only add the core host info for matched events.
+        self._add_core_host_to_new_event(event)
+
+        if "count" in rule:
+            count = rule["count"]
+            # Check if a matching event already exists that we need to
+            # count up. If the count reaches the limit, the event will
+            # be opened and its rule actions performed.
+            existing_event = self._event_status.count_event(self, event, rule, count)
+            if existing_event:
+                if "delay" in rule:
+                    if self._config["debug_rules"]:
+                        self._logger.info("Event opening will be delayed for %d seconds" %
+                                          rule["delay"])
+                    existing_event["delay_until"] = time.time() + rule["delay"]
+                    existing_event["phase"] = "delayed"
                 else:
-                    if "delay" in rule:
-                        if self._config["debug_rules"]:
-                            self._logger.info("Event opening will be delayed for %d seconds" %
-                                              rule["delay"])
-                        event["delay_until"] = time.time() + rule["delay"]
-                        event["phase"] = "delayed"
-                    else:
-                        event["phase"] = "open"
+                    event_has_opened(self._history, self.settings, self._config, self._logger,
+                                     self, self._event_columns, rule, existing_event)
+
+                self._history.add(existing_event, "COUNTREACHED")
+
+                if "delay" not in rule and rule.get("autodelete"):
+                    existing_event["phase"] = "closed"
+                    self._history.add(existing_event, "AUTODELETE")
+                    with self._event_status.lock:
+                        self._event_status.remove_event(existing_event)
+        elif "expect" in rule:
+            self._event_status.count_expected_event(self, event)
+        else:
+            if "delay" in rule:
+                if self._config["debug_rules"]:
+                    self._logger.info("Event opening will be delayed for %d seconds" %
+                                      rule["delay"])
+                event["delay_until"] = time.time() + rule["delay"]
+                event["phase"] = "delayed"
+            else:
+                event["phase"] = "open"
 
-                    if self.new_event_respecting_limits(event):
-                        if event["phase"] == "open":
-                            event_has_opened(self._history, self.settings, self._config,
-                                             self._logger, self, self._event_columns, rule, event)
-                            if rule.get("autodelete"):
-                                event["phase"] = "closed"
-                                self._history.add(event, "AUTODELETE")
-                                with self._event_status.lock:
-                                    self._event_status.remove_event(event)
-                return
+            if self.new_event_respecting_limits(event):
+                if event["phase"] == "open":
+                    event_has_opened(self._history, self.settings, self._config, self._logger,
+                                     self, self._event_columns, rule, event)
+                    if rule.get("autodelete"):
+                        event["phase"] = "closed"
+                        self._history.add(event, "AUTODELETE")
+                        with self._event_status.lock:
+                            self._event_status.remove_event(event)
 
-        # End of loop over rules.
-        if self._config["archive_orphans"]:
-            self._event_status.archive_event(event)
+    def _count_rule_hit(self, rule: Dict[str, Any], event: Dict[str, Any]) -> None:
+        self._event_status.count_rule_match(rule["id"])
+        if self._config["log_rulehits"]:
+            self._logger.info("Rule '%s/%s' hit by message %s/%s - '%s'." %
+                              (rule["pack"], rule["id"], SyslogFacility(event["facility"]),
+                               SyslogPriority(event["priority"]), event["text"]))
 
     def _add_rule_contact_groups_to_event(self, rule, event):
         if rule.get("contact_groups") is None:
@@ -3155,12 +3348,15 @@ class EventStatus:
         self.lock = threading.Lock()
         self._history = history
         self._logger = logger
+        self._store = StatusStore(settings.paths.status_file.value,
+                                  settings.paths.status_journal_file.value, logger)
         self.flush()
 
     def reload_configuration(self, config: Dict[str, Any]) -> None:
         self._config = config
 
     def flush(self) -> None:
+        self._store.invalidate()
         # TODO: Improve types!
         self._events: List[Any] = []
         self._next_event_id = 1
@@ -3230,6 +3426,7 @@ class EventStatus:
         }
 
     def unpack_status(self, status):
+        self._store.invalidate()
         self._next_event_id = status["next_event_id"]
         self._events = status["events"]
         self._rule_stats = status["rule_stats"]
@@ -3237,17 +3434,9 @@ class EventStatus:
 
     def save_status(self):
         now = time.time()
-        status = self.pack_status()
-        path = self.settings.paths.status_file.value
-        path_new = path.parent / (path.name + '.new')
-        # Believe it or not: cPickle is more than two times slower than repr()
-        with path_new.open(mode='wb') as f:
-            f.write((repr(status) + "\n").encode("utf-8"))
-            f.flush()
-            os.fsync(f.fileno())
-        path_new.rename(path)
+        self._store.save(self.pack_status())
         elapsed = time.time() - now
-        self._logger.log(VERBOSE, "Saved event state to %s in %.3fms.", path, elapsed * 1000)
+        self._logger.log(VERBOSE, "Saved event state in %.3fms.", elapsed * 1000)
 
     def reset_counters(self, rule_id):
         if rule_id:
@@ -3259,17 +3448,17 @@ class EventStatus:
 
     def load_status(self, event_server):
         path = self.settings.paths.status_file.value
-        if path.exists():
-            try:
-                status = ast.literal_eval(path.read_text(encoding="utf-8"))
-                self._next_event_id = status["next_event_id"]
-                self._events = status["events"]
-                self._rule_stats = status["rule_stats"]
-                self._interval_starts = status.get("interval_starts", {})
-                self._logger.info("Loaded event state from %s." % path)
-            except Exception as e:
-                self._logger.exception("Error loading event state from %s: %s" % (path, e))
-                raise
+        try:
+            status = self._store.load()
+        except Exception as e:
+            self._logger.exception("Error loading event state from %s: %s" % (path, e))
+            raise
+        if status is not None:
+            self._next_event_id = status["next_event_id"]
+            self._events = status["events"]
+            self._rule_stats = status["rule_stats"]
+            self._interval_starts = status["interval_starts"]
+            self._logger.info("Loaded event state from %s." % path)
 
         # Add new columns
         for event in self._events:
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Staged processing of the incoming messages of the event daemon
+
+The receiving thread of the event server only puts the data read from its
+sockets and the event pipe into a bounded queue. Worker threads parse the
+messages and match them against the rules. The outcome is then applied to
+the event status by a single thread, in the order in which the data has been
+received. This way neither slow rule matching nor slow actions block the
+reading from the sockets.
+"""
+
+import queue
+import threading
+import time
+from logging import Logger
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .main import Perfcounters
+
+# Processes an item received from a socket, is called by the worker threads
+ProcessFunction = Callable[[Any], Any]
+# Applies the result of the processing, is called by a single thread
+ApplyFunction = Callable[[Any], None]
+
+
+class EventPipeline:
+    """Distributes the received items to worker threads and serializes their results
+
+    The receive queue is bounded, so put() blocks once the workers can not keep
+    up anymore. The results are applied in the order of the items: The result of
+    a fast worker waits for the ones of the items which have been received before.
+    """
+    def __init__(self, logger: Logger, perfcounters: 'Perfcounters', num_workers: int,
+                 queue_len: int, process: ProcessFunction, apply: ApplyFunction) -> None:
+        super().__init__()
+        self._logger = logger
+        self._perfcounters = perfcounters
+        self._num_workers = num_workers
+        self._queue_len = queue_len
+        self._process = process
+        self._apply = apply
+
+        self._queue: "queue.Queue[Optional[Tuple[int, float, Any]]]" = queue.Queue(queue_len)
+        self._next_sequence = 0
+        self._queue_length = 0
+        self._queue_length_lock = threading.Lock()
+
+        # Results waiting for being applied
+        self._results: Dict[int, Any] = {}
+        self._results_changed = threading.Condition()
+        self._next_result = 0
+        self._stopping = False
+
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        self._threads = [
+            threading.Thread(name="EventWorker-%d" % number, target=self._work, daemon=True)
+            for number in range(self._num_workers)
+        ]
+        self._threads.append(
+            threading.Thread(name="EventApplier", target=self._apply_results, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        self._logger.info("Started event processing with %d worker threads" % self._num_workers)
+
+    def stop(self) -> None:
+        """Process the pending items and terminate the threads"""
+        for _unused in range(self._num_workers):
+            self._queue.put(None)
+        for thread in self._threads[:-1]:
+            thread.join()
+
+        with self._results_changed:
+            self._stopping = True
+            self._results_changed.notify_all()
+        self._threads[-1].join()
+        self._threads = []
+
+    def put(self, item: Any) -> None:
+        """Is called by the receiving thread only"""
+        self._count_queued(1)
+        self._queue.put((self._next_sequence, time.time(), item))
+        self._next_sequence += 1
+
+    def _count_queued(self, change: int) -> None:
+        with self._queue_length_lock:
+            self._queue_length += change
+            self._perfcounters.set_gauge("event_queue_length", self._queue_length)
+
+    def _work(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            sequence, received, item = entry
+            self._count_queued(-1)
+            self._perfcounters.count_time("queueing", time.time() - received)
+
+            try:
+                result = self._process(item)
+            except Exception:
+                self._logger.exception("Exception processing received data (skipping it)")
+                result = None
+
+            with self._results_changed:
+                # The result needed next must never wait, otherwise we would be stuck
+                while len(self._results) >= self._queue_len and sequence != self._next_result:
+                    self._results_changed.wait()
+                self._results[sequence] = result
+                self._perfcounters.set_gauge("apply_queue_length", len(self._results))
+                self._results_changed.notify_all()
+
+    def _apply_results(self) -> None:
+        while True:
+            with self._results_changed:
+                while self._next_result not in self._results:
+                    if self._stopping:
+                        return
+                    self._results_changed.wait()
+                result = self._results.pop(self._next_result)
+                self._next_result += 1
+                self._perfcounters.set_gauge("apply_queue_length", len(self._results))
+                self._results_changed.notify_all()
+
+            if result is None:
+                continue
+            try:
+                self._apply(result)
+            except Exception:
+                self._logger.exception("Exception applying processed data (skipping it)")
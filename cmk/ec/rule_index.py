@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Index of the Event Console rules
+
+The rule optimizer of the event server hashes the rules by syslog facility
+and priority. The index narrows these rules down further, so that the
+expensive regex matching is only done for rules which may match an event:
+
+* Rules with a plain (non regex) host condition are indexed by the host name
+  and rules with a host regex like "^prefix" by that prefix.
+* Literal texts which have to be contained in the message text, the syslog
+  application or the host name for a rule to match are extracted from its
+  conditions. These are checked before doing the full matching.
+
+The order of the rules is retained, so the first matching rule wins as before.
+Rules with inverted matching are never filtered.
+"""
+
+import collections
+import re
+import threading
+from typing import (
+    Any,
+    Counter,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from cmk.utils.caching import CacheStatistics, LRUCache
+
+Rule = Dict[str, Any]
+Event = Dict[str, Any]
+# Which field of the event has to contain which (lower case) text
+RequiredTexts = Tuple[Tuple[str, str], ...]
+# The rule together with the texts needed by it
+RuleCandidate = Tuple[Rule, RequiredTexts]
+
+# Cache of the candidates per facility, priority and host
+_CANDIDATE_CACHE_SIZE = 100000
+_CandidateKey = Tuple[int, int, str]
+
+# Characters which make a regex quantifier
+_QUANTIFIERS = "*?{"
+# A "{" not followed by this is matched literally
+_REPETITION = re.compile(r"\{\d*(,\d*)?\}")
+# Escapes which are followed by arguments, e.g. \x41 or \1
+_ESCAPES_WITH_ARGUMENTS = "xuUN0123456789"
+# Regex flags which change the meaning of the whole pattern, e.g. (?x)
+_GLOBAL_FLAGS = "aiLmsux-"
+
+
+class _PatternLiterals(NamedTuple):
+    # The literal the text has to start with
+    prefix: str
+    # The literals the text has to contain
+    infixes: List[str]
+
+
+def _skip_class(pattern: str, index: int) -> Optional[int]:
+    """Returns the index behind the character class starting at index"""
+    index += 1
+    if pattern.startswith("^", index):
+        index += 1
+    if pattern.startswith("]", index):
+        index += 1
+    while index < len(pattern):
+        if pattern[index] == "\\":
+            index += 2
+        elif pattern[index] == "]":
+            return index + 1
+        else:
+            index += 1
+    return None
+
+
+def _skip_group(pattern: str, index: int) -> Optional[int]:
+    """Returns the index behind the group starting at index"""
+    depth = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == "[":
+            class_end = _skip_class(pattern, index)
+            if class_end is None:
+                return None
+            index = class_end
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        index += 1
+    return None
+
+
+def pattern_literals(pattern: str) -> Optional[_PatternLiterals]:
+    """Find the literal texts a regex needs to match
+
+    Only the top level of the pattern is analyzed: Groups, character
+    classes, escape sequences and optional characters end a literal.
+    Returns None for patterns which can not be analyzed, e.g. the ones
+    using alternatives on the top level.
+    """
+    anchored = pattern.startswith("^")
+    index = 1 if anchored else 0
+    prefix: Optional[str] = None
+    literals: List[str] = []
+    current: List[str] = []
+
+    def end_literal() -> None:
+        nonlocal prefix
+        if prefix is None:
+            prefix = "".join(current) if anchored else ""
+        if current:
+            literals.append("".join(current))
+            current.clear()
+
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            if index + 1 >= len(pattern):
+                return None
+            escaped = pattern[index + 1]
+            index += 2
+            if escaped in _ESCAPES_WITH_ARGUMENTS:
+                return None
+            if escaped.isalnum() or escaped.isspace():
+                # Character classes, anchors, back references, ...
+                end_literal()
+            else:
+                current.append(escaped)
+        elif char in _QUANTIFIERS:
+            # The previous character is optional
+            if current:
+                current.pop()
+            end_literal()
+            if char == "{":
+                repetition = _REPETITION.match(pattern, index)
+                if repetition is None:
+                    return None
+                index = repetition.end()
+            else:
+                index += 1
+        elif char == "+":
+            # The previous character is needed, but may be repeated
+            end_literal()
+            index += 1
+        elif char == "|":
+            return None
+        elif char == "(":
+            if pattern.startswith("(?", index) and pattern[index + 2:index + 3] in _GLOBAL_FLAGS:
+                return None
+            group_end = _skip_group(pattern, index)
+            if group_end is None:
+                return None
+            end_literal()
+            index = group_end
+        elif char == "[":
+            class_end = _skip_class(pattern, index)
+            if class_end is None:
+                return None
+            end_literal()
+            index = class_end
+        elif char in ".^$)":
+            end_literal()
+            index += 1
+        else:
+            current.append(char)
+            index += 1
+    end_literal()
+
+    # Compare ASCII literals only: With re.IGNORECASE, characters like the
+    # Kelvin sign match "k", which lower() does not take into account.
+    return _PatternLiterals(
+        prefix=prefix.lower() if prefix and prefix.isascii() else "",
+        infixes=[literal.lower() for literal in literals if literal.isascii()],
+    )
+
+
+def _required_text(condition: Union[None, str, Pattern[str]]) -> Optional[str]:
+    """Returns a text which has to be contained in a field to match the condition"""
+    if condition is None:
+        return None
+    if isinstance(condition, str):
+        # Plain texts are lower case already and are matched as infix
+        return condition or None
+    literals = pattern_literals(condition.pattern)
+    if literals is None or not literals.infixes:
+        return None
+    return max(literals.infixes, key=len)
+
+
+def required_texts(rule: Rule) -> RequiredTexts:
+    """Texts which have to be contained in the fields of an event for the rule to match
+
+    The conditions of a rule which can also be fulfilled by the canceling
+    condition of the same field can not be taken into account.
+    """
+    if rule.get("invert_matching"):
+        return ()
+
+    texts = []
+    if "match_ok" not in rule:
+        text = _required_text(rule.get("match"))
+        if text is not None:
+            texts.append(("text", text))
+
+    if "cancel_application" not in rule:
+        text = _required_text(rule.get("match_application"))
+        if text is not None:
+            texts.append(("application", text))
+
+    match_host = rule.get("match_host")
+    if match_host is not None and not isinstance(match_host, str):
+        text = _required_text(match_host)
+        if text is not None:
+            texts.append(("host", text))
+
+    return tuple(texts)
+
+
+def _host_key(rule: Rule) -> Tuple[str, str]:
+    """Returns how the rule is indexed by the host: ("exact", host), ("prefix", prefix) or ("", "")"""
+    match_host = rule.get("match_host")
+    if match_host is None or rule.get("invert_matching"):
+        return "", ""
+    if isinstance(match_host, str):
+        # Plain texts are compared to the whole lower case host name
+        return "exact", match_host
+    literals = pattern_literals(match_host.pattern)
+    if literals is not None and literals.prefix:
+        return "prefix", literals.prefix
+    return "", ""
+
+
+class _RuleBucket:
+    """The rules of one syslog facility and priority"""
+    def __init__(self, rules: Sequence[Rule]) -> None:
+        self.size = len(rules)
+        self._by_host: Dict[str, List[Tuple[int, RuleCandidate]]] = {}
+        self._by_host_prefix: Dict[str, List[Tuple[int, RuleCandidate]]] = {}
+        self._unindexed: List[Tuple[int, RuleCandidate]] = []
+
+        for position, rule in enumerate(rules):
+            entry = (position, (rule, required_texts(rule)))
+            kind, key = _host_key(rule)
+            if kind == "exact":
+                self._by_host.setdefault(key, []).append(entry)
+            elif kind == "prefix":
+                self._by_host_prefix.setdefault(key, []).append(entry)
+            else:
+                self._unindexed.append(entry)
+        self._prefix_lengths: List[int] = sorted({len(prefix) for prefix in self._by_host_prefix})
+
+    def candidates(self, host: str) -> List[RuleCandidate]:
+        host = host.lower()
+        entries = [self._unindexed, self._by_host.get(host, [])]
+        if host.isascii():
+            entries.extend(
+                self._by_host_prefix.get(host[:length], [])
+                for length in self._prefix_lengths
+                if length <= len(host))
+        else:
+            # Regex matching is done without respecting lower()
+            entries.extend(self._by_host_prefix.values())
+
+        non_empty = [e for e in entries if e]
+        if len(non_empty) == 1:
+            return [candidate for _position, candidate in non_empty[0]]
+        merged = sorted((entry for e in non_empty for entry in e), key=lambda entry: entry[0])
+        return [candidate for _position, candidate in merged]
+
+
+class RuleIndexStatistics(NamedTuple):
+    events: int
+    rules_of_facility_priority: int
+    rules_of_host: int
+    skipped: Dict[str, int]
+    cache: CacheStatistics
+
+
+class RuleIndex:
+    """Finds the rules which may match an event
+
+    Is created from the rule hash of the event server: The rules of every
+    syslog facility and priority in the order in which they are tried.
+    Can be used by several threads.
+    """
+    def __init__(self, rule_hash: Dict[int, Dict[int, List[Rule]]]) -> None:
+        self._buckets: Dict[Tuple[int, int], _RuleBucket] = {
+            (facility, priority): _RuleBucket(rules) for facility, priorities in rule_hash.items()
+            for priority, rules in priorities.items()
+        }
+        self._candidates: LRUCache[_CandidateKey, List[RuleCandidate]]
+        self._candidates = LRUCache("Rule candidates", _CANDIDATE_CACHE_SIZE)
+        self._events = 0
+        self._rules_of_facility_priority = 0
+        self._rules_of_host = 0
+        self._skipped: Counter[str] = collections.Counter()
+        self._lock = threading.Lock()
+
+    def candidates(self, event: Event) -> List[RuleCandidate]:
+        """Returns the rules which may match the event together with their needed texts"""
+        bucket = self._buckets.get((event["facility"], event["priority"]))
+        key = (event["facility"], event["priority"], event["host"])
+        with self._lock:
+            self._events += 1
+            if bucket is None:
+                return []
+
+            candidates = self._candidates.get(key)
+            if candidates is None:
+                candidates = self._candidates[key] = bucket.candidates(event["host"])
+
+            self._rules_of_facility_priority += bucket.size
+            self._rules_of_host += len(candidates)
+        return candidates
+
+    def has_required_texts(self, texts: RequiredTexts, event: Event) -> bool:
+        """Checks whether or not the event contains the texts needed by a rule
+
+        Values containing non ASCII characters are not checked, see pattern_literals().
+        """
+        for field, text in texts:
+            value = event.get(field, "")
+            if value.isascii() and text not in value.lower():
+                with self._lock:
+                    self._skipped[field] += 1
+                return False
+        return True
+
+    def statistics(self) -> RuleIndexStatistics:
+        with self._lock:
+            return RuleIndexStatistics(
+                events=self._events,
+                rules_of_facility_priority=self._rules_of_facility_priority,
+                rules_of_host=self._rules_of_host,
+                skipped=dict(self._skipped),
+                cache=self._candidates.statistics(),
+            )
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Persistence of the event status
+
+The status consists of a snapshot and a journal:
+
+* The snapshot contains the complete status. It is replaced atomically.
+* The journal contains the changes made after the snapshot has been
+  written. Every save appends one record with the events created or changed
+  and the IDs of the events removed since the previous save. The record also
+  contains the other, small parts of the status.
+
+Loading the status reads the snapshot and replays the records of the journal.
+Once the journal has become larger than the snapshot, a new snapshot is
+written and the journal is emptied again.
+
+Both the snapshot and the records carry a sequence number. The records
+already contained in the snapshot are skipped, so a crash between writing a
+snapshot and emptying the journal does not matter. A record which has not
+been written completely, e.g. because of a crash, is detected by its length
+and checksum and is dropped together with the records following it. The
+status then is the one of the last complete save.
+"""
+
+import ast
+import os
+import pickle
+import struct
+import zlib
+from logging import Logger
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from cmk.utils.log import VERBOSE
+
+Event = Dict[str, Any]
+Status = Dict[str, Any]
+
+# The status file has been written with repr() up to 2.0
+_SNAPSHOT_MAGIC = b"CMKECSTATUS\x01\n"
+# Length and CRC32 checksum of a journal record
+_RECORD_HEADER = struct.Struct("!II")
+# Don't write a new snapshot for smaller journals
+_MIN_COMPACTION_SIZE = 1024 * 1024
+
+# The parts of the status besides the events
+_META_KEYS = ["next_event_id", "rule_stats", "interval_starts"]
+
+
+class StatusStore:
+    def __init__(self, snapshot_path: Path, journal_path: Path, logger: Logger) -> None:
+        super().__init__()
+        self._snapshot_path = snapshot_path
+        self._journal_path = journal_path
+        self._logger = logger
+
+        self._sequence = 0
+        self._snapshot_size = 0
+        self._journal_size = 0
+        # The events as they have been saved lastly, None forces a new snapshot
+        self._saved_events: Optional[Dict[int, Event]] = None
+        self._saved_meta: Dict[str, Any] = {}
+
+    def invalidate(self) -> None:
+        """Makes the next save write a snapshot, e.g. after replacing the whole status"""
+        self._saved_events = None
+
+    def load(self) -> Optional[Status]:
+        """Returns the saved status or None, if nothing has been saved yet"""
+        status = self._read_snapshot()
+        if status is None:
+            return None
+
+        # New events are added to the end, like EventStatus does it
+        events = {event["id"]: event for event in status["events"]}
+        replayed = 0
+        for sequence, changed, removed, meta in self._read_journal():
+            if sequence <= self._sequence:
+                continue  # Is already contained in the snapshot
+            for event_id in removed:
+                events.pop(event_id, None)
+            events.update((event["id"], event) for event in changed)
+            status.update(meta)
+            self._sequence = sequence
+            replayed += 1
+        status["events"] = list(events.values())
+
+        if replayed:
+            self._logger.info("Replayed %d changes of the event state from %s" %
+                              (replayed, self._journal_path))
+        self._remember_saved(status)
+        return status
+
+    def _read_snapshot(self) -> Optional[Status]:
+        try:
+            data = self._snapshot_path.read_bytes()
+        except FileNotFoundError:
+            return None
+        self._snapshot_size = len(data)
+
+        if not data.startswith(_SNAPSHOT_MAGIC):
+            status = ast.literal_eval(data.decode("utf-8"))
+            status.setdefault("interval_starts", {})
+            self._sequence = 0
+            return status
+
+        self._sequence, status = pickle.loads(data[len(_SNAPSHOT_MAGIC):])
+        return status
+
+    def _read_journal(self) -> Iterator[Tuple[int, List[Event], List[int], Dict[str, Any]]]:
+        try:
+            data = self._journal_path.read_bytes()
+        except FileNotFoundError:
+            self._journal_size = 0
+            return
+
+        offset = 0
+        while offset < len(data):
+            record = self._decode_record(data, offset)
+            if record is None:
+                self._logger.warning(
+                    "Ignoring incomplete change of the event state at offset %d of %s" %
+                    (offset, self._journal_path))
+                # Don't append behind the incomplete record
+                with self._journal_path.open("r+b") as f:
+                    f.truncate(offset)
+                break
+            offset += _RECORD_HEADER.size + len(record)
+            yield pickle.loads(record)
+        self._journal_size = offset
+
+    @staticmethod
+    def _decode_record(data: bytes, offset: int) -> Optional[bytes]:
+        header = data[offset:offset + _RECORD_HEADER.size]
+        if len(header) < _RECORD_HEADER.size:
+            return None
+        length, checksum = _RECORD_HEADER.unpack(header)
+        start = offset + _RECORD_HEADER.size
+        record = data[start:start + length]
+        if len(record) < length or zlib.crc32(record) != checksum:
+            return None
+        return record
+
+    def save(self, status: Status) -> None:
+        """Writes the changes made since the last save or a new snapshot"""
+        if self._saved_events is None:
+            self._write_snapshot(status)
+            return
+
+        events = {event["id"]: event for event in status["events"]}
+        changed = [
+            event for event_id, event in events.items() if self._saved_events.get(event_id) != event
+        ]
+        removed = [event_id for event_id in self._saved_events if event_id not in events]
+        meta = {key: status[key] for key in _META_KEYS}
+        if not changed and not removed and meta == self._saved_meta:
+            return
+
+        self._sequence += 1
+        self._append_record((self._sequence, changed, removed, meta))
+        for event_id in removed:
+            del self._saved_events[event_id]
+        self._saved_events.update((event["id"], dict(event)) for event in changed)
+        self._saved_meta = _copy_meta(meta)
+        self._logger.log(VERBOSE, "Saved %d changed and %d removed events to %s", len(changed),
+                         len(removed), self._journal_path)
+
+        if self._journal_size > max(self._snapshot_size, _MIN_COMPACTION_SIZE):
+            self._write_snapshot(status)
+
+    def _append_record(self, record: Tuple[int, List[Event], List[int], Dict[str, Any]]) -> None:
+        data = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        try:
+            with self._journal_path.open("ab") as f:
+                f.write(_RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception:
+            # A partially written record would hide the following ones
+            self.invalidate()
+            raise
+        self._journal_size += _RECORD_HEADER.size + len(data)
+
+    def _write_snapshot(self, status: Status) -> None:
+        data = _SNAPSHOT_MAGIC + pickle.dumps((self._sequence, status), pickle.HIGHEST_PROTOCOL)
+        path_new = self._snapshot_path.parent / (self._snapshot_path.name + ".new")
+        with path_new.open(mode="wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        path_new.rename(self._snapshot_path)
+        self._snapshot_size = len(data)
+
+        # The records are contained in the snapshot now
+        with self._journal_path.open("wb") as f:
+            os.fsync(f.fileno())
+        self._journal_size = 0
+        self._remember_saved(status)
+        self._logger.log(VERBOSE, "Saved %d events to %s", len(status["events"]),
+                         self._snapshot_path)
+
+    def _remember_saved(self, status: Status) -> None:
+        self._saved_events = {event["id"]: dict(event) for event in status["events"]}
+        self._saved_meta = _copy_meta({key: status[key] for key in _META_KEYS})
+
+
+def _copy_meta(meta: Dict[str, Any]) -> Dict[str, Any]:
+    # The rule statistics and interval starts are changed in place
+    return {key: value.copy() if isinstance(value, dict) else value for key, value in meta.items()}
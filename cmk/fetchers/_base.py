@@ -235,6 +235,13 @@ class ABCFetcher(Generic[TRawData], metaclass=abc.ABCMeta):
         raise NotImplementedError()
 
     def _fetch(self, mode: Mode) -> TRawData:
+        raw_data = self._fetch_from_cache_for(mode)
+        if raw_data:
+            return raw_data
+        return self._write_to_cache_for(mode, self._fetch_from_io(mode))
+
+    def _fetch_from_cache_for(self, mode: Mode) -> Optional[TRawData]:
+        """Return the cached data if `mode` allows to use them."""
         self._logger.debug("[%s] Fetch with cache settings: %r, Cache enabled: %r",
                            self.__class__.__name__, self.file_cache,
                            self._is_cache_read_enabled(mode))
@@ -247,7 +254,10 @@ class ABCFetcher(Generic[TRawData], metaclass=abc.ABCMeta):
                 return raw_data
 
         self._logger.log(VERBOSE, "[%s] Execute data source", self.__class__.__name__)
-        raw_data = self._fetch_from_io(mode)
+        return None
+
+    def _write_to_cache_for(self, mode: Mode, raw_data: TRawData) -> TRawData:
+        """Write the data fetched from IO to the cache if `mode` allows it."""
         if self._is_cache_write_enabled(mode):
             self.file_cache.write(raw_data)
         return raw_data
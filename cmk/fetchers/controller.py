@@ -9,14 +9,15 @@ import json
 import logging
 import os
 import signal
+import threading
 import traceback
 from pathlib import Path
 from types import FrameType
-from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
 
 import cmk.utils.cleanup
 import cmk.utils.paths as paths
-from cmk.utils.cpu_tracking import CPUTracker, Snapshot
+from cmk.utils.cpu_tracking import CPUTracker, Snapshot, times_result
 from cmk.utils.exceptions import MKTimeout
 from cmk.utils.type_defs import ConfigSerial, HostName, result
 
@@ -30,6 +31,7 @@ logger = logging.getLogger("cmk.helper")
 class GlobalConfig(NamedTuple):
     cmc_log_level: int
     snmp_plugin_store: SNMPPluginStore
+    concurrent_fetchers: bool = False
 
     @property
     def log_level(self) -> int:
@@ -57,6 +59,7 @@ class GlobalConfig(NamedTuple):
             return cls(
                 cmc_log_level=fetcher_config["cmc_log_level"],
                 snmp_plugin_store=SNMPPluginStore.deserialize(fetcher_config["snmp_plugin_store"]),
+                concurrent_fetchers=fetcher_config.get("concurrent_fetchers", False),
             )
         except (LookupError, TypeError, ValueError) as exc:
             raise ValueError(serialized) from exc
@@ -66,6 +69,7 @@ class GlobalConfig(NamedTuple):
             "fetcher_config": {
                 "cmc_log_level": self.cmc_log_level,
                 "snmp_plugin_store": self.snmp_plugin_store.serialize(),
+                "concurrent_fetchers": self.concurrent_fetchers,
             },
         }
 
@@ -117,7 +121,7 @@ def process_command(command: Command) -> None:
         global_config = load_global_config(command.serial)
         logging.getLogger().setLevel(global_config.log_level)
         SNMPFetcher.plugin_store = global_config.snmp_plugin_store
-        run_fetchers(**command._asdict())
+        run_fetchers(**command._asdict(), concurrent=global_config.concurrent_fetchers)
 
 
 @contextlib.contextmanager
@@ -129,7 +133,14 @@ def _confirm_command_processed() -> Iterator[None]:
         write_bytes(bytes(protocol.CMCMessage.end_of_reply()))
 
 
-def run_fetchers(serial: ConfigSerial, host_name: HostName, mode: Mode, timeout: int) -> None:
+def run_fetchers(
+    serial: ConfigSerial,
+    host_name: HostName,
+    mode: Mode,
+    timeout: int,
+    *,
+    concurrent: bool = False,
+) -> None:
     """Entry point from bin/fetcher"""
     # check that file is present, because lack of the file is not an error at the moment
     local_config_path = make_local_config_path(serial=serial, host_name=host_name)
@@ -139,7 +150,13 @@ def run_fetchers(serial: ConfigSerial, host_name: HostName, mode: Mode, timeout:
         return
 
     # Usually OMD_SITE/var/check_mk/core/fetcher-config/[config-serial]/[host].json
-    _run_fetchers_from_file(host_name, file_name=local_config_path, mode=mode, timeout=timeout)
+    _run_fetchers_from_file(
+        host_name,
+        file_name=local_config_path,
+        mode=mode,
+        timeout=timeout,
+        concurrent=concurrent,
+    )
 
     # Cleanup different things (like object specific caches)
     cmk.utils.cleanup.cleanup_globals()
@@ -154,14 +171,27 @@ def load_global_config(serial: ConfigSerial) -> GlobalConfig:
         return GlobalConfig(cmc_log_level=5, snmp_plugin_store=SNMPPluginStore())
 
 
-def run_fetcher(entry: Dict[str, Any], mode: Mode) -> protocol.FetcherMessage:
-    """ Entrypoint to obtain data from fetcher objects.    """
-
+def _fetcher_type(entry: Dict[str, Any]) -> FetcherType:
     try:
-        fetcher_type = FetcherType[entry["fetcher_type"]]
+        return FetcherType[entry["fetcher_type"]]
     except KeyError as exc:
         raise RuntimeError from exc
 
+
+def run_fetcher(
+    entry: Dict[str, Any],
+    mode: Mode,
+    *,
+    track_cpu: bool = True,
+) -> protocol.FetcherMessage:
+    """ Entrypoint to obtain data from fetcher objects.
+
+    The CPU times are process wide: With `track_cpu=False`, only the wall time is
+    reported, for fetchers running concurrently to others.
+    """
+
+    fetcher_type = _fetcher_type(entry)
+
     logger.debug("Executing fetcher: %s", entry["fetcher_type"])
 
     try:
@@ -177,12 +207,23 @@ def run_fetcher(entry: Dict[str, Any], mode: Mode) -> protocol.FetcherMessage:
 
     return protocol.FetcherMessage.from_raw_data(
         raw_data,
-        tracker.duration,
+        tracker.duration if track_cpu else _wall_time(tracker.duration),
         fetcher_type,
     )
 
 
-def _run_fetchers_from_file(host_name: HostName, file_name: Path, mode: Mode, timeout: int) -> None:
+def _wall_time(duration: Snapshot) -> Snapshot:
+    return Snapshot(times_result((0.0, 0.0, 0.0, 0.0, duration.process.elapsed)))
+
+
+def _run_fetchers_from_file(
+    host_name: HostName,
+    file_name: Path,
+    mode: Mode,
+    timeout: int,
+    *,
+    concurrent: bool = False,
+) -> None:
     """ Writes to the stdio next data:
     Count Answer        Content               Action
     ----- ------        -------               ------
@@ -191,20 +232,52 @@ def _run_fetchers_from_file(host_name: HostName, file_name: Path, mode: Mode, ti
     1     End of reply  empty                 End IO
     *) Fetcher blob contains all answers from all fetcher objects including failed
     **) file_name is serial/host_name.json
-    ***) timeout is not used at the moment"""
+    ***) timeout is the budget for all the fetchers of the host"""
     with file_name.open() as f:
         data = json.load(f)
 
     fetchers = data["fetchers"]
 
-    # CONTEXT: AT the moment we call fetcher-executors sequentially (due to different reasons).
+    # CONTEXT: By default, we call fetcher-executors sequentially (due to different reasons).
     # Possibilities:
     # Sequential: slow fetcher may block other fetchers.
     # Asyncio: every fetcher must be asyncio-aware. This is ok, but even estimation requires time
     # Threading: some fetcher may be not thread safe(snmp, for example). May be dangerous.
     # Multiprocessing: CPU and memory(at least in terms of kernel) hungry. Also duplicates
     # functionality of the Microcore.
+    # The opt-in concurrent mode uses threads for the I/O bound fetchers only, see
+    # `_run_fetchers_concurrently`.
+    if concurrent and _too_many_abandoned_threads():
+        logger.warning("%d fetcher threads still running, fetching %r sequentially",
+                       len(_abandoned_threads), host_name)
+        concurrent = False
+    if concurrent:
+        messages = _run_fetchers_concurrently(host_name, fetchers, mode, timeout)
+    else:
+        messages = _run_fetchers_sequentially(host_name, fetchers, mode, timeout)
+
+    logger.debug("Produced %d messages", len(messages))
+    write_bytes(bytes(protocol.CMCMessage.result_answer(*messages)))
+    for msg in filter(
+            lambda msg: msg.header.payload_type is protocol.PayloadType.ERROR,
+            messages,
+    ):
+        logger.log(msg.header.status, "Error in %s fetcher: %r", msg.header.fetcher_type.name,
+                   msg.raw_data.error)
+        logger.debug("".join(
+            traceback.format_exception(
+                msg.raw_data.error.__class__,
+                msg.raw_data.error,
+                msg.raw_data.error.__traceback__,
+            )))
+
 
+def _run_fetchers_sequentially(
+    host_name: HostName,
+    fetchers: Sequence[Dict[str, Any]],
+    mode: Mode,
+    timeout: int,
+) -> List[protocol.FetcherMessage]:
     messages: List[protocol.FetcherMessage] = []
     with timeout_control(host_name, timeout):
         try:
@@ -220,21 +293,95 @@ def _run_fetchers_from_file(host_name: HostName, file_name: Path, mode: Mode, ti
                     Snapshot.null(),
                 ) for entry in fetchers[len(messages):]
             ])
+    return messages
 
-    logger.debug("Produced %d messages", len(messages))
-    write_bytes(bytes(protocol.CMCMessage.result_answer(*messages)))
-    for msg in filter(
-            lambda msg: msg.header.payload_type is protocol.PayloadType.ERROR,
-            messages,
-    ):
-        logger.log(msg.header.status, "Error in %s fetcher: %r", msg.header.fetcher_type.name,
-                   msg.raw_data.error)
-        logger.debug("".join(
-            traceback.format_exception(
-                msg.raw_data.error.__class__,
-                msg.raw_data.error,
-                msg.raw_data.error.__traceback__,
-            )))
+
+# Fetchers that only wait for sockets or subprocesses and do not share any global state.
+# SNMP (the backends are not thread safe) and IPMI (pyghmi sessions) stay in the main thread.
+_THREADED_FETCHER_TYPES = frozenset({
+    FetcherType.PIGGYBACK,
+    FetcherType.PROGRAM,
+    FetcherType.TCP,
+})
+
+# The threads of the fetchers that timed out cannot be stopped.  They only keep running
+# until their own I/O timeout, but as the helper process is long-lived, too many of them
+# make the following hosts fall back to the sequential mode until they are done.
+# `Thread.is_alive()` is not reliable after a `join()` interrupted by a signal, so every
+# thread sets an event when it is done.
+_MAX_ABANDONED_THREADS = 16
+_abandoned_threads: List[threading.Event] = []
+
+
+def _too_many_abandoned_threads() -> bool:
+    _abandoned_threads[:] = [done for done in _abandoned_threads if not done.is_set()]
+    return len(_abandoned_threads) >= _MAX_ABANDONED_THREADS
+
+
+def _run_fetchers_concurrently(
+    host_name: HostName,
+    fetchers: Sequence[Dict[str, Any]],
+    mode: Mode,
+    timeout: int,
+) -> List[protocol.FetcherMessage]:
+    """Run the I/O bound fetchers in threads and the other ones in the calling thread.
+
+    The messages are returned in the order of `fetchers`, as in the sequential case.
+    A fetcher that did not finish within the timeout of the host gets a timeout message,
+    the others keep their results.  Unfinished threads are daemonic and their late
+    results are discarded, see `_MAX_ABANDONED_THREADS`.  As the fetchers run at the
+    same time, their messages only report the wall time, see `run_fetcher`.
+
+    """
+    fetcher_types = [_fetcher_type(entry) for entry in fetchers]
+    slots: List[Optional[protocol.FetcherMessage]] = [None] * len(fetchers)
+    done = [threading.Event() for _ in fetchers]
+
+    def run_into_slot(index: int, fetcher_type: FetcherType, entry: Dict[str, Any]) -> None:
+        try:
+            slots[index] = run_fetcher(entry, mode, track_cpu=False)
+        except Exception as exc:
+            slots[index] = protocol.FetcherMessage.error(fetcher_type, exc)
+        finally:
+            done[index].set()
+
+    threads = [
+        threading.Thread(
+            target=run_into_slot,
+            args=(index, fetcher_type, entry),
+            name="fetcher-%s-%d" % (fetcher_type.name.lower(), index),
+            daemon=True,
+        )
+        for index, (fetcher_type, entry) in enumerate(zip(fetcher_types, fetchers))
+        if fetcher_type in _THREADED_FETCHER_TYPES
+    ]
+    with timeout_control(host_name, timeout):
+        try:
+            for thread in threads:
+                thread.start()
+            for index, (fetcher_type, entry) in enumerate(zip(fetcher_types, fetchers)):
+                if fetcher_type not in _THREADED_FETCHER_TYPES:
+                    slots[index] = run_fetcher(entry, mode, track_cpu=not threads)
+            for thread in threads:
+                # Waiting on a lock is interrupted by the SIGALRM of `timeout_control`.
+                thread.join()
+        except MKTimeout as exc:
+            _abandoned_threads.extend(
+                done[index]
+                for index, fetcher_type in enumerate(fetcher_types)
+                if fetcher_type in _THREADED_FETCHER_TYPES and not done[index].is_set())
+            # Freeze the results: threads finishing from now on write to `slots` in vain.
+            return [
+                protocol.FetcherMessage.timeout(fetcher_type, exc, Snapshot.null())
+                if message is None else message
+                for fetcher_type, message in zip(fetcher_types, list(slots))
+            ]
+
+    messages: List[protocol.FetcherMessage] = []
+    for message in slots:
+        assert message is not None
+        messages.append(message)
+    return messages
 
 
 def make_local_config_path(serial: ConfigSerial, host_name: HostName) -> Path:
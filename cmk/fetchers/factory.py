@@ -50,6 +50,11 @@ def backend(snmp_config: SNMPHostConfig,
     if pysnmp_backend and snmp_config.snmp_backend == SNMPBackend.inline:
         return pysnmp_backend.PySNMPBackend(snmp_config, logger)
 
+    if snmp_config.snmp_backend == SNMPBackend.session:
+        # Importing PySNMP is expensive, only hosts using this backend need it
+        from .snmp_backend.session import SessionSNMPBackend
+        return SessionSNMPBackend(snmp_config, logger)
+
     if snmp_config.snmp_backend == SNMPBackend.classic:
         return ClassicSNMPBackend(snmp_config, logger)
 
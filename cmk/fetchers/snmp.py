@@ -7,6 +7,7 @@
 import ast
 import dataclasses
 import logging
+import time
 from functools import partial
 from typing import (
     Any,
@@ -22,6 +23,7 @@ from typing import (
     Set,
 )
 
+from cmk.utils.log import VERBOSE
 from cmk.utils.type_defs import SectionName
 
 import cmk.snmplib.snmp_table as snmp_table
@@ -149,6 +151,7 @@ class SNMPFetcher(ABCFetcher[SNMPRawData]):
         sections: Dict[SectionName, SectionMeta],
         on_error: str,
         missing_sys_description: bool,
+        detection_cache_ttl: int,
         do_status_data_inventory: bool,
         snmp_config: SNMPHostConfig,
     ) -> None:
@@ -156,6 +159,7 @@ class SNMPFetcher(ABCFetcher[SNMPRawData]):
         self.sections: Final = sections
         self.on_error: Final = on_error
         self.missing_sys_description: Final = missing_sys_description
+        self.detection_cache_ttl: Final = detection_cache_ttl
         self.do_status_data_inventory: Final = do_status_data_inventory
         self.snmp_config: Final = snmp_config
         self._backend = factory.backend(self.snmp_config, self._logger)
@@ -190,6 +194,7 @@ class SNMPFetcher(ABCFetcher[SNMPRawData]):
             },
             on_error=serialized["on_error"],
             missing_sys_description=serialized["missing_sys_description"],
+            detection_cache_ttl=serialized["detection_cache_ttl"],
             do_status_data_inventory=serialized["do_status_data_inventory"],
             snmp_config=SNMPHostConfig.deserialize(serialized["snmp_config"]),
         )
@@ -200,6 +205,7 @@ class SNMPFetcher(ABCFetcher[SNMPRawData]):
             "sections": {str(s): m.serialize() for s, m in self.sections.items()},
             "on_error": self.on_error,
             "missing_sys_description": self.missing_sys_description,
+            "detection_cache_ttl": self.detection_cache_ttl,
             "do_status_data_inventory": self.do_status_data_inventory,
             "snmp_config": self.snmp_config.serialize(),
         }
@@ -208,7 +214,7 @@ class SNMPFetcher(ABCFetcher[SNMPRawData]):
         verify_ipaddress(self.snmp_config.ipaddress)
 
     def close(self) -> None:
-        pass
+        self._backend.close()
 
     def _detect(self, *, select_from: Set[SectionName]) -> Set[SectionName]:
         """Detect the applicable sections for the device in question"""
@@ -216,6 +222,7 @@ class SNMPFetcher(ABCFetcher[SNMPRawData]):
             sections=[(name, self.plugin_store[name].detect_spec) for name in select_from],
             on_error=self.on_error,
             missing_sys_description=self.missing_sys_description,
+            detection_cache_ttl=self.detection_cache_ttl,
             backend=self._backend,
         )
 
@@ -294,21 +301,37 @@ class SNMPFetcher(ABCFetcher[SNMPRawData]):
         section_names = self._get_selection(mode)
         section_names |= self._detect(select_from=self._get_detected_sections(mode) - section_names)
 
+        # Shared by all sections, so every OID is walked only once
+        walk_planner = snmp_table.WalkPlanner()
         if self._use_snmpwalk_cache(mode):
             walk_cache_msg = "SNMP walk cache is enabled: Use any locally cached information"
-            get_snmp = partial(snmp_table.get_snmp_table_cached, backend=self._backend)
+            get_snmp = partial(snmp_table.get_snmp_table_cached,
+                               backend=self._backend,
+                               walk_planner=walk_planner)
         else:
             walk_cache_msg = "SNMP walk cache is disabled"
-            get_snmp = partial(snmp_table.get_snmp_table, backend=self._backend)
+            get_snmp = partial(snmp_table.get_snmp_table,
+                               backend=self._backend,
+                               walk_planner=walk_planner)
 
         fetched_data: MutableMapping[SectionName, SNMPRawDataSection] = {}
         for section_name in self._sort_section_names(section_names):
             self._logger.debug("%s: Fetching data (%s)", section_name, walk_cache_msg)
+            walk_count, reuse_count = walk_planner.walk_count, walk_planner.reuse_count
+            start = time.time()
 
             fetched_section_data = [
                 get_snmp(section_name, entry) for entry in self.plugin_store[section_name].trees
             ]
 
+            self._logger.log(
+                VERBOSE,
+                "%s: Walked %d OIDs (%d already walked) in %.3f seconds",
+                section_name,
+                walk_planner.walk_count - walk_count,
+                walk_planner.reuse_count - reuse_count,
+                time.time() - start,
+            )
             if any(fetched_section_data):
                 fetched_data[section_name] = fetched_section_data
 
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Sidecar index of the stored walks
+
+The index of a walk file contains the OIDs of the walk in binary form, sorted
+numerically, and the byte ranges of their lines in the walk file. Every arc of
+an OID is encoded as 4 byte big endian number, so comparing the encoded OIDs
+byte wise is the same as comparing the OIDs numerically and the OIDs below an
+OID are exactly the ones starting with its encoding.
+
+Both the index and the walk file are memory mapped. A lookup bisects the
+fixed size entries of the index and reads only the lines of the found OIDs
+from the walk file. The index records the size and modification time of the
+walk file it has been built from and is rebuilt when the walk file changes.
+"""
+
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Tuple, Union
+
+from cmk.utils.exceptions import MKGeneralException
+from cmk.utils.log import console
+
+from cmk.snmplib.type_defs import OID
+
+__all__ = ["WalkIndex"]
+
+_MAGIC = b"CMKWALK\x01"
+# Magic, size and modification time of the walk file, number of entries
+_HEADER = struct.Struct("!8sQQQ")
+# Offset and length of the encoded OID and of the line in the walk file
+_ENTRY = struct.Struct("!QHQQ")
+
+_Buffer = Union[bytes, mmap.mmap]
+
+
+def encode_oid(oid: OID) -> bytes:
+    try:
+        arcs = [int(arc) for arc in oid.strip(".").split(".")]
+        return struct.pack("!%dI" % len(arcs), *arcs)
+    except (ValueError, struct.error):
+        raise MKGeneralException("Invalid OID %s" % oid)
+
+
+def _map(path: Path) -> _Buffer:
+    with path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""  # Empty files can not be mapped
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class WalkIndex:
+    def __init__(self, index: _Buffer, walk: _Buffer) -> None:
+        super().__init__()
+        self._index = index
+        self._walk = walk
+        self._count = _HEADER.unpack_from(index)[3]
+        self._keys_offset = _HEADER.size + self._count * _ENTRY.size
+
+    @classmethod
+    def load(cls, walk_path: Path, index_path: Path) -> "WalkIndex":
+        """Opens the index of the walk file, it is (re)built if necessary"""
+        stat = walk_path.stat()
+        walk = _map(walk_path)
+        try:
+            index = _map(index_path)
+            magic, size, mtime_ns, _count = _HEADER.unpack_from(index)
+            if (magic, size, mtime_ns) == (_MAGIC, stat.st_size, stat.st_mtime_ns):
+                return cls(index, walk)
+        except (OSError, struct.error):
+            pass
+
+        console.vverbose("  Indexing %s\n" % walk_path)
+        data = cls.build(walk, stat.st_size, stat.st_mtime_ns)
+        try:
+            index_path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("wb",
+                                             dir=str(index_path.parent),
+                                             prefix=".%s.new" % index_path.name,
+                                             delete=False) as tmp:
+                tmp.write(data)
+            os.rename(tmp.name, str(index_path))
+        except OSError as e:
+            # Work with the index in memory, the next process will try again
+            console.vverbose("  Cannot write %s: %s\n" % (index_path, e))
+        return cls(data, walk)
+
+    @staticmethod
+    def build(walk: _Buffer, size: int, mtime_ns: int) -> bytes:
+        """Returns the index of the lines of the walk, lines not starting with an OID are skipped"""
+        entries: List[Tuple[bytes, int, int]] = []
+        offset = 0
+        while offset < len(walk):
+            end = walk.find(b"\n", offset)
+            if end == -1:
+                end = len(walk)
+            if walk[offset:offset + 1] == b".":
+                oid = walk[offset:end].split(None, 1)[0].decode("ascii", "replace")
+                try:
+                    entries.append((encode_oid(oid), offset, end - offset))
+                except MKGeneralException:
+                    pass  # Can not be looked up anyway
+            offset = end + 1
+        entries.sort(key=lambda entry: entry[0])
+
+        header = _HEADER.pack(_MAGIC, size, mtime_ns, len(entries))
+        table = []
+        key_offset = 0
+        for key, line_offset, line_length in entries:
+            table.append(_ENTRY.pack(key_offset, len(key), line_offset, line_length))
+            key_offset += len(key)
+        return b"".join([header] + table + [key for key, _offset, _length in entries])
+
+    def _key(self, number: int) -> bytes:
+        key_offset, key_length, _line_offset, _line_length = _ENTRY.unpack_from(
+            self._index, _HEADER.size + number * _ENTRY.size)
+        start = self._keys_offset + key_offset
+        return self._index[start:start + key_length]
+
+    def _line(self, number: int) -> bytes:
+        _key_offset, _key_length, line_offset, line_length = _ENTRY.unpack_from(
+            self._index, _HEADER.size + number * _ENTRY.size)
+        return self._walk[line_offset:line_offset + line_length]
+
+    def lines(self, oid: OID, include_oid: bool = True) -> Iterator[bytes]:
+        """Yields the lines of the OID and all OIDs below it, sorted by the OIDs"""
+        prefix = encode_oid(oid)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        for number in range(low, self._count):
+            key = self._key(number)
+            if not key.startswith(prefix):
+                break
+            if include_oid or key != prefix:
+                yield self._line(number)
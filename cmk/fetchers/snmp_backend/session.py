@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""SNMP backend talking to the device from within the process
+
+In contrast to the classic backend no snmpget and snmpwalk processes are
+executed and no text output has to be parsed. The backend keeps one SNMP
+engine per host, so all walks of a fetch share the transport and the
+credentials. The requests are sent by the command generators of PySNMP
+directly, without any MIB lookups, and the values are converted from the
+received types.
+
+Importing PySNMP takes some time, so this module is only imported when a
+host actually uses this backend.
+"""
+
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from pyasn1.type import univ  # type: ignore[import]
+from pysnmp.carrier.asyncore.dgram import udp, udp6  # type: ignore[import]
+from pysnmp.entity import config, engine  # type: ignore[import]
+from pysnmp.entity.rfc3413 import cmdgen  # type: ignore[import]
+from pysnmp.proto import rfc1902  # type: ignore[import]
+
+from cmk.utils.exceptions import MKGeneralException, MKSNMPError
+from cmk.utils.log import console
+
+from cmk.snmplib.type_defs import (
+    ABCSNMPBackend,
+    OID,
+    SNMPContextName,
+    SNMPHostConfig,
+    SNMPRawValue,
+    SNMPRowInfo,
+)
+
+__all__ = ["SessionSNMPBackend"]
+
+_AUTH_PROTOCOLS = {
+    "md5": config.usmHMACMD5AuthProtocol,
+    "sha": config.usmHMACSHAAuthProtocol,
+    "SHA-224": config.usmHMAC128SHA224AuthProtocol,
+    "SHA-256": config.usmHMAC192SHA256AuthProtocol,
+    "SHA-384": config.usmHMAC256SHA384AuthProtocol,
+    "SHA-512": config.usmHMAC384SHA512AuthProtocol,
+}
+
+_PRIV_PROTOCOLS = {
+    "DES": config.usmDESPrivProtocol,
+    "AES": config.usmAesCfb128Protocol,
+}
+
+# Like the defaults of the Net-SNMP command line tools
+_DEFAULT_TIMEOUT = 1.0
+_DEFAULT_RETRIES = 5
+# Keep the responses of batched GET requests small enough for all agents
+_MAX_GET_SIZE = 16
+
+_TARGET_NAME = "cmk-target"
+_PARAMS_NAME = "cmk-params"
+
+VarBind = Tuple[Any, Any]
+
+
+class _Response(NamedTuple):
+    var_binds: Sequence[VarBind]
+    error_status: int
+    # Refers to the variable the error is about, starting with 1
+    error_index: int
+
+
+class _Session:
+    """The SNMP engine configured for talking to a single host"""
+    def __init__(self, snmp_config: SNMPHostConfig) -> None:
+        super().__init__()
+        self.engine = engine.SnmpEngine()
+        security_name, security_level, mp_model = _add_credentials(self.engine, snmp_config)
+        config.addTargetParams(self.engine, _PARAMS_NAME, security_name, security_level, mp_model)
+
+        if snmp_config.is_ipv6_primary:
+            domain_name, transport = udp6.domainName, udp6.Udp6Transport()
+        else:
+            domain_name, transport = udp.domainName, udp.UdpTransport()
+        config.addTransport(self.engine, domain_name, transport.openClientMode())
+
+        timing = snmp_config.timing
+        config.addTargetAddr(
+            self.engine,
+            _TARGET_NAME,
+            domain_name,
+            (snmp_config.ipaddress, snmp_config.port),
+            _PARAMS_NAME,
+            # Is specified in hundredths of a second
+            timeout=int(timing.get("timeout", _DEFAULT_TIMEOUT) * 100),
+            retryCount=timing.get("retries", _DEFAULT_RETRIES),
+        )
+
+    def close(self) -> None:
+        """Close the transport of the engine"""
+        self.engine.transportDispatcher.closeDispatcher()
+
+
+class SessionSNMPBackend(ABCSNMPBackend):
+    def __init__(self, snmp_config: SNMPHostConfig, logger: logging.Logger) -> None:
+        super().__init__(snmp_config, logger)
+        # Is created with the first request, fetching from the cache needs no session
+        self._session: Optional[_Session] = None
+
+    @property
+    def session(self) -> _Session:
+        if self._session is None:
+            self._session = _Session(self.config)
+        return self._session
+
+    def close(self) -> None:
+        if self._session is None:
+            return
+        self._session.close()
+        self._session = None
+
+    def get(self,
+            oid: OID,
+            context_name: Optional[SNMPContextName] = None) -> Optional[SNMPRawValue]:
+        if not oid.endswith(".*"):
+            console.vverbose("Sending SNMP GET request for %s\n" % oid)
+            raw_value = self._get_values([_object_name(oid)], context_name)[0]
+        else:
+            oid_prefix = _object_name(oid[:-2])
+            console.vverbose("Sending SNMP GETNEXT request for %s\n" % oid_prefix)
+            response = self._send(cmdgen.NextCommandGeneratorSingleRun(), context_name,
+                                  [oid_prefix])
+            if response.error_status or not response.var_binds:
+                return None
+            name, value = response.var_binds[0]
+            # In case of .*, check if prefix is the one we are looking for
+            if not oid_prefix.isPrefixOf(name):
+                return None
+            raw_value = _raw_value(value)
+
+        console.vverbose("SNMP answer: ==> [%r]\n" % raw_value)
+        return raw_value
+
+    def get_many(self,
+                 oids: Sequence[OID],
+                 context_name: Optional[SNMPContextName] = None) -> List[Optional[SNMPRawValue]]:
+        values: Dict[OID, Optional[SNMPRawValue]] = {
+            oid: self.get(oid, context_name) for oid in oids if oid.endswith(".*")
+        }
+        names = [oid for oid in oids if not oid.endswith(".*")]
+        for start in range(0, len(names), _MAX_GET_SIZE):
+            chunk = names[start:start + _MAX_GET_SIZE]
+            console.vverbose("Sending SNMP GET request for %s\n" % ", ".join(chunk))
+            values.update(
+                zip(chunk, self._get_values([_object_name(oid) for oid in chunk], context_name)))
+        return [values[oid] for oid in oids]
+
+    def walk(self,
+             oid: OID,
+             check_plugin_name: Optional[str] = None,
+             table_base_oid: Optional[OID] = None,
+             context_name: Optional[SNMPContextName] = None) -> SNMPRowInfo:
+        return self.walk_columns([oid], check_plugin_name, table_base_oid, context_name)[0]
+
+    def walk_columns(self,
+                     oids: Sequence[OID],
+                     check_plugin_name: Optional[str] = None,
+                     table_base_oid: Optional[OID] = None,
+                     context_name: Optional[SNMPContextName] = None) -> List[SNMPRowInfo]:
+        """Walk all OIDs with the same requests
+
+        Every request asks for the successors of all OIDs which have not been
+        walked completely yet, so the columns of a table are walked in one sweep.
+        """
+        prefixes = [_object_name(oid) for oid in oids]
+        rowinfos: List[SNMPRowInfo] = [[] for _oid in oids]
+        # The last received OIDs of the columns which are not complete yet
+        last_names = dict(enumerate(prefixes))
+
+        generator: Any
+        args: Tuple[int, ...]
+        if self.config.is_bulkwalk_host:
+            generator, args = cmdgen.BulkCommandGeneratorSingleRun(), (
+                0, self.config.bulk_walk_size_of)
+        else:
+            generator, args = cmdgen.NextCommandGeneratorSingleRun(), ()
+        console.vverbose("Sending SNMP %s requests for %s\n" %
+                         ("GETBULK" if args else "GETNEXT", ", ".join(oids)))
+
+        while last_names:
+            indexes = list(last_names)
+            response = self._send(generator, context_name, [last_names[i] for i in indexes], *args)
+            if response.error_status:
+                # E.g. noSuchName of SNMPv1 agents at the end of the MIB: Complete the
+                # column the error is about and ask for the others again
+                if not 0 < response.error_index <= len(indexes):
+                    break
+                del last_names[indexes[response.error_index - 1]]
+                continue
+
+            var_binds = response.var_binds
+            if not var_binds:
+                break
+            # GETBULK responses contain the variables of a row after each other
+            for row_start in range(0, len(var_binds), len(indexes)):
+                for index, (name, value) in zip(indexes, var_binds[row_start:]):
+                    if index not in last_names:
+                        continue  # Has been completed before in this response
+                    raw_value = _raw_value(value)
+                    if (raw_value is None or not prefixes[index].isPrefixOf(name) or
+                            name <= last_names[index]):
+                        # End of the subtree or a broken agent returning the same OIDs
+                        del last_names[index]
+                        continue
+                    rowinfos[index].append((_oid_str(name), raw_value))
+                    last_names[index] = name
+
+        # Like snmpwalk: The OIDs may be scalars instead of subtrees
+        scalars = [index for index, rowinfo in enumerate(rowinfos) if not rowinfo]
+        if scalars:
+            values = self._get_values([prefixes[index] for index in scalars], context_name)
+            for index, raw_value in zip(scalars, values):
+                if raw_value is not None:
+                    rowinfos[index].append((_oid_str(prefixes[index]), raw_value))
+        return rowinfos
+
+    def _get_values(self, names: Sequence[Any],
+                    context_name: Optional[SNMPContextName]) -> List[Optional[SNMPRawValue]]:
+        """Gets the values of all OIDs with a single request, if possible"""
+        values: List[Optional[SNMPRawValue]] = [None] * len(names)
+        indexes = list(range(len(names)))
+        while indexes:
+            response = self._send(cmdgen.GetCommandGenerator(), context_name,
+                                  [names[i] for i in indexes])
+            if not response.error_status:
+                for index, (_name, value) in zip(indexes, response.var_binds):
+                    values[index] = _raw_value(value)
+                break
+            # SNMPv1 agents answer noSuchName for the whole request
+            if not 0 < response.error_index <= len(indexes):
+                break
+            del indexes[response.error_index - 1]
+        return values
+
+    def _send(self, generator: Any, context_name: Optional[SNMPContextName], names: Sequence[Any],
+              *args: int) -> _Response:
+        session = self.session
+        responses: List[_Response] = []
+        errors = []
+
+        def callback(snmp_engine, send_request_handle, error_indication, error_status, error_index,
+                     var_binds, cb_ctx):
+            if error_indication:
+                errors.append(error_indication)
+                return
+            if error_status:
+                console.vverbose("SNMP error on %s: %s\n" %
+                                 (self.config.ipaddress, error_status.prettyPrint()))
+            responses.append(_Response(var_binds, int(error_status), int(error_index)))
+
+        generator.sendVarBinds(session.engine, _TARGET_NAME, None, context_name or "", *args,
+                               [(name, univ.Null("")) for name in names], callback)
+        session.engine.transportDispatcher.runDispatcher()
+
+        if errors:
+            raise MKSNMPError("SNMP Error on %s: %s" % (self.config.ipaddress, errors[0]))
+        return responses[0]
+
+
+def _add_credentials(snmp_engine: Any, snmp_config: SNMPHostConfig) -> Tuple[str, str, int]:
+    """Returns the security name, the security level and the message processing model"""
+    if not snmp_config.is_snmpv3_host:
+        if not isinstance(snmp_config.credentials, str):
+            raise TypeError()
+        config.addV1System(snmp_engine, "cmk", snmp_config.credentials)
+        if snmp_config.is_bulkwalk_host or snmp_config.is_snmpv2or3_without_bulkwalk_host:
+            return "cmk", "noAuthNoPriv", 1
+        return "cmk", "noAuthNoPriv", 0
+
+    # TODO: Fix the horrible credentials typing
+    credentials = snmp_config.credentials
+    if not (isinstance(credentials, tuple) and len(credentials) in (2, 4, 6)):
+        raise MKGeneralException("Invalid SNMP credentials '%r' for host %s: must be "
+                                 "string, 2-tuple, 4-tuple or 6-tuple" %
+                                 (credentials, snmp_config.hostname))
+
+    if len(credentials) == 6:
+        sec_level, auth_proto, sec_name, auth_pass, priv_proto, priv_pass = credentials
+        config.addV3User(snmp_engine,
+                         sec_name,
+                         authProtocol=_protocol(_AUTH_PROTOCOLS, "auth", auth_proto),
+                         authKey=auth_pass,
+                         privProtocol=_protocol(_PRIV_PROTOCOLS, "priv", priv_proto),
+                         privKey=priv_pass)
+
+    elif len(credentials) == 4:
+        sec_level, auth_proto, sec_name, auth_pass = credentials
+        config.addV3User(snmp_engine,
+                         sec_name,
+                         authProtocol=_protocol(_AUTH_PROTOCOLS, "auth", auth_proto),
+                         authKey=auth_pass)
+
+    else:
+        sec_level, sec_name = credentials
+        config.addV3User(snmp_engine, sec_name)
+
+    return sec_name, sec_level, 3
+
+
+def _protocol(protocols: Any, what: str, proto_name: str) -> Any:
+    try:
+        return protocols[proto_name]
+    except KeyError:
+        raise MKGeneralException("Invalid SNMP %s protocol: %s" % (what, proto_name))
+
+
+def _object_name(oid: OID) -> Any:
+    return rfc1902.ObjectName(oid.strip("."))
+
+
+def _oid_str(name: Any) -> OID:
+    return "." + str(name)
+
+
+def _raw_value(value: Any) -> Optional[SNMPRawValue]:
+    """Converts the received value like the classic backend would see it"""
+    if isinstance(value, univ.Null):
+        # Also noSuchObject, noSuchInstance and endOfMibView
+        return None
+    if isinstance(value, rfc1902.IpAddress):
+        return value.prettyPrint().encode("ascii")
+    if isinstance(value, univ.OctetString):
+        return value.asOctets()
+    if isinstance(value, univ.ObjectIdentifier):
+        return _oid_str(value).encode("ascii")
+    if isinstance(value, univ.Integer):
+        return b"%d" % int(value)
+    return value.prettyPrint().encode("utf-8")
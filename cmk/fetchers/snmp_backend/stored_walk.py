@@ -5,23 +5,34 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """Abstract classes and types."""
 
-from typing import List, Optional, Tuple
+from pathlib import Path
+from typing import Dict, Optional
 
-from six import ensure_binary, ensure_str
+from six import ensure_str
 
 import cmk.utils.agent_simulator as agent_simulator
+import cmk.utils.cleanup
 import cmk.utils.paths
-from cmk.utils.exceptions import MKGeneralException, MKSNMPError
+from cmk.utils.exceptions import MKSNMPError
 from cmk.utils.log import console
-from cmk.utils.type_defs import AgentRawData, CheckPluginNameStr
+from cmk.utils.type_defs import AgentRawData, CheckPluginNameStr, HostName
 
-import cmk.snmplib.snmp_cache as snmp_cache
 from cmk.snmplib.type_defs import ABCSNMPBackend, OID, SNMPContextName, SNMPRawValue, SNMPRowInfo
 
 from ._utils import strip_snmp_value
+from ._walk_index import WalkIndex
 
 __all__ = ["StoredWalkSNMPBackend"]
 
+_walk_indexes: Dict[HostName, WalkIndex] = {}
+
+
+def cleanup_walk_indexes() -> None:
+    _walk_indexes.clear()
+
+
+cmk.utils.cleanup.register_cleanup(cleanup_walk_indexes)
+
 
 class StoredWalkSNMPBackend(ABCSNMPBackend):
     def get(self,
@@ -51,91 +62,26 @@ class StoredWalkSNMPBackend(ABCSNMPBackend):
             oid_prefix = oid
             dot_star = False
 
-        if snmp_cache.host_cache_contains(self.config.hostname):
-            lines = snmp_cache.host_cache_get(self.config.hostname)
-        else:
-            path = cmk.utils.paths.snmpwalks_dir + "/" + self.config.hostname
+        index = _walk_indexes.get(self.config.hostname)
+        if index is None:
+            path = Path(cmk.utils.paths.snmpwalks_dir, self.config.hostname)
             console.vverbose("  Loading %s from %s\n" % (oid, path))
             try:
-                lines = open(path).readlines()
+                index = WalkIndex.load(path, cmk.utils.paths.snmpwalk_index_dir / path.name)
             except IOError:
                 raise MKSNMPError("No snmpwalk file %s" % path)
-            snmp_cache.host_cache_set(self.config.hostname, lines)
-
-        begin = 0
-        end = len(lines)
-        hit = None
-        while end - begin > 0:
-            current = (begin + end) // 2
-            # skip over values including newlines to the next oid
-            while not lines[current].startswith(".") and current < end:
-                current += 1
-            parts = lines[current].split(None, 1)
-            comp = parts[0]
-            hit = StoredWalkSNMPBackend._compare_oids(oid_prefix, comp)
-            if hit == 0:
-                break
-            if hit == 1:  # we are too low
-                begin = current + 1
-            else:
-                end = current
+            _walk_indexes[self.config.hostname] = index
 
-        if hit != 0:
-            return []  # not found
-
-        rowinfo = StoredWalkSNMPBackend._collect_until(oid, oid_prefix, lines, current, -1)
-        rowinfo.reverse()
-        rowinfo += StoredWalkSNMPBackend._collect_until(oid, oid_prefix, lines, current + 1, 1)
-
-        if dot_star:
-            return [rowinfo[0]]
-
-        return rowinfo
-
-    @staticmethod
-    def _compare_oids(a: OID, b: OID) -> int:
-        aa = StoredWalkSNMPBackend._to_bin_string(a)
-        bb = StoredWalkSNMPBackend._to_bin_string(b)
-        if len(aa) <= len(bb) and bb[:len(aa)] == aa:
-            result = 0
-        else:
-            result = (aa > bb) - (aa < bb)
-        return result
-
-    @staticmethod
-    def _to_bin_string(oid: OID) -> Tuple[int, ...]:
-        try:
-            return tuple(map(int, oid.strip(".").split(".")))
-        except Exception:
-            raise MKGeneralException("Invalid OID %s" % oid)
-
-    @staticmethod
-    def _collect_until(oid: OID, oid_prefix: OID, lines: List[str], index: int,
-                       direction: int) -> SNMPRowInfo:
-        rows = []
-        # Handle case, where we run after the end of the lines list
-        if index >= len(lines):
-            if direction > 0:
-                return []
-            index -= 1
-        while True:
-            line = lines[index]
+        rowinfo = []
+        for line in index.lines(oid_prefix, include_oid=not dot_star):
             parts = line.split(None, 1)
-            o = parts[0]
-            if o.startswith('.'):
-                o = o[1:]
-            if o == oid or o.startswith(oid_prefix + "."):
-                if len(parts) > 1:
-                    # FIXME: This encoding ping-pong os horrible...
-                    value = ensure_str(
-                        agent_simulator.process(AgentRawData(ensure_binary(parts[1]),),),)
-                else:
-                    value = ""
-                # Fix for missing starting oids
-                rows.append(('.' + o, strip_snmp_value(value)))
-                index += direction
-                if index < 0 or index >= len(lines):
-                    break
+            if len(parts) > 1:
+                # FIXME: This encoding ping-pong os horrible...
+                value = ensure_str(agent_simulator.process(AgentRawData(parts[1])))
             else:
+                value = ""
+            rowinfo.append((ensure_str(parts[0]), strip_snmp_value(value)))
+            if dot_star:
                 break
-        return rows
+
+        return rowinfo
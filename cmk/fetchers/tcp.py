@@ -4,21 +4,26 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import asyncio
 import logging
 import socket
+from contextlib import suppress
 from hashlib import md5, sha256
-from typing import Any, Dict, Final, List, Mapping, Optional, Tuple
+from typing import Any, Dict, Final, List, Mapping, Optional, Sequence, Tuple
 
 from Cryptodome.Cipher import AES
 
 import cmk.utils.debug
-from cmk.utils.type_defs import AgentRawData, HostAddress
+from cmk.utils.cpu_tracking import Snapshot
+from cmk.utils.type_defs import AgentRawData, HostAddress, result
 
 from . import MKFetcherError
 from ._base import verify_ipaddress
 from .agent import AgentFetcher, DefaultAgentFileCache
 from .type_defs import Mode
 
+__all__ = ["TCPFetcher", "fetch_concurrently"]
+
 
 class TCPFetcher(AgentFetcher):
     def __init__(
@@ -123,6 +128,75 @@ class TCPFetcher(AgentFetcher):
                 raise
             raise MKFetcherError("Communication failed: %s" % e)
 
+    async def fetch_async(self, mode: Mode) -> result.Result[AgentRawData, Exception]:
+        """Asyncio variant of `fetch()`.
+
+        The connection and the cache handling are the same as in `fetch()`.
+        The fetcher must not be opened: the connection is managed by the event loop.
+
+        """
+        try:
+            return result.OK(await self._fetch_async(mode))
+        except Exception as exc:
+            if cmk.utils.debug.enabled():
+                raise
+            return result.Error(exc)
+
+    async def _fetch_async(self, mode: Mode) -> AgentRawData:
+        # Same as `with self: return self._fetch(mode)`, see `open()` and `close()`.
+        reader, writer = await self._open_async()
+        try:
+            raw_data = self._fetch_from_cache_for(mode)
+            if raw_data:
+                return raw_data
+            return self._write_to_cache_for(mode, await self._fetch_from_io_async(mode, reader))
+        finally:
+            self._logger.debug("Closing TCP connection to %s:%d", self.address[0], self.address[1])
+            writer.close()
+            with suppress(socket.error):
+                await writer.wait_closed()
+
+    async def _open_async(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        try:
+            verify_ipaddress(self.address[0])
+        except Exception as exc:
+            # As in `ABCFetcher.__enter__()`
+            if cmk.utils.debug.enabled():
+                raise
+            raise MKFetcherError(repr(exc) if any(exc.args) else type(exc).__name__) from exc
+
+        self._logger.debug(
+            "Connecting via TCP to %s:%d (%ss timeout)",
+            self.address[0],
+            self.address[1],
+            self.timeout,
+        )
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_connection(*self.address, family=self.family),
+                timeout=self.timeout,
+            )
+        except asyncio.TimeoutError:
+            raise MKFetcherError("Communication failed: timed out")
+        except socket.error as e:
+            if cmk.utils.debug.enabled():
+                raise
+            raise MKFetcherError("Communication failed: %s" % e)
+
+    async def _fetch_from_io_async(self, mode: Mode, reader: asyncio.StreamReader) -> AgentRawData:
+        if self.use_only_cache:
+            raise MKFetcherError("Got no data: No usable cache file present at %s" %
+                                 self.file_cache.path)
+
+        self._logger.debug("Reading data from agent")
+        try:
+            raw_data = AgentRawData(await reader.read())
+        except socket.error as e:
+            if cmk.utils.debug.enabled():
+                raise
+            raise MKFetcherError("Communication failed: %s" % e)
+        return self._decrypt(raw_data)
+
     def _decrypt(self, output: AgentRawData) -> AgentRawData:
         if output.startswith(b"<<<"):
             self._logger.debug("Output is not encrypted")
@@ -180,3 +254,39 @@ class TCPFetcher(AgentFetcher):
         decrypted_pkg = decryption_suite.decrypt(encrypted_pkg)
         # Strip of fill bytes of openssl
         return AgentRawData(decrypted_pkg[0:-decrypted_pkg[-1]])
+
+
+def fetch_concurrently(
+    fetchers: Sequence[Tuple[TCPFetcher, Mode]],
+    *,
+    max_concurrency: int = 256,
+) -> List[Tuple[result.Result[AgentRawData, Exception], Snapshot]]:
+    """Fetch the agent data of many hosts in a single process.
+
+    At most `max_concurrency` connections are open at the same time.  The
+    results are in the order of `fetchers`.  The duration is measured from
+    the start to the end of each fetch and therefore includes the time spent
+    on the other fetches running in parallel.
+
+    """
+    if not fetchers:
+        return []
+    return asyncio.run(_fetch_concurrently(fetchers, max_concurrency))
+
+
+async def _fetch_concurrently(
+    fetchers: Sequence[Tuple[TCPFetcher, Mode]],
+    max_concurrency: int,
+) -> List[Tuple[result.Result[AgentRawData, Exception], Snapshot]]:
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(
+        fetcher: TCPFetcher,
+        mode: Mode,
+    ) -> Tuple[result.Result[AgentRawData, Exception], Snapshot]:
+        async with semaphore:
+            start = Snapshot.take()
+            raw_data = await fetcher.fetch_async(mode)
+            return raw_data, Snapshot.take() - start
+
+    return list(await asyncio.gather(*(fetch(fetcher, mode) for fetcher, mode in fetchers)))
@@ -2426,6 +2426,8 @@ def transform_snmp_backend_default_forth(backend):
         return SNMPBackend.inline_legacy
     if backend in [False, "classic"]:
         return SNMPBackend.classic
+    if backend == "session":
+        return SNMPBackend.session
     raise MKConfigError("SNMPBackend %r not implemented" % backend)
 
 
@@ -2436,6 +2438,8 @@ def transform_snmp_backend_back(backend):
         return "classic"
     if backend == SNMPBackend.inline:
         return "inline"
+    if backend == SNMPBackend.session:
+        return "session"
     raise MKConfigError("SNMPBackend %r not implemented" % backend)
 
 
@@ -2458,6 +2462,7 @@ class ConfigVariableChooseSNMPBackend(ConfigVariable):
                     (SNMPBackend.classic, _("Use Classic SNMP Backend")),
                     (SNMPBackend.inline, _("Use Inline SNMP (PySNMP) Backend")),
                     (SNMPBackend.inline_legacy, _("Use Inline SNMP (legacy) Backend")),
+                    (SNMPBackend.session, _("Use SNMP Session Backend")),
                 ],
                 help=
                 _("By default Checkmk uses command line calls of Net-SNMP tools like snmpget or "
@@ -4422,7 +4427,8 @@ def _help_snmp_backend():
         "is enabled by default for all SNMP hosts and it is a good idea to keep this default setting. "
         "However, there are SNMP devices which have problems with some SNMP implementations. "
         "You can use this rule to select the SNMP Backend for these hosts."
-        "Inline SNMP uses PySNMP bindings to make SNMP calls.")
+        "Inline SNMP uses PySNMP bindings to make SNMP calls. The SNMP Session backend "
+        "also uses PySNMP, keeps one SNMP session per host and is available in all editions.")
 
 
 def transform_snmp_backend_hosts_forth(backend):
@@ -4434,6 +4440,8 @@ def transform_snmp_backend_hosts_forth(backend):
         return SNMPBackend.inline_legacy
     if backend in [True, "classic"]:
         return SNMPBackend.classic
+    if backend == "session":
+        return SNMPBackend.session
     raise MKConfigError("SNMPBackend %r not implemented" % backend)
 
 
@@ -4445,6 +4453,7 @@ def _valuespec_snmp_backend():
                 (SNMPBackend.inline, _("Use Inline SNMP (PySNMP) Backend")),
                 (SNMPBackend.inline_legacy, _("Use Inline SNMP (legacy) Backend")),
                 (SNMPBackend.classic, _("Use Classic Backend")),
+                (SNMPBackend.session, _("Use SNMP Session Backend")),
             ],
         ),
         forth=transform_snmp_backend_hosts_forth,
@@ -3712,6 +3712,56 @@ class ConfigVariableEventConsoleEventSocketQueueLength(ConfigVariable):
         )
 
 
+@config_variable_registry.register
+class ConfigVariableEventConsoleEventProcessingThreads(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupEventConsoleGeneric
+
+    def domain(self):
+        return ConfigDomainEventConsole
+
+    def ident(self):
+        return "event_processing_threads"
+
+    def valuespec(self):
+        return Integer(
+            title=_("Number of threads for processing messages"),
+            help=_("The Event Console reads the incoming messages in one thread and hands "
+                   "them over to this number of threads, which parse the messages and match "
+                   "them against the rules. That way the messages are read in time, even if "
+                   "processing them is slow for a while. The events are still created and "
+                   "canceled in the order in which the messages have been received. "
+                   "Set this to 0 for processing the messages directly after reading them. "
+                   "Changes of this setting require a restart of the Event Console."),
+            minvalue=0,
+            unit=_("threads"),
+        )
+
+
+@config_variable_registry.register
+class ConfigVariableEventConsoleEventQueueLength(ConfigVariable):
+    def group(self):
+        return ConfigVariableGroupEventConsoleGeneric
+
+    def domain(self):
+        return ConfigDomainEventConsole
+
+    def ident(self):
+        return "event_queue_len"
+
+    def valuespec(self):
+        return Integer(
+            title=_("Max. number of received messages waiting for processing"),
+            help=_("The number of received chunks of messages which may wait for the "
+                   "threads processing them. Once this limit is reached, the Event Console "
+                   "stops reading messages until the processing has caught up again. "
+                   "Changes of this setting require a restart of the Event Console."),
+            minvalue=1,
+            label="max.",
+            unit=_("chunks of messages"),
+        )
+
+
 @config_variable_registry.register
 class ConfigVariableEventConsoleTranslateSNMPTraps(ConfigVariable):
     def group(self):
@@ -5,8 +5,10 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """SNMP caching"""
 
+import hashlib
 import os
-from typing import Dict, List, Optional
+import time
+from typing import Dict, Optional, Tuple
 
 import cmk.utils.cleanup
 import cmk.utils.paths
@@ -19,8 +21,6 @@ from .type_defs import OID, SNMPDecodedString, SNMPHostConfig
 _g_single_oid_hostname: Optional[HostName] = None
 _g_single_oid_ipaddress: Optional[HostAddress] = None
 _g_single_oid_cache: Optional[Dict[OID, Optional[SNMPDecodedString]]] = None
-# TODO: Move to StoredWalkSNMPBackend?
-_g_walk_cache: Dict[str, List[str]] = {}
 
 
 def initialize_single_oid_cache(snmp_config: SNMPHostConfig, from_disk: bool = False) -> None:
@@ -68,25 +68,58 @@ def _load_single_oid_cache(snmp_config: SNMPHostConfig) -> Dict[OID, Optional[SN
     return store.load_object_from_file(cache_path, default={})
 
 
-def cleanup_host_caches() -> None:
-    global _g_walk_cache
-    _g_walk_cache = {}
-    _clear_other_hosts_oid_cache(None)
+# Maps the names of the sections to the hash of their detect spec and the detection result
+DetectedSections = Dict[str, Tuple[str, bool]]
 
 
-cmk.utils.cleanup.register_cleanup(cleanup_host_caches)
+def _detection_cache_path(snmp_config: SNMPHostConfig) -> str:
+    return "%s/%s.%s" % (cmk.utils.paths.snmp_detection_cache_dir, snmp_config.hostname,
+                         snmp_config.ipaddress)
+
+
+def _description_hash(sys_description: SNMPDecodedString) -> str:
+    return hashlib.sha256(sys_description.encode("utf-8")).hexdigest()
+
 
+def load_detection_cache(snmp_config: SNMPHostConfig, sys_object: SNMPDecodedString,
+                         sys_description: SNMPDecodedString,
+                         max_age: int) -> Tuple[float, DetectedSections]:
+    """Return the time of the cached detection and its results, if they are still valid
 
-def host_cache_contains(name: HostName) -> bool:
-    return name in _g_walk_cache
+    The results are only valid for the same device, i.e. the same system object and
+    description, and until they are older than max_age seconds.
+    """
+    now = time.time()
+    if max_age <= 0:
+        return now, {}
+    cache = store.load_object_from_file(_detection_cache_path(snmp_config), default={})
+    if (cache.get("sys_object") != sys_object or
+            cache.get("sys_description_hash") != _description_hash(sys_description) or
+            not now - max_age < cache.get("detected", 0) <= now):
+        return now, {}
+    return cache["detected"], cache["sections"]
 
 
-def host_cache_get(name: HostName) -> List[str]:
-    return _g_walk_cache[name]
+def save_detection_cache(snmp_config: SNMPHostConfig, sys_object: SNMPDecodedString,
+                         sys_description: SNMPDecodedString, detected: float,
+                         sections: DetectedSections) -> None:
+    store.makedirs(cmk.utils.paths.snmp_detection_cache_dir)
+    store.save_object_to_file(
+        _detection_cache_path(snmp_config),
+        {
+            "sys_object": sys_object,
+            "sys_description_hash": _description_hash(sys_description),
+            "detected": detected,
+            "sections": sections,
+        },
+    )
 
 
-def host_cache_set(name: HostName, contents: List[str]) -> None:
-    _g_walk_cache[name] = contents
+def cleanup_host_caches() -> None:
+    _clear_other_hosts_oid_cache(None)
+
+
+cmk.utils.cleanup.register_cleanup(cleanup_host_caches)
 
 
 def _clear_other_hosts_oid_cache(hostname: Optional[str]) -> None:
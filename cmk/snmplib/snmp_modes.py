@@ -21,7 +21,14 @@ from cmk.utils.log import console
 from cmk.utils.type_defs import SectionName
 
 from . import snmp_cache
-from .type_defs import ABCSNMPBackend, OID, SNMPDecodedString, SNMPRawValue, SNMPRowInfo
+from .type_defs import (
+    ABCSNMPBackend,
+    OID,
+    SNMPContext,
+    SNMPDecodedString,
+    SNMPRawValue,
+    SNMPRowInfo,
+)
 
 SNMPRowInfoForStoredWalk = List[Tuple[OID, str]]
 SNMPWalkOptions = Dict[str, List[OID]]
@@ -90,6 +97,48 @@ def get_single_oid(oid: str,
     return decoded_value
 
 
+def prefetch_oids(oids: Iterable[OID], *, context_names: List[SNMPContext],
+                  backend: ABCSNMPBackend) -> None:
+    """Fetch the OIDs which are not cached yet into the single OID cache
+
+    All OIDs are fetched with as few requests as possible instead of one request per
+    OID. Like in get_single_oid(), the SNMP contexts are queried until the first answer
+    is received.
+    """
+    missing = sorted({oid for oid in oids if not snmp_cache.is_in_single_oid_cache(oid)})
+    values: Dict[OID, Optional[SNMPRawValue]] = {}
+    for context_name in context_names:
+        pending = [oid for oid in missing if values.get(oid) is None]
+        if not pending:
+            break
+        console.vverbose("       Getting OIDs %s\n" % ", ".join(pending))
+        try:
+            fetched = backend.get_many(pending, context_name=context_name)
+        except Exception:
+            if cmk.utils.debug.enabled():
+                raise
+            # Like get_single_oid(), only the values of the failing OIDs are lost
+            fetched = [_get_or_none(oid, context_name, backend) for oid in pending]
+        values.update(zip(pending, fetched))
+
+    for oid in missing:
+        value = values.get(oid)
+        snmp_cache.set_single_oid_cache(
+            oid,
+            None if value is None else backend.config.ensure_str(value),
+        )
+
+
+def _get_or_none(oid: OID, context_name: SNMPContext,
+                 backend: ABCSNMPBackend) -> Optional[SNMPRawValue]:
+    try:
+        return backend.get(oid=oid, context_name=context_name)
+    except Exception:
+        if cmk.utils.debug.enabled():
+            raise
+        return None
+
+
 def walk_for_export(oid: OID, *, backend: ABCSNMPBackend) -> SNMPRowInfoForStoredWalk:
     return _convert_rows_for_stored_walk(backend.walk(oid=oid))
 
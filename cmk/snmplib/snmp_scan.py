@@ -5,7 +5,8 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 import functools
-from typing import Collection, Iterable, Tuple, Set
+import hashlib
+from typing import Collection, Dict, Iterable, List, Optional, Set, Tuple
 
 import cmk.utils.tty as tty
 from cmk.utils.exceptions import MKGeneralException, MKSNMPError
@@ -14,18 +15,26 @@ from cmk.utils.type_defs import SectionName, SNMPDetectBaseType
 
 import cmk.snmplib.snmp_cache as snmp_cache
 import cmk.snmplib.snmp_modes as snmp_modes
-from cmk.snmplib.type_defs import ABCSNMPBackend
+from cmk.snmplib.type_defs import ABCSNMPBackend, OID, SNMPContext
 from cmk.snmplib.utils import evaluate_snmp_detection
 
 SNMPScanSection = Tuple[SectionName, SNMPDetectBaseType]
 
 
+class _OIDNotFetched(Exception):
+    """Stops the evaluation of a detect spec until the OID has been fetched"""
+    def __init__(self, oid: OID) -> None:
+        super().__init__(oid)
+        self.oid = oid
+
+
 # gather auto_discovered check_plugin_names for this host
 def gather_available_raw_section_names(
     sections: Collection[SNMPScanSection],
     on_error: str,
     *,
     missing_sys_description: bool,
+    detection_cache_ttl: int,
     backend: ABCSNMPBackend,
 ) -> Set[SectionName]:
     if not sections:
@@ -36,6 +45,7 @@ def gather_available_raw_section_names(
             sections,
             on_error=on_error,
             missing_sys_description=missing_sys_description,
+            detection_cache_ttl=detection_cache_ttl,
             backend=backend,
         )
     except Exception as e:
@@ -52,10 +62,11 @@ OID_SYS_OBJ = ".1.3.6.1.2.1.1.2.0"
 
 
 def _snmp_scan(
-    sections: Iterable[SNMPScanSection],
+    sections: Collection[SNMPScanSection],
     on_error: str = "ignore",
     *,
     missing_sys_description: bool,
+    detection_cache_ttl: int = 0,
     backend: ABCSNMPBackend,
 ) -> Set[SectionName]:
     snmp_cache.initialize_single_oid_cache(backend.config)
@@ -66,20 +77,58 @@ def _snmp_scan(
     else:
         _prefetch_description_object(backend=backend)
 
-    found_sections = _find_sections(
-        sections,
-        on_error=on_error,
-        backend=backend,
+    # Rediscoveries of the same device only have to evaluate new or changed detect specs
+    sys_object = snmp_cache.get_oid_from_single_oid_cache(OID_SYS_OBJ) or ""
+    sys_description = snmp_cache.get_oid_from_single_oid_cache(OID_SYS_DESCR) or ""
+    detected, cached = snmp_cache.load_detection_cache(
+        backend.config,
+        sys_object,
+        sys_description,
+        detection_cache_ttl,
     )
+    spec_hashes = {name: _spec_hash(specs) for name, specs in sections}
+    results = {
+        name: cached[str(name)][1]
+        for name, spec_hash in spec_hashes.items()
+        if cached.get(str(name), ("", False))[0] == spec_hash
+    }
+    if results:
+        console.vverbose("   Using %d cached detection results\n" % len(results))
+
+    results.update(
+        _detect_sections(
+            [(name, specs) for name, specs in sections if name not in results],
+            on_error=on_error,
+            backend=backend,
+        ))
+    found_sections = {name for name, found in results.items() if found}
     _output_snmp_check_plugins("SNMP scan found", found_sections)
     snmp_cache.write_single_oid_cache(backend.config)
+    if detection_cache_ttl > 0:
+        cached.update((str(name), (spec_hashes[name], found)) for name, found in results.items())
+        snmp_cache.save_detection_cache(
+            backend.config,
+            sys_object,
+            sys_description,
+            detected,
+            cached,
+        )
     return found_sections
 
 
+def _spec_hash(specs: SNMPDetectBaseType) -> str:
+    return hashlib.sha256(repr(specs).encode("utf-8")).hexdigest()
+
+
 def _prefetch_description_object(
     *,
     backend: ABCSNMPBackend,
 ) -> None:
+    snmp_modes.prefetch_oids(
+        [OID_SYS_DESCR, OID_SYS_OBJ],
+        context_names=backend.config.snmpv3_contexts_of(None),
+        backend=backend,
+    )
     for oid, name in [
         (OID_SYS_DESCR, "system description"),
         (OID_SYS_OBJ, "system object"),
@@ -107,35 +156,59 @@ def _fake_description_object() -> None:
     snmp_cache.set_single_oid_cache(OID_SYS_OBJ, "")
 
 
-def _find_sections(
+def _detect_sections(
     sections: Iterable[SNMPScanSection],
     *,
     on_error: str,
     backend: ABCSNMPBackend,
-) -> Set[SectionName]:
-    found_sections: Set[SectionName] = set()
-    for name, specs in sections:
-        oid_value_getter = functools.partial(
-            snmp_modes.get_single_oid,
-            section_name=name,
-            backend=backend,
-        )
-        try:
-            if evaluate_snmp_detection(
+) -> Dict[SectionName, bool]:
+    """Evaluate the detect specs, the sections failing to evaluate are left out
+
+    The specs are evaluated in rounds: Every spec is evaluated until it needs an OID
+    which has not been fetched yet. These OIDs are fetched together, then the
+    remaining specs are evaluated again. So exactly the OIDs are fetched which are
+    needed to evaluate the specs one after the other, but with a few batched requests.
+    """
+    results: Dict[SectionName, bool] = {}
+    undecided = list(sections)
+    while undecided:
+        missing: Dict[Tuple[SNMPContext, ...], Set[OID]] = {}
+        remaining: List[SNMPScanSection] = []
+        for name, specs in undecided:
+            try:
+                results[name] = evaluate_snmp_detection(
                     detect_spec=specs,
-                    oid_value_getter=oid_value_getter,
-            ):
-                found_sections.add(name)
-        except MKGeneralException:
-            # some error messages which we explicitly want to show to the user
-            # should be raised through this
-            raise
-        except Exception:
-            if on_error == "warn":
-                console.warning("   Exception in SNMP scan function of %s" % name)
-            elif on_error == "raise":
+                    oid_value_getter=functools.partial(
+                        _get_fetched_oid,
+                        section_name=name,
+                        backend=backend,
+                    ),
+                )
+            except _OIDNotFetched as e:
+                contexts = tuple(backend.config.snmpv3_contexts_of(name))
+                missing.setdefault(contexts, set()).add(e.oid)
+                remaining.append((name, specs))
+            except MKGeneralException:
+                # some error messages which we explicitly want to show to the user
+                # should be raised through this
                 raise
-    return found_sections
+            except Exception:
+                if on_error == "warn":
+                    console.warning("   Exception in SNMP scan function of %s" % name)
+                elif on_error == "raise":
+                    raise
+
+        for contexts, oids in missing.items():
+            snmp_modes.prefetch_oids(oids, context_names=list(contexts), backend=backend)
+        undecided = remaining
+    return results
+
+
+def _get_fetched_oid(oid: OID, *, section_name: SectionName,
+                     backend: ABCSNMPBackend) -> Optional[str]:
+    if oid.startswith(".") and not snmp_cache.is_in_single_oid_cache(oid):
+        raise _OIDNotFetched(oid)
+    return snmp_modes.get_single_oid(oid, section_name=section_name, backend=backend)
 
 
 def _output_snmp_check_plugins(
@@ -16,7 +16,7 @@ using `OIDCached` (that is: if the save_to_cache attribute of the OID object is
 
 """
 import os
-from typing import Callable, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
 
 from six import ensure_binary
 
@@ -31,6 +31,7 @@ from .type_defs import (
     OID,
     SNMPDecodedValues,
     SNMPHostConfig,
+    SNMPContext,
     SNMPRawValue,
     SNMPRowInfo,
     SNMPTable,
@@ -44,13 +45,54 @@ ResultColumnsSanitized = List[Tuple[List[SNMPRawValue], SNMPValueEncoding]]
 ResultColumnsDecoded = List[List[SNMPDecodedValues]]
 
 
+class WalkPlanner:
+    """Plans the walks needed for the tables of a fetch
+
+    All columns of a table which are not read from the walk cache are walked
+    together, see ABCSNMPBackend.walk_columns(). The walked OIDs are remembered,
+    so OIDs needed by several sections of the fetch are walked only once.
+    """
+    def __init__(self) -> None:
+        super().__init__()
+        self._walked: Dict[Tuple[Tuple[SNMPContext, ...], OID], SNMPRowInfo] = {}
+        self.walk_count = 0
+        self.reuse_count = 0
+
+    def walk(
+        self,
+        section_name: Optional[SectionName],
+        base_oid: str,
+        fetchoids: Sequence[OID],
+        *,
+        backend: ABCSNMPBackend,
+    ) -> List[SNMPRowInfo]:
+        contexts = tuple(backend.config.snmpv3_contexts_of(section_name))
+        missing = [
+            fetchoid for fetchoid in dict.fromkeys(fetchoids)
+            if (contexts, fetchoid) not in self._walked
+        ]
+        self.walk_count += len(missing)
+        self.reuse_count += len(fetchoids) - len(missing)
+        if missing:
+            rowinfos = _perform_snmpwalks(section_name, base_oid, missing, backend=backend)
+            self._walked.update(((contexts, fetchoid), rowinfo)
+                                for fetchoid, rowinfo in zip(missing, rowinfos))
+        # The row infos may be sorted in place later on
+        return [list(self._walked[(contexts, fetchoid)]) for fetchoid in fetchoids]
+
+
 def get_snmp_table(
     section_name: Optional[SectionName],
     oid_info: BackendSNMPTree,
     *,
     backend: ABCSNMPBackend,
+    walk_planner: Optional[WalkPlanner] = None,
 ) -> SNMPTable:
-    return _get_snmp_table(section_name, oid_info, read_walk_cache=False, backend=backend)
+    return _get_snmp_table(section_name,
+                           oid_info,
+                           read_walk_cache=False,
+                           backend=backend,
+                           walk_planner=walk_planner)
 
 
 def get_snmp_table_cached(
@@ -58,8 +100,13 @@ def get_snmp_table_cached(
     oid_info: BackendSNMPTree,
     *,
     backend: ABCSNMPBackend,
+    walk_planner: Optional[WalkPlanner] = None,
 ) -> SNMPTable:
-    return _get_snmp_table(section_name, oid_info, read_walk_cache=True, backend=backend)
+    return _get_snmp_table(section_name,
+                           oid_info,
+                           read_walk_cache=True,
+                           backend=backend,
+                           walk_planner=walk_planner)
 
 
 def _get_snmp_table(
@@ -68,7 +115,15 @@ def _get_snmp_table(
     *,
     read_walk_cache: bool,
     backend: ABCSNMPBackend,
+    walk_planner: Optional[WalkPlanner] = None,
 ) -> SNMPTable:
+    rowinfos = _get_snmpwalks(
+        section_name,
+        tree,
+        read_walk_cache=read_walk_cache,
+        backend=backend,
+        walk_planner=walk_planner or WalkPlanner(),
+    )
 
     index_column = -1
     index_format: Optional[SpecialColumn] = None
@@ -96,14 +151,7 @@ def _get_snmp_table(
             index_column = len(columns)
             index_format = oid.column
         else:
-            rowinfo = _get_snmpwalk(
-                section_name,
-                tree.base,
-                fetchoid,
-                read_walk_cache=read_walk_cache,
-                save_walk_cache=oid.save_to_cache,
-                backend=backend,
-            )
+            rowinfo = rowinfos[fetchoid]
             if len(rowinfo) > max_len:
                 max_len_col = len(columns)
 
@@ -186,41 +234,53 @@ def _key_oid_pairs(pair1: Tuple[OID, SNMPRawValue]) -> List[int]:
     return _oid_to_intlist(pair1[0].lstrip('.'))
 
 
-def _get_snmpwalk(
+def _get_snmpwalks(
     section_name: Optional[SectionName],
-    base: str,
-    fetchoid: OID,
+    tree: BackendSNMPTree,
     *,
     read_walk_cache: bool,
-    save_walk_cache: bool,
     backend: ABCSNMPBackend,
-) -> SNMPRowInfo:
-    if save_walk_cache and read_walk_cache:  # no point in reading if OID isn't saved
-        try:
-            return _get_cached_snmpwalk(backend.hostname, fetchoid)
-        except Exception:
-            if cmk.utils.debug.enabled():
-                raise
-
-    rowinfo = _perform_snmpwalk(section_name, base, fetchoid, backend=backend)
-    if save_walk_cache:
-        _save_snmpwalk_cache(backend.hostname, fetchoid, rowinfo)
-    return rowinfo
-
-
-def _perform_snmpwalk(
+    walk_planner: WalkPlanner,
+) -> Dict[OID, SNMPRowInfo]:
+    rowinfos: Dict[OID, SNMPRowInfo] = {}
+    fetchoids: List[OID] = []
+    save_walk_cache: Set[OID] = set()
+    for oid in tree.oids:
+        if isinstance(oid.column, SpecialColumn):
+            continue
+        fetchoid: OID = "%s.%s" % (tree.base, oid.column)
+        if oid.save_to_cache:
+            save_walk_cache.add(fetchoid)
+            if read_walk_cache:  # no point in reading if OID isn't saved
+                try:
+                    rowinfos[fetchoid] = _get_cached_snmpwalk(backend.hostname, fetchoid)
+                    continue
+                except Exception:
+                    if cmk.utils.debug.enabled():
+                        raise
+        fetchoids.append(fetchoid)
+
+    for fetchoid, rowinfo in zip(
+            fetchoids, walk_planner.walk(section_name, tree.base, fetchoids, backend=backend)):
+        rowinfos[fetchoid] = rowinfo
+        if fetchoid in save_walk_cache:
+            _save_snmpwalk_cache(backend.hostname, fetchoid, rowinfo)
+    return rowinfos
+
+
+def _perform_snmpwalks(
     section_name: Optional[SectionName],
     base_oid: str,
-    fetchoid: OID,
+    fetchoids: Sequence[OID],
     *,
     backend: ABCSNMPBackend,
-) -> SNMPRowInfo:
-    added_oids: Set[OID] = set([])
-    rowinfo: SNMPRowInfo = []
+) -> List[SNMPRowInfo]:
+    added_oids: List[Set[OID]] = [set() for _fetchoid in fetchoids]
+    rowinfos: List[SNMPRowInfo] = [[] for _fetchoid in fetchoids]
 
     for context_name in backend.config.snmpv3_contexts_of(section_name):
-        rows = backend.walk(
-            oid=fetchoid,
+        walked = backend.walk_columns(
+            fetchoids,
             # revert back to legacy "possilbly-empty-string"-Type
             # TODO: pass Optional[SectionName] along!
             check_plugin_name=str(section_name) if section_name else "",
@@ -228,23 +288,24 @@ def _perform_snmpwalk(
             context_name=context_name,
         )
 
-        # I've seen a broken device (Mikrotik Router), that broke after an
-        # update to RouterOS v6.22. It would return 9 time the same OID when
-        # .1.3.6.1.2.1.1.1.0 was being walked. We try to detect these situations
-        # by removing any duplicate OID information
-        if len(rows) > 1 and rows[0][0] == rows[1][0]:
-            console.vverbose("Detected broken SNMP agent. Ignoring duplicate OID %s.\n" %
-                             rows[0][0])
-            rows = rows[:1]
-
-        for row_oid, val in rows:
-            if row_oid in added_oids:
-                console.vverbose("Duplicate OID found: %s (%r)\n" % (row_oid, val))
-            else:
-                rowinfo.append((row_oid, val))
-                added_oids.add(row_oid)
-
-    return rowinfo
+        for rows, rowinfo, added in zip(walked, rowinfos, added_oids):
+            # I've seen a broken device (Mikrotik Router), that broke after an
+            # update to RouterOS v6.22. It would return 9 time the same OID when
+            # .1.3.6.1.2.1.1.1.0 was being walked. We try to detect these situations
+            # by removing any duplicate OID information
+            if len(rows) > 1 and rows[0][0] == rows[1][0]:
+                console.vverbose("Detected broken SNMP agent. Ignoring duplicate OID %s.\n" %
+                                 rows[0][0])
+                rows = rows[:1]
+
+            for row_oid, val in rows:
+                if row_oid in added:
+                    console.vverbose("Duplicate OID found: %s (%r)\n" % (row_oid, val))
+                else:
+                    rowinfo.append((row_oid, val))
+                    added.add(row_oid)
+
+    return rowinfos
 
 
 def _sanitize_snmp_encoding(columns: ResultColumnsSanitized,
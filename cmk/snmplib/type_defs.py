@@ -98,6 +98,7 @@ class SNMPBackend(enum.Enum):
     inline = "Inline"
     inline_legacy = "Inline (legacy)"
     classic = "Classic"
+    session = "Session"
 
     def serialize(self) -> str:
         return self.name
@@ -213,6 +214,34 @@ class ABCSNMPBackend(metaclass=abc.ABCMeta):
              context_name: Optional[SNMPContextName] = None) -> SNMPRowInfo:
         return []
 
+    def close(self) -> None:
+        """Release the resources of the backend, e.g. its sockets
+        A backend may still be used afterwards, the resources are acquired again then.
+        """
+
+    def get_many(self,
+                 oids: Sequence[OID],
+                 context_name: Optional[SNMPContextName] = None) -> List[Optional[SNMPRawValue]]:
+        """Fetch several OIDs and return one value per OID, like get() does
+        Backends which are able to fetch the OIDs with a single request override this.
+        """
+        return [self.get(oid, context_name=context_name) for oid in oids]
+
+    def walk_columns(self,
+                     oids: Sequence[OID],
+                     check_plugin_name: Optional[_CheckPluginName] = None,
+                     table_base_oid: Optional[OID] = None,
+                     context_name: Optional[SNMPContextName] = None) -> List[SNMPRowInfo]:
+        """Walk several OIDs, e.g. the columns of a table, and return one row info per OID
+        Backends which are able to walk the OIDs at the same time override this.
+        """
+        return [
+            self.walk(oid,
+                      check_plugin_name=check_plugin_name,
+                      table_base_oid=table_base_oid,
+                      context_name=context_name) for oid in oids
+        ]
+
 
 class SpecialColumn(enum.IntEnum):
     # Until we remove all but the first, its worth having an enum
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+"""Bounded in-memory caches which keep statistics about their usage"""
+
+import collections
+import itertools
+import sys
+from typing import Any, Generic, Iterable, Iterator, NamedTuple, Optional, TypeVar
+
+from cmk.utils.misc import total_size
+
+__all__ = ["CacheStatistics", "LRUCache", "format_cache_statistics"]
+
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+_MISSING: Any = object()
+
+# Number of entries used to estimate the memory usage of a cache
+_MEMORY_SAMPLE_SIZE = 100
+
+
+class CacheStatistics(NamedTuple):
+    name: str
+    maxsize: Optional[int]
+    size: int
+    hits: int
+    misses: int
+    evictions: int
+    memory: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return 1.0 * self.hits / lookups if lookups else 0.0
+
+
+class LRUCache(Generic[_K, _V]):
+    """Mapping like cache with an optional maximum number of entries
+
+    Once the cache is full, the least recently used entry is evicted.
+    Lookups with `[]` and `get` are counted as hits or misses, `in` is not.
+    A maxsize of None makes the cache unbounded.
+    """
+    def __init__(self, name: str, maxsize: Optional[int] = None) -> None:
+        super(LRUCache, self).__init__()
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize must be at least 1, got %r" % maxsize)
+        self.name = name
+        self.maxsize = maxsize
+        self._data: "collections.OrderedDict[_K, _V]" = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self) -> str:
+        return "%s(%r, maxsize=%r)" % (type(self).__name__, self.name, self.maxsize)
+
+    def __getitem__(self, key: _K) -> _V:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: _K, default: Any = None) -> Any:
+        # This is the hot path: Avoid exceptions and additional calls.
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        if self.maxsize is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: _K, value: _V) -> None:
+        self._data[key] = value
+        if self.maxsize is None:
+            return
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __delitem__(self, key: _K) -> None:
+        del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __iter__(self) -> Iterator[_K]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        """Remove all entries, the statistics are kept"""
+        self._data.clear()
+
+    def estimate_memory(self) -> int:
+        """Estimate the memory used by the cache in bytes
+
+        The size of the entries is extrapolated from a sample of the most
+        recently used entries. Objects shared between entries are counted
+        for every entry, so this tends to overestimate."""
+        memory = sys.getsizeof(self._data)
+        if not self._data:
+            return memory
+        sample = list(itertools.islice(reversed(self._data.items()), _MEMORY_SAMPLE_SIZE))
+        sample_memory = sum(total_size(key) + total_size(value) for key, value in sample)
+        return memory + sample_memory * len(self._data) // len(sample)
+
+    def statistics(self) -> CacheStatistics:
+        return CacheStatistics(
+            name=self.name,
+            maxsize=self.maxsize,
+            size=len(self._data),
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            memory=self.estimate_memory(),
+        )
+
+
+def format_cache_statistics(statistics: Iterable[CacheStatistics]) -> str:
+    return "\n".join(
+        "%s: %d/%s entries, %d hits, %d misses (hit rate: %.1f%%), %d evictions, ~%.1f MB" % (
+            stats.name,
+            stats.size,
+            "unlimited" if stats.maxsize is None else stats.maxsize,
+            stats.hits,
+            stats.misses,
+            100.0 * stats.hit_rate,
+            stats.evictions,
+            stats.memory / 1024.0 / 1024.0,
+        ) for stats in statistics)
@@ -49,6 +49,7 @@ counters_dir = _omd_path("tmp/check_mk/counters")
 tcp_cache_dir = _omd_path("tmp/check_mk/cache")
 data_source_cache_dir = _omd_path("tmp/check_mk/data_source_cache")
 snmp_scan_cache_dir = _omd_path("tmp/check_mk/snmp_scan_cache")
+snmp_detection_cache_dir = _omd_path("tmp/check_mk/snmp_detection_cache")
 include_cache_dir = _omd_path("tmp/check_mk/check_includes")
 tmp_dir = _omd_path("tmp/check_mk")
 logwatch_dir = _omd_path("var/check_mk/logwatch")
@@ -72,6 +73,8 @@ base_discovered_host_labels_dir = Path(_omd_path("var/check_mk/discovered_host_l
 discovered_host_labels_dir = base_discovered_host_labels_dir
 piggyback_dir = Path(tmp_dir, "piggyback")
 piggyback_source_dir = Path(tmp_dir, "piggyback_sources")
+piggyback_spool_dir = Path(tmp_dir, "piggyback_spool")
+snmpwalk_index_dir = Path(tmp_dir, "snmpwalk_index")
 crash_dir = Path(var_dir, "crashes")
 diagnostics_dir = Path(var_dir, "diagnostics")
 site_config_dir = Path(var_dir, "site_configs")
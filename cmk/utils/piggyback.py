@@ -6,10 +6,13 @@
 
 import errno
 import logging
+import mmap
 import os
+import struct
 import tempfile
+import time
 from pathlib import Path
-from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import cmk.utils
 import cmk.utils.paths
@@ -29,6 +32,7 @@ PiggybackFileInfo = NamedTuple('PiggybackFileInfo', [
     ('successfully_processed', bool),
     ('reason', str),
     ('reason_status', int),
+    ('in_spool', bool),
 ])
 
 PiggybackRawDataInfo = NamedTuple('PiggybackRawDataInfo', [
@@ -58,6 +62,18 @@ PiggybackTimeSettings = List[Tuple[Optional[str], str, int]]
 # "source_hostname":
 # - Path(tmp/check_mk/piggyback/HOST/SOURCE).name
 # - Path(tmp/check_mk/piggyback_sources/SOURCE).name
+# - Path(tmp/check_mk/piggyback_spool/SOURCE).name
+#
+# "spool_segment":
+# - tmp/check_mk/piggyback_spool/SOURCE
+#   The piggyback data of all piggybacked hosts of the source, see _SpoolSegment.
+#   Sources write either one "piggybacked_host_source" per piggybacked host or
+#   their "spool_segment", the data is read from both.
+#
+# "spool_marker":
+# - tmp/check_mk/piggyback/HOST/.SOURCE.spool
+#   The "spool_segment" of the source contains data for the piggybacked host. Looking
+#   up the data of a piggybacked host only opens the segments of its markers.
 
 
 def get_piggyback_raw_data(
@@ -88,7 +104,10 @@ def get_piggyback_raw_data(
             # Raw data is always stored as bytes. Later the content is
             # converted to unicode in abstact.py:_parse_info which respects
             # 'encoding' in section options.
-            raw_data = AgentRawData(store.load_bytes_from_file(file_info.file_path))
+            if file_info.in_spool:
+                raw_data = _read_spool_data(file_info.file_path, piggybacked_hostname)
+            else:
+                raw_data = AgentRawData(store.load_bytes_from_file(file_info.file_path))
 
         except IOError as e:
             reason = "Cannot read piggyback raw data from source '%s'" % file_info.source_hostname
@@ -139,15 +158,16 @@ def get_source_and_piggyback_hosts(
         time_settings: PiggybackTimeSettings) -> Iterator[Tuple[str, str]]:
     """Generates all piggyback pig/piggybacked host pairs that have up-to-date data"""
 
-    # Pylint bug (https://github.com/PyCQA/pylint/issues/1660). Fixed with pylint 2.x
-    for piggybacked_host_folder in _get_piggybacked_host_folders():
+    spool_segments = _load_spool_segments()
+    for piggybacked_hostname in _get_piggybacked_hostnames(spool_segments):
         for file_info in _get_piggyback_processed_file_infos(
-                piggybacked_host_folder.name,
+                piggybacked_hostname,
                 time_settings,
+                spool_segments,
         ):
             if not file_info.successfully_processed:
                 continue
-            yield file_info.source_hostname, piggybacked_host_folder.name
+            yield file_info.source_hostname, piggybacked_hostname
 
 
 def has_piggyback_raw_data(piggybacked_hostname: str, time_settings: PiggybackTimeSettings) -> bool:
@@ -158,7 +178,10 @@ def has_piggyback_raw_data(piggybacked_hostname: str, time_settings: PiggybackTi
 
 
 def _get_piggyback_processed_file_infos(
-        piggybacked_hostname: str, time_settings: PiggybackTimeSettings) -> List[PiggybackFileInfo]:
+    piggybacked_hostname: str,
+    time_settings: PiggybackTimeSettings,
+    spool_segments: Optional[Dict[str, "_SpoolSegment"]] = None,
+) -> List[PiggybackFileInfo]:
     """Gather a list of piggyback files to read for further processing.
 
     Please note that there may be multiple parallel calls executing the
@@ -166,22 +189,18 @@ def _get_piggyback_processed_file_infos(
     functions. Therefor all these functions needs to deal with suddenly vanishing or
     updated files/directories.
     """
-    source_hostnames = get_source_hostnames(piggybacked_hostname)
-    matching_time_settings = _get_matching_time_settings(source_hostnames, piggybacked_hostname,
-                                                         time_settings)
+    piggyback_data = _get_piggyback_data(piggybacked_hostname, spool_segments)
+    matching_time_settings = _get_matching_time_settings(
+        [data.source_hostname for data in piggyback_data], piggybacked_hostname, time_settings)
 
     file_infos: List[PiggybackFileInfo] = []
-    for source_hostname in source_hostnames:
-        if source_hostname.startswith("."):
-            continue
-
-        piggyback_file_path = _get_piggybacked_file_path(source_hostname, piggybacked_hostname)
-
+    for data in piggyback_data:
         successfully_processed, reason, reason_status = _get_piggyback_processed_file_info(
-            source_hostname, piggybacked_hostname, piggyback_file_path, matching_time_settings)
+            data.source_hostname, piggybacked_hostname, data.mtime, matching_time_settings)
 
-        piggyback_file_info = PiggybackFileInfo(source_hostname, piggyback_file_path,
-                                                successfully_processed, reason, reason_status)
+        piggyback_file_info = PiggybackFileInfo(data.source_hostname, data.file_path,
+                                                successfully_processed, reason, reason_status,
+                                                data.in_spool)
         file_infos.append(piggyback_file_info)
     return file_infos
 
@@ -205,17 +224,16 @@ def _get_matching_time_settings(
 
 
 def _get_piggyback_processed_file_info(
-        source_hostname: str, piggybacked_hostname: str, piggyback_file_path: Path,
+        source_hostname: str, piggybacked_hostname: str, file_mtime: Optional[float],
         time_settings: Dict[Tuple[Optional[str], str], int]) -> Tuple[bool, str, int]:
 
     max_cache_age = _get_max_cache_age(source_hostname, piggybacked_hostname, time_settings)
     validity_period = _get_validity_period(source_hostname, piggybacked_hostname, time_settings)
     validity_state = _get_validity_state(source_hostname, piggybacked_hostname, time_settings)
 
-    try:
-        file_age = cmk.utils.cachefile_age(piggyback_file_path)
-    except MKGeneralException:
+    if file_mtime is None:
         return False, "Piggyback file might have been deleted", 0
+    file_age = time.time() - file_mtime
 
     if file_age > max_cache_age:
         return False, "Piggyback file too old: %s" % Age(file_age - max_cache_age), 0
@@ -225,7 +243,7 @@ def _get_piggyback_processed_file_info(
         reason = "Source '%s' not sending piggyback data" % source_hostname
         return _eval_file_in_validity_period(file_age, validity_period, validity_state, reason)
 
-    if _is_piggyback_file_outdated(status_file_path, piggyback_file_path):
+    if _is_piggyback_file_outdated(status_file_path, file_mtime):
         reason = "Piggyback file not updated by source '%s'" % source_hostname
         return _eval_file_in_validity_period(file_age, validity_period, validity_state, reason)
 
@@ -264,19 +282,26 @@ def _eval_file_in_validity_period(file_age: float, validity_period: Optional[int
     return False, reason, 0
 
 
-def _is_piggyback_file_outdated(status_file_path: Path, piggyback_file_path: Path) -> bool:
+def _is_piggyback_file_outdated(status_file_path: Path, file_mtime: float) -> bool:
     try:
         # TODO use Path.stat() but be aware of:
         # On POSIX platforms Python reads atime and mtime at nanosecond resolution
         # but only writes them at microsecond resolution.
         # (We're using os.utime() in _store_status_file_of())
-        return os.stat(str(status_file_path))[8] > os.stat(str(piggyback_file_path))[8]
+        return os.stat(str(status_file_path))[8] > file_mtime
     except OSError as e:
         if e.errno == errno.ENOENT:
             return True
         raise
 
 
+def _get_file_mtime(piggyback_file_path: Path) -> Optional[float]:
+    try:
+        return os.stat(str(piggyback_file_path))[8]
+    except OSError:
+        return None
+
+
 def _remove_piggyback_file(piggyback_file_path: Path) -> bool:
     try:
         piggyback_file_path.unlink()
@@ -294,10 +319,14 @@ def remove_source_status_file(source_hostname: str) -> bool:
     return _remove_piggyback_file(source_status_path)
 
 
-def store_piggyback_raw_data(source_hostname: str, piggybacked_raw_data: Dict[str,
-                                                                              List[bytes]]) -> None:
+def store_piggyback_raw_data(source_hostname: str,
+                             piggybacked_raw_data: Dict[str, List[bytes]],
+                             spool: bool = False) -> None:
+    """Store the piggyback data of the source, one file per piggybacked host or a spool segment"""
     piggyback_file_paths = []
     for piggybacked_hostname, lines in piggybacked_raw_data.items():
+        if spool:
+            continue
         piggyback_file_path = _get_piggybacked_file_path(source_hostname, piggybacked_hostname)
         logger.log(
             VERBOSE,
@@ -318,13 +347,26 @@ def store_piggyback_raw_data(source_hostname: str, piggybacked_raw_data: Dict[st
         logger.log(VERBOSE, "Received piggyback data for %d hosts", len(piggybacked_raw_data))
 
         status_file_path = _get_source_status_file_path(source_hostname)
-        _store_status_file_of(status_file_path, piggyback_file_paths)
+        if spool:
+            store.makedirs(cmk.utils.paths.piggyback_spool_dir)
+            with store.locked(_get_spool_lock_path(source_hostname)):
+                _store_status_file_of(
+                    status_file_path,
+                    lambda times: _store_spool_segment(source_hostname, piggybacked_raw_data,
+                                                       times[1]),
+                )
+        else:
+            _store_status_file_of(
+                status_file_path,
+                lambda times: _set_piggyback_file_times(piggyback_file_paths, times),
+            )
     else:
         logger.log(VERBOSE, "Received no piggyback data")
         remove_source_status_file(source_hostname)
 
 
-def _store_status_file_of(status_file_path: Path, piggyback_file_paths: List[Path]) -> None:
+def _store_status_file_of(status_file_path: Path,
+                          store_piggyback_times: Callable[[Tuple[float, float]], None]) -> None:
     store.makedirs(status_file_path.parent)
 
     # Cannot use store.save_bytes_to_file like:
@@ -343,21 +385,214 @@ def _store_status_file_of(status_file_path: Path, piggyback_file_paths: List[Pat
         tmp.write(b"")
 
         tmp_stats = os.stat(tmp_path)
-        status_file_times = (tmp_stats.st_atime, tmp_stats.st_mtime)
-        for piggyback_file_path in piggyback_file_paths:
-            try:
-                # TODO use Path.stat() but be aware of:
-                # On POSIX platforms Python reads atime and mtime at nanosecond resolution
-                # but only writes them at microsecond resolution.
-                # (We're using os.utime() in _store_status_file_of())
-                os.utime(str(piggyback_file_path), status_file_times)
-            except OSError as e:
-                if e.errno == errno.ENOENT:
-                    continue
-                raise
+        store_piggyback_times((tmp_stats.st_atime, tmp_stats.st_mtime))
     os.rename(tmp_path, str(status_file_path))
 
 
+def _set_piggyback_file_times(piggyback_file_paths: List[Path],
+                              status_file_times: Tuple[float, float]) -> None:
+    for piggyback_file_path in piggyback_file_paths:
+        try:
+            # TODO use Path.stat() but be aware of:
+            # On POSIX platforms Python reads atime and mtime at nanosecond resolution
+            # but only writes them at microsecond resolution.
+            # (We're using os.utime() in _store_status_file_of())
+            os.utime(str(piggyback_file_path), status_file_times)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            raise
+
+
+def _store_spool_segment(source_hostname: str, piggybacked_raw_data: Dict[str, List[bytes]],
+                         timestamp: float) -> None:
+    """Replace the spool segment of the source, the caller holds the lock of the segment
+
+    The data of piggybacked hosts which have not been sent this time is taken over
+    from the previous segment together with its time, just like the piggyback files
+    of these hosts are left untouched.
+    """
+    logger.log(
+        VERBOSE,
+        "Storing piggyback data for %d hosts to spool",
+        len(piggybacked_raw_data),
+    )
+    entries: Dict[str, Tuple[float, bytes]] = {}
+    segment = _SpoolSegment.load(_get_spool_segment_path(source_hostname))
+    if segment is not None:
+        entries.update((piggybacked_hostname, (entry.timestamp, segment.read(entry)))
+                       for piggybacked_hostname, entry in segment.items()
+                       if piggybacked_hostname not in piggybacked_raw_data)
+    entries.update((piggybacked_hostname, (timestamp, b"%s\n" % b"\n".join(lines)))
+                   for piggybacked_hostname, lines in piggybacked_raw_data.items())
+    _write_spool_segment(source_hostname, segment, entries)
+
+
+def _write_spool_segment(source_hostname: str, segment: Optional["_SpoolSegment"],
+                         entries: Dict[str, Tuple[float, bytes]]) -> None:
+    """Replace the segment, the caller holds the lock of the segment
+
+    The markers of new piggybacked hosts are created before and the ones of removed
+    piggybacked hosts are removed after the segment has been replaced, so there is
+    a marker for every piggybacked host of the segment at any time.
+    """
+    for piggybacked_hostname in entries:
+        _add_spool_marker(source_hostname, piggybacked_hostname)
+
+    segment_path = _get_spool_segment_path(source_hostname)
+    if entries:
+        with tempfile.NamedTemporaryFile("wb",
+                                         dir=str(segment_path.parent),
+                                         prefix=".%s.new" % segment_path.name,
+                                         delete=False) as tmp:
+            os.chmod(tmp.name, 0o660)
+            tmp.write(_SpoolSegment.build(entries))
+        os.rename(tmp.name, str(segment_path))
+    else:
+        _remove_piggyback_file(segment_path)
+
+    if segment is not None:
+        for piggybacked_hostname, _entry in segment.items():
+            if piggybacked_hostname not in entries:
+                _remove_piggyback_file(_get_spool_marker_path(source_hostname,
+                                                              piggybacked_hostname))
+
+
+def _add_spool_marker(source_hostname: str, piggybacked_hostname: str) -> None:
+    marker_path = _get_spool_marker_path(source_hostname, piggybacked_hostname)
+    try:
+        marker_path.touch()
+    except FileNotFoundError:
+        store.makedirs(marker_path.parent)
+        marker_path.touch()
+
+
+def rename_spool_source(old_source_hostname: str, new_source_hostname: str) -> bool:
+    """Move the spool segment of a renamed source host together with its markers"""
+    old_segment_path = _get_spool_segment_path(old_source_hostname)
+    if not old_segment_path.exists():
+        return False
+
+    with store.locked(_get_spool_lock_path(old_source_hostname)):
+        segment = _SpoolSegment.load(old_segment_path)
+        if segment is None:
+            return False
+        for piggybacked_hostname, _entry in segment.items():
+            _add_spool_marker(new_source_hostname, piggybacked_hostname)
+        os.rename(str(old_segment_path), str(_get_spool_segment_path(new_source_hostname)))
+        for piggybacked_hostname, _entry in segment.items():
+            _remove_piggyback_file(_get_spool_marker_path(old_source_hostname,
+                                                          piggybacked_hostname))
+    return True
+
+
+def _read_spool_data(segment_path: Path, piggybacked_hostname: str) -> AgentRawData:
+    segment = _SpoolSegment.load(segment_path)
+    entry = None if segment is None else segment.find(piggybacked_hostname)
+    if segment is None or entry is None:
+        raise IOError(errno.ENOENT, "No piggyback data for %s" % piggybacked_hostname,
+                      str(segment_path))
+    return AgentRawData(segment.read(entry))
+
+
+#.
+#   .--spool---------------------------------------------------------------.
+#   |                                             _                        |
+#   |                       ___ _ __   ___   ___ | |                       |
+#   |                      / __| '_ \ / _ \ / _ \| |                       |
+#   |                      \__ \ |_) | (_) | (_) | |                       |
+#   |                      |___/ .__/ \___/ \___/|_|                       |
+#   |                          |_|                                         |
+#   '----------------------------------------------------------------------'
+
+_SpoolEntry = NamedTuple("_SpoolEntry", [
+    ("timestamp", float),
+    ("offset", int),
+    ("length", int),
+])
+
+
+class _SpoolSegment:
+    """The piggyback data of all piggybacked hosts of one source in a single file
+
+    The file starts with an index of the piggybacked hosts, sorted by their names,
+    followed by the names and the data. Every index entry contains the position of
+    the name and of the data in the file and the time the data has been stored at,
+    which takes the role of the mtime of the piggyback files. The file is replaced
+    atomically and memory mapped for reading, so looking up the data of a
+    piggybacked host reads only the index entries needed for bisecting it.
+    """
+    _MAGIC = b"CMKPIGG\x01"
+    # Magic and number of entries
+    _HEADER = struct.Struct("!8sQ")
+    # Offset and length of the name, offset and length of the data and the time
+    _ENTRY = struct.Struct("!QHQQd")
+
+    def __init__(self, data: Union[bytes, mmap.mmap]) -> None:
+        super().__init__()
+        self._data = data
+        self._count = self._HEADER.unpack_from(data)[1]
+        self._names_offset = self._HEADER.size + self._count * self._ENTRY.size
+
+    @classmethod
+    def load(cls, segment_path: Path) -> Optional["_SpoolSegment"]:
+        """Returns the segment or None, if it does not exist (anymore) or is invalid"""
+        try:
+            with segment_path.open("rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):  # Empty files can not be mapped
+            return None
+        if data[:len(cls._MAGIC)] != cls._MAGIC:
+            logger.log(VERBOSE, "Ignoring invalid piggyback spool segment '%s'", segment_path)
+            return None
+        return cls(data)
+
+    @classmethod
+    def build(cls, entries: Dict[str, Tuple[float, bytes]]) -> bytes:
+        names = sorted((name.encode("utf-8"), name) for name in entries)
+        data_offset = (cls._HEADER.size + len(names) * cls._ENTRY.size +
+                       sum(len(encoded) for encoded, _name in names))
+        index = [cls._HEADER.pack(cls._MAGIC, len(names))]
+        name_offset = 0
+        for encoded, name in names:
+            timestamp, data = entries[name]
+            index.append(
+                cls._ENTRY.pack(name_offset, len(encoded), data_offset, len(data), timestamp))
+            name_offset += len(encoded)
+            data_offset += len(data)
+        return b"".join(index + [encoded for encoded, _name in names] +
+                        [entries[name][1] for _encoded, name in names])
+
+    def _entry(self, number: int) -> Tuple[bytes, _SpoolEntry]:
+        name_offset, name_length, offset, length, timestamp = self._ENTRY.unpack_from(
+            self._data, self._HEADER.size + number * self._ENTRY.size)
+        start = self._names_offset + name_offset
+        return self._data[start:start + name_length], _SpoolEntry(timestamp, offset, length)
+
+    def items(self) -> Iterator[Tuple[str, _SpoolEntry]]:
+        for number in range(self._count):
+            name, entry = self._entry(number)
+            yield name.decode("utf-8"), entry
+
+    def find(self, piggybacked_hostname: str) -> Optional[_SpoolEntry]:
+        name = piggybacked_hostname.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count:
+            found_name, entry = self._entry(low)
+            if found_name == name:
+                return entry
+        return None
+
+    def read(self, entry: _SpoolEntry) -> bytes:
+        return self._data[entry.offset:entry.offset + entry.length]
+
+
 #   .--folders/files-------------------------------------------------------.
 #   |         __       _     _                  ____ _ _                   |
 #   |        / _| ___ | | __| | ___ _ __ ___   / / _(_) | ___  ___         |
@@ -370,16 +605,87 @@ def _store_status_file_of(status_file_path: Path, piggyback_file_paths: List[Pat
 
 def get_source_hostnames(piggybacked_hostname: Optional[str] = None) -> List[str]:
     if piggybacked_hostname is None:
+        spool_segments = _load_spool_segments()
         return [
-            source_host.name
-            for piggybacked_host_folder in _get_piggybacked_host_folders()
-            for source_host in _get_piggybacked_host_sources(piggybacked_host_folder)
+            data.source_hostname
+            for piggybacked_hostname_ in _get_piggybacked_hostnames(spool_segments)
+            for data in _get_piggyback_data(piggybacked_hostname_, spool_segments)
         ]
 
+    return [data.source_hostname for data in _get_piggyback_data(piggybacked_hostname)]
+
+
+_PiggybackData = NamedTuple("_PiggybackData", [
+    ("source_hostname", str),
+    ("file_path", Path),
+    ("mtime", Optional[float]),
+    ("in_spool", bool),
+])
+
+
+def _get_piggyback_data(
+    piggybacked_hostname: str,
+    spool_segments: Optional[Dict[str, "_SpoolSegment"]] = None,
+    newest_only: bool = True,
+) -> List[_PiggybackData]:
+    """The piggyback data of all sources for the piggybacked host, from both layouts
+
+    Without the already loaded spool segments of all sources, only the segments of
+    the spool markers of the piggybacked host are loaded.
+
+    A source which switched between the layouts may still have data in both of them.
+    Usually only the newer one is relevant.
+    """
     piggybacked_host_folder = cmk.utils.paths.piggyback_dir / Path(piggybacked_hostname)
-    return [
-        source_host.name for source_host in _get_piggybacked_host_sources(piggybacked_host_folder)
-    ]
+    source_hosts, spool_sources = _get_piggybacked_host_sources(piggybacked_host_folder)
+    if spool_segments is None:
+        spool_segments = _load_spool_segments(spool_sources)
+
+    piggyback_data: List[_PiggybackData] = []
+    for source_host in source_hosts:
+        piggyback_data.append(
+            _PiggybackData(source_host.name, source_host, _get_file_mtime(source_host), False))
+
+    for source_hostname, segment in spool_segments.items():
+        entry = segment.find(piggybacked_hostname)
+        if entry is not None:
+            piggyback_data.append(
+                _PiggybackData(source_hostname, _get_spool_segment_path(source_hostname),
+                               entry.timestamp, True))
+
+    if not newest_only:
+        return piggyback_data
+
+    newest: Dict[str, _PiggybackData] = {}
+    for data in piggyback_data:
+        other = newest.get(data.source_hostname)
+        if other is None or (other.mtime or 0) < (data.mtime or 0):
+            newest[data.source_hostname] = data
+    return list(newest.values())
+
+
+def _get_piggybacked_hostnames(spool_segments: Dict[str, "_SpoolSegment"]) -> List[str]:
+    piggybacked_hostnames = {
+        piggybacked_host_folder.name: None
+        for piggybacked_host_folder in _get_piggybacked_host_folders()
+    }
+    for segment in spool_segments.values():
+        piggybacked_hostnames.update(
+            (piggybacked_hostname, None) for piggybacked_hostname, _entry in segment.items())
+    return list(piggybacked_hostnames)
+
+
+def _load_spool_segments(
+        source_hostnames: Optional[List[str]] = None) -> Dict[str, "_SpoolSegment"]:
+    """Load the segments of the given sources or of all sources"""
+    segment_paths = (_get_spool_segment_paths() if source_hostnames is None else
+                     [_get_spool_segment_path(source) for source in source_hostnames])
+    spool_segments = {}
+    for segment_path in segment_paths:
+        segment = _SpoolSegment.load(segment_path)
+        if segment is not None:
+            spool_segments[segment_path.name] = segment
+    return spool_segments
 
 
 def _get_piggybacked_host_folders() -> List[Path]:
@@ -395,12 +701,29 @@ def _get_piggybacked_host_folders() -> List[Path]:
         raise
 
 
-def _get_piggybacked_host_sources(piggybacked_host_folder: Path) -> List[Path]:
+def _get_piggybacked_host_sources(piggybacked_host_folder: Path) -> Tuple[List[Path], List[str]]:
+    """The piggybacked host sources and the sources of the spool markers"""
+    try:
+        paths = list(piggybacked_host_folder.iterdir())
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return [], []
+        raise
+    return (
+        [path for path in paths if not path.name.startswith(".")],
+        [
+            path.name[1:-len(_SPOOL_MARKER_SUFFIX)]
+            for path in paths
+            if path.name.startswith(".") and path.name.endswith(_SPOOL_MARKER_SUFFIX)
+        ],
+    )
+
+
+def _get_spool_segment_paths() -> List[Path]:
     try:
         return [
-            piggybacked_host_source
-            for piggybacked_host_source in piggybacked_host_folder.iterdir()
-            if not piggybacked_host_source.name.startswith(".")
+            segment_path for segment_path in cmk.utils.paths.piggyback_spool_dir.iterdir()
+            if not segment_path.name.startswith(".")
         ]
     except OSError as e:
         if e.errno == errno.ENOENT:
@@ -429,6 +752,23 @@ def _get_piggybacked_file_path(source_hostname: str, piggybacked_hostname: str)
     return cmk.utils.paths.piggyback_dir / piggybacked_hostname / source_hostname
 
 
+def _get_spool_segment_path(source_hostname: str) -> Path:
+    return cmk.utils.paths.piggyback_spool_dir / source_hostname
+
+
+def _get_spool_lock_path(source_hostname: str) -> Path:
+    return cmk.utils.paths.piggyback_spool_dir / (".%s.lock" % source_hostname)
+
+
+_SPOOL_MARKER_SUFFIX = ".spool"
+
+
+def _get_spool_marker_path(source_hostname: str, piggybacked_hostname: str) -> Path:
+    # Hidden like the temporary files, which never end with the suffix
+    return (cmk.utils.paths.piggyback_dir / piggybacked_hostname /
+            (".%s%s" % (source_hostname, _SPOOL_MARKER_SUFFIX)))
+
+
 #.
 #   .--clean up------------------------------------------------------------.
 #   |                     _                                                |
@@ -460,41 +800,45 @@ def cleanup_piggyback_files(time_settings: List[Tuple[Optional[str], str, int]])
     _cleanup_old_piggybacked_files(piggybacked_hosts_settings)
 
 
+_PiggybackedHostSettings = Tuple[str, List[_PiggybackData], Dict[Tuple[Optional[str], str], int]]
+
+
 def _get_piggybacked_hosts_settings(
-    time_settings: List[Tuple[Optional[str], str, int]]
-) -> List[Tuple[Path, List[Path], Dict[Tuple[Optional[str], str], int]]]:
+        time_settings: List[Tuple[Optional[str], str, int]]) -> List[_PiggybackedHostSettings]:
+    spool_segments = _load_spool_segments()
     piggybacked_hosts_settings = []
-    for piggybacked_host_folder in _get_piggybacked_host_folders():
-        source_hosts = _get_piggybacked_host_sources(piggybacked_host_folder)
+    for piggybacked_hostname in _get_piggybacked_hostnames(spool_segments):
+        piggyback_data = _get_piggyback_data(piggybacked_hostname,
+                                             spool_segments,
+                                             newest_only=False)
         matching_time_settings = _get_matching_time_settings(
-            [source_host.name for source_host in source_hosts],
-            piggybacked_host_folder.name,
+            sorted({data.source_hostname for data in piggyback_data}),
+            piggybacked_hostname,
             time_settings,
         )
         piggybacked_hosts_settings.append(
-            (piggybacked_host_folder, source_hosts, matching_time_settings))
+            (piggybacked_hostname, piggyback_data, matching_time_settings))
     return piggybacked_hosts_settings
 
 
 def _cleanup_old_source_status_files(
-    piggybacked_hosts_settings: List[Tuple[Path, List[Path], Dict[Tuple[Optional[str], str], int]]]
-) -> None:
+        piggybacked_hosts_settings: List[_PiggybackedHostSettings]) -> None:
     """Remove source status files which exceed configured maximum cache age.
     There may be several 'Piggybacked Host Files' rules where the max age is configured.
     We simply use the greatest one per source."""
 
     max_cache_age_by_sources: Dict[str, int] = {}
-    for piggybacked_host_folder, source_hosts, time_settings in piggybacked_hosts_settings:
-        for source_host in source_hosts:
-            max_cache_age = _get_max_cache_age(source_host.name, piggybacked_host_folder.name,
+    for piggybacked_hostname, piggyback_data, time_settings in piggybacked_hosts_settings:
+        for data in piggyback_data:
+            max_cache_age = _get_max_cache_age(data.source_hostname, piggybacked_hostname,
                                                time_settings)
 
-            max_cache_age_of_source = max_cache_age_by_sources.get(source_host.name)
+            max_cache_age_of_source = max_cache_age_by_sources.get(data.source_hostname)
             if max_cache_age_of_source is None:
-                max_cache_age_by_sources[source_host.name] = max_cache_age
+                max_cache_age_by_sources[data.source_hostname] = max_cache_age
 
             elif max_cache_age >= max_cache_age_of_source:
-                max_cache_age_by_sources[source_host.name] = max_cache_age
+                max_cache_age_by_sources[data.source_hostname] = max_cache_age
 
     for source_state_file in _get_source_state_files():
         try:
@@ -523,33 +867,53 @@ def _cleanup_old_source_status_files(
 
 
 def _cleanup_old_piggybacked_files(
-    piggybacked_hosts_settings: List[Tuple[Path, List[Path], Dict[Tuple[Optional[str], str], int]]]
-) -> None:
+        piggybacked_hosts_settings: List[_PiggybackedHostSettings]) -> None:
     """Remove piggybacked data files which exceed configured maximum cache age."""
 
-    for piggybacked_host_folder, source_hosts, time_settings in piggybacked_hosts_settings:
-        for piggybacked_host_source in source_hosts:
+    # Piggybacked hosts and the time of their outdated data by source
+    outdated_spool_entries: Dict[str, Dict[str, float]] = {}
+    for piggybacked_hostname, piggyback_data, time_settings in piggybacked_hosts_settings:
+        for data in piggyback_data:
             successfully_processed, reason, _reason_status = _get_piggyback_processed_file_info(
-                piggybacked_host_source.name,
-                piggybacked_host_folder.name,
-                piggybacked_host_source,
+                data.source_hostname,
+                piggybacked_hostname,
+                data.mtime,
                 time_settings=time_settings,
             )
+            if successfully_processed:
+                continue
 
-            if not successfully_processed:
+            if data.in_spool:
+                logger.log(
+                    VERBOSE,
+                    "Piggyback data of '%s' in '%s' is outdated (%s). Remove it.",
+                    piggybacked_hostname,
+                    data.file_path,
+                    reason,
+                )
+                assert data.mtime is not None
+                outdated_spool_entries.setdefault(data.source_hostname,
+                                                  {})[piggybacked_hostname] = data.mtime
+            else:
                 logger.log(
                     VERBOSE,
                     "Piggyback file '%s' is outdated (%s). Remove it.",
-                    piggybacked_host_source,
+                    data.file_path,
                     reason,
                 )
-                _remove_piggyback_file(piggybacked_host_source)
+                _remove_piggyback_file(data.file_path)
 
-        # Remove empty backed host directory
+    # Also removes the spool markers of the outdated data
+    for source_hostname, outdated in outdated_spool_entries.items():
+        _remove_spool_entries(source_hostname, outdated)
+
+    # Remove empty backed host directory
+    for piggybacked_hostname, _piggyback_data, _time_settings in piggybacked_hosts_settings:
+        piggybacked_host_folder = cmk.utils.paths.piggyback_dir / piggybacked_hostname
         try:
             piggybacked_host_folder.rmdir()
         except OSError as e:
-            if e.errno == errno.ENOTEMPTY:
+            if e.errno in (errno.ENOTEMPTY, errno.ENOENT):
                 continue
             raise
         else:
@@ -558,3 +922,21 @@ def _cleanup_old_piggybacked_files(
                 "Piggyback folder '%s' is empty. Removed it.",
                 piggybacked_host_folder,
             )
+
+
+def _remove_spool_entries(source_hostname: str, outdated: Dict[str, float]) -> None:
+    """Rewrite the spool segment without the outdated data
+
+    The source may have stored new data in the meantime, only the data which has not
+    been replaced since it was found to be outdated is removed.
+    """
+    with store.locked(_get_spool_lock_path(source_hostname)):
+        segment = _SpoolSegment.load(_get_spool_segment_path(source_hostname))
+        if segment is None:
+            return
+        _write_spool_segment(
+            source_hostname, segment, {
+                piggybacked_hostname: (entry.timestamp, segment.read(entry))
+                for piggybacked_hostname, entry in segment.items()
+                if outdated.get(piggybacked_hostname) != entry.timestamp
+            })
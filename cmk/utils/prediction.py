@@ -8,7 +8,7 @@ import json
 import logging
 import os
 import time
-from typing import Dict, Callable, List, Optional, Tuple, Iterator
+from typing import Any, Dict, Callable, List, Optional, Sequence, Tuple, Iterator, TYPE_CHECKING
 
 from six import ensure_str
 
@@ -19,10 +19,14 @@ from cmk.utils.log import VERBOSE
 import cmk.utils.paths
 from cmk.utils.type_defs import Timestamp, Seconds, MetricName, ServiceName, HostName
 
+if TYPE_CHECKING:
+    import numpy as np  # type: ignore[import]
+
 logger = logging.getLogger("cmk.prediction")
 
 TimeWindow = Tuple[Timestamp, Timestamp, Seconds]
-RRDColumnFunction = Callable[[Timestamp, Timestamp], "TimeSeries"]
+TimeRange = Tuple[Timestamp, Timestamp]
+RRDColumnFunction = Callable[[Sequence[TimeRange]], List["TimeSeries"]]
 TimeSeriesValue = Optional[float]
 TimeSeriesValues = List[TimeSeriesValue]
 ConsolidationFunctionName = str
@@ -32,6 +36,14 @@ EstimatedLevels = Tuple[EstimatedLevel, EstimatedLevel, EstimatedLevel, Estimate
 PredictionInfo = Dict  # TODO: improve this type
 
 
+def _numpy() -> Any:
+    # numpy takes a while to import. Import it only when it is actually needed:
+    # This module is imported by every check helper, but only few of them compute
+    # predictions.
+    import numpy  # type: ignore[import] # pylint: disable=import-outside-toplevel
+    return numpy
+
+
 def is_dst(timestamp: float) -> bool:
     """Check wether a certain time stamp lies with in daylight saving time (DST)"""
     return bool(time.localtime(timestamp).tm_isdst)
@@ -118,19 +130,48 @@ class TimeSeries:
         twindow : 3-tuple, (start, end, step)
              description of target time interval
         """
-        upsa = []
-        i = 0
+        indices = self._bfill_upsample_indices(twindow, shift)
+        if indices is None:
+            return self.values
+        return _numpy().array(self.values, dtype=object)[indices].tolist()
+
+    def bfill_upsample_array(self, twindow: TimeWindow, shift: Seconds) -> "np.ndarray":
+        """Like bfill_upsample, but returns a float array with NaN for missing values"""
+        values = _numpy().array(self.values, dtype=float)
+        indices = self._bfill_upsample_indices(twindow, shift)
+        if indices is None:
+            return values
+        return values[indices]
+
+    def _bfill_upsample_indices(self, twindow: TimeWindow,
+                                shift: Seconds) -> "Optional[np.ndarray]":
+        """Compute the indices of the values backward filling the target time interval
+
+        For every target timestamp t the index of the value is advanced by at most one
+        compared to the previous t, once t reaches the (shifted) timestamp of the value.
+        This is the closed form of that recursion:
+
+            index[k] = min(index[k - 1] + 1, number of timestamps <= t[k])
+        """
         start, end, step = twindow
-        current_times = rrd_timestamps(self.twindow)
-        if start != self.start or end != self.end or step != self.step:
-            for t in range(start, end, step):
-                if t >= current_times[i] + shift:
-                    i += 1
-                upsa.append(self.values[i])
+        if start == self.start and end == self.end and step == self.step:
+            return None
 
-            return upsa
+        np = _numpy()
+        current_times = np.array(rrd_timestamps(self.twindow), dtype=np.int64) + shift
+        target_times = np.arange(start, end, step, dtype=np.int64)
+        if not len(target_times):
+            return np.zeros(0, dtype=np.intp)
 
-        return self.values
+        position = np.arange(len(target_times))
+        passed = np.searchsorted(current_times, target_times, side="right")
+        indices = position + np.minimum(1, np.minimum.accumulate(passed - position))
+
+        if (not len(current_times) or indices[-1] >= len(self.values) or
+                len(indices) > 1 and indices[-2] >= len(current_times)):
+            raise IndexError("Time series %r does not cover the time window %r" %
+                             (self.twindow, twindow))
+        return indices
 
     def downsample(self,
                    twindow: TimeWindow,
@@ -234,36 +275,66 @@ def get_rrd_data(hostname: HostName,
           x---v---v---v---v---y
 
     """
-
+    return get_rrd_data_of_time_ranges(hostname, service_description, [varname], cf,
+                                       [(fromtime, untiltime)], max_entries)[varname][0]
+
+
+def get_rrd_data_of_time_ranges(
+    hostname: HostName,
+    service_description: ServiceName,
+    varnames: Sequence[MetricName],
+    cf: ConsolidationFunctionName,
+    time_ranges: Sequence[TimeRange],
+    max_entries: int = 400,
+) -> Dict[MetricName, List[TimeSeries]]:
+    """Fetch RRD historic metrics data of several metrics of a service and time ranges at once
+
+    Works like get_rrd_data, but needs a single livestatus query for all of the
+    data: Every combination of metric and time range is a column of the query.
+    Each time range is fetched with its own resolution, just like with individual
+    queries.
+
+    returns the TimeSeries objects of every metric in the order of the time ranges
+    """
     step = 1
-    rpn = "%s.%s" % (varname, cf.lower())  # "MAX" -> "max"
-    point_range = ":".join(
-        livestatus.lqencode(str(x)) for x in (fromtime, untiltime, step, max_entries))
-    column = "rrddata:m1:%s:%s" % (rpn, point_range)
+    columns = []
+    for varname in varnames:
+        rpn = "%s.%s" % (varname, cf.lower())  # "MAX" -> "max"
+        for fromtime, untiltime in time_ranges:
+            point_range = ":".join(
+                livestatus.lqencode(str(x)) for x in (fromtime, untiltime, step, max_entries))
+            columns.append("rrddata:m1:%s:%s" % (rpn, point_range))
 
-    lql = livestatus_lql([hostname], [column], service_description) + "OutputFormat: python\n"
+    lql = livestatus_lql([hostname], columns, service_description) + "OutputFormat: python\n"
 
     try:
         connection = livestatus.SingleSiteConnection("unix:%s" %
                                                      cmk.utils.paths.livestatus_unix_socket)
-        response = connection.query_value(lql)
+        response = connection.query_row(lql)
     except livestatus.MKLivestatusNotFoundError as e:
         if cmk.utils.debug.enabled():
             raise
         raise MKGeneralException("Cannot get historic metrics via Livestatus: %s" % e)
 
-    if response is None:
+    if any(data is None for data in response):
         raise MKGeneralException("Cannot retrieve historic data with Nagios Core")
 
-    return TimeSeries(response)
+    num_time_ranges = len(time_ranges)
+    return {
+        varname: [
+            TimeSeries(data)
+            for data in response[index * num_time_ranges:(index + 1) * num_time_ranges]
+        ] for index, varname in enumerate(varnames)
+    }
 
 
 def rrd_datacolum(hostname: HostName, service_description: ServiceName, varname: MetricName,
                   cf: ConsolidationFunctionName) -> RRDColumnFunction:
     "Partial helper function to get rrd data"
 
-    def time_boundaries(fromtime: Timestamp, untiltime: Timestamp) -> TimeSeries:
-        return get_rrd_data(hostname, service_description, varname, cf, fromtime, untiltime)
+    def time_boundaries(time_ranges: Sequence[TimeRange]) -> List[TimeSeries]:
+        return get_rrd_data_of_time_ranges(hostname, service_description, [varname], cf,
+                                           time_ranges)[varname]
 
     return time_boundaries
 
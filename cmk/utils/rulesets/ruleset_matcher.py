@@ -5,7 +5,20 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 """This module provides generic Check_MK ruleset processing functionality"""
 
-from typing import TYPE_CHECKING, Any, Dict, Generator, List, Optional, Pattern, Set, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    FrozenSet,
+    Generator,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Tuple,
+)
 
 from cmk.utils.rulesets.tuple_rulesets import (
     ALL_HOSTS,
@@ -14,6 +27,7 @@ from cmk.utils.rulesets.tuple_rulesets import (
     PHYSICAL_HOSTS,
     NEGATE,
 )
+from cmk.utils.caching import CacheStatistics, LRUCache
 from cmk.utils.regex import regex
 from cmk.utils.exceptions import MKGeneralException
 from cmk.utils.type_defs import HostName, ServiceName, TagGroups, TagList, Ruleset, RuleValue, Union
@@ -27,6 +41,71 @@ PreprocessedPattern = Tuple[bool, Pattern[str]]
 PreprocessedServiceRuleset = List[Tuple[RuleValue, Set[HostName], LabelConditions, Tuple,
                                         PreprocessedPattern]]
 
+# Maximum number of entries of the matcher caches. A limit of None means unbounded.
+DEFAULT_CACHE_SIZES: Mapping[str, Optional[int]] = {
+    "service_match": 1000000,
+    "service_ruleset": 4096,
+    "host_ruleset": 4096,
+    "all_matching_hosts": 65536,
+}
+
+# Characters that end the literal prefix of a service description pattern
+_REGEX_SPECIAL_CHARS = frozenset('.?*+^$|[](){}\\')
+
+
+class ServiceRulesetIndex:
+    """Index of a preprocessed service ruleset
+
+    The rules which may apply to a service are narrowed down by the host name
+    and by the first character of the service description. The candidates are
+    always returned in the order of the ruleset. They still have to be matched
+    against the service conditions.
+    """
+    def __init__(
+        self,
+        rules: PreprocessedServiceRuleset,
+        first_chars: Sequence[Optional[FrozenSet[str]]],
+    ) -> None:
+        super(ServiceRulesetIndex, self).__init__()
+        self.rules = rules
+        # Rules matching any service description
+        self._unindexed: Set[int] = set()
+        # First character of the service description -> rules
+        self._by_first_char: Dict[str, Set[int]] = {}
+        for rule_index, rule_first_chars in enumerate(first_chars):
+            if rule_first_chars is None:
+                self._unindexed.add(rule_index)
+                continue
+            for first_char in rule_first_chars:
+                self._by_first_char.setdefault(first_char, set()).add(rule_index)
+
+        self._host_candidates: Dict[HostName, Tuple[int, ...]] = {}
+        self._candidates: Dict[Tuple[HostName, str], Tuple[int, ...]] = {}
+
+    def candidates(self, host_name: HostName, service_description: ServiceName) -> Tuple[int, ...]:
+        """Returns the indexes of the rules that may match the service"""
+        cache_id = host_name, service_description[:1]
+        try:
+            return self._candidates[cache_id]
+        except KeyError:
+            pass
+
+        indexed = self._by_first_char.get(service_description[:1], set())
+        candidates = self._candidates[cache_id] = tuple(
+            rule_index for rule_index in self._candidates_of_host(host_name)
+            if rule_index in self._unindexed or rule_index in indexed)
+        return candidates
+
+    def _candidates_of_host(self, host_name: HostName) -> Tuple[int, ...]:
+        try:
+            return self._host_candidates[host_name]
+        except KeyError:
+            pass
+
+        host_candidates = self._host_candidates[host_name] = tuple(
+            rule_index for rule_index, rule in enumerate(self.rules) if host_name in rule[1])
+        return host_candidates
+
 
 class RulesetMatchObject:
     """Wrapper around dict to ensure the ruleset match objects are correctly created"""
@@ -76,8 +155,10 @@ class RulesetMatcher:
         all_configured_hosts: Set[HostName],
         clusters_of: Dict[HostName, List[HostName]],
         nodes_of: Dict[HostName, List[HostName]],
+        cache_sizes: Optional[Mapping[str, Optional[int]]] = None,
     ) -> None:
         super(RulesetMatcher, self).__init__()
+        cache_sizes = {**DEFAULT_CACHE_SIZES, **(cache_sizes or {})}
 
         self.tuple_transformer = RulesetToDictTransformer(tag_to_group_map=tag_to_group_map)
 
@@ -89,9 +170,15 @@ class RulesetMatcher:
             all_configured_hosts,
             clusters_of,
             nodes_of,
+            cache_sizes,
         )
 
-        self._service_match_cache: Dict = {}
+        self._service_match_cache: LRUCache[Tuple, bool] = LRUCache(
+            "service_match", cache_sizes["service_match"])
+
+    def cache_statistics(self) -> List[CacheStatistics]:
+        return ([self._service_match_cache.statistics()] +
+                self.ruleset_optimizer.cache_statistics())
 
     def is_matching_host_ruleset(self, match_object: RulesetMatchObject,
                                  ruleset: List[Dict]) -> bool:
@@ -172,19 +259,24 @@ class RulesetMatcher:
                                                                        with_foreign_hosts,
                                                                        is_binary=is_binary)
 
-        for value, hosts, service_labels_condition, service_labels_condition_cache_id, service_description_condition in optimized_ruleset:
-            if match_object.service_description is None:
-                continue
-
-            if match_object.host_name not in hosts:
-                continue
+        if match_object.service_description is None:
+            return
 
-            service_cache_id = (match_object.service_cache_id, service_description_condition,
+        assert match_object.host_name is not None
+        rules = optimized_ruleset.rules
+        for rule_index in optimized_ruleset.candidates(match_object.host_name,
+                                                       match_object.service_description):
+            (value, _hosts, service_labels_condition, service_labels_condition_cache_id,
+             service_description_condition) = rules[rule_index]
+
+            # Use the pattern string instead of the compiled pattern: Its hash is cached,
+            # while hashing a compiled pattern hashes the whole compiled code again.
+            service_cache_id = (match_object.service_cache_id, service_description_condition[0],
+                                service_description_condition[1].pattern,
                                 service_labels_condition_cache_id)
 
-            if service_cache_id in self._service_match_cache:
-                match = self._service_match_cache[service_cache_id]
-            else:
+            match = self._service_match_cache.get(service_cache_id)
+            if match is None:
                 match = self._matches_service_conditions(service_description_condition,
                                                          service_labels_condition, match_object)
                 self._service_match_cache[service_cache_id] = match
@@ -257,7 +349,8 @@ class RulesetOptimizer:
     def __init__(self, ruleset_matcher: RulesetMatcher, host_tag_lists: Dict[HostName, TagList],
                  host_paths: Dict[HostName, str], labels: 'LabelManager',
                  all_configured_hosts: Set[HostName], clusters_of: Dict[HostName, List[HostName]],
-                 nodes_of: Dict[HostName, List[HostName]]) -> None:
+                 nodes_of: Dict[HostName, List[HostName]],
+                 cache_sizes: Optional[Mapping[str, Optional[int]]] = None) -> None:
         super(RulesetOptimizer, self).__init__()
         self._ruleset_matcher = ruleset_matcher
         self._labels = labels
@@ -279,9 +372,13 @@ class RulesetOptimizer:
         # It is used to determine the best rule evualation method
         self._all_processed_hosts_similarity = 1.0
 
-        self._service_ruleset_cache: Dict = {}
-        self._host_ruleset_cache: Dict = {}
-        self._all_matching_hosts_match_cache: Dict = {}
+        cache_sizes = {**DEFAULT_CACHE_SIZES, **(cache_sizes or {})}
+        self._service_ruleset_cache: LRUCache[Tuple[int, bool], ServiceRulesetIndex] = LRUCache(
+            "service_ruleset", cache_sizes["service_ruleset"])
+        self._host_ruleset_cache: LRUCache[Tuple[int, bool], PreprocessedHostRuleset] = LRUCache(
+            "host_ruleset", cache_sizes["host_ruleset"])
+        self._all_matching_hosts_match_cache: LRUCache[Tuple, Set[HostName]] = LRUCache(
+            "all_matching_hosts", cache_sizes["all_matching_hosts"])
 
         # Reference dirname -> hosts in this dir including subfolders
         self._folder_host_lookup: Dict[Tuple[bool, str], Set[HostName]] = {}
@@ -306,6 +403,13 @@ class RulesetOptimizer:
         self._host_ruleset_cache.clear()
         self._all_matching_hosts_match_cache.clear()
 
+    def cache_statistics(self) -> List[CacheStatistics]:
+        return [
+            self._service_ruleset_cache.statistics(),
+            self._host_ruleset_cache.statistics(),
+            self._all_matching_hosts_match_cache.statistics(),
+        ]
+
     def all_processed_hosts(self) -> Set[HostName]:
         """Returns a set of all processed hosts"""
         return self._all_processed_hosts
@@ -350,8 +454,10 @@ class RulesetOptimizer:
                          is_binary: bool) -> PreprocessedHostRuleset:
         cache_id = id(ruleset), with_foreign_hosts
 
-        if cache_id in self._host_ruleset_cache:
+        try:
             return self._host_ruleset_cache[cache_id]
+        except KeyError:
+            pass
 
         host_ruleset = self._convert_host_ruleset(ruleset, with_foreign_hosts, is_binary)
         self._host_ruleset_cache[cache_id] = host_ruleset
@@ -375,11 +481,13 @@ class RulesetOptimizer:
         return host_values
 
     def get_service_ruleset(self, ruleset: Ruleset, with_foreign_hosts: bool,
-                            is_binary: bool) -> PreprocessedServiceRuleset:
+                            is_binary: bool) -> ServiceRulesetIndex:
         cache_id = id(ruleset), with_foreign_hosts
 
-        if cache_id in self._service_ruleset_cache:
+        try:
             return self._service_ruleset_cache[cache_id]
+        except KeyError:
+            pass
 
         cached_ruleset = self._convert_service_ruleset(ruleset,
                                                        with_foreign_hosts=with_foreign_hosts,
@@ -388,8 +496,9 @@ class RulesetOptimizer:
         return cached_ruleset
 
     def _convert_service_ruleset(self, ruleset: Ruleset, with_foreign_hosts: bool,
-                                 is_binary: bool) -> PreprocessedServiceRuleset:
+                                 is_binary: bool) -> ServiceRulesetIndex:
         new_rules: PreprocessedServiceRuleset = []
+        first_chars: List[Optional[FrozenSet[str]]] = []
         for rule in ruleset:
             if "options" in rule and "disabled" in rule["options"]:
                 continue
@@ -408,7 +517,9 @@ class RulesetOptimizer:
             new_rules.append(
                 (rule["value"], hosts, service_labels_condition, service_labels_condition_cache_id,
                  self._convert_pattern_list(rule["condition"].get("service_description"))))
-        return new_rules
+            first_chars.append(_first_chars_of_pattern_list(
+                rule["condition"].get("service_description")))
+        return ServiceRulesetIndex(new_rules, first_chars)
 
     def _convert_pattern_list(self, patterns: List[str]) -> PreprocessedPattern:
         """Compiles a list of service match patterns to a to a single regex
@@ -703,6 +814,34 @@ def matches_labels(object_labels, required_labels) -> bool:
     return True
 
 
+def _first_chars_of_pattern_list(patterns: Optional[List]) -> Optional[FrozenSet[str]]:
+    """Returns the possible first characters of the service descriptions matched by the patterns
+
+    Returns None in case this can not be told by looking at the literal prefixes
+    of the patterns (no patterns, negated patterns, patterns starting with special
+    characters, alternatives or inline flags)."""
+    if not patterns:
+        return None
+
+    negate, patterns = parse_negated_condition_list(patterns)
+    if negate:
+        return None
+
+    first_chars = set()
+    for pattern in patterns:
+        if isinstance(pattern, dict):
+            pattern = pattern["$regex"]
+
+        if not pattern or pattern[0] in _REGEX_SPECIAL_CHARS or "|" in pattern or "(?" in pattern:
+            return None
+
+        if len(pattern) > 1 and pattern[1] in "?*{":
+            return None  # The first character is optional
+
+        first_chars.add(pattern[0])
+    return frozenset(first_chars)
+
+
 def parse_negated_condition_list(entries):
     negate = False
     if isinstance(entries, dict) and "$nor" in entries:
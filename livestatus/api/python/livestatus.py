@@ -9,6 +9,8 @@ import time
 import re
 import os
 import ast
+import json
+import selectors
 import ssl
 from typing import NewType, AnyStr, Any, Type, List, Tuple, Union, Dict, Pattern, Optional, Set
 
@@ -249,7 +251,8 @@ class Query:
 
     def __init__(self,
                  query: Union[str, bytes],
-                 suppress_exceptions: Optional[List[Type[Exception]]] = None) -> None:
+                 suppress_exceptions: Optional[List[Type[Exception]]] = None,
+                 output_format: str = "python3") -> None:
         super(Query, self).__init__()
 
         self._query = _ensure_unicode(query)
@@ -259,10 +262,39 @@ class Query:
         else:
             self.suppress_exceptions = suppress_exceptions
 
+        # "json" is decoded a lot faster than "python3", which is important for
+        # large responses. But blob columns (e.g. files) are returned as strings
+        # containing the bytes as code points (latin-1) instead of bytes objects.
+        if output_format not in _RESPONSE_DECODERS:
+            raise MKLivestatusConfigError("Unsupported output format '%s'" % output_format)
+        self.output_format = output_format
+
     def __str__(self) -> str:
         return self._query
 
 
+def _decode_python3(data: bytes) -> LivestatusResponse:
+    return ast.literal_eval(data.decode("utf-8"))
+
+
+_RESPONSE_DECODERS = {
+    "python3": _decode_python3,
+    "json": json.loads,
+}
+
+# The output format requested lastly in a query is used by livestatus
+_output_format_regex: Pattern = re.compile("^OutputFormat: *([^\n]*)$", re.MULTILINE)
+
+
+def _response_length(header: bytes) -> Optional[int]:
+    """Returns the length announced by a fixed16 response header, None if it is malformed"""
+    try:
+        length = int(header[4:15].lstrip())
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
 QueryTypes = Union[str, bytes, Query]
 OnlySites = Optional[List[SiteId]]
 DeadSite = Dict[str, Union[str, int, Exception, SiteConfiguration]]
@@ -413,20 +445,24 @@ class SingleSiteConnection(Helpers):
             except KeyError:
                 pass
 
-    def receive_data(self, size: int) -> bytes:
+    def receive_data(self, size: int) -> bytearray:
         if self.socket is None:
             raise MKLivestatusSocketError("Socket to '%s' is not connected" % self.socketurl)
 
-        result = b""
+        # The announced size is received directly into the result, which avoids
+        # copying the data received so far again and again for large responses
+        result = bytearray(size)
+        view = memoryview(result)
         # Timeout is only honored when connecting
         self.socket.settimeout(None)
-        while size > 0:
-            packet = self.socket.recv(size)
-            if not packet:
+        received = 0
+        while received < size:
+            length = self.socket.recv_into(view[received:], size - received)
+            if not length:
                 raise MKLivestatusSocketClosed(
                     "Read zero data from socket, nagios server closed connection")
-            size -= len(packet)
-            result += packet
+            received += length
+        view.release()
         return result
 
     # TODO: change all call sites to hand over Query + str
@@ -444,7 +480,7 @@ class SingleSiteConnection(Helpers):
             self.auth_header,
             self.add_headers,
             f"Localtime: {int(time.time()):d}",
-            "OutputFormat: python3",
+            f"OutputFormat: {query_obj.output_format}",
             "KeepAlive: on",
             "ResponseHeader: fixed16",
             add_headers,
@@ -480,33 +516,41 @@ class SingleSiteConnection(Helpers):
     # Reads a response from the livestatus socket. If the socket is closed
     # by the livestatus server, we automatically make a reconnect and send
     # the query again (once). This is due to timeouts during keepalive.
-    def recv_response(self, query: str, timeout_at: Optional[float] = None) -> LivestatusResponse:
+    # The response may also have been received already, e.g. by MultiSiteConnection,
+    # and is handed over as pair of response header and data then.
+    def recv_response(self,
+                      query: str,
+                      timeout_at: Optional[float] = None,
+                      received: Optional[Tuple[bytes, bytes]] = None) -> LivestatusResponse:
         try:
             # Headers are always ASCII encoded
-            resp = self.receive_data(16)
+            resp = self.receive_data(16) if received is None else received[0]
             code = resp[0:3].decode("ascii")
-            try:
-                length = int(resp[4:15].lstrip())
-            except Exception:
+            length = _response_length(resp)
+            if length is None:
                 self.disconnect()
                 raise MKLivestatusSocketError(
                     "Malformed output. Livestatus TCP socket might be unreachable or wrong"
                     "encryption settings are used.")
 
-            data = self.receive_data(length).decode("utf-8")
+            data = self.receive_data(length) if received is None else received[1]
 
             if code == "200":
+                output_formats = _output_format_regex.findall(query)
+                decode = _RESPONSE_DECODERS.get(output_formats[-1] if output_formats else "",
+                                                _decode_python3)
                 try:
-                    return ast.literal_eval(data)
+                    return decode(data)
                 except (ValueError, SyntaxError):
                     self.disconnect()
                     raise MKLivestatusSocketError("Malformed output")
 
             elif code == "404":
-                raise MKLivestatusTableNotFoundError("Not Found (%s): %s" % (code, data.strip()))
+                raise MKLivestatusTableNotFoundError("Not Found (%s): %s" %
+                                                     (code, data.decode("utf-8").strip()))
 
             else:
-                raise MKLivestatusQueryError("%s: %s" % (code, data.strip()))
+                raise MKLivestatusQueryError("%s: %s" % (code, data.decode("utf-8").strip()))
 
         except (MKLivestatusSocketClosed, IOError) as e:
             # In case of an IO error or the other side having
@@ -563,7 +607,8 @@ class SingleSiteConnection(Helpers):
 
         if self.limit is not None:
             normalized_query = Query("%sLimit: %d\n" % (normalized_query, self.limit),
-                                     normalized_query.suppress_exceptions)
+                                     normalized_query.suppress_exceptions,
+                                     normalized_query.output_format)
 
         response = self.do_query(normalized_query, normalized_add_headers)
         if self.prepend_site:
@@ -643,6 +688,8 @@ class MultiSiteConnection(Helpers):
         self.only_sites: OnlySites = None
         self.limit: Optional[int] = None
         self.parallelize = True
+        # Sites not responding within this time are marked dead by query_parallel()
+        self.response_timeout: Optional[float] = None
 
         # Status host: A status host helps to prevent trying to connect
         # to a remote site which is unreachable. This is done by looking
@@ -811,6 +858,14 @@ class MultiSiteConnection(Helpers):
         """Impose Limit on number of returned datasets (distributed among sites)"""
         self.limit = limit
 
+    def set_response_timeout(self, timeout: Optional[float] = None) -> None:
+        """Mark sites as dead which do not respond within the given time
+
+        The other sites are not affected by a slow site. It is only used for
+        parallel queries.
+        """
+        self.response_timeout = timeout
+
     def dead_sites(self) -> Dict[SiteId, DeadSite]:
         return self.deadsites
 
@@ -894,10 +949,12 @@ class MultiSiteConnection(Helpers):
             limit_header = u""
 
         # First send all queries
+        sent_to_sites = []
         for sitename, site, connection in connect_to_sites:
             try:
                 str_query = connection.build_query(query, add_headers + limit_header)
                 connection.send_query(str_query)
+                sent_to_sites.append((sitename, connection))
             except Exception as e:
                 self.deadsites[sitename] = {
                     "exception": e,
@@ -906,13 +963,22 @@ class MultiSiteConnection(Helpers):
 
         suppress_exceptions = tuple(query.suppress_exceptions)
 
-        # Then retrieve all answers. We will be as slow as the slowest of all
-        # connections.
+        # Then retrieve all answers, from whichever site is ready first. A slow
+        # site does not delay reading the answers of the others.
+        received = self._receive_responses(sent_to_sites)
+
         result = LivestatusResponse([])
         for sitename, site, connection in connect_to_sites:
+            if sitename not in received:
+                continue
             try:
                 str_query = connection.build_query(query, add_headers + limit_header)
-                r = connection.recv_response(str_query)
+                response = received[sitename]
+                if isinstance(response, Exception):
+                    raise response
+                # Without a response, e.g. after the site closed the connection, the
+                # connection handles the error like it does for a single site
+                r = connection.recv_response(str_query, received=response)
                 stillalive.append((sitename, site, connection))
                 if self.prepend_site:
                     for row in r:
@@ -934,6 +1000,51 @@ class MultiSiteConnection(Helpers):
         self.connections = stillalive
         return result
 
+    def _receive_responses(
+        self, connections: List[Tuple[SiteId, SingleSiteConnection]]
+    ) -> Dict[SiteId, Union[None, Tuple[bytes, bytes], Exception]]:
+        """Reads the responses of the sites in parallel
+
+        The result is the pair of response header and data for each site. It is
+        None for sites which failed to deliver the response and the exception
+        for sites which did not respond within the response timeout.
+        """
+        received: Dict[SiteId, Union[None, Tuple[bytes, bytes], Exception]] = {}
+        started = time.time()
+        deadline = None if self.response_timeout is None else started + self.response_timeout
+        with selectors.DefaultSelector() as selector:
+            for sitename, connection in connections:
+                if connection.socket is None:
+                    received[sitename] = None
+                    continue
+                connection.socket.setblocking(False)
+                selector.register(connection.socket, selectors.EVENT_READ,
+                                  _ResponseReader(sitename, connection.socket))
+
+            while selector.get_map():
+                timeout = None if deadline is None else max(0.0, deadline - time.time())
+                for key, _mask in selector.select(timeout):
+                    reader = key.data
+                    try:
+                        response = reader.read()
+                        if response is None:
+                            continue
+                    except (MKLivestatusSocketClosed, IOError):
+                        response = None
+                    selector.unregister(key.fileobj)
+                    received[reader.sitename] = response
+
+                if deadline is not None and time.time() >= deadline:
+                    for key in list(selector.get_map().values()):
+                        selector.unregister(key.fileobj)
+                        received[key.data.sitename] = MKLivestatusSocketError(
+                            "No response within %.1f seconds" % (deadline - started))
+
+        for sitename, connection in connections:
+            if connection.socket is not None:
+                connection.socket.setblocking(True)
+        return received
+
     # TODO: Is this SiteId(...) the way to go? Without this mypy complains about incompatible bytes
     # vs. Optional[SiteId]
     def command(self, command: AnyStr, sitename: Optional[SiteId] = SiteId("local")) -> None:
@@ -960,6 +1071,38 @@ class MultiSiteConnection(Helpers):
         raise KeyError("Connection does not exist")
 
 
+class _ResponseReader:
+    """Receives a response from a non-blocking socket, as far as data is available"""
+    def __init__(self, sitename: SiteId, sock: socket.socket) -> None:
+        super(_ResponseReader, self).__init__()
+        self.sitename = sitename
+        self._socket = sock
+        self._header = bytearray(16)
+        self._data: Optional[bytearray] = None
+        self._received = 0
+
+    def read(self) -> Optional[Tuple[bytes, bytes]]:
+        """Returns the response header and data once the response is complete"""
+        while True:
+            buf = self._header if self._data is None else self._data
+            if self._received == len(buf):
+                if self._data is not None:
+                    return self._header, self._data
+                # A malformed header is reported when the connection handles the response
+                self._data = bytearray(_response_length(self._header) or 0)
+                self._received = 0
+                continue
+
+            try:
+                length = self._socket.recv_into(memoryview(buf)[self._received:])
+            except (BlockingIOError, ssl.SSLWantReadError):
+                return None
+            if not length:
+                raise MKLivestatusSocketClosed(
+                    "Read zero data from socket, nagios server closed connection")
+            self._received += length
+
+
 #.
 #   .--LocalConn-----------------------------------------------------------.
 #   |            _                    _  ____                              |
@@ -90,6 +90,25 @@ TableEventConsoleStatus::TableEventConsoleStatus(MonitoringCore *mc)
                                       offsets));
     addColumn(ECRow::makeDoubleColumn("status_average_sync_time",
                                       "The average sync time", offsets));
+    addColumn(ECRow::makeDoubleColumn(
+        "status_average_queueing_time",
+        "The average time received messages wait for a processing thread",
+        offsets));
+    addColumn(ECRow::makeDoubleColumn(
+        "status_average_matching_time",
+        "The average time for parsing and rule matching of a message", offsets));
+    addColumn(ECRow::makeDoubleColumn(
+        "status_average_applying_time",
+        "The average time for applying a matched message to the event status",
+        offsets));
+    addColumn(ECRow::makeIntColumn(
+        "status_event_queue_length",
+        "The number of received chunks of messages waiting for processing",
+        offsets));
+    addColumn(ECRow::makeIntColumn(
+        "status_apply_queue_length",
+        "The number of processed chunks of messages waiting for being applied",
+        offsets));
     addColumn(ECRow::makeStringColumn(
         "status_replication_slavemode",
         "The replication slavemode (empty or one of sync/takeover)", offsets));
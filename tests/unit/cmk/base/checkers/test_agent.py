@@ -15,6 +15,7 @@ import pytest  # type: ignore[import]
 
 from testlib.base import Scenario
 
+from cmk.utils.encoding import ensure_str_with_fallback
 from cmk.utils.exceptions import MKTimeout
 from cmk.utils.type_defs import AgentRawData, AgentRawDataSection, result, SectionName, SourceType
 
@@ -24,7 +25,14 @@ from cmk.fetchers.cache import PersistedSections, SectionStore
 
 import cmk.base.config as config
 from cmk.base.checkers import Mode
-from cmk.base.checkers.agent import AgentParser, AgentSource, AgentSummarizer, HostSectionParser
+from cmk.base.checkers.agent import (
+    AgentOutputScanner,
+    AgentParser,
+    AgentSource,
+    AgentSummarizer,
+    PiggybackMarker,
+    SectionMarker,
+)
 from cmk.base.checkers.type_defs import NO_SELECTION
 from cmk.base.exceptions import MKAgentError, MKEmptyAgentData
 
@@ -250,7 +258,7 @@ class TestParser:
     )  # yapf: disable
     def test_section_header_options(self, headerline, section_name, section_options):
         try:
-            HostSectionParser.Header.from_headerline(
+            SectionMarker.from_headerline(
                 f"<<<{headerline}>>>".encode("ascii")) == (  # type: ignore[comparison-overlap]
                     section_name,
                     section_options,
@@ -259,7 +267,7 @@ class TestParser:
             assert section_name is None
 
     def test_section_header_options_decode_values(self):
-        section_header = HostSectionParser.Header.from_headerline(b"<<<" + b":".join((
+        section_header = SectionMarker.from_headerline(b"<<<" + b":".join((
             b"name",
             b"cached(1,2)",
             b"encoding(ascii)",
@@ -275,7 +283,7 @@ class TestParser:
         assert section_header.separator == "|"
 
     def test_section_header_options_decode_nothing(self):
-        section_header = HostSectionParser.Header.from_headerline(b"<<<name>>>")
+        section_header = SectionMarker.from_headerline(b"<<<name>>>")
         assert section_header.name == SectionName("name")
         assert section_header.cached is None
         assert section_header.encoding == "utf-8"
@@ -284,6 +292,107 @@ class TestParser:
         assert section_header.separator is None
 
 
+class TestAgentOutputScanner:
+    @pytest.fixture
+    def hostname(self):
+        return "testhost"
+
+    @pytest.fixture
+    def logger(self):
+        return logging.getLogger("test")
+
+    @pytest.fixture
+    def scenario(self, hostname, monkeypatch):
+        ts = Scenario()
+        ts.add_host(hostname)
+        ts.apply(monkeypatch)
+
+    @staticmethod
+    def parse_line_by_line(hostname, raw_data, logger):
+        """Reference implementation, examines every line of the agent output"""
+        sections, piggybacked_raw_data, section_info = {}, {}, set()
+        # In a host section (`header`), in a piggybacked section or in between
+        header, piggybacked_hostname = None, None
+        for line in raw_data.split(b"\n"):
+            if not line.strip():
+                continue
+            try:
+                if PiggybackMarker.is_header(line):
+                    hostname_ = PiggybackMarker.from_headerline(line, hostname).hostname
+                    if hostname_ != hostname:
+                        header, piggybacked_hostname = None, hostname_
+                    elif piggybacked_hostname is not None:
+                        piggybacked_hostname = None
+                elif piggybacked_hostname is not None:
+                    if PiggybackMarker.is_footer(line):
+                        piggybacked_hostname = None
+                    else:
+                        piggybacked_raw_data.setdefault(piggybacked_hostname, []).append(line)
+                elif SectionMarker.is_header(line):
+                    header = SectionMarker.from_headerline(line)
+                    sections.setdefault(header.name, [])
+                    section_info.add(header)
+                elif SectionMarker.is_footer(line):
+                    header = None
+                elif header is not None:
+                    if not header.nostrip:
+                        line = line.strip()
+                    sections[header.name].append(
+                        ensure_str_with_fallback(
+                            line,
+                            encoding=header.encoding,
+                            fallback="latin-1",
+                        ).split(header.separator))
+            except Exception:
+                logger.warning("Ignoring invalid raw section: %r" % line, exc_info=True)
+                header, piggybacked_hostname = None, None
+        return sections, piggybacked_raw_data, section_info
+
+    @pytest.mark.usefixtures("scenario")
+    @pytest.mark.parametrize("lines", [
+        (),
+        (b"no", b"header"),
+        (b"<<<a>>>", b"first line", b"  second  line  ", b"", b"<<<>>>", b"ignored"),
+        (b"<<<a:sep(124)>>>", b"1|2 3", b"<<<a>>>", b"4 5", b"<<<b:nostrip()>>>", b" 6 ", b"   "),
+        (b"<<<a:encoding(latin-1)>>>", b"\xe4", b"<<<b>>>", b"\xe4 \xc3\xa4"),
+        (b"<<<a:encoding(no such encoding)>>>", b"line", b"<<<<>>>>", b"<<<b>>>", b"line"),
+        (b"<<<a:cached(a,b)>>>", b"ignored", b"<<<b>>>", b"line"),
+        (b"<<<a>>>", b"line", b"<<<<testhost>>>>", b"still a", b"<<<<>>>>", b"also a"),
+        (b"<<<<piggy>>>>", b"<<<a>>>", b"line", b"<<<>>>", b"<<<<>>>>", b"nothing"),
+        (b"<<<<piggy>>>>", b"<<<a>>>", b"<<<<other piggy>>>>", b"x", b"<<<<testhost>>>>", b"y"),
+        (b"  <<<a>>>\r", b"line\r", b"<<<x>>> y", b"foo <<<b>>>", b"<<<<a>>>", b"<<<<>>>>>"),
+    ])
+    def test_same_as_line_by_line(self, hostname, logger, lines):
+        for raw_data in (b"\n".join(lines), b"\n".join(lines) + b"\n"):
+            sections, piggybacked_raw_data, section_info = self.parse_line_by_line(
+                hostname, raw_data, logger)
+
+            scanned = AgentOutputScanner(hostname, logger=logger).scan(AgentRawData(raw_data))
+
+            host_sections = scanned.host_sections()
+            assert host_sections.sections == sections
+            assert host_sections.piggybacked_raw_data == piggybacked_raw_data
+            assert scanned.section_info == section_info
+
+    def test_decode_on_access(self, hostname, logger):
+        raw_data = AgentRawData(b"\n".join((
+            b"<<<section>>>",
+            b"line",
+            b"<<<other>>>",
+            b"line",
+        )))
+
+        sections = AgentOutputScanner(hostname, logger=logger).scan(raw_data).sections
+
+        assert list(sections) == [SectionName("section"), SectionName("other")]
+        assert not sections.is_decoded(SectionName("section"))
+        assert not sections.is_decoded(SectionName("other"))
+
+        assert sections[SectionName("section")] == [["line"]]
+        assert sections.is_decoded(SectionName("section"))
+        assert not sections.is_decoded(SectionName("other"))
+
+
 class StubSummarizer(AgentSummarizer):
     def summarize_success(self, host_sections):
         return 0, "", []
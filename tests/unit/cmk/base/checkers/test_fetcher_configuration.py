@@ -12,6 +12,9 @@ import pytest  # type: ignore[import]
 from testlib.base import Scenario  # type: ignore[import]
 
 from cmk.fetchers import FetcherType
+from cmk.fetchers.controller import GlobalConfig
+
+import cmk.base.config as config
 
 from cmk.base.checkers import fetcher_configuration
 
@@ -70,3 +73,11 @@ def test_generates_correct_sections(file, hostname, tags, fetchers, monkeypatch)
     fetcher_configuration.dump(hostname, "1.2.3.4", file)
     file.seek(0)
     assert [FetcherType[f["fetcher_type"]] for f in json.load(file)["fetchers"]] == fetchers
+
+
+@pytest.mark.parametrize("concurrent_fetchers", [False, True])
+def test_dumps_global(concurrent_fetchers, monkeypatch):
+    monkeypatch.setattr(config, "concurrent_fetchers", concurrent_fetchers)
+    global_config = GlobalConfig.deserialize(json.loads(fetcher_configuration.dumps_global(5)))
+    assert global_config.cmc_log_level == 5
+    assert global_config.concurrent_fetchers is concurrent_fetchers
@@ -40,7 +40,12 @@ from cmk.base.checkers import (
     update_host_sections,
 )
 from cmk.base.checkers.agent import AgentHostSections
-from cmk.base.checkers.host_sections import HostKey, HostSections, MultiHostSections
+from cmk.base.checkers.host_sections import (
+    HostKey,
+    HostSections,
+    LazySections,
+    MultiHostSections,
+)
 from cmk.base.checkers.piggyback import PiggybackSource
 from cmk.base.checkers.programs import ProgramSource
 from cmk.base.checkers.snmp import SNMPSource
@@ -140,6 +145,70 @@ def test_abstract_hostsections_filter():
     assert list(filtered.piggybacked_raw_data) == ["bar"]
 
 
+def _decode_joined(chunks):
+    return [chunk.split() for chunk in b" ".join(chunks).decode().split(",")]
+
+
+def _lazy_sections(**raw_sections):
+    sections = LazySections(_decode_joined)
+    for name, chunks in raw_sections.items():
+        sections.add_raw(SectionName(name), chunks)
+    return sections
+
+
+def test_lazysections_decode_on_access():
+    sections = _lazy_sections(foo=[b"a b", b"c"], bar=[b"d"])
+
+    assert SectionName("foo") in sections
+    assert list(sections) == [SectionName("foo"), SectionName("bar")]
+    assert not sections.is_decoded(SectionName("foo"))
+
+    assert sections[SectionName("foo")] == [["a", "b", "c"]]
+    assert sections.is_decoded(SectionName("foo"))
+    assert not sections.is_decoded(SectionName("bar"))
+
+
+def test_lazysections_add_raw_to_decoded_section():
+    sections = _lazy_sections(foo=[b"a"])
+    assert sections[SectionName("foo")] == [["a"]]
+
+    sections.add_raw(SectionName("foo"), [b"b"])
+
+    assert sections[SectionName("foo")] == [["a"], ["b"]]
+
+
+def test_lazysections_extend_does_not_decode():
+    sections = _lazy_sections(foo=[b"a"])
+    sections.extend(_lazy_sections(foo=[b"b"], bar=[b"c"]))
+
+    assert not sections.is_decoded(SectionName("foo"))
+    assert not sections.is_decoded(SectionName("bar"))
+    assert dict(sections) == {
+        SectionName("foo"): [["a", "b"]],
+        SectionName("bar"): [["c"]],
+    }
+
+
+def test_lazysections_extend_with_plain_mapping():
+    sections = _lazy_sections(foo=[b"a"])
+    sections.extend({SectionName("foo"): [["b"]]})
+
+    assert sections[SectionName("foo")] == [["a"], ["b"]]
+
+
+def test_hostsections_filter_and_add_keep_sections_lazy():
+    host_sections: HostSections = HostSections(_lazy_sections(foo=[b"a"], bar=[b"b"]))
+
+    filtered = host_sections.filter({SectionName("bar")})
+    filtered.add(HostSections(_lazy_sections(bar=[b"c"])))
+
+    assert isinstance(filtered.sections, LazySections)
+    assert list(filtered.sections) == [SectionName("bar")]
+    assert not filtered.sections.is_decoded(SectionName("bar"))
+    assert filtered.sections[SectionName("bar")] == [["b", "c"]]
+    assert not host_sections.sections.is_decoded(SectionName("bar"))
+
+
 @pytest.mark.parametrize("node_section_content,expected_result", [
     ({}, None),
     ({
@@ -28,6 +28,7 @@ from cmk.base.discovered_labels import (
 @pytest.fixture(autouse=True)
 def autochecks_dir(monkeypatch, tmp_path):
     monkeypatch.setattr(cmk.utils.paths, "autochecks_dir", str(tmp_path))
+    monkeypatch.setattr(cmk.utils.paths, "tmp_dir", str(tmp_path / "tmp"))
 
 
 @pytest.fixture()
@@ -279,3 +280,58 @@ def test_save_autochecks_file(items, expected_content):
         content = f.read()
 
     assert expected_content == content
+
+
+def _write_autochecks(content):
+    Path(cmk.utils.paths.autochecks_dir, "host.mk").write_text(content)
+
+
+def test_raw_autochecks_cache(monkeypatch):
+    monkeypatch.setattr(autochecks, "_raw_autochecks_cache_stats", autochecks.collections.Counter())
+    path = Path(cmk.utils.paths.autochecks_dir, "host.mk")
+    _write_autochecks("[{'check_plugin_name': 'df', 'item': '/', 'parameters': {},"
+                      " 'service_labels': {}}]\n")
+
+    raw_autochecks = autochecks._load_raw_autochecks(path=path, check_variables=None)
+    assert autochecks._autochecks_cache_path_for("host").exists()
+
+    def eval_not_expected(**kwargs):
+        raise AssertionError("autochecks evaluated again")
+
+    with monkeypatch.context() as m:
+        m.setattr(autochecks, "_eval_raw_autochecks", eval_not_expected)
+        assert autochecks._load_raw_autochecks(path=path, check_variables=None) == raw_autochecks
+
+    assert autochecks._format_raw_autochecks_cache_stats() == (
+        "1 hits, 1 misses (hit rate: 50.0%)")
+
+
+def test_raw_autochecks_cache_invalidation(monkeypatch):
+    path = Path(cmk.utils.paths.autochecks_dir, "host.mk")
+    _write_autochecks("[{'check_plugin_name': 'df', 'item': '/', 'parameters': {},"
+                      " 'service_labels': {}}]\n")
+    assert autochecks._load_raw_autochecks(path=path, check_variables=None)[0]["item"] == "/"
+
+    autochecks.save_autochecks_file("host", [
+        Service(CheckPluginName("df"), "/opt", "Filesystem /opt", {}),
+    ])
+    assert autochecks._load_raw_autochecks(path=path, check_variables=None)[0]["item"] == "/opt"
+
+    # Other check variables
+    _write_autochecks("[{'check_plugin_name': 'df', 'item': '/', 'parameters': levels,"
+                      " 'service_labels': {}}]\n")
+    assert autochecks._load_raw_autochecks(
+        path=path, check_variables={"levels": (80.0, 90.0)})[0]["parameters"] == (80.0, 90.0)
+    assert autochecks._load_raw_autochecks(
+        path=path, check_variables={"levels": (1.0, 2.0)})[0]["parameters"] == (1.0, 2.0)
+
+
+def test_raw_autochecks_cache_invalid_content():
+    path = Path(cmk.utils.paths.autochecks_dir, "host.mk")
+    _write_autochecks("[{'check_plugin_name': 'df', 'item': '/', 'parameters': {},"
+                      " 'service_labels': {}}]\n")
+    cache_path = autochecks._autochecks_cache_path_for("host")
+    cache_path.parent.mkdir(parents=True)
+    cache_path.write_bytes(b"garbage")
+
+    assert autochecks._load_raw_autochecks(path=path, check_variables=None)[0]["item"] == "/"
@@ -4,6 +4,7 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import marshal
 from pathlib import Path
 
 import pytest  # type: ignore[import]
@@ -2038,12 +2039,12 @@ def test_save_packed_config(monkeypatch, serial):
 
     assert Path(cmk.utils.paths.core_helper_config_dir, serial,
                 "precompiled_check_config.mk").exists()
-    assert Path(cmk.utils.paths.core_helper_config_dir, serial,
-                "precompiled_check_config.mk.orig").exists()
+    assert not Path(cmk.utils.paths.core_helper_config_dir, serial,
+                    "precompiled_check_config.mk.orig").exists()
 
 
 def test_load_packed_config(serial):
-    config.PackedConfigStore(serial).write("abc = 1")
+    config.PackedConfigStore(serial).write({"abc": 1})
 
     assert "abc" not in config.__dict__
     config.load_packed_config(serial)
@@ -2074,21 +2075,46 @@ class TestPackedConfigStore:
     def test_write(self, store, serial):
         assert not Path(cmk.utils.paths.core_helper_config_dir, serial,
                         "precompiled_check_config.mk").exists()
-        assert not Path(cmk.utils.paths.core_helper_config_dir, serial,
-                        "precompiled_check_config.mk.orig").exists()
 
-        store.write("abc = 1\n")
+        store.write({"abc": 1})
 
         packed_file_path = Path(cmk.utils.paths.core_helper_config_dir, serial,
                                 "precompiled_check_config.mk")
         assert packed_file_path.exists()
-        assert Path(cmk.utils.paths.core_helper_config_dir, serial,
-                    "precompiled_check_config.mk.orig").exists()
 
         assert store.read() == {
             "abc": 1,
         }
 
+    def test_write_skips_unpackable_values(self, store):
+        store.write({
+            "abc": [("host", ["a", "b"], {
+                "x": 1.5
+            })],
+            "not_packable": lambda: None,
+            "plugin_name": CheckPluginName("uptime"),
+        })
+
+        assert store.read() == {
+            "abc": [("host", ["a", "b"], {
+                "x": 1.5
+            })],
+            "plugin_name": CheckPluginName("uptime"),
+        }
+
+    def test_read_compiled_code(self, store, serial):
+        # Packed configuration written by previous versions
+        packed_file_path = Path(cmk.utils.paths.core_helper_config_dir, serial,
+                                "precompiled_check_config.mk")
+        packed_file_path.parent.mkdir(parents=True, exist_ok=True)
+        with packed_file_path.open("wb") as f:
+            marshal.dump(compile("abc = 1\nxyz = [1, 2]\n", "<string>", "exec"), f)
+
+        assert store.read() == {
+            "abc": 1,
+            "xyz": [1, 2],
+        }
+
 
 @pytest.mark.parametrize("params, expected_result", [
     (
@@ -316,3 +316,69 @@ def test_compile_delayed_host_check(monkeypatch, serial):
     assert compiled_file.resolve() != source_file
     with compiled_file.open("rb") as f:
         assert f.read().startswith(importlib.util.MAGIC_NUMBER)
+
+
+def test_host_chunks_keep_order():
+    hostnames = ["host%02d" % i for i in range(10)]
+    chunks = core_config.host_chunks(hostnames, 2)
+    assert len(chunks) == 5
+    assert [h for chunk in chunks for h in chunk] == hostnames
+    assert core_config.host_chunks([], 2) == []
+    assert core_config.host_chunks(["a"], 4) == [["a"]]
+
+
+def test_add_host_chunk_result_renumbers_hostcheck_commands():
+    cfg = core_nagios.NagiosConfig(io.StringIO(), [])
+    cfg.hostcheck_commands_to_define.append(("check-mk-host-custom-1", "existing"))
+
+    chunk_cfg = core_nagios._NagiosConfigOfHostChunk(io.StringIO(), [])
+    command_name = chunk_cfg.next_hostcheck_command_name()
+    chunk_cfg.hostcheck_commands_to_define.append((command_name, "new"))
+
+    core_nagios._add_host_chunk_result(
+        cfg,
+        core_nagios._HostChunkResult(
+            config="  check_command\t%s\n" % command_name,
+            hostgroups_to_define={"hg"},
+            servicegroups_to_define=set(),
+            contactgroups_to_define=set(),
+            checknames_to_define=set(),
+            active_checks_to_define=set(),
+            custom_commands_to_define=set(),
+            hostcheck_commands_to_define=chunk_cfg.hostcheck_commands_to_define,
+        ))
+
+    assert cfg._outfile.getvalue() == "  check_command\tcheck-mk-host-custom-2\n"
+    assert cfg.hostcheck_commands_to_define == [
+        ("check-mk-host-custom-1", "existing"),
+        ("check-mk-host-custom-2", "new"),
+    ]
+    assert cfg.hostgroups_to_define == {"hg"}
+
+
+def test_create_nagios_config_hosts_parallel_is_identical(monkeypatch):
+    hostnames = ["host%02d" % i for i in range(12)]
+    ts = Scenario()
+    for hostname in hostnames:
+        ts.add_host(hostname)
+    ts.set_option("ipaddresses", {hostname: "127.0.0.1" for hostname in hostnames})
+    ts.set_option("host_check_commands", [
+        (("custom", "check_custom -H $HOSTADDRESS$"), [], hostnames[3:6]),
+        (("service", "CPU load"), [], hostnames[8:]),
+    ])
+    config_cache = ts.apply(monkeypatch)
+
+    def create(processes):
+        monkeypatch.setattr(config, "core_config_processes", processes)
+        cfg = core_nagios.NagiosConfig(io.StringIO(), hostnames)
+        core_nagios._create_nagios_config_hosts(cfg, config_cache, hostnames)
+        return cfg
+
+    serial_cfg = create(1)
+    parallel_cfg = create(3)
+
+    assert serial_cfg.hostcheck_commands_to_define
+    assert parallel_cfg._outfile.getvalue() == serial_cfg._outfile.getvalue()
+    assert parallel_cfg.hostcheck_commands_to_define == serial_cfg.hostcheck_commands_to_define
+    assert parallel_cfg.hostgroups_to_define == serial_cfg.hostgroups_to_define
+    assert parallel_cfg.custom_commands_to_define == serial_cfg.custom_commands_to_define
@@ -5,8 +5,12 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 # pylint: disable=protected-access
+import os
+
 import pytest  # type: ignore[import]
 
+import cmk.utils.store as store
+
 from cmk.base import item_state
 
 
@@ -68,3 +72,91 @@ def test_get_average(ini_zero, backlog_min, timeseries):
             initialize_zero=ini_zero,
         )
         assert avg == expected_average, "at [%r]: got %r expected %r" % (idx, avg, expected_average)
+
+
+@pytest.fixture(name="counters_dir")
+def fixture_counters_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr("cmk.utils.paths.counters_dir", str(tmp_path))
+    yield tmp_path
+    store.release_all_locks()
+
+
+def _make_item_states(num_services):
+    return {("if", "%d" % num, "in_octets"): (1600000000.0 + num, 123456789 * num)
+            for num in range(num_services)}
+
+
+def test_save_and_load_binary(counters_dir):
+    states = item_state.CachedItemStates()
+    states.load("heute")
+    assert states.get_all_item_states() == {}
+
+    states.set_item_state_prefix(("cpu", None))
+    states.set_item_state("util", (42.0, 23))
+    states.set_item_state("inf", float("inf"))
+    states.save("heute")
+
+    assert (counters_dir / "heute").read_bytes().startswith(item_state._BINARY_MAGIC)
+
+    states = item_state.CachedItemStates()
+    states.load("heute")
+    assert states.get_all_item_states() == {
+        ("cpu", None, "util"): (42.0, 23),
+        ("cpu", None, "inf"): float("inf"),
+    }
+
+
+def test_load_migrates_literal_format(counters_dir):
+    store.save_object_to_file(str(counters_dir / "heute"), {("cpu", None, "util"): (42.0, 23)})
+
+    states = item_state.CachedItemStates()
+    states.load("heute")
+    assert states.get_all_item_states() == {("cpu", None, "util"): (42.0, 23)}
+
+    states.set_item_state_prefix(("cpu", None))
+    states.set_item_state("util", (43.0, 24))
+    states.save("heute")
+
+    assert (counters_dir / "heute").read_bytes().startswith(item_state._BINARY_MAGIC)
+    assert item_state._load_item_states(str(counters_dir / "heute")) == {
+        ("cpu", None, "util"): (43.0, 24),
+    }
+
+
+def test_save_falls_back_to_literal_format(counters_dir):
+    class Str(str):
+        pass
+
+    item_state._save_item_states(str(counters_dir / "heute"), {("cpu", None, "x"): Str("y")})
+
+    assert store.load_object_from_file(str(counters_dir / "heute")) == {("cpu", None, "x"): "y"}
+
+
+def test_save_merges_changed_keys_only(counters_dir):
+    item_state._save_item_states(str(counters_dir / "heute"), {
+        ("a", None, "keep"): 1,
+        ("a", None, "update"): 2,
+        ("a", None, "remove"): 3,
+    })
+    states = item_state.CachedItemStates()
+    states.load("heute")
+    states.set_item_state_prefix(("a", None))
+    states.set_item_state("update", 20)
+    states.clear_item_state("remove")
+
+    # Modified by someone else in the meantime
+    item_state._save_item_states(str(counters_dir / "heute"), {
+        ("a", None, "keep"): 10,
+        ("a", None, "update"): 2,
+        ("a", None, "remove"): 3,
+        ("b", None, "new"): 4,
+    })
+    os.utime(str(counters_dir / "heute"), (0, 0))
+    states.save("heute")
+
+    assert item_state._load_item_states(str(counters_dir / "heute")) == {
+        ("a", None, "keep"): 10,
+        ("a", None, "update"): 20,
+        ("b", None, "new"): 4,
+    }
+
@@ -4,11 +4,22 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import json
 import math
+import os
+import random
 import time
+from pathlib import Path
 from pprint import pprint
+
+import numpy as np  # type: ignore[import]
 import pytest  # type: ignore[import]
 
+import cmk.utils.paths
+import cmk.utils.prediction
+from cmk.utils.exceptions import MKGeneralException
+from cmk.utils.prediction import TimeSeries
+
 from cmk.base import prediction
 from testlib import on_time
 
@@ -120,3 +131,231 @@ def test_time_slices(utcdate, timezone, horizon, period_info, timegroup, result)
     ])
 def test_data_stats(slices, result):
     assert prediction._data_stats(slices) == result
+
+
+def _data_stats_reference(slices):
+    # The former pure Python implementation of prediction._data_stats
+    descriptors = []
+    for time_column in zip(*slices):
+        point_line = [x for x in time_column if x is not None]
+        if not point_line:
+            descriptors.append([None, None, None, None])
+            continue
+        average = sum(point_line) / float(len(point_line))
+        samples = len(point_line)
+        if samples == 1:
+            std_dev = abs(average)
+        else:
+            std_dev = math.sqrt(
+                abs(sum(p**2 for p in point_line) - average**2 * samples) / float(samples - 1))
+        descriptors.append([average, min(point_line), max(point_line), std_dev])
+    return descriptors
+
+
+def _random_slices(num_slices, num_points, gap_ratio=0.1):
+    rng = random.Random(42)
+    return [[None if rng.random() < gap_ratio else rng.uniform(0, 100)
+             for _ in range(num_points)]
+            for _ in range(num_slices)]
+
+
+def _assert_data_stats_equal(data_stats, reference):
+    assert len(data_stats) == len(reference)
+    for descriptor, reference_descriptor in zip(data_stats, reference):
+        if reference_descriptor[0] is None:
+            assert descriptor == reference_descriptor
+        else:
+            assert descriptor == pytest.approx(reference_descriptor, rel=1e-9, abs=1e-9)
+
+
+@pytest.mark.parametrize("num_slices, gap_ratio", [(1, 0.0), (1, 0.5), (4, 0.3), (7, 0.9)])
+def test_data_stats_equals_reference(num_slices, gap_ratio):
+    slices = _random_slices(num_slices, 500, gap_ratio)
+    _assert_data_stats_equal(prediction._data_stats(slices), _data_stats_reference(slices))
+
+
+def test_data_stats_of_arrays():
+    slices = [[1, 5, None, 6], [2, None, 2, 4]]
+    assert prediction._data_stats([np.array(s, dtype=float) for s in slices
+                                  ]) == prediction._data_stats(slices)
+
+
+def test_data_stats_truncates_to_shortest_slice():
+    assert prediction._data_stats([[1, 2, 3], [3, 4]]) == [
+        [2.0, 1, 3, pytest.approx(math.sqrt(2))],
+        [3.0, 2, 4, pytest.approx(math.sqrt(2))],
+    ]
+    assert prediction._data_stats([]) == []
+
+
+def test_calculate_data_for_prediction():
+    step = 300
+    rrd_data = {
+        # The youngest slice has the finest resolution
+        (1000000, 1086400): TimeSeries(_random_slices(1, 288)[0], (1000000, 1086400, step)),
+        (913600, 1000000): TimeSeries(_random_slices(1, 144, 0.3)[0], (913600, 1000000, 2 * step)),
+    }
+    data_for_prediction = prediction._calculate_data_for_prediction(
+        list(rrd_data), lambda time_ranges: [rrd_data[r] for r in time_ranges])
+
+    upsampled = [
+        rrd_data[(1000000, 1086400)].values,
+        rrd_data[(913600, 1000000)].bfill_upsample((1000000, 1086400, step), 86400),
+    ]
+    assert data_for_prediction["num_points"] == 288
+    assert data_for_prediction["data_twindow"] == [1000000, 1086400]
+    assert data_for_prediction["step"] == step
+    _assert_data_stats_equal(
+        json.loads(json.dumps(data_for_prediction["points"])),
+        _data_stats_reference(upsampled),
+    )
+
+
+def test_data_stats_of_upsampled_series():
+    # One slice per week for a horizon of 90 days with a resolution of one minute
+    slices = _random_slices(13, 1440)
+    series = [TimeSeries(s, (0, 1440 * 60, 60)) for s in slices]
+
+    _assert_data_stats_equal(
+        prediction._data_stats([s.bfill_upsample_array((0, 1440 * 60, 60), 0) for s in series]),
+        _data_stats_reference([s.values for s in series]),
+    )
+
+
+@pytest.fixture(name="rrd_queries")
+def fixture_rrd_queries(monkeypatch, tmp_path):
+    monkeypatch.setattr(cmk.utils.paths, "var_dir", str(tmp_path))
+    queries = []
+
+    def get_rrd_data_of_time_ranges(hostname, service_description, varnames, cf, time_ranges):
+        queries.append((hostname, service_description, list(varnames)))
+        step = 3600
+        return {
+            varname: [
+                TimeSeries([float(i)] * ((end - start) // step), (start, end, step))
+                for i, (start, end) in enumerate(time_ranges)
+            ] for varname in varnames
+        }
+
+    monkeypatch.setattr(cmk.utils.prediction, "get_rrd_data_of_time_ranges",
+                        get_rrd_data_of_time_ranges)
+    return queries
+
+
+_PARAMS = {
+    "period": "hour",
+    "horizon": 3,
+    "levels_upper": ("absolute", (1.0, 2.0)),
+}
+
+
+def _write_prediction_info(hostname, service_description, dsname, info, last_use=0):
+    pred_dir = Path(cmk.utils.prediction.predictions_dir(hostname, service_description, dsname))
+    pred_dir.mkdir(parents=True)
+    with (pred_dir / "everyday.info").open("w") as f:
+        json.dump(info, f)
+    last_use_file = pred_dir / ".last_use"
+    last_use_file.touch()
+    os.utime(str(last_use_file), (time.time() - last_use,) * 2)
+
+
+def _prediction_info(hostname, service_description, dsname, age, params=None):
+    return {
+        "time": int(time.time()) - age,
+        "cf": "MAX",
+        "dsname": dsname,
+        "slice": 86400,
+        "params": json.loads(json.dumps(params or _PARAMS)),
+        "host_name": hostname,
+        "service_description": service_description,
+    }
+
+
+def test_get_levels_saves_service_of_prediction(rrd_queries):
+    prediction.get_levels("heute", "CPU load", "load15", _PARAMS, "MAX")
+    assert rrd_queries == [("heute", "CPU load", ["load15"])]
+    assert prediction._is_used(
+        Path(cmk.utils.prediction.predictions_dir("heute", "CPU load", "load15")), _PARAMS,
+        int(time.time()))
+
+    pred_file = Path(cmk.utils.prediction.predictions_dir("heute", "CPU load", "load15"),
+                     "everyday")
+    info = json.loads(pred_file.with_suffix(".info").read_text())
+    assert info["host_name"] == "heute"
+    assert info["service_description"] == "CPU load"
+    assert json.loads(pred_file.read_text())["num_points"] == 24
+    # No temporary files are left
+    assert sorted(path.name for path in pred_file.parent.iterdir()) == [
+        ".last_use", ".lock", "everyday", "everyday.info"
+    ]
+
+    # The prediction is up to date now
+    prediction.get_levels("heute", "CPU load", "load15", _PARAMS, "MAX")
+    assert len(rrd_queries) == 1
+
+
+def test_update_predictions(rrd_queries):
+    for dsname in ["in", "out"]:
+        _write_prediction_info("heute", "Interface 1", dsname,
+                               _prediction_info("heute", "Interface 1", dsname, 2 * 86400))
+    _write_prediction_info("heute", "CPU load", "load15",
+                           _prediction_info("heute", "CPU load", "load15", 60))
+    old_info = _prediction_info("heute", "Memory", "mem_used", 2 * 86400)
+    del old_info["host_name"], old_info["service_description"]
+    _write_prediction_info("heute", "Memory", "mem_used", old_info)
+    # Not used by a check for more than a day, e.g. of a removed service
+    removed_info = _prediction_info("heute", "Removed", "load15", 2 * 86400)
+    _write_prediction_info("heute", "Removed", "load15", removed_info, last_use=2 * 86400)
+
+    result = prediction.update_predictions(processes=2)
+
+    assert result.metrics == 3
+    assert result.refreshed == 2
+    assert result.failed == 0
+    assert result.skipped == 1
+    assert result.unused == 1
+    # Both metrics of the interface are fetched with one query
+    assert rrd_queries == [("heute", "Interface 1", ["in", "out"])]
+
+    for dsname in ["in", "out"]:
+        assert prediction._is_prediction_up_to_date(
+            os.path.join(cmk.utils.prediction.predictions_dir("heute", "Interface 1", dsname),
+                         "everyday"), "everyday", _PARAMS, time.time())
+
+    # Nothing left to do
+    assert prediction.update_predictions().refreshed == 0
+    assert len(rrd_queries) == 1
+
+
+def test_update_predictions_ahead_of_timegroup_change(rrd_queries, monkeypatch):
+    params = dict(_PARAMS, period="wday", horizon=14)
+    _write_prediction_info("heute", "CPU load", "load15",
+                           _prediction_info("heute", "CPU load", "load15", 60, params))
+    next_start = prediction._get_prediction_timegroup(int(time.time()),
+                                                      prediction._PREDICTION_PERIODS["wday"])[2]
+
+    monkeypatch.setattr(time, "time", lambda: next_start - 1800.0)
+    result = prediction.update_predictions()
+    # The predictions of the current and of the next weekday
+    assert result.refreshed == 2
+    assert len(rrd_queries) == 2
+
+    # The first check of the next weekday uses the prediction computed in advance
+    monkeypatch.setattr(time, "time", lambda: next_start + 60.0)
+    prediction.get_levels("heute", "CPU load", "load15", params, "MAX")
+    assert len(rrd_queries) == 2
+
+
+def test_update_predictions_failure(rrd_queries, monkeypatch):
+    _write_prediction_info("heute", "CPU load", "load15",
+                           _prediction_info("heute", "CPU load", "load15", 2 * 86400))
+
+    def get_rrd_data_of_time_ranges(*args):
+        raise MKGeneralException("Cannot get historic metrics via Livestatus")
+
+    monkeypatch.setattr(cmk.utils.prediction, "get_rrd_data_of_time_ranges",
+                        get_rrd_data_of_time_ranges)
+
+    result = prediction.update_predictions()
+    assert result.refreshed == 0
+    assert result.failed == 1
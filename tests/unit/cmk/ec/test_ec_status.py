@@ -147,3 +147,202 @@ def test_mkevent_check_query_perf(config, event_status, status_server):
     assert "event_id" in response[0]
 
     assert duration < 0.2
+
+
+def _rule(rule_id, **kwargs):
+    rule = {
+        "id": rule_id,
+        "state": 2,
+        "sl": {
+            "value": 0,
+            "precedence": "message"
+        },
+        "actions": [],
+        "autodelete": False,
+        "contact_groups": None,
+    }
+    rule.update(kwargs)
+    return rule
+
+
+def test_process_received_messages(monkeypatch, event_server, event_status):
+    monkeypatch.setattr(event_server, "_add_core_host_to_new_event", lambda event: None)
+    event_server.compile_rules([], [{
+        "id": "skipped",
+        "disabled": False,
+        "rules": [
+            _rule("skip", match="noise", drop="skip_pack"),
+            _rule("noise", match="noise"),
+        ],
+    }, {
+        "id": "pack",
+        "disabled": False,
+        "rules": [
+            _rule("drop", match="drop me", drop=True),
+            _rule("crit", match="failed"),
+        ],
+    }])
+
+    matched = event_server._process_received(
+        ("lines", b"<78>Jan 21 10:00:00 host1 app: disk failed\n"
+         b"<78>Jan 21 10:00:01 host1 app: drop me\n"
+         b"<78>Jan 21 10:00:02 host2 app: noise failed\n", None))
+    assert [rule_match.rule["id"] for _event, rule_match, _duration in matched
+           ] == ["crit", "drop", "crit"]
+    assert [[rule["id"] for rule in rule_match.skip_pack_hits]
+            for _event, rule_match, _duration in matched] == [[], [], ["skip"]]
+    assert not event_status.events()
+
+    event_server._apply_processed(matched)
+    assert [(event["host"], event["text"], event["rule_id"]) for event in event_status.events()
+           ] == [("host1", "disk failed", "crit"), ("host2", "noise failed", "crit")]
+    assert event_status._rule_stats == {"skip": 1, "drop": 1, "crit": 2}
+
+
+def test_save_and_load_status(tmp_path, config, perfcounters, history, event_server):
+    settings = ec.settings('1.2.3i45', tmp_path, tmp_path / "etc", ['mkeventd'])
+    settings.paths.status_file.value.parent.mkdir(parents=True)
+    event_status = cmk.ec.main.EventStatus(settings, config, perfcounters, history,
+                                           logging.getLogger("cmk.mkeventd.EventStatus"))
+    for num in range(3):
+        event_status.new_event(
+            CMKEventConsole.new_event({
+                "host": "host-%d" % num,
+                "text": "text %d" % num,
+                "core_host": "host-%d" % num,
+            }))
+    event_status.save_status()
+
+    event_status.events()[0]["phase"] = "ack"
+    event_status.remove_event(event_status.events()[1])
+    event_status.count_rule_match("rule")
+    event_status.save_status()
+    assert settings.paths.status_journal_file.value.stat().st_size > 0
+
+    loaded = cmk.ec.main.EventStatus(settings, config, perfcounters, history,
+                                     logging.getLogger("cmk.mkeventd.EventStatus"))
+    loaded.load_status(event_server)
+    assert loaded.pack_status() == event_status.pack_status()
+    assert loaded.num_existing_events == 2
+
+
+def _query_history(status_server, *filters):
+    s = FakeStatusSocket(b"\n".join([b"GET history"] + [b"Filter: " + f for f in filters]))
+    status_server.handle_client(s, True, "127.0.0.1")
+    header, *rows = s.get_response()
+    # Without the index, the lines are numbered after grepping them
+    return [dict(zip(header[1:], row[1:])) for row in rows]
+
+
+@pytest.fixture(name="history_dir")
+def fixture_history_dir(tmp_path, monkeypatch, history):
+    settings = ec.settings('1.2.3i45', tmp_path, tmp_path / "etc", ['mkeventd'])
+    monkeypatch.setattr(history, "_settings", settings)
+    for number in range(30):
+        history.add(
+            {
+                "id": number,
+                "host": "host%d" % (number % 3),
+                "rule_id": "rule%d" % (number % 2),
+                "text": "Text %d" % number,
+            }, "NEW")
+    return settings.paths.history_dir.value
+
+
+@pytest.mark.parametrize("filters", [
+    [b"event_host = host1"],
+    [b"event_id = 7"],
+    [b"event_host in host0 host2", b"event_rule_id = rule1"],
+    [b"event_host ~ ^HOST1$", b"event_text ~ 1"],
+    [b"event_rule_id ~ 1$", b"event_id in 1 2 3", b"history_time > 0"],
+    [b"history_time > 0"],
+    [b"event_host = unknown"],
+])
+def test_history_index(history_dir, status_server, filters):
+    indexed = _query_history(status_server, *filters)
+    for path in history_dir.glob("*.idx"):
+        path.unlink()
+    assert indexed == _query_history(status_server, *filters)
+
+
+def test_history_index_line_numbers(history_dir, status_server):
+    s = FakeStatusSocket(b"GET history\nColumns: history_line event_id\nFilter: event_host = host1")
+    status_server.handle_client(s, True, "127.0.0.1")
+    assert s.get_response()[1:] == [[30 - event_id, event_id] for event_id in range(28, 0, -3)]
+
+
+def test_history_index_incomplete(history_dir, history, status_server):
+    expected = _query_history(status_server, b"event_host = host1")
+    assert [row["event_id"] for row in expected] == list(range(28, 0, -3))
+
+    # The lines missing in the index are read, a torn index line is ignored
+    path, = history_dir.glob("*.idx")
+    index = path.read_bytes()
+    path.write_bytes(index[:len(index) // 2])
+    assert _query_history(status_server, b"event_host = host1") == expected
+
+    # An index which doesn't fit the history file is not used at all
+    path.write_bytes(b"1000000\t10\t" + index.split(b"\t", 2)[2])
+    assert _query_history(status_server, b"event_host = host1") == expected
+
+    history.add({"id": 30, "host": "host1"}, "NEW")
+    (index,) = history_dir.glob("*.idx")
+    assert len(index.read_bytes().splitlines()) == 31
+    assert [row["event_id"] for row in _query_history(status_server, b"event_host = host1")
+           ] == [30] + [row["event_id"] for row in expected]
+
+
+def test_history_index_lost_line(history_dir, history, status_server, monkeypatch):
+    expected = _query_history(status_server, b"event_host = host1")
+
+    # A crash between writing the history line and the index line
+    with monkeypatch.context() as m:
+        m.setattr(cmk.ec.history, "_add_index_line", lambda *args: None)
+        history.add({"id": 30, "host": "host1"}, "NEW")
+    history.add({"id": 31, "host": "host1"}, "NEW")
+    assert [row["event_id"] for row in _query_history(status_server, b"event_host = host1")
+           ] == [31, 30] + [row["event_id"] for row in expected]
+
+
+def test_history_index_end_not_read_again(history_dir, history, status_server, monkeypatch):
+    expected = _query_history(status_server, b"event_host = host1")
+
+    def indexed_end(path):
+        raise AssertionError("index read again")
+
+    monkeypatch.setattr(cmk.ec.history, "indexed_end", indexed_end)
+    history.add({"id": 30, "host": "host1"}, "NEW")
+    (index,) = history_dir.glob("*.idx")
+    assert len(index.read_bytes().splitlines()) == 31
+    assert [row["event_id"] for row in _query_history(status_server, b"event_host = host1")
+           ] == [30] + [row["event_id"] for row in expected]
+
+
+def test_history_index_expired(history_dir, history):
+    assert len(list(history_dir.glob("*.idx"))) == 1
+    history.flush()
+    assert not list(history_dir.iterdir())
+
+
+@pytest.mark.parametrize("content", [
+    b"",
+    b"\n",
+    b"a\n",
+    b"a",
+    b"a\nbc\n\ndef\n",
+    b"a\nbc\n\ndef",
+    b"".join(b"line %d\n" % number for number in range(100)),
+])
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_history_lines_reversed(tmp_path, monkeypatch, content, use_mmap):
+    def mmap_not_possible(*args, **kwargs):
+        raise OSError("mmap not supported")
+
+    if not use_mmap:
+        monkeypatch.setattr(cmk.ec.history.mmap, "mmap", mmap_not_possible)
+        monkeypatch.setattr(cmk.ec.history, "_REVERSE_BLOCK_SIZE", 3)
+    path = tmp_path / "history.log"
+    path.write_bytes(content)
+    with path.open("rb") as f:
+        lines = list(cmk.ec.history._lines_reversed(f))
+    assert lines == content.splitlines(keepends=True)[::-1]
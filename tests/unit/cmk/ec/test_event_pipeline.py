@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import logging
+import random
+import threading
+import time
+
+from cmk.ec.main import Perfcounters
+from cmk.ec.pipeline import EventPipeline
+
+logger = logging.getLogger("cmk.mkeventd")
+
+
+def _pipeline(process, apply, num_workers=3, queue_len=5):
+    return EventPipeline(logger, Perfcounters(logger), num_workers, queue_len, process, apply)
+
+
+def test_pipeline_applies_results_in_order():
+    rnd = random.Random(42)
+    delays = [rnd.random() / 1000 for _unused in range(200)]
+    workers = set()
+    applied = []
+
+    def process(item):
+        workers.add(threading.current_thread().name)
+        time.sleep(delays[item])
+        return item * 2
+
+    pipeline = _pipeline(process, applied.append)
+    pipeline.start()
+    for item in range(200):
+        pipeline.put(item)
+    pipeline.stop()
+
+    assert applied == [item * 2 for item in range(200)]
+    assert len(workers) > 1
+
+
+def test_pipeline_skips_failing_items():
+    applied = []
+
+    def process(item):
+        if item == 1:
+            raise ValueError("broken")
+        return item
+
+    def apply(result):
+        if result == 3:
+            raise ValueError("broken")
+        applied.append(result)
+
+    pipeline = _pipeline(process, apply, num_workers=1)
+    pipeline.start()
+    for item in range(5):
+        pipeline.put(item)
+    pipeline.stop()
+
+    assert applied == [0, 2, 4]
+
+
+def test_pipeline_statistics():
+    perfcounters = Perfcounters(logger)
+    applying = threading.Event()
+    pipeline = EventPipeline(logger, perfcounters, 1, 10, lambda item: item,
+                             lambda result: applying.wait())
+    pipeline.start()
+    for item in range(3):
+        pipeline.put(item)
+    applying.set()
+    pipeline.stop()
+
+    status = dict(zip([name for name, _default in perfcounters.status_columns()],
+                      perfcounters.get_status()))
+    assert status["status_event_queue_length"] == 0
+    assert status["status_apply_queue_length"] == 0
+    assert status["status_average_queueing_time"] > 0.0
@@ -110,6 +110,8 @@ def test_perfcounters_correct_status_values():
     for _x in range(2):
         c.count("rule_tries")
 
+    c.set_gauge("event_queue_length", 3)
+
     for column_name, column_value in zip([n for n, _d in c.status_columns()], c.get_status()):
         if column_name.startswith("status_average_") and column_name.endswith("_time"):
             counter_name = column_name.split("_")[-2]
@@ -123,6 +125,10 @@ def test_perfcounters_correct_status_values():
             counter_name = column_name.split("_")[-2]
             assert column_value == c._rates.get(counter_name, 0.0)
 
+        elif column_name.startswith("status_") and column_name.endswith("_length"):
+            gauge_name = "_".join(column_name.split("_")[1:])
+            assert column_value == c._gauges[gauge_name]
+
         elif column_name.startswith("status_"):
             counter_name = "_".join(column_name.split("_")[1:])
             assert column_value == c._counters[counter_name], "Invalid value %r: %r" % (
@@ -130,3 +136,6 @@ def test_perfcounters_correct_status_values():
 
         else:
             raise NotImplementedError()
+
+    assert dict(zip([n for n, _d in c.status_columns()],
+                    c.get_status()))["status_event_queue_length"] == 3
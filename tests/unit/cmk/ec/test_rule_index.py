@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import itertools
+import logging
+import random
+
+import pytest  # type: ignore[import]
+
+from cmk.ec.main import EventServer, RuleMatcher
+from cmk.ec.rule_index import pattern_literals, required_texts, RuleIndex
+
+
+@pytest.mark.parametrize("pattern, prefix, infixes", [
+    ("^web", "web", ["web"]),
+    ("^Web\\d+\\.example", "web", ["web", ".example"]),
+    ("foo.*bar", "", ["foo", "bar"]),
+    ("^a*b", "", ["b"]),
+    ("^ab+c", "ab", ["ab", "c"]),
+    ("^(x)abc", "", ["abc"]),
+    ("[a-z]+xyz{2,3}q", "", ["xy", "q"]),
+    ("abc\\.de", "", ["abc.de"]),
+    ("(?P<name>a|b)cd", "", ["cd"]),
+    ("s[ä]ure", "", ["s", "ure"]),
+    ("säure", "", []),
+])
+def test_pattern_literals(pattern, prefix, infixes):
+    literals = pattern_literals(pattern)
+    assert literals is not None
+    assert literals.prefix == prefix
+    assert literals.infixes == infixes
+
+
+@pytest.mark.parametrize("pattern", [
+    "foo|bar",
+    "(?i)abc",
+    "\\x41bc",
+    "a{|b}",
+    "(abc",
+    "[abc",
+])
+def test_pattern_literals_not_analyzable(pattern):
+    assert pattern_literals(pattern) is None
+
+
+def _compile(rule):
+    rule = rule.copy()
+    for key in ["match", "match_ok", "match_host", "match_application", "cancel_application"]:
+        if key in rule:
+            value = EventServer._compile_matching_value(key, rule[key])
+            if value is None:
+                del rule[key]
+            else:
+                rule[key] = value
+    return rule
+
+
+def test_required_texts():
+    assert required_texts(_compile({
+        "match": "Disk (.*) failed",
+        "match_host": "^db.*prod$",
+        "match_application": "kernel",
+    })) == (("text", " failed"), ("application", "kernel"), ("host", "prod"))
+
+
+@pytest.mark.parametrize("rule", [
+    {
+        "match": "Disk failed",
+        "match_ok": "Disk ok",
+    },
+    {
+        "match_application": "kernel",
+        "cancel_application": "init",
+    },
+    {
+        "match": "Disk failed",
+        "invert_matching": True
+    },
+])
+def test_required_texts_of_canceling_rules(rule):
+    assert required_texts(_compile(rule)) == ()
+
+
+_HOSTS = ["web01", "WEB02", "db01", "db01.prod", "mail", "Kmail", "Kmail", "ſmtp", ""]
+_TEXTS = [
+    "Disk /var failed", "disk OK", "Link down on eth0", "link UP", "Backup of db01 done",
+    "Kernel panic", "ſegfault in proc", "",
+]
+_APPLICATIONS = ["kernel", "sshd", "cron", "KERNEL", "Kernel", ""]
+
+_HOST_PATTERNS = ["web01", "^web", "^WEB0\\d", "^db01\\.", "mail$", "^k", "^s", "prod", ".*"]
+_TEXT_PATTERNS = [
+    "disk", "Disk (.*) failed", "link (down|up)", "^link", "backup of (\\S+)", "kernel",
+    "segfault", "OK$", "failed|done",
+]
+_APPLICATION_PATTERNS = ["kernel", "^ssh", "cron|sshd", "k"]
+
+
+def _random_rule(rnd, pack, number):
+    rule = {"id": "rule%d" % number, "pack": pack, "state": 0}
+    if rnd.random() < 0.7:
+        rule["match"] = rnd.choice(_TEXT_PATTERNS)
+    if rnd.random() < 0.2:
+        rule["match_ok"] = rnd.choice(_TEXT_PATTERNS)
+    if rnd.random() < 0.6:
+        rule["match_host"] = rnd.choice(_HOST_PATTERNS)
+    if rnd.random() < 0.4:
+        rule["match_application"] = rnd.choice(_APPLICATION_PATTERNS)
+    if rnd.random() < 0.1:
+        rule["cancel_application"] = rnd.choice(_APPLICATION_PATTERNS)
+    if rnd.random() < 0.1:
+        rule["invert_matching"] = True
+    return _compile(rule)
+
+
+def test_rule_index_keeps_all_matching_rules():
+    rnd = random.Random(4711)
+    matcher = RuleMatcher(logging.getLogger("cmk.mkeventd"), {"debug_rules": False})
+    rules = [_random_rule(rnd, "pack%d" % (number // 10), number) for number in range(200)]
+    rule_index = RuleIndex({1: {3: rules}})
+    positions = {id(rule): position for position, rule in enumerate(rules)}
+
+    for host, text, application in itertools.product(_HOSTS, _TEXTS, _APPLICATIONS):
+        event = {
+            "facility": 1,
+            "priority": 3,
+            "host": host,
+            "text": text,
+            "application": application,
+            "ipaddress": "127.0.0.1",
+        }
+        candidates = rule_index.candidates(event)
+        candidate_positions = [positions[id(rule)] for rule, _texts in candidates]
+        assert candidate_positions == sorted(candidate_positions)
+
+        remaining = {
+            id(rule) for rule, texts in candidates if rule_index.has_required_texts(texts, event)
+        }
+        for rule in rules:
+            result = matcher.event_rule_matches_non_inverted(rule, event)
+            if rule.get("invert_matching"):
+                result = not result
+            if result:
+                assert id(rule) in remaining, (rule, event)
+
+
+def test_rule_index_statistics():
+    rules = [
+        _compile({
+            "id": "a",
+            "match_host": "web01"
+        }),
+        _compile({
+            "id": "b",
+            "match_host": "^db"
+        }),
+        _compile({
+            "id": "c",
+            "match": "failed"
+        }),
+    ]
+    rule_index = RuleIndex({1: {3: rules}})
+    event = {"facility": 1, "priority": 3, "host": "web01", "text": "disk ok"}
+
+    for _unused in range(2):
+        candidates = rule_index.candidates(event)
+        assert [rule["id"] for rule, _texts in candidates] == ["a", "c"]
+        assert [rule_index.has_required_texts(texts, event) for _rule, texts in candidates
+               ] == [True, False]
+    assert rule_index.candidates({"facility": 2, "priority": 3, "host": "web01"}) == []
+
+    stats = rule_index.statistics()
+    assert stats.events == 3
+    assert stats.rules_of_facility_priority == 6
+    assert stats.rules_of_host == 4
+    assert stats.skipped == {"text": 2}
+    assert stats.cache.hits == 1
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import copy
+import logging
+
+import pytest  # type: ignore[import]
+
+import cmk.ec.status_store as status_store
+from cmk.ec.status_store import StatusStore
+
+logger = logging.getLogger("cmk.mkeventd")
+
+
+@pytest.fixture(name="paths")
+def fixture_paths(tmp_path):
+    return tmp_path / "status", tmp_path / "status.journal"
+
+
+def _store(paths):
+    return StatusStore(paths[0], paths[1], logger)
+
+
+def _event(event_id, **kwargs):
+    event = {
+        "id": event_id,
+        "host": "host%d" % event_id,
+        "text": "text %d" % event_id,
+        "phase": "open",
+        "count": 1,
+        "match_groups": ("a",),
+    }
+    event.update(kwargs)
+    return event
+
+
+def _status(events, next_event_id=None, rule_stats=None):
+    return {
+        "next_event_id": next_event_id or max([e["id"] for e in events] + [0]) + 1,
+        "events": events,
+        "rule_stats": rule_stats or {},
+        "interval_starts": {},
+    }
+
+
+def _changes():
+    """A series of status changes, the snapshot of every step is returned"""
+    status = _status([_event(1), _event(2)], rule_stats={"r": 2})
+    yield copy.deepcopy(status)
+
+    status["events"].append(_event(3))
+    status["next_event_id"] = 4
+    yield copy.deepcopy(status)
+
+    status["events"][0]["phase"] = "ack"
+    status["events"][0]["count"] = 5
+    status["rule_stats"]["r"] += 1
+    yield copy.deepcopy(status)
+
+    del status["events"][1]
+    status["interval_starts"]["r"] = 1234
+    yield copy.deepcopy(status)
+
+    status["events"].append(_event(4, text=u"Ümlaut"))
+    status["next_event_id"] = 5
+    yield copy.deepcopy(status)
+
+
+def test_load_nothing_saved(paths):
+    assert _store(paths).load() is None
+
+
+def test_save_and_load(paths):
+    store = _store(paths)
+    for status in _changes():
+        store.save(copy.deepcopy(status))
+        assert _store(paths).load() == status
+
+    # Everything after the initial snapshot has been journaled
+    assert paths[1].stat().st_size > 0
+
+
+def test_save_without_changes(paths):
+    store = _store(paths)
+    status = _status([_event(1)])
+    store.save(status)
+    store.save(status)
+    assert paths[1].stat().st_size == 0
+
+
+def test_continue_after_load(paths):
+    saved = list(_changes())
+    store = _store(paths)
+    for status in saved[:3]:
+        store.save(copy.deepcopy(status))
+
+    store = _store(paths)
+    store.load()
+    for status in saved[3:]:
+        store.save(copy.deepcopy(status))
+    assert _store(paths).load() == saved[-1]
+
+
+def test_load_repr_status(paths):
+    status = _status([_event(1), _event(2)])
+    del status["interval_starts"]
+    paths[0].write_text(repr(status) + "\n")
+
+    loaded = _store(paths).load()
+    assert loaded is not None
+    assert loaded["events"] == status["events"]
+    assert loaded["interval_starts"] == {}
+
+
+def test_invalidate_writes_snapshot(paths):
+    store = _store(paths)
+    saved = list(_changes())
+    for status in saved[:2]:
+        store.save(copy.deepcopy(status))
+    assert paths[1].stat().st_size > 0
+
+    store.invalidate()
+    store.save(copy.deepcopy(saved[2]))
+    assert paths[1].stat().st_size == 0
+    assert _store(paths).load() == saved[2]
+
+
+def test_compaction(paths, monkeypatch):
+    monkeypatch.setattr(status_store, "_MIN_COMPACTION_SIZE", 0)
+    store = _store(paths)
+    status = _status([_event(number) for number in range(1, 11)])
+    store.save(status)
+    snapshot_size = paths[0].stat().st_size
+
+    for number in range(1, 11):
+        status["events"][number - 1]["text"] = "x" * 100
+        store.save(status)
+        if paths[1].stat().st_size == 0:
+            break
+    else:
+        raise AssertionError("Journal has not been compacted")
+    assert paths[0].stat().st_size > snapshot_size
+    assert _store(paths).load() == status
+
+
+def test_crash_while_appending(paths):
+    """Every incomplete record is dropped, the previous state is loaded"""
+    saved = list(_changes())
+    store = _store(paths)
+    for status in saved[:-1]:
+        store.save(copy.deepcopy(status))
+    complete = paths[1].read_bytes()
+    store.save(copy.deepcopy(saved[-1]))
+    journal = paths[1].read_bytes()
+    assert len(journal) > len(complete)
+
+    for length in range(len(complete), len(journal)):
+        paths[1].write_bytes(journal[:length])
+        assert _store(paths).load() == saved[-2], "torn at %d" % length
+
+        # The incomplete record is truncated, following saves can be loaded
+        assert paths[1].read_bytes() == complete
+        store = _store(paths)
+        store.load()
+        store.save(copy.deepcopy(saved[-1]))
+        assert _store(paths).load() == saved[-1]
+
+
+def test_corrupted_record(paths):
+    saved = list(_changes())
+    store = _store(paths)
+    for status in saved:
+        store.save(copy.deepcopy(status))
+
+    journal = bytearray(paths[1].read_bytes())
+    journal[-1] ^= 0xff
+    paths[1].write_bytes(bytes(journal))
+    assert _store(paths).load() == saved[-2]
+
+
+def test_crash_between_snapshot_and_journal_reset(paths):
+    """The records already contained in the snapshot are not replayed again"""
+    saved = list(_changes())
+    store = _store(paths)
+    for status in saved[:-1]:
+        store.save(copy.deepcopy(status))
+    journal = paths[1].read_bytes()
+    assert journal
+
+    store.invalidate()
+    store.save(copy.deepcopy(saved[-1]))
+    # The old journal is still there when the crash happened before emptying it
+    paths[1].write_bytes(journal)
+    assert _store(paths).load() == saved[-1]
+
+
+def test_crash_while_writing_snapshot(paths):
+    """The incomplete new snapshot is ignored"""
+    saved = list(_changes())
+    store = _store(paths)
+    for status in saved:
+        store.save(copy.deepcopy(status))
+    paths[0].with_name("status.new").write_bytes(b"CMKECSTATUS\x01\nincomplete")
+    assert _store(paths).load() == saved[-1]
+
+
+def test_failed_append_writes_snapshot(paths, monkeypatch):
+    saved = list(_changes())
+    store = _store(paths)
+    store.save(copy.deepcopy(saved[0]))
+
+    def broken_fsync(fd):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(status_store.os, "fsync", broken_fsync)
+    with pytest.raises(OSError):
+        store.save(copy.deepcopy(saved[1]))
+    monkeypatch.undo()
+
+    store.save(copy.deepcopy(saved[2]))
+    assert paths[1].stat().st_size == 0
+    assert _store(paths).load() == saved[2]
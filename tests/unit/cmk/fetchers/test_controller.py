@@ -4,13 +4,18 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import json
 import logging
+import threading
+import time
 
 import pytest  # type: ignore[import]
 
+from cmk.utils.cpu_tracking import CPUTracker, Snapshot, times_result
 from cmk.utils.paths import core_helper_config_dir
 from cmk.utils.type_defs import ConfigSerial
 
+import cmk.fetchers.controller as controller
 from cmk.fetchers import FetcherType
 from cmk.fetchers.controller import (
     GlobalConfig,
@@ -19,7 +24,7 @@ from cmk.fetchers.controller import (
     run_fetcher,
     write_bytes,
 )
-from cmk.fetchers.protocol import CMCMessage
+from cmk.fetchers.protocol import CMCMessage, PayloadType
 from cmk.fetchers.snmp import SNMPPluginStore
 from cmk.fetchers.type_defs import Mode
 
@@ -32,6 +37,15 @@ class TestGlobalConfig:
     def test_deserialization(self, global_config):
         assert GlobalConfig.deserialize(global_config.serialize()) == global_config
 
+    def test_concurrent_fetchers_default_off(self, global_config):
+        serialized = global_config.serialize()
+        del serialized["fetcher_config"]["concurrent_fetchers"]
+        assert GlobalConfig.deserialize(serialized).concurrent_fetchers is False
+
+    def test_concurrent_fetchers_deserialization(self, global_config):
+        global_config = global_config._replace(concurrent_fetchers=True)
+        assert GlobalConfig.deserialize(global_config.serialize()) == global_config
+
 
 class TestControllerApi:
     def test_controller_log(self):
@@ -77,3 +91,79 @@ class TestControllerApi:
         captured = capfdbinary.readouterr()
         assert captured.out == b"123"
         assert captured.err == b""
+
+
+class TestConcurrentFetchers:
+    @pytest.fixture
+    def fetchers(self):
+        # No "fetcher_params": every fetcher fails immediately with an error message.
+        return [{"fetcher_type": name} for name in ("TCP", "SNMP", "PROGRAM", "PIGGYBACK")]
+
+    def test_same_order_as_sequential(self, fetchers):
+        sequential = controller._run_fetchers_sequentially("host", fetchers, Mode.CHECKING, 10)
+        concurrent = controller._run_fetchers_concurrently("host", fetchers, Mode.CHECKING, 10)
+        assert [msg.header.fetcher_type for msg in concurrent] == [
+            msg.header.fetcher_type for msg in sequential
+        ] == [FetcherType.TCP, FetcherType.SNMP, FetcherType.PROGRAM, FetcherType.PIGGYBACK]
+        assert bytes(CMCMessage.result_answer(*concurrent)) == bytes(
+            CMCMessage.result_answer(*sequential))
+
+    def test_slow_fetcher_does_not_block_the_others(self, monkeypatch, fetchers):
+        run_fetcher_orig = controller.run_fetcher
+
+        def run_fetcher_slow_program(entry, mode, **kwargs):
+            if entry["fetcher_type"] == "PROGRAM":
+                time.sleep(5)
+            return run_fetcher_orig(entry, mode, **kwargs)
+
+        monkeypatch.setattr(controller, "run_fetcher", run_fetcher_slow_program)
+        monkeypatch.setattr(controller, "_abandoned_threads", [])
+
+        messages = controller._run_fetchers_concurrently("host", fetchers, Mode.CHECKING, 1)
+
+        assert [msg.header.fetcher_type for msg in messages] == [
+            FetcherType.TCP, FetcherType.SNMP, FetcherType.PROGRAM, FetcherType.PIGGYBACK
+        ]
+        assert all(msg.header.payload_type is PayloadType.ERROR for msg in messages)
+        assert [msg.header.status for msg in messages] == [
+            logging.CRITICAL, logging.CRITICAL, logging.ERROR, logging.CRITICAL
+        ]
+        assert type(messages[2].raw_data.error).__name__ == "MKTimeout"
+        assert len(controller._abandoned_threads) == 1
+        assert not controller._abandoned_threads[0].is_set()
+
+    def test_sequential_with_too_many_abandoned_threads(self, monkeypatch, tmp_path, fetchers):
+        file_name = tmp_path / "host.json"
+        file_name.write_text(json.dumps({"fetchers": fetchers}))
+        monkeypatch.setattr(controller, "write_bytes", lambda data: None)
+        monkeypatch.setattr(controller, "_run_fetchers_concurrently", None)
+
+        done = threading.Event()
+        monkeypatch.setattr(controller, "_abandoned_threads", [done])
+        monkeypatch.setattr(controller, "_MAX_ABANDONED_THREADS", 1)
+        controller._run_fetchers_from_file("host", file_name, Mode.CHECKING, 10, concurrent=True)
+
+        done.set()
+        assert not controller._too_many_abandoned_threads()
+        assert controller._abandoned_threads == []
+
+    def test_only_wall_time(self, monkeypatch, fetchers):
+        class FakeTracker(CPUTracker):
+            duration = Snapshot(times_result((1.0, 2.0, 3.0, 4.0, 5.0)))
+
+        monkeypatch.setattr(controller, "CPUTracker", FakeTracker)
+        for entry in fetchers:
+            entry["fetcher_params"] = {}
+
+        durations = [
+            msg.stats.duration
+            for msg in controller._run_fetchers_concurrently("host", fetchers, Mode.CHECKING, 10)
+        ]
+        assert durations == 4 * [Snapshot(times_result((0.0, 0.0, 0.0, 0.0, 5.0)))]
+
+        message = controller.run_fetcher(fetchers[0], Mode.CHECKING)
+        assert message.stats.duration == FakeTracker.duration
+
+    def test_unknown_fetcher_type(self):
+        with pytest.raises(RuntimeError):
+            controller._run_fetchers_concurrently("host", [{"trash": 1}], Mode.CHECKING, 10)
@@ -7,8 +7,10 @@
 import json
 import os
 import socket
+import threading
 from abc import ABC, abstractmethod
 from collections import namedtuple
+from contextlib import suppress
 from pathlib import Path
 from typing import Optional
 
@@ -40,7 +42,7 @@ from cmk.fetchers.snmp import (
     SNMPPluginStore,
     SNMPPluginStoreItem,
 )
-from cmk.fetchers.tcp import TCPFetcher
+from cmk.fetchers.tcp import fetch_concurrently, TCPFetcher
 from cmk.fetchers.type_defs import Mode
 
 SensorReading = namedtuple(
@@ -380,6 +382,7 @@ class ABCTestSNMPFetcher(ABC):
             sections={},
             on_error="raise",
             missing_sys_description=False,
+            detection_cache_ttl=0,
             do_status_data_inventory=False,
             snmp_config=SNMPHostConfig(
                 is_ipv6_primary=False,
@@ -406,6 +409,7 @@ class ABCTestSNMPFetcher(ABC):
             sections={},
             on_error="raise",
             missing_sys_description=False,
+            detection_cache_ttl=0,
             do_status_data_inventory=False,
             snmp_config=SNMPHostConfig(
                 is_ipv6_primary=False,
@@ -433,6 +437,7 @@ class ABCTestSNMPFetcher(ABC):
             sections={},
             on_error="raise",
             missing_sys_description=False,
+            detection_cache_ttl=0,
             do_status_data_inventory=False,
             snmp_config=SNMPHostConfig(
                 is_ipv6_primary=False,
@@ -483,6 +488,7 @@ class TestSNMPFetcherDeserialization(ABCTestSNMPFetcher):
         assert other.checking_sections == fetcher.checking_sections
         assert other.on_error == fetcher.on_error
         assert other.missing_sys_description == fetcher.missing_sys_description
+        assert other.detection_cache_ttl == fetcher.detection_cache_ttl
         assert other.snmp_config == fetcher.snmp_config
         assert other.snmp_config.snmp_backend == SNMPBackend.classic
 
@@ -554,6 +560,12 @@ class TestSNMPFetcherFetch(ABCTestSNMPFetcher):
         )
         assert fetcher.fetch(Mode.DISCOVERY) == result.OK({})
 
+    def test_close_closes_backend(self, monkeypatch, fetcher):
+        closed = []
+        monkeypatch.setattr(fetcher._backend, "close", lambda: closed.append(True))
+        fetcher.close()
+        assert closed == [True]
+
 
 class TestSNMPFetcherFetchCache(ABCTestSNMPFetcher):
     @pytest.fixture
@@ -668,6 +680,114 @@ class TestTCPFetcher:
             fetcher._decrypt(output)
 
 
+class TestTCPFetcherAsync:
+    @pytest.fixture
+    def agent_output(self):
+        return AgentRawData(b"<<<check_mk>>>\nVersion: 1.7.0\n" * 1000)
+
+    @pytest.fixture
+    def agent_address(self, agent_output):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen(16)
+
+        def serve():
+            while True:
+                try:
+                    conn, _addr = server.accept()
+                except OSError:
+                    return
+                with conn, suppress(OSError):
+                    # The fetchers using the cache close the connection without reading.
+                    conn.sendall(agent_output)
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        yield server.getsockname()
+        server.close()
+
+    @pytest.fixture
+    def file_cache(self):
+        return StubFileCache(
+            path=Path(os.devnull),
+            max_age=0,
+            disabled=False,
+            use_outdated=False,
+            simulation=False,
+        )
+
+    def make_fetcher(self, file_cache, address, use_only_cache=False):
+        return TCPFetcher(
+            file_cache,
+            family=socket.AF_INET,
+            address=address,
+            timeout=5.0,
+            encryption_settings={"use_regular": "allow"},
+            use_only_cache=use_only_cache,
+        )
+
+    def test_fetch_concurrently(self, agent_output, agent_address, file_cache):
+        fetchers = [self.make_fetcher(file_cache, agent_address) for _ in range(20)]
+
+        fetched = fetch_concurrently([(fetcher, Mode.CHECKING) for fetcher in fetchers],
+                                     max_concurrency=4)
+
+        assert [raw_data for raw_data, _duration in fetched] == 20 * [result.OK(agent_output)]
+        assert file_cache.cache == agent_output
+
+    def test_fetch_concurrently_keeps_order_and_errors(self, agent_output, agent_address,
+                                                       file_cache):
+        fetched = fetch_concurrently([
+            (self.make_fetcher(file_cache, agent_address, use_only_cache=True), Mode.CHECKING),
+            (self.make_fetcher(file_cache, agent_address), Mode.CHECKING),
+        ])
+
+        assert fetched[0][0].is_error()
+        assert isinstance(fetched[0][0].error, MKFetcherError)
+        assert fetched[1][0] == result.OK(agent_output)
+
+    @pytest.fixture
+    def refused_address(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        address = sock.getsockname()
+        sock.close()
+        return address
+
+    def test_fetch_async_connection_refused(self, refused_address, file_cache):
+        ((raw_data, _duration),) = fetch_concurrently([
+            (self.make_fetcher(file_cache, refused_address), Mode.CHECKING),
+        ])
+
+        assert raw_data.is_error()
+        assert isinstance(raw_data.error, MKFetcherError)
+        assert str(raw_data.error).startswith("Communication failed")
+
+    def test_fetch_async_uses_cache(self, agent_address, file_cache):
+        file_cache.cache = AgentRawData(b"cached_section")
+        fetcher = self.make_fetcher(file_cache, agent_address)
+
+        ((raw_data, _duration),) = fetch_concurrently([(fetcher, Mode.DISCOVERY)])
+
+        assert raw_data == result.OK(b"cached_section")
+
+    def test_fetch_async_connects_before_using_cache(self, refused_address, file_cache):
+        file_cache.cache = AgentRawData(b"cached_section")
+        fetcher = self.make_fetcher(file_cache, refused_address)
+
+        ((raw_data, _duration),) = fetch_concurrently([(fetcher, Mode.DISCOVERY)])
+
+        # As with `with fetcher: fetcher.fetch(mode)`
+        assert raw_data.is_error()
+        assert isinstance(raw_data.error, MKFetcherError)
+        with pytest.raises(MKFetcherError):
+            with fetcher:
+                pass
+
+    def test_fetch_concurrently_nothing_to_do(self):
+        assert fetch_concurrently([]) == []
+
+
 class StubFileCache(DefaultAgentFileCache):
     """Holds the data to be cached in-memory for testing"""
     def __init__(self, *args, **kwargs):
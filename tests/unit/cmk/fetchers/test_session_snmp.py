@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import bisect
+import threading
+
+import pytest  # type: ignore[import]
+
+from pysnmp.carrier.asyncore.dgram import udp  # type: ignore[import]
+from pysnmp.entity import config, engine  # type: ignore[import]
+from pysnmp.entity.rfc3413 import cmdrsp, context  # type: ignore[import]
+from pysnmp.proto import rfc1902, rfc1905  # type: ignore[import]
+from pysnmp.smi import instrum  # type: ignore[import]
+
+from cmk.utils.exceptions import MKSNMPError
+from cmk.utils.log import logger
+
+from cmk.snmplib.type_defs import SNMPBackend, SNMPHostConfig
+
+import cmk.fetchers.factory as factory
+from cmk.fetchers.snmp_backend.session import SessionSNMPBackend
+
+# The walk served by the agent
+WALK = [
+    ("1.3.6.1.2.1.1.1.0", rfc1902.OctetString(b"Linux sw1 4.19")),
+    ("1.3.6.1.2.1.1.2.0", rfc1902.ObjectIdentifier("1.3.6.1.4.1.8072.3.2.10")),
+    ("1.3.6.1.2.1.1.3.0", rfc1902.TimeTicks(123456)),
+    ("1.3.6.1.2.1.2.2.1.1.1", rfc1902.Integer(1)),
+    ("1.3.6.1.2.1.2.2.1.1.2", rfc1902.Integer(2)),
+    ("1.3.6.1.2.1.2.2.1.6.1", rfc1902.OctetString(b"\xb2\xe0},M\x15")),
+    ("1.3.6.1.2.1.2.2.1.6.2", rfc1902.OctetString(b"")),
+    ("1.3.6.1.2.1.2.2.1.10.1", rfc1902.Counter32(4294967295)),
+    ("1.3.6.1.2.1.2.2.1.10.2", rfc1902.Counter32(0)),
+    ("1.3.6.1.2.1.4.20.1.1.10.0.0.1", rfc1902.IpAddress("10.0.0.1")),
+    ("1.3.6.1.2.1.31.1.1.1.6.1", rfc1902.Counter64(2**64 - 1)),
+]
+
+
+class _WalkInstrumController(instrum.AbstractMibInstrumController):
+    def __init__(self, walk):
+        super().__init__()
+        self._oids = [rfc1902.ObjectName(oid) for oid, _value in walk]
+        self._values = dict(zip(self._oids, [value for _oid, value in walk]))
+
+    def readVars(self, varBinds, acInfo=(None, None)):
+        return [(oid, self._values.get(oid, rfc1905.noSuchInstance)) for oid, _value in varBinds]
+
+    def readNextVars(self, varBinds, acInfo=(None, None)):
+        result = []
+        for oid, _value in varBinds:
+            index = bisect.bisect_right(self._oids, oid)
+            if index < len(self._oids):
+                result.append((self._oids[index], self._values[self._oids[index]]))
+            else:
+                result.append((oid, rfc1905.endOfMibView))
+        return result
+
+
+@pytest.fixture(name="agent_port", scope="module")
+def fixture_agent_port():
+    """An SNMP agent in a thread, serving the stored walk"""
+    snmp_engine = engine.SnmpEngine()
+    transport = udp.UdpTransport().openServerMode(("127.0.0.1", 0))
+    config.addTransport(snmp_engine, udp.domainName, transport)
+    config.addV1System(snmp_engine, "agent", "public")
+    config.addVacmUser(snmp_engine, 1, "agent", "noAuthNoPriv", (1, 3, 6))
+    config.addVacmUser(snmp_engine, 2, "agent", "noAuthNoPriv", (1, 3, 6))
+    snmp_context = context.SnmpContext(snmp_engine)
+    snmp_context.unregisterContextName(b"")
+    snmp_context.registerContextName(b"", _WalkInstrumController(WALK))
+    for responder in (cmdrsp.GetCommandResponder, cmdrsp.NextCommandResponder,
+                      cmdrsp.BulkCommandResponder):
+        responder(snmp_engine, snmp_context)
+
+    snmp_engine.transportDispatcher.jobStarted(1)
+    thread = threading.Thread(target=snmp_engine.transportDispatcher.runDispatcher, daemon=True)
+    thread.start()
+    yield transport.socket.getsockname()[1]
+    snmp_engine.transportDispatcher.jobFinished(1)
+    thread.join()
+    snmp_engine.transportDispatcher.closeDispatcher()
+
+
+def _snmp_config(port, **kwargs):
+    snmp_config = SNMPHostConfig(
+        is_ipv6_primary=False,
+        hostname="sw1",
+        ipaddress="127.0.0.1",
+        credentials="public",
+        port=port,
+        is_bulkwalk_host=False,
+        is_snmpv2or3_without_bulkwalk_host=False,
+        bulk_walk_size_of=3,
+        timing={
+            "timeout": 1,
+            "retries": 1
+        },
+        oid_range_limits=[],
+        snmpv3_contexts=[],
+        character_encoding=None,
+        is_usewalk_host=False,
+        snmp_backend=SNMPBackend.session,
+    )
+    return snmp_config._replace(**kwargs)
+
+
+def test_factory_snmp_backend_session():
+    assert isinstance(factory.backend(_snmp_config(161), logger), SessionSNMPBackend)
+
+
+@pytest.fixture(name="backend", params=["v1", "v2c", "bulk"])
+def fixture_backend(request, agent_port):
+    return SessionSNMPBackend(
+        _snmp_config(
+            agent_port,
+            is_bulkwalk_host=request.param == "bulk",
+            is_snmpv2or3_without_bulkwalk_host=request.param == "v2c",
+        ), logger)
+
+
+def test_walk(backend):
+    assert backend.walk(".1.3.6.1.2.1.2.2.1") == [
+        (".1.3.6.1.2.1.2.2.1.1.1", b"1"),
+        (".1.3.6.1.2.1.2.2.1.1.2", b"2"),
+        (".1.3.6.1.2.1.2.2.1.6.1", b"\xb2\xe0},M\x15"),
+        (".1.3.6.1.2.1.2.2.1.6.2", b""),
+        (".1.3.6.1.2.1.2.2.1.10.1", b"4294967295"),
+        (".1.3.6.1.2.1.2.2.1.10.2", b"0"),
+    ]
+
+
+def test_walk_types(backend):
+    assert backend.walk(".1.3.6.1.2.1.1") == [
+        (".1.3.6.1.2.1.1.1.0", b"Linux sw1 4.19"),
+        (".1.3.6.1.2.1.1.2.0", b".1.3.6.1.4.1.8072.3.2.10"),
+        (".1.3.6.1.2.1.1.3.0", b"123456"),
+    ]
+    assert backend.walk(".1.3.6.1.2.1.4.20.1.1") == [(".1.3.6.1.2.1.4.20.1.1.10.0.0.1",
+                                                       b"10.0.0.1")]
+
+
+def test_walk_scalar(backend):
+    assert backend.walk(".1.3.6.1.2.1.1.1.0") == [(".1.3.6.1.2.1.1.1.0", b"Linux sw1 4.19")]
+
+
+def test_walk_missing(backend):
+    assert backend.walk(".1.3.6.1.2.1.3") == []
+    assert backend.walk(".1.3.6.1.4.1") == []
+
+
+def test_get(backend):
+    assert backend.get(".1.3.6.1.2.1.1.1.0") == b"Linux sw1 4.19"
+    assert backend.get(".1.3.6.1.2.1.1.4.0") is None
+
+
+def test_getnext(backend):
+    assert backend.get(".1.3.6.1.2.1.1.2.*") == b".1.3.6.1.4.1.8072.3.2.10"
+    assert backend.get(".1.3.6.1.2.1.5.*") is None
+
+
+def test_session_is_kept(backend):
+    backend.walk(".1.3.6.1.2.1.1")
+    session = backend.session
+    backend.walk(".1.3.6.1.2.1.2")
+    assert backend.session is session
+
+
+def test_close(backend):
+    backend.walk(".1.3.6.1.2.1.1")
+    socket = backend.session.engine.transportDispatcher.getTransport(
+        udp.domainName).socket
+    backend.close()
+    assert socket.fileno() == -1
+    backend.close()
+
+    # A new session is opened for further requests
+    assert backend.get(".1.3.6.1.2.1.1.1.0") == b"Linux sw1 4.19"
+
+
+def test_timeout(agent_port):
+    backend = SessionSNMPBackend(_snmp_config(agent_port, credentials="wrong"), logger)
+    backend.config.timing.update(timeout=0.1, retries=0)
+    with pytest.raises(MKSNMPError, match="No SNMP response"):
+        backend.walk(".1.3.6.1.2.1.1")
+
+
+def test_walk_columns(backend, monkeypatch):
+    oids = [
+        ".1.3.6.1.2.1.2.2.1.1",
+        ".1.3.6.1.2.1.2.2.1.6",
+        ".1.3.6.1.2.1.2.2.1.10",
+        ".1.3.6.1.2.1.1.1.0",
+        ".1.3.6.1.2.1.3",
+    ]
+    expected = [backend.walk(oid) for oid in oids]
+
+    requests = []
+    send = backend._send
+    monkeypatch.setattr(backend, "_send",
+                        lambda *args, **kwargs: requests.append(args) or send(*args, **kwargs))
+    assert backend.walk_columns(oids) == expected
+    # GETNEXT: One request per row and one more to notice the end of the columns. GETBULK
+    # gets all rows with the first request. The scalar and the missing column are requested
+    # with a single GET. SNMPv1 agents fail it because of the missing one, so it is repeated.
+    if backend.config.is_bulkwalk_host:
+        assert len(requests) == 2
+    elif backend.config.is_snmpv2or3_without_bulkwalk_host:
+        assert len(requests) == 4
+    else:
+        assert len(requests) == 5
+
+
+def test_get_many(backend, monkeypatch):
+    oids = [
+        ".1.3.6.1.2.1.1.1.0",
+        ".1.3.6.1.2.1.1.4.0",
+        ".1.3.6.1.2.1.1.2.*",
+        ".1.3.6.1.2.1.2.2.1.10.1",
+    ]
+    expected = [backend.get(oid) for oid in oids]
+    assert expected[1] is None
+
+    requests = []
+    send = backend._send
+    monkeypatch.setattr(backend, "_send",
+                        lambda *args, **kwargs: requests.append(args) or send(*args, **kwargs))
+    assert backend.get_many(oids) == expected
+    # One GETNEXT and one GET, which is repeated by SNMPv1 because of the missing OID
+    if backend.config.is_bulkwalk_host or backend.config.is_snmpv2or3_without_bulkwalk_host:
+        assert len(requests) == 2
+    else:
+        assert len(requests) == 3
@@ -4,10 +4,18 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import logging
+
 import pytest  # type: ignore[import]
 
+import cmk.utils.paths
+from cmk.utils.exceptions import MKSNMPError
+
+from cmk.snmplib.type_defs import SNMPBackend, SNMPHostConfig
+
 import cmk.fetchers.snmp_backend._utils as utils
 from cmk.fetchers.snmp_backend import StoredWalkSNMPBackend
+from cmk.fetchers.snmp_backend.stored_walk import cleanup_walk_indexes
 
 
 @pytest.mark.parametrize("value,expected", [
@@ -20,15 +28,82 @@ def test_strip_snmp_value(value, expected):
     assert utils.strip_snmp_value(value) == expected
 
 
-class TestStoredWalkSNMPBackend:
-    @pytest.mark.parametrize("a, b, result", [
-        ("1.2.3", "1.2.3", 0),
-        ("1.2.3", ".1.2.3", 0),
-        (".1.2.3", "1.2.3", 0),
-        (".1.2.3", ".1.2.3", 0),
-        ("1.2.3", "1.2.3.4", 0),
-        ("1.2.3.4", "1.2.3", 1),
-        ("1.2.3", "4.5.6", -1),
-    ])
-    def test_compare_oids(self, a, b, result):
-        assert StoredWalkSNMPBackend._compare_oids(a, b) == result
+WALK = """\
+.1.3.6.1.2.1.1.1.0 Linux sw1 4.19
+.1.3.6.1.2.1.1.5.0 "sw1"
+.1.3.6.1.2.1.2.2.1.10.1 4294967295
+.1.3.6.1.2.1.2.2.1.2.1 "lo"
+.1.3.6.1.2.1.2.2.1.2.2 eth0
+second line of the value
+.1.3.6.1.2.1.2.2.1.2.10 "eth8"
+.1.3.6.1.2.1.2.2.1.6.1 "B2 E0 7D 2C 4D 15 "
+.1.3.6.1.2.1.2.2.1.6.2
+"""
+
+
+class TestStoredWalkIndex:
+    @pytest.fixture(name="backend")
+    def fixture_backend(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(cmk.utils.paths, "snmpwalks_dir", str(tmp_path / "walks"))
+        monkeypatch.setattr(cmk.utils.paths, "snmpwalk_index_dir", tmp_path / "index")
+        (tmp_path / "walks").mkdir()
+        (tmp_path / "walks" / "sw1").write_text(WALK)
+        yield StoredWalkSNMPBackend(SNMPHostConfig(
+            is_ipv6_primary=False,
+            hostname="sw1",
+            ipaddress="127.0.0.1",
+            credentials="public",
+            port=161,
+            is_bulkwalk_host=False,
+            is_snmpv2or3_without_bulkwalk_host=False,
+            bulk_walk_size_of=10,
+            timing={},
+            oid_range_limits=[],
+            snmpv3_contexts=[],
+            character_encoding=None,
+            is_usewalk_host=True,
+            snmp_backend=SNMPBackend.classic,
+        ),
+                                    logger=logging.getLogger("test"))
+        cleanup_walk_indexes()
+
+    def test_walk(self, backend):
+        # Sorted numerically, the continuation line of a value is ignored
+        assert backend.walk(".1.3.6.1.2.1.2.2.1.2") == [
+            (".1.3.6.1.2.1.2.2.1.2.1", b"lo"),
+            (".1.3.6.1.2.1.2.2.1.2.2", b"eth0"),
+            (".1.3.6.1.2.1.2.2.1.2.10", b"eth8"),
+        ]
+        assert backend.walk(".1.3.6.1.2.1.2.2.1.6") == [
+            (".1.3.6.1.2.1.2.2.1.6.1", b"\xb2\xe0},M\x15"),
+            (".1.3.6.1.2.1.2.2.1.6.2", b""),
+        ]
+        assert backend.walk(".1.3.6.1.2.1.2.2.1.1") == []
+        assert backend.walk(".1.3.6.1.2.1.2.2.1.2.1") == [(".1.3.6.1.2.1.2.2.1.2.1", b"lo")]
+
+    def test_get(self, backend):
+        assert backend.get(".1.3.6.1.2.1.1.1.0") == b"Linux sw1 4.19"
+        assert backend.get(".1.3.6.1.2.1.1.2.0") is None
+        assert backend.get(".1.3.6.1.2.1.1.*") == b"Linux sw1 4.19"
+        assert backend.get(".1.3.6.1.2.1.1.1.0.*") is None
+
+    def test_no_walk_file(self, backend):
+        with pytest.raises(MKSNMPError, match="No snmpwalk file"):
+            StoredWalkSNMPBackend(backend.config._replace(hostname="sw2"),
+                                  backend._logger).walk(".1.3.6.1.2.1.1.1.0")
+
+    def test_index_is_rebuilt(self, backend, tmp_path):
+        assert backend.get(".1.3.6.1.2.1.1.5.0") == b"sw1"
+        index_path = tmp_path / "index" / "sw1"
+        index = index_path.read_bytes()
+
+        # Another process uses the written index
+        cleanup_walk_indexes()
+        assert backend.get(".1.3.6.1.2.1.1.5.0") == b"sw1"
+        assert index_path.read_bytes() == index
+
+        walk_path = tmp_path / "walks" / "sw1"
+        walk_path.write_text(WALK.replace('"sw1"', '"switch1"'))
+        cleanup_walk_indexes()
+        assert backend.get(".1.3.6.1.2.1.1.5.0") == b"switch1"
+        assert index_path.read_bytes() != index
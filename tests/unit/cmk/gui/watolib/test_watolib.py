@@ -100,6 +100,8 @@ def test_registered_configvars():
         'enable_sounds',
         'escape_plugin_output',
         'event_limit',
+        'event_processing_threads',
+        'event_queue_len',
         'eventsocket_queue_len',
         'failed_notification_horizon',
         'hard_query_limit',
@@ -6,6 +6,7 @@
 
 # pylint: disable=protected-access, redefined-outer-name
 
+import time
 from pathlib import Path
 
 import pytest  # type: ignore[import]
@@ -13,10 +14,12 @@ import pytest  # type: ignore[import]
 # No stub file
 from testlib.base import Scenario  # type: ignore[import]
 
+import cmk.utils.paths
 from cmk.utils.log import logger
 from cmk.utils.type_defs import SectionName
 
 import cmk.snmplib.snmp_cache as snmp_cache
+import cmk.snmplib.snmp_modes as snmp_modes
 import cmk.snmplib.snmp_scan as snmp_scan
 from cmk.snmplib.type_defs import ABCSNMPBackend, SNMPHostConfig, SNMPBackend
 from cmk.snmplib.utils import evaluate_snmp_detection
@@ -243,15 +246,16 @@ def test_snmp_scan_fake_description_object__success(backend):
 @pytest.mark.usefixtures("cache_oids")
 def test_snmp_scan_find_plugins__success(backend):
     sections = [(s.name, s.detect_spec) for s in agent_based_register.iter_all_snmp_sections()]
-    found = snmp_scan._find_sections(
+    results = snmp_scan._detect_sections(
         sections,
         on_error="raise",
         backend=backend,
     )
 
     assert sections
-    assert found
-    assert len(sections) > len(found)
+    assert len(results) == len(sections)
+    assert any(results.values())
+    assert not all(results.values())
 
 
 @pytest.mark.usefixtures("scenario")
@@ -264,6 +268,7 @@ def test_gather_available_raw_section_names_defaults(backend, mocker):
         [(s.name, s.detect_spec) for s in agent_based_register.iter_all_snmp_sections()],
         on_error="raise",
         missing_sys_description=False,
+        detection_cache_ttl=0,
         backend=backend,
     ) == {
         SectionName("hr_mem"),
@@ -271,3 +276,126 @@ def test_gather_available_raw_section_names_defaults(backend, mocker):
         SectionName("snmp_os"),
         SectionName("snmp_uptime"),
     }
+
+
+OID_MEM_TOTAL = ".1.3.6.1.4.1.2021.4.5.0"
+OID_MEM_FREE = ".1.3.6.1.4.1.2021.4.6.0"
+
+DETECT_SECTIONS = [
+    (SectionName("linux"), [[(snmp_scan.OID_SYS_DESCR, ".*linux.*", True)]]),
+    (SectionName("net_snmp_mem"), [[(snmp_scan.OID_SYS_OBJ, ".1.3.6.1.4.1.8072.*", True),
+                                    (OID_MEM_TOTAL, ".*", True)]]),
+    (SectionName("cisco"), [[(snmp_scan.OID_SYS_OBJ, ".1.3.6.1.4.1.9.*", True),
+                             (".1.3.6.1.4.1.9.9.9.0", ".*", True)]]),
+    (SectionName("mem_without_free"), [[(OID_MEM_TOTAL, ".*", True), (OID_MEM_FREE, ".*", False)]
+                                      ]),
+]
+
+
+class SNMPValuesTestBackend(SNMPTestBackend):
+    def __init__(self, values):
+        super().__init__(SNMPConfig, logger)
+        self.values = values
+        self.requests = []
+
+    def get_many(self, oids, context_name=None):
+        self.requests.append(list(oids))
+        return [self.values.get(oid) for oid in oids]
+
+
+@pytest.fixture(name="values_backend")
+def fixture_values_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(cmk.utils.paths, "snmp_scan_cache_dir", str(tmp_path / "scan"))
+    monkeypatch.setattr(cmk.utils.paths, "snmp_detection_cache_dir", str(tmp_path / "detection"))
+
+    def backend(sys_description=b"Linux sw1 4.19"):
+        snmp_cache.cleanup_host_caches()
+        return SNMPValuesTestBackend({
+            snmp_scan.OID_SYS_DESCR: sys_description,
+            snmp_scan.OID_SYS_OBJ: b".1.3.6.1.4.1.8072.3.2.10",
+            OID_MEM_TOTAL: b"1024",
+        })
+
+    yield backend
+    snmp_cache.cleanup_host_caches()
+
+
+def _scan(backend, sections=DETECT_SECTIONS, ttl=0):
+    return snmp_scan._snmp_scan(
+        sections,
+        on_error="raise",
+        missing_sys_description=False,
+        detection_cache_ttl=ttl,
+        backend=backend,
+    )
+
+
+def test_snmp_scan_batched_requests(values_backend):
+    backend = values_backend()
+    assert _scan(backend) == {
+        SectionName("linux"),
+        SectionName("net_snmp_mem"),
+        SectionName("mem_without_free"),
+    }
+    # The OIDs needed by several specs are fetched with one request per round. The OID
+    # of "cisco" is not fetched, its spec is decided by the system object already.
+    assert backend.requests == [
+        [snmp_scan.OID_SYS_DESCR, snmp_scan.OID_SYS_OBJ],
+        [OID_MEM_TOTAL],
+        [OID_MEM_FREE],
+    ]
+
+
+class SNMPFailingBatchTestBackend(SNMPValuesTestBackend):
+    def get_many(self, oids, context_name=None):
+        raise TimeoutError()
+
+    def get(self, oid, context_name=None):
+        if oid == OID_MEM_FREE:
+            raise TimeoutError()
+        return self.values.get(oid)
+
+
+def test_prefetch_oids_single_requests_on_failure(values_backend):
+    values_backend()
+    backend = SNMPFailingBatchTestBackend({OID_MEM_TOTAL: b"1024"})
+    snmp_cache.initialize_single_oid_cache(backend.config)
+    snmp_modes.prefetch_oids([OID_MEM_TOTAL, OID_MEM_FREE], context_names=[None], backend=backend)
+
+    # Only the value of the failing OID is lost
+    assert snmp_cache.get_oid_from_single_oid_cache(OID_MEM_TOTAL) == "1024"
+    assert snmp_cache.is_in_single_oid_cache(OID_MEM_FREE)
+    assert snmp_cache.get_oid_from_single_oid_cache(OID_MEM_FREE) is None
+
+
+def test_snmp_scan_detection_cache(values_backend, monkeypatch):
+    found = _scan(values_backend(), ttl=3600)
+
+    backend = values_backend()
+    assert _scan(backend, ttl=3600) == found
+    assert backend.requests == [[snmp_scan.OID_SYS_DESCR, snmp_scan.OID_SYS_OBJ]]
+
+    # Only the changed spec is evaluated again
+    changed_sections = DETECT_SECTIONS[:-1] + [
+        (SectionName("mem_without_free"), [[(OID_MEM_FREE, ".*", False)]]),
+    ]
+    backend = values_backend()
+    assert _scan(backend, sections=changed_sections, ttl=3600) == found
+    assert backend.requests == [[snmp_scan.OID_SYS_DESCR, snmp_scan.OID_SYS_OBJ], [OID_MEM_FREE]]
+
+    # Another device
+    backend = values_backend(sys_description=b"Cisco IOS")
+    assert _scan(backend, ttl=3600) == found - {SectionName("linux")}
+    assert len(backend.requests) == 3
+
+    # Outdated
+    backend = values_backend(sys_description=b"Cisco IOS")
+    now = time.time()
+    monkeypatch.setattr(snmp_cache.time, "time", lambda: now + 3600)
+    _scan(backend, ttl=3600)
+    assert len(backend.requests) == 3
+
+    # Disabled
+    backend = values_backend(sys_description=b"Cisco IOS")
+    _scan(backend)
+    assert len(backend.requests) == 3
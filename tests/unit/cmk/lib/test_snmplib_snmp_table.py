@@ -107,3 +107,51 @@ def test_is_bulkwalk_host(monkeypatch):
     config_cache = ts.apply(monkeypatch)
     assert config_cache.get_host_config("abc").snmp_config("").is_bulkwalk_host is False
     assert config_cache.get_host_config("localhost").snmp_config("").is_bulkwalk_host is True
+
+
+class SNMPColumnsTestBackend(SNMPTestBackend):
+    def __init__(self, snmp_config, logger):
+        super().__init__(snmp_config, logger)
+        self.walked = []
+
+    def walk_columns(self, oids, check_plugin_name=None, table_base_oid=None, context_name=None):
+        self.walked.append(list(oids))
+        return super().walk_columns(oids, check_plugin_name, table_base_oid, context_name)
+
+
+def test_walk_planner():
+    backend = SNMPColumnsTestBackend(SNMPConfig, logger)
+    planner = snmp_table.WalkPlanner()
+    interfaces = BackendSNMPTree(
+        base=".1.3.6.1.2.1.2.2.1",
+        oids=[
+            BackendOIDSpec(SpecialColumn.END, "string", False),
+            BackendOIDSpec("2", "string", False),
+            BackendOIDSpec("10", "string", False),
+        ],
+    )
+    counters = BackendSNMPTree(
+        base=".1.3.6.1.2.1.2.2.1",
+        oids=[
+            BackendOIDSpec("10", "string", False),
+            BackendOIDSpec("16", "string", False),
+        ],
+    )
+
+    table = snmp_table.get_snmp_table(SectionName("interfaces"),
+                                      interfaces,
+                                      backend=backend,
+                                      walk_planner=planner)
+    assert table == [[str(r), "C0FEFE", "C0FEFE"] for r in (1, 2, 3)]
+    assert snmp_table.get_snmp_table(SectionName("counters"),
+                                     counters,
+                                     backend=backend,
+                                     walk_planner=planner) == [["C0FEFE", "C0FEFE"]] * 3
+
+    # The columns of a table are walked together, every OID only once
+    assert backend.walked == [
+        [".1.3.6.1.2.1.2.2.1.2", ".1.3.6.1.2.1.2.2.1.10"],
+        [".1.3.6.1.2.1.2.2.1.16"],
+    ]
+    assert planner.walk_count == 3
+    assert planner.reuse_count == 1
@@ -5,13 +5,18 @@
 # conditions defined in the file COPYING, which is part of this source code package.
 
 # pylint: disable=redefined-outer-name
+import re
+
 import pytest  # type: ignore[import]
 from testlib.base import Scenario
 
 from cmk.utils.type_defs import CheckPluginName
 from cmk.base.check_utils import Service
 from cmk.base.discovered_labels import DiscoveredServiceLabels, ServiceLabel
-from cmk.utils.rulesets.ruleset_matcher import RulesetMatchObject
+from cmk.utils.rulesets.ruleset_matcher import (
+    _first_chars_of_pattern_list,
+    RulesetMatchObject,
+)
 
 
 def test_ruleset_match_object_no_conditions():
@@ -526,3 +531,207 @@ def test_ruleset_optimizer_clear_ruleset_caches(monkeypatch):
     ruleset_optimizer.clear_ruleset_caches()
     assert not ruleset_optimizer._host_ruleset_cache
     assert not ruleset_optimizer._service_ruleset_cache
+
+
+@pytest.mark.parametrize("patterns,expected_result", [
+    (None, None),
+    ([], None),
+    (["CPU load"], {"C"}),
+    ([{"$regex": "CPU"}, "Interface"], {"C", "I"}),
+    (["C*PU"], None),
+    (["C?PU"], None),
+    (["C{0,1}PU"], None),
+    (["CP+U"], {"C"}),
+    (["CPU|Memory"], None),
+    (["(?i)cpu"], None),
+    ([".*"], None),
+    (["\\.CPU"], None),
+    ({"$nor": ["CPU"]}, None),
+])
+def test_first_chars_of_pattern_list(patterns, expected_result):
+    assert _first_chars_of_pattern_list(patterns) == (None if expected_result is None else
+                                                      frozenset(expected_result))
+
+
+service_description_ruleset = [
+    {
+        "value": "cpu",
+        "condition": {
+            "service_description": [{
+                "$regex": "CPU"
+            }],
+        },
+    },
+    {
+        "value": "cpu_or_mem_host1",
+        "condition": {
+            "host_name": ["host1"],
+            "service_description": [{
+                "$regex": "CPU load$"
+            }, {
+                "$regex": "Memory"
+            }],
+        },
+    },
+    {
+        "value": "not_cpu",
+        "condition": {
+            "service_description": {
+                "$nor": [{
+                    "$regex": "CPU"
+                }]
+            },
+        },
+    },
+    {
+        "value": "disabled",
+        "condition": {
+            "service_description": [{
+                "$regex": "CPU"
+            }],
+        },
+        "options": {
+            "disabled": True,
+        },
+    },
+    {
+        "value": "if_or_empty",
+        "condition": {
+            "service_description": [{
+                "$regex": "Interface|$"
+            }],
+        },
+    },
+    {
+        "value": "case_insensitive_cpu",
+        "condition": {
+            "service_description": [{
+                "$regex": "(?i:cpu)"
+            }],
+        },
+    },
+    {
+        "value": "optional_m",
+        "condition": {
+            "host_name": ["host2"],
+            "service_description": [{
+                "$regex": "M?emory"
+            }],
+        },
+    },
+    {
+        "value": "all",
+        "condition": {},
+    },
+]
+
+
+def _matching_values_linear(hostname, service_description):
+    values = []
+    for rule in service_description_ruleset:
+        if rule.get("options", {}).get("disabled"):
+            continue
+        if hostname not in rule["condition"].get("host_name", [hostname]):
+            continue
+        patterns = rule["condition"].get("service_description")
+        if patterns:
+            negate = isinstance(patterns, dict)
+            if negate:
+                patterns = patterns["$nor"]
+            match = any(re.match(p["$regex"], service_description) for p in patterns)
+            if match is negate:
+                continue
+        values.append(rule["value"])
+    return values
+
+
+@pytest.mark.parametrize("service_description", [
+    "CPU load",
+    "CPU utilization",
+    "cpu load",
+    "Memory",
+    "emory",
+    "Interface 1",
+    "",
+    "Uptime",
+])
+def test_ruleset_matcher_get_service_ruleset_values_indexed(monkeypatch, service_description):
+    ts = Scenario()
+    ts.add_host("host1")
+    ts.add_host("host2")
+    config_cache = ts.apply(monkeypatch)
+    matcher = config_cache.ruleset_matcher
+
+    for hostname in ["host1", "host2"]:
+        match_object = RulesetMatchObject(hostname, service_description)
+        expected_result = _matching_values_linear(hostname, service_description)
+        assert list(
+            matcher.get_service_ruleset_values(match_object,
+                                               ruleset=service_description_ruleset,
+                                               is_binary=False)) == expected_result
+        # And once more from the caches
+        assert list(
+            matcher.get_service_ruleset_values(match_object,
+                                               ruleset=service_description_ruleset,
+                                               is_binary=False)) == expected_result
+
+
+def test_service_ruleset_index_candidates(monkeypatch):
+    ts = Scenario()
+    ts.add_host("host1")
+    ts.add_host("host2")
+    ruleset_optimizer = ts.apply(monkeypatch).ruleset_matcher.ruleset_optimizer
+    ruleset_index = ruleset_optimizer.get_service_ruleset(service_description_ruleset, False,
+                                                          False)
+
+    values = [rule[0] for rule in ruleset_index.rules]
+    assert [values[i] for i in ruleset_index.candidates("host1", "CPU load")] == [
+        "cpu",
+        "cpu_or_mem_host1",
+        "not_cpu",
+        "if_or_empty",
+        "case_insensitive_cpu",
+        "all",
+    ]
+    assert [values[i] for i in ruleset_index.candidates("host2", "Uptime")] == [
+        "not_cpu",
+        "if_or_empty",
+        "case_insensitive_cpu",
+        "optional_m",
+        "all",
+    ]
+
+
+def test_ruleset_matcher_bounded_caches(monkeypatch):
+    ts = Scenario()
+    ts.add_host("host1")
+    ts.add_host("host2")
+    ts.set_option("ruleset_matcher_cache_sizes", {
+        "service_match": 1,
+        "service_ruleset": 1,
+    })
+    config_cache = ts.apply(monkeypatch)
+    matcher = config_cache.ruleset_matcher
+
+    for _round in range(2):
+        for hostname in ["host1", "host2"]:
+            for service_description in ["CPU load", "Memory", "Uptime"]:
+                assert list(
+                    matcher.get_service_ruleset_values(
+                        RulesetMatchObject(hostname, service_description),
+                        ruleset=service_description_ruleset,
+                        is_binary=False)) == _matching_values_linear(
+                            hostname, service_description)
+                # Another ruleset evicts the preprocessed ruleset above
+                assert list(
+                    matcher.get_service_ruleset_values(
+                        RulesetMatchObject(hostname, service_description, {}),
+                        ruleset=service_label_ruleset,
+                        is_binary=False)) == ["hu", "BLA"]
+
+    statistics = {stats.name: stats for stats in matcher.cache_statistics()}
+    assert statistics["service_match"].size == 1
+    assert statistics["service_match"].evictions > 0
+    assert statistics["service_ruleset"].size == 1
+    assert statistics["service_ruleset"].evictions == 23
+    assert statistics["host_ruleset"].maxsize == 4096
@@ -15,6 +15,8 @@ pathlib_paths = [
     "discovered_host_labels_dir",
     "piggyback_dir",
     "piggyback_source_dir",
+    "piggyback_spool_dir",
+    "snmpwalk_index_dir",
     "notifications_dir",
     "pnp_templates_dir",
     "doc_dir",
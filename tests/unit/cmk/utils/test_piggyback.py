@@ -22,6 +22,8 @@ def test_config():
 
     for f1 in piggyback_dir.glob("*/*"):
         f1.unlink()
+    for f1 in cmk.utils.paths.piggyback_spool_dir.glob("*"):
+        f1.unlink()
 
     source_file = piggyback_dir / "test-host" / "source1"
     with source_file.open(mode="wb") as f2:
@@ -432,3 +434,136 @@ def test_get_piggyback_matching_time_settings(time_settings, expected_time_setti
         piggyback._get_matching_time_settings(
             ["source-host"], "piggybacked-host",
             time_settings).keys()) == sorted(expected_time_setting_keys)
+
+
+def test_store_piggyback_raw_data_spool():
+    time_settings: piggyback.PiggybackTimeSettings = [(None, "max_cache_age",
+                                                       piggyback_max_cachefile_age)]
+
+    piggyback.store_piggyback_raw_data("source2", {
+        "pig": [b"<<<check_mk>>>", b"pig"],
+        "test-host": [b"<<<check_mk>>>", b"lulu"],
+    },
+                                       spool=True)
+
+    assert list(cmk.utils.paths.piggyback_dir.glob("*/source2")) == []
+    assert [p.name for p in cmk.utils.paths.piggyback_spool_dir.glob("[!.]*")] == ["source2"]
+
+    raw_data_infos = piggyback.get_piggyback_raw_data("test-host", time_settings)
+    assert sorted((i.source_hostname, i.raw_data) for i in raw_data_infos) == [
+        ("source1", b"<<<check_mk>>>\nlala\n"),
+        ("source2", b"<<<check_mk>>>\nlulu\n"),
+    ]
+    for raw_data_info in piggyback.get_piggyback_raw_data("pig", time_settings):
+        assert raw_data_info.source_hostname == "source2"
+        assert raw_data_info.file_path.endswith("/piggyback_spool/source2")
+        assert raw_data_info.successfully_processed is True
+        assert raw_data_info.reason == "Successfully processed from source 'source2'"
+        assert raw_data_info.raw_data == b"<<<check_mk>>>\npig\n"
+
+    assert sorted(piggyback.get_source_hostnames()) == ["source1", "source2", "source2"]
+    assert sorted(piggyback.get_source_hostnames("test-host")) == ["source1", "source2"]
+
+
+def test_store_piggyback_raw_data_spool_not_updated():
+    time_settings: piggyback.PiggybackTimeSettings = [
+        (None, "max_cache_age", piggyback_max_cachefile_age),
+        ("pig", "validity_period", 1000),
+    ]
+
+    piggyback.store_piggyback_raw_data("source2", {
+        "pig": [b"<<<check_mk>>>", b"pig"],
+        "test-host": [b"<<<check_mk>>>", b"lulu"],
+    },
+                                       spool=True)
+    # Status files are compared with a resolution of seconds
+    piggyback._store_spool_segment("source2", {"pig": [b"<<<check_mk>>>", b"pig"]},
+                                   time.time() - 10)
+    piggyback.store_piggyback_raw_data("source2", {"test-host": [b"<<<check_mk>>>", b"lili"]},
+                                       spool=True)
+
+    # The data of "pig" is kept, like the file of a piggybacked host not sent anymore
+    for raw_data_info in piggyback.get_piggyback_raw_data("pig", time_settings):
+        assert raw_data_info.successfully_processed is True
+        assert raw_data_info.reason.startswith(
+            "Piggyback file not updated by source 'source2' (still valid")
+        assert raw_data_info.raw_data == b"<<<check_mk>>>\npig\n"
+
+    assert sorted(piggyback.get_source_and_piggyback_hosts(time_settings)) == [
+        ("source1", "test-host"),
+        ("source2", "pig"),
+        ("source2", "test-host"),
+    ]
+    assert not piggyback.has_piggyback_raw_data("pig", time_settings[:1])
+
+
+def test_store_piggyback_raw_data_spool_migration():
+    time_settings: piggyback.PiggybackTimeSettings = [(None, "max_cache_age",
+                                                       piggyback_max_cachefile_age)]
+    old_file = cmk.utils.paths.piggyback_dir / "test-host" / "source1"
+    os.utime(str(old_file), (time.time() - 10, time.time() - 10))
+
+    piggyback.store_piggyback_raw_data("source1", {"test-host": [b"<<<check_mk>>>", b"lulu"]},
+                                       spool=True)
+
+    # The newer data of the source is used
+    raw_data_infos = piggyback.get_piggyback_raw_data("test-host", time_settings)
+    assert [(i.source_hostname, i.successfully_processed, i.raw_data) for i in raw_data_infos
+           ] == [("source1", True, b"<<<check_mk>>>\nlulu\n")]
+
+    # The file of the old layout is outdated now
+    piggyback.cleanup_piggyback_files(time_settings)
+    assert not old_file.exists()
+    assert [i.raw_data for i in piggyback.get_piggyback_raw_data("test-host", time_settings)
+           ] == [b"<<<check_mk>>>\nlulu\n"]
+
+
+def test_cleanup_piggyback_files_spool():
+    piggyback.store_piggyback_raw_data("source2", {"pig": [b"<<<check_mk>>>", b"pig"]},
+                                       spool=True)
+    piggyback.cleanup_piggyback_files([(None, "max_cache_age", piggyback_max_cachefile_age)])
+    assert (cmk.utils.paths.piggyback_spool_dir / "source2").exists()
+
+    piggyback.cleanup_piggyback_files([(None, 'max_cache_age', -1)])
+    assert list(cmk.utils.paths.piggyback_spool_dir.glob("[!.]*")) == []
+    assert list(cmk.utils.paths.piggyback_source_dir.glob("*")) == []
+    assert not (cmk.utils.paths.piggyback_dir / "pig").exists()
+
+
+def test_get_piggyback_raw_data_spool_loads_marked_segments(monkeypatch):
+    time_settings: piggyback.PiggybackTimeSettings = [(None, "max_cache_age",
+                                                       piggyback_max_cachefile_age)]
+    piggyback.store_piggyback_raw_data("source2", {"pig": [b"<<<check_mk>>>", b"pig"]},
+                                       spool=True)
+    piggyback.store_piggyback_raw_data("source3", {"other": [b"<<<check_mk>>>", b"other"]},
+                                       spool=True)
+    assert (cmk.utils.paths.piggyback_dir / "pig" / ".source2.spool").exists()
+
+    loaded = []
+    load = piggyback._SpoolSegment.load
+    monkeypatch.setattr(piggyback._SpoolSegment, "load",
+                        lambda segment_path: loaded.append(segment_path.name) or load(segment_path))
+
+    assert [i.source_hostname for i in piggyback.get_piggyback_raw_data("pig", time_settings)
+           ] == ["source2"]
+    # Once for the lookup, once for reading the data
+    assert loaded == ["source2", "source2"]
+
+    del loaded[:]
+    assert [i.source_hostname for i in piggyback.get_piggyback_raw_data("test-host", time_settings)
+           ] == ["source1"]
+    assert loaded == []
+
+
+def test_rename_spool_source():
+    time_settings: piggyback.PiggybackTimeSettings = [(None, "max_cache_age",
+                                                       piggyback_max_cachefile_age)]
+    piggyback.store_piggyback_raw_data("source2", {"pig": [b"<<<check_mk>>>", b"pig"]},
+                                       spool=True)
+
+    assert piggyback.rename_spool_source("source2", "source3")
+    assert not piggyback.rename_spool_source("source2", "source3")
+    assert not (cmk.utils.paths.piggyback_dir / "pig" / ".source2.spool").exists()
+    assert [(i.source_hostname, i.raw_data)
+            for i in piggyback.get_piggyback_raw_data("pig", time_settings)
+           ] == [("source3", b"<<<check_mk>>>\npig\n")]
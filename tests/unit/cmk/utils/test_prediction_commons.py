@@ -4,9 +4,13 @@
 # This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
 # conditions defined in the file COPYING, which is part of this source code package.
 
+import numpy as np  # type: ignore[import]
 import pytest  # type: ignore[import]
 
+import livestatus
+
 import cmk.utils.prediction as prediction
+from cmk.utils.exceptions import MKGeneralException
 
 
 @pytest.mark.parametrize("filter_condition, values, join, result", [
@@ -60,6 +64,88 @@ def test_time_series_upsampling(rrddata, twindow, shift, upsampled):
     assert ts.bfill_upsample(twindow, shift) == upsampled
 
 
+@pytest.mark.parametrize("rrddata, twindow, shift, upsampled", [
+    ([10, 20, 10, 20], (10, 20, 10), 0, [20.0]),
+    ([0, 120, 40, 25, None, 105],
+     (300, 400, 10), 300, [25, 25, 25, 25, np.nan, np.nan, np.nan, np.nan, 105, 105]),
+    ([0, 120, 40, 25, 65, 105], (330, 410, 10), 300, [25, 65, 65, 65, 65, 105, 105, 105]),
+])
+def test_time_series_upsampling_array(rrddata, twindow, shift, upsampled):
+    ts = prediction.TimeSeries(rrddata)
+    upsampled_array = ts.bfill_upsample_array(twindow, shift)
+    assert upsampled_array.dtype == float
+    np.testing.assert_array_equal(upsampled_array, np.array(upsampled, dtype=float))
+
+
+@pytest.mark.parametrize("twindow, shift", [
+    ((0, 200, 40), 0),
+    ((300, 500, 10), 300),
+])
+def test_time_series_upsampling_out_of_range(twindow, shift):
+    ts = prediction.TimeSeries([0, 120, 40, 25, 65, 105])
+    with pytest.raises(IndexError):
+        ts.bfill_upsample(twindow, shift)
+
+
+@pytest.fixture(name="livestatus_queries")
+def fixture_livestatus_queries(monkeypatch):
+    queries = []
+
+    def query(self, query, add_headers=""):
+        queries.append(str(query))
+        columns = str(query).split("\n")[1][len("Columns: "):].split()
+        # Answer every rrddata column with one value for the requested time range
+        return [[[int(c.split(":")[3]), int(c.split(":")[4]), 60,
+                  float(i)] for i, c in enumerate(columns)]]
+
+    monkeypatch.setattr(livestatus.SingleSiteConnection, "query", query)
+    return queries
+
+
+def test_get_rrd_data_of_time_ranges(livestatus_queries):
+    time_ranges = [(1200, 1260), (600, 660), (0, 60)]
+    result = prediction.get_rrd_data_of_time_ranges("heute", "CPU load", ["load1", "load15"],
+                                                    "MAX", time_ranges)
+
+    assert len(livestatus_queries) == 1
+    assert livestatus_queries[0] == (
+        "GET services\n"
+        "Columns: rrddata:m1:load1.max:1200:1260:1:400 rrddata:m1:load1.max:600:660:1:400 "
+        "rrddata:m1:load1.max:0:60:1:400 rrddata:m1:load15.max:1200:1260:1:400 "
+        "rrddata:m1:load15.max:600:660:1:400 rrddata:m1:load15.max:0:60:1:400\n"
+        "Filter: host_name = heute\n"
+        "Filter: service_description = CPU load\n"
+        "OutputFormat: python\n")
+    assert result == {
+        "load1": [
+            prediction.TimeSeries([0.0], (1200, 1260, 60)),
+            prediction.TimeSeries([1.0], (600, 660, 60)),
+            prediction.TimeSeries([2.0], (0, 60, 60)),
+        ],
+        "load15": [
+            prediction.TimeSeries([3.0], (1200, 1260, 60)),
+            prediction.TimeSeries([4.0], (600, 660, 60)),
+            prediction.TimeSeries([5.0], (0, 60, 60)),
+        ],
+    }
+
+
+def test_rrd_datacolum(livestatus_queries):
+    rrd_column = prediction.rrd_datacolum("heute", "CPU load", "load15", "MAX")
+    assert rrd_column([(1200, 1260), (600, 660)]) == [
+        prediction.TimeSeries([0.0], (1200, 1260, 60)),
+        prediction.TimeSeries([1.0], (600, 660, 60)),
+    ]
+    assert len(livestatus_queries) == 1
+
+
+def test_get_rrd_data_with_nagios_core(monkeypatch):
+    monkeypatch.setattr(livestatus.SingleSiteConnection, "query",
+                        lambda self, query, add_headers="": [[None]])
+    with pytest.raises(MKGeneralException, match="Nagios Core"):
+        prediction.get_rrd_data("heute", "CPU load", "load15", "MAX", 0, 60)
+
+
 @pytest.mark.parametrize("rrddata, twindow, cf, downsampled", [
     ([10, 25, 5, 15, 20, 25], (10, 30, 10), "average", [17.5, 25]),
     ([10, 25, 5, 15, 20, 25], (10, 30, 10), "max", [20, 25]),
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (C) 2019 tribe29 GmbH - License: GNU General Public License v2
+# This file is part of Checkmk (https://checkmk.com). It is subject to the terms and
+# conditions defined in the file COPYING, which is part of this source code package.
+
+import pytest  # type: ignore[import]
+
+from cmk.utils.caching import CacheStatistics, format_cache_statistics, LRUCache
+
+
+def test_lru_cache_hits_and_misses():
+    cache: LRUCache[str, int] = LRUCache("test")
+    cache["a"] = 1
+
+    assert cache["a"] == 1
+    assert cache.get("b") is None
+    with pytest.raises(KeyError):
+        _ = cache["b"]
+    assert "b" not in cache
+
+    stats = cache.statistics()
+    assert (stats.size, stats.hits, stats.misses, stats.evictions) == (1, 1, 2, 0)
+    assert stats.hit_rate == pytest.approx(1 / 3)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache: LRUCache[str, int] = LRUCache("test", maxsize=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache["a"] == 1
+    cache["c"] = 3
+
+    assert list(cache) == ["a", "c"]
+    assert cache.evictions == 1
+
+    cache["a"] = 4
+    cache["d"] = 5
+    assert list(cache) == ["a", "d"]
+    assert cache.evictions == 2
+
+
+def test_lru_cache_unbounded():
+    cache: LRUCache[int, int] = LRUCache("test")
+    for i in range(1000):
+        cache[i] = i
+    assert len(cache) == 1000
+    assert cache.evictions == 0
+
+
+def test_lru_cache_invalid_maxsize():
+    with pytest.raises(ValueError):
+        LRUCache("test", maxsize=0)
+
+
+def test_lru_cache_clear_keeps_statistics():
+    cache: LRUCache[str, int] = LRUCache("test")
+    cache["a"] = 1
+    assert cache["a"] == 1
+    cache.clear()
+
+    assert not cache
+    assert cache.hits == 1
+
+
+def test_lru_cache_estimate_memory():
+    cache: LRUCache[int, str] = LRUCache("test")
+    empty = cache.estimate_memory()
+    for i in range(1000):
+        cache[i] = "x" * 100
+    assert cache.estimate_memory() > empty + 1000 * 100
+
+
+def test_format_cache_statistics():
+    assert format_cache_statistics([
+        CacheStatistics("a", None, 1, 3, 1, 0, 1024 * 1024),
+        CacheStatistics("b", 10, 10, 0, 0, 5, 0),
+    ]) == ("a: 1/unlimited entries, 3 hits, 1 misses (hit rate: 75.0%), 0 evictions, ~1.0 MB\n"
+           "b: 10/10 entries, 0 hits, 0 misses (hit rate: 0.0%), 5 evictions, ~0.0 MB")
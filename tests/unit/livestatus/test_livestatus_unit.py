@@ -9,6 +9,8 @@
 import errno
 import socket
 import ssl
+import threading
+import time
 from contextlib import closing
 
 import pytest  # type: ignore[import]
@@ -201,3 +203,120 @@ def test_create_socket_no_cert(tmp_path):
     with pytest.raises(livestatus.MKLivestatusConfigError,
                        match="(unknown error|no certificate or crl found)"):
         live._create_socket(socket.AF_INET)
+
+
+class FakeSocket:
+    """Returns the data in small packets, like a slow network does"""
+    def __init__(self, data, packet_size=7):
+        self._data = data
+        self._packet_size = packet_size
+        self.sent = b""
+
+    def settimeout(self, timeout):
+        pass
+
+    def send(self, data):
+        self.sent += data
+
+    def recv_into(self, buffer, nbytes=0):
+        length = min(nbytes or len(buffer), self._packet_size, len(self._data))
+        buffer[:length] = self._data[:length]
+        self._data = self._data[length:]
+        return length
+
+
+def _connection(response):
+    live = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    live.socket = FakeSocket(b"200 %11d\n" % len(response) + response)
+    return live
+
+
+def test_receive_data():
+    live = livestatus.SingleSiteConnection("unix:/tmp/xyz")
+    data = bytes(range(256)) * 10
+    live.socket = FakeSocket(data + b"next")
+    assert live.receive_data(len(data)) == data
+    assert live.receive_data(4) == b"next"
+
+    with pytest.raises(livestatus.MKLivestatusSocketClosed):
+        live.receive_data(1)
+
+
+@pytest.mark.parametrize("output_format, response", [
+    ("python3", b'[[u"h\\u00e4st",1,2.5,None,[u"a",u"b"],{u"x":u"y"}],\n[u"b",0,0,None,[],{}]]\n'),
+    ("json", b'[["h\\u00e4st",1,2.5,null,["a","b"],{"x":"y"}],\n["b",0,0,null,[],{}]]\n'),
+])
+def test_query_output_format(output_format, response):
+    live = _connection(response)
+    result = live.query(livestatus.Query("GET hosts\n", output_format=output_format))
+
+    assert result == [[u"häst", 1, 2.5, None, ["a", "b"], {"x": "y"}], ["b", 0, 0, None, [], {}]]
+    assert b"\nOutputFormat: %s\n" % output_format.encode("ascii") in live.socket.sent
+
+
+def test_query_malformed_output():
+    live = _connection(b'[[u"abc"')
+    with pytest.raises(livestatus.MKLivestatusSocketError, match="Malformed output"):
+        live.query("GET hosts\n")
+
+
+def test_query_unsupported_output_format():
+    with pytest.raises(livestatus.MKLivestatusConfigError, match="Unsupported output format"):
+        livestatus.Query("GET hosts\n", output_format="csv")
+
+
+def _multisite_connection(tmp_path, sites):
+    """Connects to sites answering the query by the given functions"""
+    live = livestatus.MultiSiteConnection({})
+    for sitename, answer in sites.items():
+        client, server = socket.socketpair()
+        connection = livestatus.SingleSiteConnection("unix:%s" % (tmp_path / sitename))
+        connection.socket = client
+        live.connections.append((sitename, {"socket": connection.socketurl}, connection))
+        threading.Thread(target=answer, args=(server,), daemon=True).start()
+    return live
+
+
+def _answer(rows, delay=0.0, packet_size=3):
+    def answer(server):
+        server.recv(1024)
+        time.sleep(delay)
+        response = repr(rows).encode("utf-8")
+        data = b"200 %11d\n" % len(response) + response
+        for start in range(0, len(data), packet_size):
+            server.sendall(data[start:start + packet_size])
+
+    return answer
+
+
+def _close(server):
+    server.recv(1024)
+    server.close()
+
+
+def test_query_parallel(tmp_path):
+    live = _multisite_connection(tmp_path, {
+        "slow": _answer([["a", 1]], delay=0.2),
+        "fast": _answer([["b", 2], ["c", 3]]),
+        "closed": _close,
+        "empty": _answer([]),
+    })
+    live.set_prepend_site(True)
+
+    assert live.query("GET hosts\n") == [["slow", "a", 1], ["fast", "b", 2], ["fast", "c", 3]]
+    assert live.alive_sites() == ["slow", "fast", "empty"]
+    assert list(live.dead_sites()) == ["closed"]
+
+
+def test_query_parallel_response_timeout(tmp_path):
+    live = _multisite_connection(tmp_path, {
+        "hanging": _answer([["a", 1]], delay=10),
+        "fast": _answer([["b", 2]]),
+    })
+    live.set_response_timeout(0.2)
+
+    before = time.time()
+    assert live.query("GET hosts\n") == [["b", 2]]
+    assert time.time() - before < 5
+    assert live.alive_sites() == ["fast"]
+    assert "No response within" in str(live.dead_sites()["hanging"]["exception"])